@@ -10,6 +10,7 @@
  * - 每个心跳都触发统一电子表格同步 workflow（项目结算 / 合同完工 / 支付记录 / 吉柿工队结算财务台账 / 材料补货）
  * - 08:30 额外触发待预约工单提醒
  * - 09:00 额外触发 SLA 日报
+ * - 23:30 额外触发 outbox 归档（outbox-maintenance workflow）
  */
 
 const CRON_HEARTBEAT = "0,30 0-15 * * *";
@@ -68,6 +69,7 @@ function getWorkflowNames(env) {
     smartsheetSync: env.GITHUB_WORKFLOW_SMARTSHEET_SYNC || 'smartsheet-sync.yml',
     pendingOrders: env.GITHUB_WORKFLOW_PENDING_ORDERS || 'pending-orders-reminder.yml',
     dailyServiceReport: env.GITHUB_WORKFLOW_DAILY_SERVICE_REPORT || 'daily-service-report.yml',
+    outboxMaintenance: env.GITHUB_WORKFLOW_OUTBOX_MAINTENANCE || 'outbox-maintenance.yml',
   };
 }
 
@@ -77,6 +79,7 @@ function getTimeBasedScheduleConfig(env) {
     "08:00-23:30/30m": [workflows.signBroadcast, workflows.performanceBroadcast, workflows.housekeeperOfflineBroadcast, workflows.smartsheetSync],
     "08:30": [workflows.pendingOrders],
     "09:00": [workflows.dailyServiceReport],
+    "23:30": [workflows.outboxMaintenance],
   };
 }
 
@@ -127,6 +130,10 @@ function getTargetWorkflows(env, options = {}) {
     return [createWorkflowDispatch(workflows.dailyServiceReport)];
   }
 
+  if (options.target === 'outbox-retention') {
+    return [createWorkflowDispatch(workflows.outboxMaintenance, { task: 'outbox-retention' })];
+  }
+
   if (options.target === 'all') {
     return [
       createWorkflowDispatch(workflows.signBroadcast),
@@ -155,6 +162,10 @@ function getTargetWorkflows(env, options = {}) {
     targetWorkflows.push(createWorkflowDispatch(workflows.dailyServiceReport));
   }
 
+  if (shanghai.hour === 23 && shanghai.minute === 30) {
+    targetWorkflows.push(createWorkflowDispatch(workflows.outboxMaintenance, { task: 'outbox-retention' }));
+  }
+
   return targetWorkflows;
 }
 
@@ -9,17 +9,17 @@ from modules.core.beijing_jobs import performance_broadcast_beijing
 from modules.core.beijing_jobs import signing_broadcast_beijing
 from modules.core.pending_orders_jobs import send_pending_orders_reminder_v2
 from modules.core.housekeeper_offline_jobs import broadcast_housekeeper_offline_v2
-from modules.core.project_settlement_jobs import sync_contract_completion_smartsheet_v2
-from modules.core.project_settlement_jobs import sync_crew_settlement_finance_ledger_smartsheet_v2
-from modules.core.project_settlement_jobs import sync_material_replenishment_smartsheet_v2
-from modules.core.project_settlement_jobs import sync_payment_records_smartsheet_v2
-from modules.core.project_settlement_jobs import sync_project_settlement_smartsheet_v2
+from modules.core.outbox_drain import drain_outbox_v2
+from modules.core.outbox_retention import archive_outbox_v2
+from modules.core.project_settlement_jobs import sync_all_smartsheets_v2
 from modules.core.sla_jobs import generate_daily_service_report_v2
+from modules.core.task_lease import with_task_lease
 
 
 setup_logging()
 
 
+@with_task_lease("beijing-sign-broadcast")
 def run_beijing_sign_broadcast_task():
     """北京签约播报常驻任务（无月份限制）。"""
     try:
@@ -31,6 +31,7 @@ def run_beijing_sign_broadcast_task():
         logging.error(traceback.format_exc())
 
 
+@with_task_lease("beijing-performance-broadcast")
 def run_beijing_performance_broadcast_task():
     """北京业绩播报常驻任务（无月份限制）。"""
     try:
@@ -42,6 +43,7 @@ def run_beijing_performance_broadcast_task():
         logging.error(traceback.format_exc())
 
 
+@with_task_lease("pending-orders-reminder")
 def run_pending_orders_reminder_task():
     """待预约工单提醒常驻任务。"""
     try:
@@ -53,6 +55,7 @@ def run_pending_orders_reminder_task():
         logging.error(traceback.format_exc())
 
 
+@with_task_lease("housekeeper-offline-broadcast")
 def run_housekeeper_offline_broadcast_task():
     """管家下线企业微信群播报任务。"""
     try:
@@ -64,6 +67,7 @@ def run_housekeeper_offline_broadcast_task():
         logging.error(traceback.format_exc())
 
 
+@with_task_lease("daily-service-report")
 def run_daily_service_report_task():
     """SLA 日报/周报任务。"""
     try:
@@ -75,72 +79,53 @@ def run_daily_service_report_task():
         logging.error(traceback.format_exc())
 
 
-def run_project_settlement_smartsheet_task():
-    """项目结算企业微信电子表格同步任务。"""
-    try:
-        logging.info("开始执行项目结算电子表格同步任务")
-        sync_project_settlement_smartsheet_v2()
-        logging.info("项目结算电子表格同步任务执行完成")
-    except Exception as e:
-        logging.error(f"执行项目结算电子表格同步任务失败: {e}")
-        logging.error(traceback.format_exc())
-
-
-def run_contract_completion_smartsheet_task():
-    """合同完工企业微信电子表格同步任务。"""
-    try:
-        logging.info("开始执行合同完工电子表格同步任务")
-        sync_contract_completion_smartsheet_v2()
-        logging.info("合同完工电子表格同步任务执行完成")
-    except Exception as e:
-        logging.error(f"执行合同完工电子表格同步任务失败: {e}")
-        logging.error(traceback.format_exc())
+def run_smartsheet_sync_task():
+    """企业微信电子表格统一同步任务（项目结算、合同完工、支付记录、财务台账、材料补货）。
 
-
-def run_payment_records_smartsheet_task():
-    """支付记录企业微信电子表格同步任务。"""
+    租约在 sync_all_smartsheets_v2 内按卡片获取，与 run_scheduled_task.py 的单卡任务共用同一租约键。
+    """
     try:
-        logging.info("开始执行支付记录电子表格同步任务")
-        sync_payment_records_smartsheet_v2()
-        logging.info("支付记录电子表格同步任务执行完成")
+        logging.info("开始执行电子表格统一同步任务")
+        sync_all_smartsheets_v2()
+        logging.info("电子表格统一同步任务执行完成")
     except Exception as e:
-        logging.error(f"执行支付记录电子表格同步任务失败: {e}")
+        logging.error(f"执行电子表格统一同步任务失败: {e}")
         logging.error(traceback.format_exc())
 
 
-def run_crew_settlement_finance_ledger_smartsheet_task():
-    """吉柿工队结算财务台账企业微信电子表格同步任务。"""
+@with_task_lease("outbox-drain")
+def run_outbox_drain_task(budget_seconds=None):
+    """跨活动 outbox 补发任务（按墙钟预算退出）。"""
     try:
-        logging.info("开始执行吉柿工队结算财务台账电子表格同步任务")
-        sync_crew_settlement_finance_ledger_smartsheet_v2()
-        logging.info("吉柿工队结算财务台账电子表格同步任务执行完成")
+        logging.info("开始执行 outbox 补发任务")
+        drain_outbox_v2(budget_seconds=budget_seconds)
+        logging.info("outbox 补发任务执行完成")
     except Exception as e:
-        logging.error(f"执行吉柿工队结算财务台账电子表格同步任务失败: {e}")
+        logging.error(f"执行 outbox 补发任务失败: {e}")
         logging.error(traceback.format_exc())
 
 
-def run_material_replenishment_smartsheet_task():
-    """材料补货企业微信电子表格同步任务。"""
+@with_task_lease("outbox-retention")
+def run_outbox_retention_task():
+    """outbox 保留策略任务（归档已发送 / 过期死信消息）。"""
     try:
-        logging.info("开始执行材料补货电子表格同步任务")
-        sync_material_replenishment_smartsheet_v2()
-        logging.info("材料补货电子表格同步任务执行完成")
+        logging.info("开始执行 outbox 归档任务")
+        archive_outbox_v2()
+        logging.info("outbox 归档任务执行完成")
     except Exception as e:
-        logging.error(f"执行材料补货电子表格同步任务失败: {e}")
+        logging.error(f"执行 outbox 归档任务失败: {e}")
         logging.error(traceback.format_exc())
 
-
 # 常驻任务
 schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_beijing_sign_broadcast_task)
 schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_beijing_performance_broadcast_task)
 schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_pending_orders_reminder_task)
 schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_housekeeper_offline_broadcast_task)
-schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_project_settlement_smartsheet_task)
-schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_contract_completion_smartsheet_task)
-schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_payment_records_smartsheet_task)
-schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_crew_settlement_finance_ledger_smartsheet_task)
-schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_material_replenishment_smartsheet_task)
+schedule.every(RUN_JOBS_SERIALLY_SCHEDULE).minutes.do(run_smartsheet_sync_task)
 schedule.every().day.at("08:10").do(run_daily_service_report_task)
+schedule.every().day.at("03:30").do(run_outbox_retention_task)
+# 各任务自身只补发本活动前 NOTIFICATION_OUTBOX_BATCH_LIMIT 条，积压由补发任务按预算跨活动清空
+schedule.every().hour.do(run_outbox_drain_task)
 
 
 if __name__ == "__main__":
@@ -10,53 +10,55 @@
 - 标准化的数据模型
 """
 
-# 数据模型
-from .data_models import (
-    HousekeeperStats,
-    ProcessingConfig,
-    ContractData,
-    RewardInfo,
-    PerformanceRecord,
-    JobConfig,
-    OrderType,
-    City
-)
-
-# 存储层
-from .storage import (
-    PerformanceDataStore,
-    SQLitePerformanceDataStore,
-    create_data_store
-)
-
-# 处理管道
-from .processing_pipeline import (
-    DataProcessingPipeline,
-    PipelineValidator,
-    create_processing_pipeline
-)
-
-# 奖励计算
-from .reward_calculator import (
-    RewardCalculator,
-    create_reward_calculator
-)
-
-# 记录构建
-from .record_builder import (
-    RecordBuilder,
-    BatchRecordBuilder,
-    create_record_builder,
-    create_batch_record_builder
-)
-
-# 配置适配器
-from .config_adapter import (
-    ConfigAdapter,
-    get_reward_config,
-    get_bonus_pool_ratio,
-    validate_all_configs
-)
+# 导出名 -> 子模块；按需导入（PEP 562），只用存储层的任务不必加载处理管道与奖励计算
+_LAZY_EXPORTS = {
+    # 数据模型
+    'HousekeeperStats': 'data_models',
+    'ProcessingConfig': 'data_models',
+    'ContractData': 'data_models',
+    'RewardInfo': 'data_models',
+    'PerformanceRecord': 'data_models',
+    'JobConfig': 'data_models',
+    'OrderType': 'data_models',
+    'City': 'data_models',
+
+    # 存储层
+    'PerformanceDataStore': 'storage',
+    'SQLitePerformanceDataStore': 'storage',
+    'create_data_store': 'storage',
+
+    # 处理管道
+    'DataProcessingPipeline': 'processing_pipeline',
+    'PipelineValidator': 'processing_pipeline',
+    'create_processing_pipeline': 'processing_pipeline',
+
+    # 奖励计算
+    'RewardCalculator': 'reward_calculator',
+    'create_reward_calculator': 'reward_calculator',
+
+    # 记录构建
+    'RecordBuilder': 'record_builder',
+    'BatchRecordBuilder': 'record_builder',
+    'create_record_builder': 'record_builder',
+    'create_batch_record_builder': 'record_builder',
+
+    # 配置适配器
+    'ConfigAdapter': 'config_adapter',
+    'get_reward_config': 'config_adapter',
+    'get_bonus_pool_ratio': 'config_adapter',
+    'validate_all_configs': 'config_adapter',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
 
 # 版本信息
 __version__ = "1.0.0"
@@ -116,6 +118,8 @@ def create_standard_pipeline(config_key: str, activity_code: str, city: str, **k
     """创建标准处理管道的便捷函数"""
     import os
     from .data_models import City, ProcessingConfig
+    from .processing_pipeline import create_processing_pipeline
+    from .storage import create_data_store
     
     # DB_SOURCE 优先于调用方硬编码，确保本地/云端可统一切换
     db_source = os.getenv("DB_SOURCE", "").strip().lower()
@@ -137,11 +141,15 @@ def create_standard_pipeline(config_key: str, activity_code: str, city: str, **k
         enable_dual_track=kwargs.get('enable_dual_track', False),
         enable_historical_contracts=kwargs.get('enable_historical_contracts', False),
         enable_project_limit=kwargs.get('enable_project_limit', False),
-        enable_csv_output=kwargs.get('enable_csv_output', False)  # 默认关闭CSV输出
+        enable_csv_output=kwargs.get('enable_csv_output', False),  # 默认关闭CSV输出
+        enable_inline_outbox=kwargs.get(
+            'enable_inline_outbox',
+            os.getenv("PIPELINE_INLINE_OUTBOX", "").strip().lower() in {"1", "true", "yes", "y", "on"},
+        ),
     )
     
     # 创建存储实例
-    storage_kwargs = {k: v for k, v in kwargs.items() if k not in ['housekeeper_key_format', 'storage_type', 'enable_dual_track', 'enable_historical_contracts', 'enable_project_limit', 'enable_csv_output']}
+    storage_kwargs = {k: v for k, v in kwargs.items() if k not in ['housekeeper_key_format', 'storage_type', 'enable_dual_track', 'enable_historical_contracts', 'enable_project_limit', 'enable_csv_output', 'enable_inline_outbox']}
     if config.storage_type == "sqlite":
         storage_kwargs.setdefault("db_path", os.getenv("LOCAL_DB_PATH", kwargs.get("db_path", "performance_data.db")))
     elif config.storage_type == "turso":
@@ -10,21 +10,19 @@
 import logging
 import os
 import sys
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from typing import List, Dict, Optional
 
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:  # pragma: no cover
-    ZoneInfo = None
-
 # 确保能导入现有模块
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from modules.core import create_standard_pipeline
+from modules.core.card_fingerprint import CardFingerprintGuard
 from modules.core.data_models import PerformanceRecord
+from modules.metabase_stream import MetabaseCardStream, card_columns_and_rows
+from modules.time_parsing import BEIJING_TZ
 
 
 def signing_and_sales_incentive_jun_beijing_v2() -> List[PerformanceRecord]:
@@ -173,33 +171,44 @@ def signing_and_sales_incentive_sep_beijing_v2() -> List[PerformanceRecord]:
 
 # 辅助函数 - 保持与现有系统的兼容性
 
-def _parse_metabase_response(response: dict) -> List[Dict]:
+def _parse_metabase_response(response, card_guard: Optional[CardFingerprintGuard] = None) -> List[Dict]:
     """
     通用的Metabase API响应解析函数
 
     将Metabase API返回的原始数据（英文字段名）转换为标准格式（中文字段名）
 
     Args:
-        response: Metabase API返回的响应字典
+        response: Metabase API返回的响应字典，或流式响应 MetabaseCardStream
+        card_guard: 流式响应时逐行累计卡片指纹
 
     Returns:
         转换后的合同数据列表，每个元素是包含中文字段名的字典
     """
-    if not response or not isinstance(response, dict) or 'data' not in response:
-        logging.warning("API响应为空或格式不正确")
-        return []
+    if isinstance(response, MetabaseCardStream):
+        card = card_columns_and_rows(response)
+        if card is None:
+            logging.warning("API响应为空或格式不正确")
+            return []
+        columns, rows = card
+    else:
+        if not response or not isinstance(response, dict) or 'data' not in response:
+            logging.warning("API响应为空或格式不正确")
+            return []
+
+        data = response['data']
+        if not data or 'rows' not in data or 'cols' not in data:
+            logging.warning("API数据格式不正确：缺少rows或cols字段")
+            return []
 
-    data = response['data']
-    if not data or 'rows' not in data or 'cols' not in data:
-        logging.warning("API数据格式不正确：缺少rows或cols字段")
-        return []
+        rows = data['rows']
+        columns = data['cols']
 
-    rows = data['rows']
-    columns = data['cols']
+        if not rows:
+            logging.warning("没有获取到合同数据")
+            return []
 
-    if not rows:
-        logging.warning("没有获取到合同数据")
-        return []
+    if card_guard is not None:
+        rows = card_guard.track(columns, rows)
 
     # 构建字段名映射
     column_names = [col['name'] for col in columns]
@@ -254,6 +263,8 @@ def _parse_metabase_response(response: dict) -> List[Dict]:
         }
         contract_data.append(contract_dict)
 
+    if not contract_data and isinstance(response, MetabaseCardStream):
+        logging.warning("没有获取到合同数据")
     return contract_data
 
 
@@ -543,11 +554,7 @@ def signing_and_sales_incentive_nov_beijing():
 
 def _get_bj_sign_broadcast_activity_code(now: Optional[datetime] = None) -> str:
     """按北京时间生成签约播报 activity_code，格式：BJ-SIGN-BROADCAST-YYYY-MM。"""
-    if ZoneInfo is not None:
-        beijing_tz = ZoneInfo("Asia/Shanghai")
-    else:
-        beijing_tz = timezone(timedelta(hours=8))
-
+    beijing_tz = BEIJING_TZ
     if now is None:
         now = datetime.now(beijing_tz)
     elif now.tzinfo is None:
@@ -559,11 +566,7 @@ def _get_bj_sign_broadcast_activity_code(now: Optional[datetime] = None) -> str:
 
 
 def _normalize_beijing_now(now: Optional[datetime] = None) -> datetime:
-    if ZoneInfo is not None:
-        beijing_tz = ZoneInfo("Asia/Shanghai")
-    else:
-        beijing_tz = timezone(timedelta(hours=8))
-
+    beijing_tz = BEIJING_TZ
     if now is None:
         return datetime.now(beijing_tz)
     if now.tzinfo is None:
@@ -603,11 +606,24 @@ def signing_broadcast_beijing_v2() -> List[PerformanceRecord]:
             db_path="performance_data.db"
         )
 
-        contract_data = _get_contract_data_from_metabase_broadcast()
+        from modules.config import API_URL_BJ_SIGN_BROADCAST
+
+        response = _fetch_metabase_card(API_URL_BJ_SIGN_BROADCAST)
+        card_guard = CardFingerprintGuard(store, activity_code, API_URL_BJ_SIGN_BROADCAST)
+        if card_guard.unchanged(response):
+            # 卡片未变化：跳过解析与处理，只补发未通知记录并投递到期 outbox
+            _send_notifications([], config)
+            return []
+
+        contract_data = _get_contract_data_from_metabase_broadcast(response, card_guard)
+        if card_guard.streamed_unchanged():
+            _send_notifications([], config)
+            return []
         logging.info(f"北京签约播报：获取到 {len(contract_data)} 条合同数据")
 
         processed_records = pipeline.process(contract_data)
         logging.info(f"北京签约播报：处理完成 {len(processed_records)} 条记录")
+        card_guard.commit()
 
         _send_notifications(processed_records, config)
         return processed_records
@@ -617,19 +633,37 @@ def signing_broadcast_beijing_v2() -> List[PerformanceRecord]:
         raise
 
 
-def _get_contract_data_from_metabase_broadcast() -> List[Dict]:
-    """获取北京签约播报数据（新 Metabase 地址）。"""
-    logging.info("从Metabase获取北京签约播报数据...")
+def _fetch_metabase_card(api_url: str):
+    """请求 Metabase 卡片原始响应（METABASE_STREAMING 开启时为流式响应），供指纹检查与解析共用。
+
+    登录或请求异常时记录并返回 None，由解析函数按空数据处理，未通知记录与 outbox 仍照常投递。
+    """
+    from modules.request_module import (
+        metabase_streaming_enabled,
+        send_request_with_managed_session,
+        send_streaming_request_with_managed_session,
+    )
+
+    logging.info(f"从Metabase获取卡片数据: {api_url}")
     try:
-        from modules.config import API_URL_BJ_SIGN_BROADCAST
-        from modules.request_module import send_request_with_managed_session
+        if metabase_streaming_enabled():
+            return send_streaming_request_with_managed_session(api_url)
+        return send_request_with_managed_session(api_url)
+    except Exception as e:
+        logging.error(f"获取Metabase卡片数据失败: {e}")
+        return None
+
 
-        response = send_request_with_managed_session(API_URL_BJ_SIGN_BROADCAST)
+def _get_contract_data_from_metabase_broadcast(
+    response, card_guard: Optional[CardFingerprintGuard] = None
+) -> List[Dict]:
+    """解析北京签约播报数据（新 Metabase 地址）。"""
+    try:
         if response is None:
             logging.error("Metabase API调用失败")
             return []
 
-        contract_data = _parse_metabase_response(response)
+        contract_data = _parse_metabase_response(response, card_guard)
         if contract_data:
             logging.info(f"从Metabase获取到 {len(contract_data)} 条签约播报数据")
         return contract_data
@@ -669,11 +703,23 @@ def performance_broadcast_beijing_v2() -> List[PerformanceRecord]:
             db_path="performance_data.db"
         )
 
-        contract_data = _get_contract_data_from_metabase_performance_broadcast(now)
+        from modules.config import API_URL_BJ_PERFORMANCE_BROADCAST
+
+        response = _fetch_metabase_card(API_URL_BJ_PERFORMANCE_BROADCAST)
+        card_guard = CardFingerprintGuard(store, activity_code, API_URL_BJ_PERFORMANCE_BROADCAST)
+        if card_guard.unchanged(response):
+            _send_notifications([], config)
+            return []
+
+        contract_data = _get_contract_data_from_metabase_performance_broadcast(response, now, card_guard)
+        if card_guard.streamed_unchanged():
+            _send_notifications([], config)
+            return []
         logging.info(f"北京业绩播报：获取到 {len(contract_data)} 条本月业绩数据")
 
         processed_records = pipeline.process(contract_data)
         logging.info(f"北京业绩播报：处理完成 {len(processed_records)} 条记录")
+        card_guard.commit()
 
         _send_notifications(processed_records, config)
         return processed_records
@@ -683,19 +729,16 @@ def performance_broadcast_beijing_v2() -> List[PerformanceRecord]:
         raise
 
 
-def _get_contract_data_from_metabase_performance_broadcast(now: Optional[datetime] = None) -> List[Dict]:
-    """获取北京业绩播报数据，并限定为北京时间当前月份。"""
-    logging.info("从Metabase获取北京业绩播报数据...")
+def _get_contract_data_from_metabase_performance_broadcast(
+    response, now: Optional[datetime] = None, card_guard: Optional[CardFingerprintGuard] = None
+) -> List[Dict]:
+    """解析北京业绩播报数据，并限定为北京时间当前月份。"""
     try:
-        from modules.config import API_URL_BJ_PERFORMANCE_BROADCAST
-        from modules.request_module import send_request_with_managed_session
-
-        response = send_request_with_managed_session(API_URL_BJ_PERFORMANCE_BROADCAST)
         if response is None:
             logging.error("Metabase API调用失败")
             return []
 
-        contract_data = _parse_metabase_response(response)
+        contract_data = _parse_metabase_response(response, card_guard)
         contract_data.sort(key=lambda item: item.get("签约时间(signedDate)", ""))
         contract_data = _apply_latest_housekeeper_conversion_rate(contract_data)
         if contract_data:
@@ -0,0 +1,118 @@
+"""Metabase 卡片响应指纹：卡片内容自上次成功处理以来未变化时，任务跳过解析与处理，只投递到期 outbox。
+
+指纹按 (任务键, 卡片 URL) 保存行数与「列名 + data.rows」的内容哈希。行数与上次不同时直接判定为变化，
+不必等到哈希比较；只在任务成功处理完数据后写入指纹，失败的运行下次会完整重跑。
+结果依赖当前时间的任务（如 48 小时待预约判定、按业务日期的 SLA 日报）不应使用。
+
+环境变量 METABASE_FINGERPRINT_SKIP=0 可关闭短路。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from modules.core.storage import PerformanceDataStore
+
+
+def _is_truthy(value: Optional[str]) -> bool:
+    return str(value or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _card_hasher(columns: Optional[List]):
+    hasher = hashlib.sha256()
+    hasher.update(_canonical(list(columns or [])))
+    return hasher
+
+
+def card_content_hash(rows: Iterable, columns: Optional[List] = None) -> str:
+    hasher = _card_hasher(columns)
+    for row in rows:
+        hasher.update(b"\n" + _canonical(row))
+    return hasher.hexdigest()
+
+
+def _column_names(columns: Optional[List]) -> List:
+    return [col.get("name") if isinstance(col, dict) else col for col in (columns or [])]
+
+
+class CardFingerprintGuard:
+    """一次任务运行内的卡片指纹检查：unchanged() 判定是否短路，commit() 在成功处理后记录指纹。
+
+    流式响应（MetabaseCardStream）无法在解析前判断：用 track() 包装行迭代器边解码边累计，
+    解码完成后再用 streamed_unchanged() 判断是否跳过后续处理。
+    """
+
+    def __init__(self, storage: PerformanceDataStore, task_key: str, card_url: str):
+        self.storage = storage
+        self.task_key = task_key
+        self.card_url = card_url
+        self.enabled = _is_truthy(os.getenv("METABASE_FINGERPRINT_SKIP", "1"))
+        self.logger = logging.getLogger(__name__)
+        self.row_count: Optional[int] = None
+        self._rows: Optional[List] = None
+        self._columns: List = []
+        self._content_hash: Optional[str] = None
+
+    def unchanged(self, response) -> bool:
+        """完整响应与上次成功处理时一致返回 True；空响应、格式异常或流式响应时不短路。"""
+        data = response.get("data") if isinstance(response, dict) else None
+        rows = data.get("rows") if isinstance(data, dict) else None
+        if not self.enabled or rows is None:
+            return False
+        self._rows = rows
+        self._columns = _column_names(data.get("cols"))
+        self.row_count = len(rows)
+        return self._matches_previous()
+
+    def track(self, columns: Optional[List], rows: Iterable) -> Iterable:
+        """包装流式行迭代器，迭代时累计行数与内容哈希；完整响应已由 unchanged() 处理时原样返回。"""
+        if not self.enabled or self._rows is not None:
+            return rows
+        return self._track(_column_names(columns), rows)
+
+    def streamed_unchanged(self) -> bool:
+        """track() 的行迭代完毕后判断卡片是否与上次一致。"""
+        if self._rows is not None or self._content_hash is None:
+            return False
+        return self._matches_previous()
+
+    def commit(self) -> None:
+        """记录本次已成功处理的指纹；写入失败只告警，下次运行按变化处理。"""
+        if self.row_count is None:
+            return
+        try:
+            self.storage.save_metabase_card_fingerprint(
+                self.task_key, self.card_url, self.row_count, self._current_hash()
+            )
+        except Exception as exc:
+            self.logger.warning("记录 Metabase 卡片指纹失败 %s: %s", self.task_key, exc)
+
+    def _track(self, columns: List, rows: Iterable) -> Iterator:
+        hasher = _card_hasher(columns)
+        count = 0
+        for row in rows:
+            hasher.update(b"\n" + _canonical(row))
+            count += 1
+            yield row
+        self.row_count = count
+        self._content_hash = hasher.hexdigest()
+
+    def _matches_previous(self) -> bool:
+        previous = self.storage.get_metabase_card_fingerprint(self.task_key, self.card_url)
+        if not previous or previous["row_count"] != self.row_count:
+            return False
+        if previous["content_hash"] != self._current_hash():
+            return False
+        self.logger.info("Metabase 卡片内容未变化（%s 行），跳过处理: %s", self.row_count, self.task_key)
+        return True
+
+    def _current_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = card_content_hash(self._rows, self._columns)
+        return self._content_hash
@@ -46,6 +46,22 @@ CREATE TABLE performance_data (
     
     -- 扩展字段（JSON格式存储城市特有数据）
     extensions TEXT,                       -- JSON格式存储额外字段
+
+    -- 热路径 extensions 字段提升列（schema 1.4.0，不声明类型以保留原值类型）
+    ext_contract_doc_num,                  -- 合同编号(contractdocNum)
+    ext_performance_amount,                -- 计入业绩金额
+    ext_housekeeper_contract_count,        -- 管家累计单数
+    ext_housekeeper_total_amount,          -- 管家累计金额
+    ext_housekeeper_performance_amount,    -- 管家累计业绩金额
+    ext_remarks,                           -- 备注
+    ext_platform_count,                    -- 平台单累计数量
+    ext_self_referral_count,               -- 自引单累计数量
+    ext_platform_amount,                   -- 平台单累计金额
+    ext_self_referral_amount,              -- 自引单累计金额
+    ext_conversion,                        -- 转化率(conversion)
+    ext_paid_amount,                       -- 支付金额(paidAmount)
+    ext_project_address,                   -- 项目地址(projectAddress)
+    ext_promoted INTEGER DEFAULT 0,        -- 1 = 提升列已写入；0 = 读取时回退解析 extensions
     
     -- 唯一约束：同一活动中的合同ID不能重复
     UNIQUE(activity_code, contract_id)
@@ -58,6 +74,7 @@ CREATE INDEX IF NOT EXISTS idx_project_activity ON performance_data(project_id,
 CREATE INDEX IF NOT EXISTS idx_order_type ON performance_data(order_type, activity_code);
 CREATE INDEX IF NOT EXISTS idx_created_at ON performance_data(created_at);
 CREATE INDEX IF NOT EXISTS idx_notification_status ON performance_data(notification_sent, activity_code);
+-- idx_project_address(activity_code, ext_project_address) 由存储层迁移创建（历史库需先补列）
 
 -- 管家累计统计视图（替代复杂的内存计算）
 CREATE VIEW housekeeper_stats AS
@@ -135,12 +152,16 @@ CREATE TABLE notification_outbox (
     response_code INTEGER DEFAULT 0,
     response_body TEXT DEFAULT '',
     last_error TEXT DEFAULT '',
+    enqueue_count INTEGER NOT NULL DEFAULT 1, -- 重复入队时自增，RETURNING enqueue_count = 1 即为新建
+    claimed_until TIMESTAMP,               -- 发送方认领截止时间，避免补发任务与业务任务重复发送
     sent_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(activity_code, dedupe_key)
 );
 CREATE INDEX IF NOT EXISTS idx_outbox_retry ON notification_outbox(activity_code, status, attempt_count, created_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox(status, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_contract ON notification_outbox(activity_code, contract_id);
 
 -- 待预约工单提醒快照（数据库优先架构，支持去重/恢复/审计）
 CREATE TABLE pending_order_reminders (
@@ -169,6 +190,31 @@ ON pending_order_reminders(activity_code, is_active, notification_sent, org_name
 CREATE INDEX IF NOT EXISTS idx_pending_orders_order_num
 ON pending_order_reminders(activity_code, order_num);
 
+-- 待预约工单快照同步暂存表（单事务内写入本次快照，集合式 upsert / 反连接失活后清空）
+CREATE TABLE pending_order_snapshot_staging (
+    activity_code TEXT NOT NULL,
+    status_fingerprint TEXT NOT NULL,
+    order_num TEXT NOT NULL,
+    customer_name TEXT DEFAULT '',
+    address TEXT DEFAULT '',
+    supervisor_name TEXT DEFAULT '',
+    create_time TEXT NOT NULL,
+    org_name TEXT NOT NULL,
+    order_status TEXT NOT NULL,
+    eligible_since TEXT NOT NULL,
+    extensions TEXT DEFAULT '',
+    PRIMARY KEY (activity_code, status_fingerprint)
+);
+
+-- 每个服务商最近一次成功提醒时的活跃工单集合指纹，集合未变化时可跳过重复提醒
+CREATE TABLE pending_order_org_digests (
+    activity_code TEXT NOT NULL,
+    org_name TEXT NOT NULL,
+    digest_fingerprint TEXT NOT NULL,
+    notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (activity_code, org_name)
+);
+
 -- SLA 日报/周报的违规快照
 CREATE TABLE sla_violation_records (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -187,6 +233,8 @@ CREATE TABLE sla_violation_records (
     work_type TEXT DEFAULT '',
     create_time TEXT DEFAULT '',
     raw_json TEXT DEFAULT '',
+    raw_json_codec TEXT DEFAULT '',        -- '' 原文 / zlib+base64 压缩
+    row_hash TEXT DEFAULT '',              -- 原始记录内容哈希，重跑时仅改写变化的行
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(business_date, order_num, org_name, violation_type, violation_description)
@@ -194,6 +242,92 @@ CREATE TABLE sla_violation_records (
 CREATE INDEX IF NOT EXISTS idx_sla_violation_business_date
 ON sla_violation_records(business_date, org_name);
 
+-- SLA 违规按 服务商 × 业务日期 × 违规类型 的计数汇总，随快照写入同步维护；
+-- 主键前缀 (business_date, org_name) 即周报窗口查询使用的索引
+CREATE TABLE sla_violation_rollups (
+    business_date TEXT NOT NULL,
+    org_name TEXT NOT NULL,
+    violation_type TEXT NOT NULL DEFAULT '',
+    violation_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (business_date, org_name, violation_type)
+);
+
+-- 电子表格同步内容指纹（identity -> 归一化字段值哈希），未变化的行跳过 outbox I/O
+CREATE TABLE smartsheet_sync_state (
+    activity_code TEXT NOT NULL,
+    identity_hash TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    record_id TEXT DEFAULT '',             -- 企业微信电子表格记录 ID（用于 update_records）
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (activity_code, identity_hash)
+);
+
+-- 自引单项目地址去重索引（归一化地址哈希，跨运行持久化；同一键以最早写入的合同为准）
+CREATE TABLE project_address_index (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity_code TEXT NOT NULL,
+    housekeeper TEXT NOT NULL,             -- 管家键（与 performance_data.housekeeper 一致）
+    address_hash TEXT NOT NULL,
+    normalized_address TEXT NOT NULL,
+    contract_id TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(activity_code, contract_id)
+);
+CREATE INDEX IF NOT EXISTS idx_project_address_lookup
+ON project_address_index(activity_code, housekeeper, address_hash);
+
+-- outbox 冷数据归档（已发送 / 过期死信），payload 等大字段可 zlib 压缩
+CREATE TABLE notification_outbox_archive (
+    id INTEGER PRIMARY KEY,                -- 沿用 notification_outbox 原 id
+    activity_code TEXT NOT NULL,
+    contract_id TEXT NOT NULL,
+    message_type TEXT NOT NULL,
+    webhook_url TEXT NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    status TEXT NOT NULL,                  -- sent | dead_letter
+    attempt_count INTEGER NOT NULL DEFAULT 0,
+    response_code INTEGER DEFAULT 0,
+    last_error TEXT DEFAULT '',
+    body_codec TEXT NOT NULL DEFAULT '',   -- '' 原文 | 'zlib+base64'
+    payload_json TEXT DEFAULT '',
+    metadata_json TEXT DEFAULT '',
+    response_body TEXT DEFAULT '',
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(activity_code, dedupe_key)
+);
+
 -- 插入当前版本信息
 INSERT OR IGNORE INTO schema_version (version, description)
 VALUES ('1.3.0', 'Add pending order snapshots and SLA violation records');
+
+-- 定时任务运行租约：同一任务同一时间只允许一个执行者；expires_at 为 epoch 秒，过期可被接管
+CREATE TABLE task_leases (
+    task_name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,                   -- 执行者标识（主机:进程:随机后缀）
+    acquired_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    previous_owner TEXT,                   -- 最近一次 upsert 覆盖前的持有者，用于记录接管
+    previous_expires_at REAL
+);
+
+-- Metabase 卡片响应指纹（任务键 × 卡片 URL）：行数 + 列名与 rows 内容哈希，仅在任务成功处理后写入
+CREATE TABLE metabase_card_fingerprints (
+    task_key TEXT NOT NULL,                -- 通常为 activity_code（按月切分的任务随月份变化）
+    card_url TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    content_hash TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (task_key, card_url)
+);
+
+-- 定时任务增量水位（任务键 -> 上次成功处理到的时间点，ISO 8601），用于 Metabase 卡片参数只拉取新窗口
+CREATE TABLE task_watermarks (
+    task_key TEXT PRIMARY KEY,
+    watermark TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
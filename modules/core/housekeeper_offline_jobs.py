@@ -7,22 +7,23 @@ import os
 import time
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List
-from zoneinfo import ZoneInfo
 
 import requests
 
 from modules.config import API_URL_HOUSEKEEPER_OFFLINE
+from modules.core.card_fingerprint import CardFingerprintGuard
 from modules.core.storage import PerformanceDataStore, create_data_store
 from modules.core.webhook_router import (
     CHANNEL_HOUSEKEEPER_OFFLINE,
     format_safe_webhook_target,
     resolve_wecom_webhook,
 )
-from modules.request_module import send_request_with_managed_session
+from modules.request_module import metabase_card_parameter, send_request_with_managed_session
+from modules.time_parsing import BEIJING_TZ, parse_datetime_or_none
 
 
 HOUSEKEEPER_OFFLINE_ACTIVITY_CODE = "HOUSEKEEPER-OFFLINE-BROADCAST"
-SHANGHAI_TIMEZONE = ZoneInfo("Asia/Shanghai")
+SHANGHAI_TIMEZONE = BEIJING_TZ
 
 
 def _is_truthy(value: str) -> bool:
@@ -75,11 +76,7 @@ def _parse_event_time(value) -> datetime | None:
     text = _normalize_text(value)
     if not text:
         return None
-    try:
-        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
-    except ValueError:
-        return None
-    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
+    return parse_datetime_or_none(text, default_tz=timezone.utc)
 
 
 def _format_housekeeper_offline_message(
@@ -107,6 +104,9 @@ class HousekeeperOfflineBroadcastService:
         if self.now.tzinfo is None:
             self.now = self.now.replace(tzinfo=timezone.utc)
         self.lookback_minutes = max(1, int(os.getenv("HOUSEKEEPER_OFFLINE_LOOKBACK_MINUTES", "60")))
+        # 卡片 SQL 中按 createTime 过滤的 template tag 名；未配置时拉取整张卡片
+        self.since_param = os.getenv("HOUSEKEEPER_OFFLINE_SINCE_PARAM", "").strip()
+        self.watermark_overlap_minutes = max(0, int(os.getenv("HOUSEKEEPER_OFFLINE_WATERMARK_OVERLAP_MINUTES", "15")))
 
     def run(self) -> Dict[str, int]:
         stats = {
@@ -118,12 +118,25 @@ class HousekeeperOfflineBroadcastService:
             "sent": 0,
             "failed": 0,
             "dead_letter": 0,
+            "card_unchanged": 0,
             "dry_run": int(self.dry_run),
         }
-        records = self._fetch_records()
-        stats["raw_events"] = len(records)
         cutoff = self.now - timedelta(minutes=self.lookback_minutes)
+        response = self._fetch_response(self._query_window_start(cutoff))
+        fetched = isinstance(response, dict) and "data" in response
+        card_guard = CardFingerprintGuard(self.storage, self.activity_code, API_URL_HOUSEKEEPER_OFFLINE)
+        if not self.dry_run and card_guard.unchanged(response):
+            # 卡片未变化：事件都已入队（按 dedupe_key 去重）或已超出回看窗口，只投递到期 outbox
+            stats["card_unchanged"] = 1
+            stats["raw_events"] = len(response["data"]["rows"])
+            self._advance_watermark()
+            stats.update(self._dispatch_outbox())
+            return stats
 
+        records = self._records_from_response(response)
+        stats["raw_events"] = len(records)
+
+        messages = []
         for record in records:
             create_user_name = _normalize_text(_get_field(record, "createUserName"))
             operation = _get_operation(record)
@@ -142,19 +155,26 @@ class HousekeeperOfflineBroadcastService:
                 continue
 
             fingerprint = _event_fingerprint(record)
-            outbox_id = self.storage.enqueue_outbox_message(
-                activity_code=self.activity_code,
-                contract_id=f"event::{fingerprint}",
-                message_type="housekeeper_offline_broadcast",
-                webhook_url=resolve_wecom_webhook(CHANNEL_HOUSEKEEPER_OFFLINE),
-                payload_json=json.dumps({"msgtype": "text", "text": {"content": message}}, ensure_ascii=False),
-                metadata_json=json.dumps({"source": "metabase_card_2085"}, ensure_ascii=False),
-                dedupe_key=fingerprint,
+            messages.append(
+                {
+                    "activity_code": self.activity_code,
+                    "contract_id": f"event::{fingerprint}",
+                    "message_type": "housekeeper_offline_broadcast",
+                    "webhook_url": resolve_wecom_webhook(CHANNEL_HOUSEKEEPER_OFFLINE),
+                    "payload_json": json.dumps({"msgtype": "text", "text": {"content": message}}, ensure_ascii=False),
+                    "metadata_json": json.dumps({"source": "metabase_card_2085"}, ensure_ascii=False),
+                    "dedupe_key": fingerprint,
+                }
             )
-            if outbox_id and self.storage.get_outbox_message(outbox_id).get("status") != "sent":
+
+        for outbox in self.storage.enqueue_outbox_messages(messages):
+            if outbox["id"] and outbox["status"] != "sent":
                 stats["enqueued"] += 1
 
         if not self.dry_run:
+            card_guard.commit()
+            if fetched:
+                self._advance_watermark()
             stats.update(self._dispatch_outbox())
         if stats["invalid_events"]:
             self.logger.warning(
@@ -163,9 +183,31 @@ class HousekeeperOfflineBroadcastService:
             )
         return stats
 
-    def _fetch_records(self) -> List[Dict]:
-        self.logger.info("获取管家下线数据: %s", API_URL_HOUSEKEEPER_OFFLINE)
-        response = send_request_with_managed_session(API_URL_HOUSEKEEPER_OFFLINE)
+    def _query_window_start(self, cutoff: datetime) -> datetime:
+        """本次拉取窗口起点：上次成功运行的水位回退重叠时间，且不早于回看窗口。"""
+        stored = self.storage.get_task_watermark(self.activity_code)
+        watermark = parse_datetime_or_none(stored or "", default_tz=timezone.utc)
+        if watermark is None:
+            return cutoff
+        return max(cutoff, watermark - timedelta(minutes=self.watermark_overlap_minutes))
+
+    def _advance_watermark(self) -> None:
+        try:
+            self.storage.save_task_watermark(self.activity_code, self.now.isoformat())
+        except Exception as exc:
+            self.logger.warning("记录管家下线水位失败（下次按回看窗口拉取）: %s", exc)
+
+    def _fetch_response(self, window_start: datetime) -> Dict | None:
+        parameters = None
+        if self.since_param:
+            since = window_start.astimezone(SHANGHAI_TIMEZONE).strftime("%Y-%m-%dT%H:%M:%S")
+            parameters = [metabase_card_parameter(self.since_param, since)]
+            self.logger.info("获取管家下线数据: %s（%s >= %s）", API_URL_HOUSEKEEPER_OFFLINE, self.since_param, since)
+        else:
+            self.logger.info("获取管家下线数据: %s", API_URL_HOUSEKEEPER_OFFLINE)
+        return send_request_with_managed_session(API_URL_HOUSEKEEPER_OFFLINE, parameters=parameters)
+
+    def _records_from_response(self, response: Dict | None) -> List[Dict]:
         if not response or "data" not in response:
             self.logger.warning("管家下线 Metabase 接口返回为空或格式异常")
             return []
@@ -175,7 +217,12 @@ class HousekeeperOfflineBroadcastService:
         stats = {"sent": 0, "failed": 0, "dead_letter": 0}
         max_attempts = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
         limit = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_LIMIT", "200"))
-        items = self.storage.get_retryable_outbox_messages(self.activity_code, max_attempts=max_attempts, limit=limit)
+        items = self.storage.get_retryable_outbox_messages(
+            self.activity_code,
+            max_attempts=max_attempts,
+            limit=limit,
+            claim_seconds=int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900")),
+        )
         for item in items:
             try:
                 payload = json.loads(item.get("payload_json") or "{}")
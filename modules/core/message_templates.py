@@ -0,0 +1,301 @@
+"""群播报消息模板注册表。
+
+模板按 (config_key, message_type) 注册，注册时即解析为“字面量 + 字段取值函数”片段，
+渲染时只做取值与拼接；每个模板带版本号，随 outbox metadata 落库，便于审计某次发送使用的模板。
+"""
+
+from dataclasses import dataclass
+from string import Formatter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+GROUP_BROADCAST = "group_broadcast"
+
+# 取值函数签名：(记录字典, 渲染上下文) -> 显示值
+TemplateField = Callable[[Dict, Dict], object]
+
+
+def format_amount(amount) -> str:
+    """金额千分位显示。"""
+    try:
+        return f"{int(float(amount)):,d}"
+    except (ValueError, TypeError):
+        return "0"
+
+
+def format_amount_without_grouping(amount) -> str:
+    """金额不加千分位显示。"""
+    try:
+        return str(int(float(amount)))
+    except (ValueError, TypeError):
+        return "0"
+
+
+def format_rate(rate) -> str:
+    """转化率百分比显示。"""
+    from modules.data_utils import preprocess_rate
+    return preprocess_rate(str(rate))
+
+
+def record_value(key: str, default="") -> TemplateField:
+    return lambda record, context: record.get(key, default)
+
+
+def record_amount(key: str) -> TemplateField:
+    return lambda record, context: format_amount(record.get(key, 0))
+
+
+def record_rate(key: str) -> TemplateField:
+    return lambda record, context: format_rate(record.get(key, ""))
+
+
+def context_value(key: str, default="") -> TemplateField:
+    return lambda record, context: context.get(key, default)
+
+
+@dataclass(frozen=True)
+class MessageTemplate:
+    """模板定义：str.format 风格占位符 + 占位符到取值函数的映射。"""
+    name: str
+    version: str
+    text: str
+    fields: Dict[str, TemplateField]
+
+
+class CompiledTemplate:
+    """预编译模板：解析一次，之后每次渲染只做取值与拼接。"""
+
+    def __init__(self, template: MessageTemplate):
+        self.source = template
+        self.name = template.name
+        self.version = template.version
+        self._segments: List[Tuple[str, Optional[TemplateField]]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template.text):
+            if field_name is None:
+                self._segments.append((literal, None))
+                continue
+            if format_spec or conversion:
+                raise ValueError(f"模板 {template.name} 不支持格式说明符: {{{field_name}}}")
+            if field_name not in template.fields:
+                raise ValueError(f"模板 {template.name} 缺少字段定义: {field_name}")
+            self._segments.append((literal, template.fields[field_name]))
+
+    def render(self, record: Dict, context: Optional[Dict] = None) -> str:
+        context = context or {}
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(field(record, context)))
+        return "".join(parts)
+
+    def render_many(
+        self,
+        items: Iterable[Tuple[Dict, Dict]],
+        on_error: Optional[Callable[[Dict, Exception], None]] = None,
+    ) -> List[Optional[str]]:
+        """批量渲染；给定 on_error 时单条失败只回调并返回 None，不影响同批其他记录。"""
+        results: List[Optional[str]] = []
+        for record, context in items:
+            try:
+                results.append(self.render(record, context))
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                on_error(record, exc)
+                results.append(None)
+        return results
+
+    @property
+    def audit_metadata(self) -> Dict[str, str]:
+        return {"template": self.name, "template_version": self.version}
+
+
+_REGISTRY: Dict[Tuple[str, str], CompiledTemplate] = {}
+
+
+def city_default_key(city: str) -> str:
+    return f"city:{city}"
+
+
+def register_template(key: str, message_type: str, template: MessageTemplate) -> CompiledTemplate:
+    compiled = CompiledTemplate(template)
+    _REGISTRY[(key, message_type)] = compiled
+    return compiled
+
+
+def get_template(config_key: str, city: str, message_type: str = GROUP_BROADCAST) -> CompiledTemplate:
+    """按 config_key 精确匹配，未注册时回退到城市默认模板。"""
+    compiled = _REGISTRY.get((config_key, message_type))
+    if compiled is None:
+        compiled = _REGISTRY.get((city_default_key(city), message_type))
+    if compiled is None:
+        raise KeyError(f"未注册消息模板: config_key={config_key}, city={city}, message_type={message_type}")
+    return compiled
+
+
+# 渲染上下文（由 NotificationService 提供）：
+#   housekeeper  - 应用徽章后的管家名（仅北京）
+#   next_msg     - 按活动口径生成的奖励进度文案
+#   performance_cap - 是否展示累计计入业绩（北京默认模板）
+
+register_template("BJ-PERFORMANCE-BROADCAST", GROUP_BROADCAST, MessageTemplate(
+    name="BJ-PERFORMANCE-BROADCAST/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+
+恭喜 {housekeeper} 签约合同 {contract_num} 并完成首付款支付条件🎉🎉🎉
+
+
+🌻 本合同计入业绩金额为{contract_performance}，本月个人累计签约业绩 {accumulated_performance} 元
+
+🌻 当前全年平台转化率为{conversion_rate}
+
+👊 继续加油，再接再厉！🎉🎉🎉
+''',
+    fields={
+        "housekeeper": context_value("housekeeper"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "contract_performance": lambda record, context: format_amount_without_grouping(record.get("计入业绩金额", 0)),
+        "accumulated_performance": record_amount("管家累计业绩金额"),
+        "conversion_rate": record_rate("转化率(conversion)"),
+    },
+))
+
+register_template("BJ-2025-11", GROUP_BROADCAST, MessageTemplate(
+    name="BJ-2025-11/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+
+恭喜 {housekeeper} 签约合同 {contract_num} 并完成线上收款🎉🎉🎉
+
+🌻 本单为平台本月累计签约第 {global_sequence} 单
+
+🌻 个人累计签约第 {personal_count} 单，累计签约 {accumulated_amount} 元
+
+👊 继续加油，再接再厉！🎉🎉🎉
+''',
+    fields={
+        "housekeeper": context_value("housekeeper"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "global_sequence": record_value("活动期内第几个合同", 0),
+        "personal_count": record_value("管家累计单数", 0),
+        "accumulated_amount": record_amount("管家累计金额"),
+    },
+))
+
+_SH_PLATFORM_ONLY = MessageTemplate(
+    name="SH-PLATFORM-ONLY/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+
+恭喜 {housekeeper_raw} 签约合同（{order_type}） {contract_num} 并完成线上收款🎉🎉🎉
+
+🌻 本单为本月平台累计签约第 {global_sequence} 单，
+
+🌻 个人平台单累计签约第 {platform_count} 单。
+🌻 个人平台单金额累计签约 {platform_amount} 元
+
+🌻 个人平台单转化率 {conversion_rate}，
+
+👊 {next_msg} 🎉🎉🎉。
+''',
+    fields={
+        "housekeeper_raw": record_value("管家(serviceHousekeeper)"),
+        "order_type": record_value("工单类型", "平台单"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "global_sequence": record_value("活动期内第几个合同", 0),
+        "platform_count": record_value("平台单累计数量", 0),
+        "platform_amount": record_amount("平台单累计金额"),
+        "conversion_rate": record_rate("转化率(conversion)"),
+        "next_msg": context_value("next_msg"),
+    },
+)
+# 上海10月和11月：不显示自引单信息，不显示业绩信息
+register_template("SH-2025-10", GROUP_BROADCAST, _SH_PLATFORM_ONLY)
+register_template("SH-2025-11", GROUP_BROADCAST, _SH_PLATFORM_ONLY)
+
+register_template(city_default_key("SH"), GROUP_BROADCAST, MessageTemplate(
+    name="SH-DEFAULT/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+
+恭喜 {housekeeper_raw} 签约合同（{order_type}） {contract_num} 并完成线上收款🎉🎉🎉
+
+🌻 本单为本月平台累计签约第 {global_sequence} 单，
+
+🌻 个人平台单累计签约第 {platform_count} 单， 自引单累计签约第 {self_referral_count} 单。
+🌻 个人平台单金额累计签约 {platform_amount} 元，自引单金额累计签约 {self_referral_amount}元
+
+🌻 个人平台单转化率 {conversion_rate}，
+
+👊 {next_msg} 🎉🎉🎉。
+''',
+    fields={
+        "housekeeper_raw": record_value("管家(serviceHousekeeper)"),
+        "order_type": record_value("工单类型", "平台单"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "global_sequence": record_value("活动期内第几个合同", 0),
+        "platform_count": record_value("平台单累计数量", 0),
+        "self_referral_count": record_value("自引单累计数量", 0),
+        "platform_amount": record_amount("平台单累计金额"),
+        "self_referral_amount": record_amount("自引单累计金额"),
+        "conversion_rate": record_rate("转化率(conversion)"),
+        "next_msg": context_value("next_msg"),
+    },
+))
+
+register_template("BJ-2025-10", GROUP_BROADCAST, MessageTemplate(
+    name="BJ-2025-10/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+
+恭喜 {housekeeper} 签约合同（{order_type}） {contract_num} 并完成线上收款🎉🎉🎉
+
+🌻 本单为平台本月累计签约第 {global_sequence} 单
+
+🌻 个人平台单累计签约第 {platform_count} 单，累计签约 {platform_amount} 元
+🌻 个人自引单累计签约第 {self_referral_count} 单，累计签约 {self_referral_amount}元
+🌻 个人累计业绩金额 {performance_amount} 元
+
+👊 {next_msg} 🎉🎉🎉
+''',
+    fields={
+        "housekeeper": context_value("housekeeper"),
+        "order_type": record_value("工单类型", "平台单"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "global_sequence": record_value("活动期内第几个合同", 0),
+        "platform_count": record_value("平台单累计数量", 0),
+        "self_referral_count": record_value("自引单累计数量", 0),
+        "platform_amount": record_amount("平台单累计金额"),
+        "self_referral_amount": record_amount("自引单累计金额"),
+        "performance_amount": record_amount("管家累计业绩金额"),
+        "next_msg": context_value("next_msg"),
+    },
+))
+
+register_template(city_default_key("BJ"), GROUP_BROADCAST, MessageTemplate(
+    name="BJ-DEFAULT/group_broadcast",
+    version="v1",
+    text='''🧨🧨🧨 签约喜报 🧨🧨🧨
+恭喜 {housekeeper} 签约合同 {contract_num} 并完成线上收款🎉🎉🎉
+
+🌻 本单为活动期间平台累计签约第 {global_sequence} 单，个人累计签约第 {personal_count} 单。
+
+🌻 {housekeeper_raw}累计签约 {accumulated_amount} 元{performance_suffix}
+
+👊 {next_msg}。
+''',
+    fields={
+        "housekeeper": context_value("housekeeper"),
+        "housekeeper_raw": record_value("管家(serviceHousekeeper)"),
+        "contract_num": record_value("合同编号(contractdocNum)"),
+        "global_sequence": record_value("活动期内第几个合同", 0),
+        "personal_count": record_value("管家累计单数", 0),
+        "accumulated_amount": record_amount("管家累计金额"),
+        "performance_suffix": lambda record, context: (
+            f", 累计计入业绩 {format_amount(record.get('管家累计业绩金额', 0))} 元"
+            if context.get("performance_cap") else ""
+        ),
+        "next_msg": context_value("next_msg"),
+    },
+))
@@ -12,12 +12,20 @@ import time
 import json
 import hashlib
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import requests
 
 from .storage import PerformanceDataStore
-from .data_models import ProcessingConfig
+from .data_models import PerformanceRecord, ProcessingConfig
+from .message_templates import (
+    GROUP_BROADCAST,
+    CompiledTemplate,
+    format_amount,
+    format_amount_without_grouping,
+    format_rate,
+    get_template,
+)
 from .webhook_router import (
     CHANNEL_BJ_PERFORMANCE_BROADCAST,
     CHANNEL_SIGN_BROADCAST,
@@ -27,6 +35,35 @@ from .webhook_router import (
 from ..config import *
 
 
+# 回读待通知记录时所需的列与 extensions 键（与 _build_notification_dict 对应）
+NOTIFICATION_RECORD_COLUMNS = (
+    'contract_id',
+    'housekeeper',
+    'contract_amount',
+    'performance_amount',
+    'contract_sequence',
+    'order_type',
+    'notification_sent',
+    'service_provider',
+    'reward_types',
+    'reward_names',
+)
+NOTIFICATION_EXTENSION_KEYS = (
+    '合同编号(contractdocNum)',
+    '计入业绩金额',
+    '管家累计单数',
+    '管家累计金额',
+    '管家累计业绩金额',
+    '备注',
+    '平台单累计数量',
+    '自引单累计数量',
+    '平台单累计金额',
+    '自引单累计金额',
+    '转化率(conversion)',
+    '支付金额(paidAmount)',
+)
+
+
 class NotificationService:
     """新架构通知服务 - 直接从数据库操作"""
     
@@ -34,6 +71,10 @@ class NotificationService:
         self.storage = storage
         self.config = config
         self.logger = logging.getLogger(__name__)
+        # 北京业绩播报的当前快照累计金额（管家 -> 金额），每次 send_notifications 聚合一次
+        self._snapshot_performance_totals: Optional[Dict[str, float]] = None
+        self._compiled_group_template: Optional[CompiledTemplate] = None
+        self._badge_names: Dict[str, str] = {}
         
     def send_notifications(self) -> Dict[str, int]:
         """
@@ -51,20 +92,29 @@ class NotificationService:
             "dead_letter": 0,
         }
 
-        records = self._get_notification_records()
+        if self.uses_inline_outbox():
+            # 处理管道已在写入记录的同一事务内入队，只回读渲染失败、尚无播报消息的记录
+            records = self._get_notification_records(without_outbox=True)
+            self.logger.info(f"inline outbox 模式：消息已由处理管道入队，补入队 {len(records)} 条无 outbox 的记录")
+        else:
+            records = self._get_notification_records()
+            self.logger.info(f"找到 {len(records)} 条待通知记录（notification_sent=false）")
         stats["records"] = len(records)
-        self.logger.info(f"找到 {len(records)} 条待通知记录（notification_sent=false）")
+        self._snapshot_performance_totals = None
 
-        for record in records:
+        # 先整理记录与渲染上下文，再用预编译模板整批渲染后一次性入队
+        messages = []
+        for record, msg in self._render_group_messages(records):
             try:
-                if self._should_send_group_notification(record):
-                    record = self._normalize_record_before_enqueue(record)
-                    msg = self._build_group_notification_message(record)
-                    outbox_id = self._enqueue_text_outbox(record, msg, "group_broadcast")
-                    if outbox_id:
-                        stats["enqueued"] += 1
+                messages.append(self._build_text_outbox_message(record, msg, GROUP_BROADCAST))
             except Exception as e:
                 self.logger.error(f"Outbox enqueue failed - 合同ID: {record.get('合同ID(_id)')}, 错误: {e}")
+        if messages:
+            try:
+                results = self.storage.enqueue_outbox_messages(messages)
+                stats["enqueued"] = sum(1 for result in results if result.get("id"))
+            except Exception as e:
+                self.logger.error(f"Outbox enqueue failed - 批量 {len(messages)} 条, 错误: {e}")
 
         retry_limit = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_LIMIT", "200"))
         max_attempts = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
@@ -72,6 +122,7 @@ class NotificationService:
             activity_code=self.config.activity_code,
             max_attempts=max_attempts,
             limit=retry_limit,
+            claim_seconds=int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900")),
         )
 
         self.logger.info(f"本轮待发送 outbox 数量: {len(outbox_items)}")
@@ -134,7 +185,7 @@ class NotificationService:
         )
         return stats
     
-    def _get_notification_records(self) -> List[Dict]:
+    def _get_notification_records(self, without_outbox: bool = False) -> List[Dict]:
         """从数据库获取需要发送通知的记录"""
         # 查询需要发送通知的记录（未发送 + 非历史合同）
         query_conditions = {
@@ -142,14 +193,20 @@ class NotificationService:
             'notification_sent': False,
             'is_historical': False
         }
+        if without_outbox:
+            query_conditions['without_outbox_message_type'] = GROUP_BROADCAST
         
-        # 从存储层获取记录
-        records = self.storage.query_performance_records(query_conditions)
+        # 从存储层按投影获取记录：只取消息所需列，extensions 在库内按键提取
+        records = self.storage.query_performance_projection(
+            query_conditions,
+            columns=NOTIFICATION_RECORD_COLUMNS,
+            extension_keys=NOTIFICATION_EXTENSION_KEYS,
+        )
         
         # 转换为字典格式，兼容现有消息生成逻辑
         notification_records = []
         for record in records:
-            record_dict = self._convert_record_to_dict(record)
+            record_dict = self._convert_record_to_dict(record._asdict())
             notification_records.append(record_dict)
         
         return notification_records
@@ -172,12 +229,11 @@ class NotificationService:
             return record
 
         current_cumulative = self._to_float(record.get("管家累计业绩金额", 0))
-        snapshot_cumulative = self._to_float(
-            self.storage.get_housekeeper_stats(
-                housekeeper=housekeeper,
-                activity_code=self.config.activity_code,
-            ).performance_amount
-        )
+        if self._snapshot_performance_totals is None:
+            self._snapshot_performance_totals = self.storage.get_housekeeper_performance_totals(
+                self.config.activity_code
+            )
+        snapshot_cumulative = self._to_float(self._snapshot_performance_totals.get(housekeeper, 0))
         if snapshot_cumulative == current_cumulative:
             return record
 
@@ -198,11 +254,48 @@ class NotificationService:
         except (TypeError, ValueError):
             return 0.0
     
+    def uses_inline_outbox(self) -> bool:
+        """是否由处理管道直接入队播报消息。
+
+        北京业绩播报需在发送时按当前快照修正累计金额，仍走回读路径。
+        """
+        return bool(getattr(self.config, "enable_inline_outbox", False)) and (
+            self.config.config_key != "BJ-PERFORMANCE-BROADCAST"
+        )
+
+    def build_outbox_message(self, record: PerformanceRecord) -> Optional[Dict]:
+        """基于内存中的业绩记录渲染播报消息，返回待入队的 outbox 消息（无需播报时为 None）。"""
+        if record.notification_sent or record.contract_data.is_historical:
+            return None
+        record_dict = self._convert_performance_record_to_dict(record)
+        if not self._should_send_group_notification(record_dict):
+            return None
+        msg = self._build_group_notification_message(record_dict)
+        return self._build_text_outbox_message(record_dict, msg, "group_broadcast")
+
+    def _convert_performance_record_to_dict(self, record: PerformanceRecord) -> Dict:
+        """将内存中的业绩记录转换为与数据库回读一致的消息字典。"""
+        row = {
+            'contract_id': record.contract_data.contract_id,
+            'housekeeper': record.housekeeper_stats.housekeeper,
+            'contract_amount': record.contract_data.contract_amount,
+            'performance_amount': record.performance_amount,
+            'contract_sequence': record.contract_sequence,
+            'order_type': record.contract_data.order_type.value,
+            'notification_sent': record.notification_sent,
+            'service_provider': record.contract_data.service_provider,
+        }
+        reward_types = ', '.join(r.reward_type for r in record.rewards)
+        reward_names = ', '.join(r.reward_name for r in record.rewards)
+        return self._build_notification_dict(row, record.to_dict(), reward_types, reward_names)
+
     def _convert_record_to_dict(self, record) -> Dict:
         """将数据库记录转换为字典格式，兼容现有消息模板"""
-        # 数据库记录是字典格式，直接处理
+        # 数据库记录是字典格式，直接处理；投影查询已将 extensions 解码为字典
         extensions = {}
-        if record.get('extensions'):
+        if isinstance(record.get('extensions'), dict):
+            extensions = record['extensions']
+        elif record.get('extensions'):
             import json
             try:
                 extensions = json.loads(record['extensions'])
@@ -228,6 +321,9 @@ class NotificationService:
             except:
                 reward_names = str(record.get('reward_names', ''))
 
+        return self._build_notification_dict(record, extensions, reward_types, reward_names)
+
+    def _build_notification_dict(self, record: Dict, extensions: Dict, reward_types: str, reward_names: str) -> Dict:
         # 转换订单类型
         order_type_display = "自引单" if record.get('order_type') == 'self_referral' else "平台单"
 
@@ -267,159 +363,66 @@ class NotificationService:
         """判断是否应该发送群通知"""
         return record.get('是否发送通知') == 'N'
     
-    def _build_group_notification_message(self, record: Dict) -> str:
-        """构建群通知文本（发送由 outbox 负责）。"""
-        # 复用现有的消息生成逻辑
+    def _group_template(self) -> CompiledTemplate:
+        """当前活动的群通知模板（注册时已预编译）。"""
+        if self._compiled_group_template is None:
+            self._compiled_group_template = get_template(self.config.config_key, self.config.city.value, GROUP_BROADCAST)
+        return self._compiled_group_template
+
+    def _build_template_context(self, record: Dict) -> Dict:
+        """模板渲染上下文：徽章管家名、奖励进度文案等依赖活动口径的派生值。"""
         service_housekeeper = record['管家(serviceHousekeeper)']
-        
         # 处理徽章逻辑（与旧架构保持一致）
         if self.config.city.value == "BJ":
             service_housekeeper = self._apply_badge_logic(service_housekeeper)
-        
-        # 格式化金额显示
-        accumulated_amount = self._format_amount(record.get('管家累计金额', 0))
-        performance_amount = self._format_amount(record.get('管家累计业绩金额', 0))
-        
-        # 生成群通知消息 - 根据城市和活动配置使用不同的模板
-        order_type = record.get("工单类型", "平台单")
-
-        # 根据配置决定备注逻辑
-        if self.config.config_key == "BJ-PERFORMANCE-BROADCAST":
-            contract_num = record.get("合同编号(contractdocNum)", "")
-            contract_performance = self._format_amount_without_grouping(record.get("计入业绩金额", 0))
-            accumulated_performance = self._format_amount(record.get("管家累计业绩金额", 0))
-            conversion_rate = self._format_rate(record.get("转化率(conversion)", ""))
-
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-
-恭喜 {service_housekeeper} 签约合同 {contract_num} 并完成首付款支付条件🎉🎉🎉
-
-
-🌻 本合同计入业绩金额为{contract_performance}，本月个人累计签约业绩 {accumulated_performance} 元
-
-🌻 当前全年平台转化率为{conversion_rate}
-
-👊 继续加油，再接再厉！🎉🎉🎉
-'''
-            return msg
-
-        if self.config.config_key == "BJ-2025-11":
-            # 🔧 新增：北京11月专用消息模板（仅播报模式）
-            contract_num = record.get("合同编号(contractdocNum)", "")
-            global_sequence = record.get("活动期内第几个合同", 0)
-            personal_count = record.get("管家累计单数", 0)
-            accumulated_amount = self._format_amount(record.get('管家累计金额', 0))
-
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-
-恭喜 {service_housekeeper} 签约合同 {contract_num} 并完成线上收款🎉🎉🎉
-
-🌻 本单为平台本月累计签约第 {global_sequence} 单
 
-🌻 个人累计签约第 {personal_count} 单，累计签约 {accumulated_amount} 元
-
-👊 继续加油，再接再厉！🎉🎉🎉
-'''
-            return msg
-
-        # 其他活动的备注逻辑
+        order_type = record.get("工单类型", "平台单")
+        remarks = record.get("备注", "")
         if self.config.config_key == "BJ-2025-10":
             # 北京10月：自引单和平台单都使用节节高奖励进度
-            remarks = record.get("备注", "")
-            if '无' in remarks:
-                next_msg = '恭喜已经达成所有奖励，祝愿再接再厉，再创佳绩'
-            else:
-                next_msg = remarks  # 统一显示节节高进度
+            next_msg = '恭喜已经达成所有奖励，祝愿再接再厉，再创佳绩' if '无' in remarks else remarks
         elif order_type == "自引单" and self.config.city.value == "SH":
             # 上海自引单：显示独立奖励信息
             next_msg = '继续加油，争取更多奖励'
         else:
             # 其他情况：按照备注字段动态生成
-            if '无' in record.get("备注", ""):
-                next_msg = ''  # 空白显示
-            else:
-                next_msg = f'{record.get("备注", "")}'
-
-        if self.config.config_key in ["SH-2025-10", "SH-2025-11"]:
-            # 上海10月和11月专用消息模板 - 不显示自引单信息，不显示业绩信息
-            order_type = record.get("工单类型", "平台单")
-            platform_count = record.get("平台单累计数量", 0)
-            platform_amount = self._format_amount(record.get("平台单累计金额", 0))
-            conversion_rate = self._format_rate(record.get("转化率(conversion)", ""))
-
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-
-恭喜 {record["管家(serviceHousekeeper)"]} 签约合同（{order_type}） {record.get("合同编号(contractdocNum)", "")} 并完成线上收款🎉🎉🎉
-
-🌻 本单为本月平台累计签约第 {record.get("活动期内第几个合同", 0)} 单，
-
-🌻 个人平台单累计签约第 {platform_count} 单。
-🌻 个人平台单金额累计签约 {platform_amount} 元
-
-🌻 个人平台单转化率 {conversion_rate}，
-
-👊 {next_msg} 🎉🎉🎉。
-'''
-        elif self.config.city.value == "SH":
-            # 上海群通知模板（与旧架构保持一致）- 其他上海活动使用
-            order_type = record.get("工单类型", "平台单")
-            platform_count = record.get("平台单累计数量", 0)
-            self_referral_count = record.get("自引单累计数量", 0)
-            platform_amount = self._format_amount(record.get("平台单累计金额", 0))
-            self_referral_amount = self._format_amount(record.get("自引单累计金额", 0))
-            conversion_rate = self._format_rate(record.get("转化率(conversion)", ""))
-
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-
-恭喜 {record["管家(serviceHousekeeper)"]} 签约合同（{order_type}） {record.get("合同编号(contractdocNum)", "")} 并完成线上收款🎉🎉🎉
-
-🌻 本单为本月平台累计签约第 {record.get("活动期内第几个合同", 0)} 单，
-
-🌻 个人平台单累计签约第 {platform_count} 单， 自引单累计签约第 {self_referral_count} 单。
-🌻 个人平台单金额累计签约 {platform_amount} 元，自引单金额累计签约 {self_referral_amount}元
-
-🌻 个人平台单转化率 {conversion_rate}，
-
-👊 {next_msg} 🎉🎉🎉。
-'''
-        elif self.config.config_key == "BJ-2025-10":
-            # 北京10月专用消息模板 - 支持双轨统计显示
-            platform_count = record.get("平台单累计数量", 0)
-            self_referral_count = record.get("自引单累计数量", 0)
-            platform_amount = self._format_amount(record.get("平台单累计金额", 0))
-            self_referral_amount = self._format_amount(record.get("自引单累计金额", 0))
-            # 新增：业绩金额显示
-            performance_amount = self._format_amount(record.get("管家累计业绩金额", 0))
-
-            # 🔧 修复：使用全局合同序号，而不是个人总数
-            global_contract_sequence = record.get("活动期内第几个合同", 0)
-
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-
-恭喜 {service_housekeeper} 签约合同（{order_type}） {record.get("合同编号(contractdocNum)", "")} 并完成线上收款🎉🎉🎉
+            next_msg = '' if '无' in remarks else f'{remarks}'
 
-🌻 本单为平台本月累计签约第 {global_contract_sequence} 单
-
-🌻 个人平台单累计签约第 {platform_count} 单，累计签约 {platform_amount} 元
-🌻 个人自引单累计签约第 {self_referral_count} 单，累计签约 {self_referral_amount}元
-🌻 个人累计业绩金额 {performance_amount} 元
+        return {
+            "housekeeper": service_housekeeper,
+            "next_msg": next_msg,
+            "performance_cap": ENABLE_PERFORMANCE_AMOUNT_CAP_BJ_FEB,
+        }
 
-👊 {next_msg} 🎉🎉🎉
-'''
-        else:
-            # 其他北京活动的群通知模板
-            msg = f'''🧨🧨🧨 签约喜报 🧨🧨🧨
-恭喜 {service_housekeeper} 签约合同 {record.get("合同编号(contractdocNum)", "")} 并完成线上收款🎉🎉🎉
+    def _render_group_messages(self, records: List[Dict]) -> List[Tuple[Dict, str]]:
+        """批量渲染待播报记录的群通知文本，单条失败只记录日志，返回 [(记录, 文本)]。"""
+        batch = []
+        for record in records:
+            try:
+                if self._should_send_group_notification(record):
+                    record = self._normalize_record_before_enqueue(record)
+                    batch.append((record, self._build_template_context(record)))
+            except Exception as e:
+                self.logger.error(f"Outbox enqueue failed - 合同ID: {record.get('合同ID(_id)')}, 错误: {e}")
+        if not batch:
+            return []
+        try:
+            template = self._group_template()
+        except KeyError as e:
+            self.logger.error(f"Outbox enqueue failed - 批量 {len(batch)} 条, 错误: {e}")
+            return []
 
-🌻 本单为活动期间平台累计签约第 {record.get("活动期内第几个合同", 0)} 单，个人累计签约第 {record.get("管家累计单数", 0)} 单。
+        def log_failure(record: Dict, exc: Exception) -> None:
+            self.logger.error(f"Outbox enqueue failed - 合同ID: {record.get('合同ID(_id)')}, 错误: {exc}")
 
-🌻 {record["管家(serviceHousekeeper)"]}累计签约 {accumulated_amount} 元{f', 累计计入业绩 {performance_amount} 元' if ENABLE_PERFORMANCE_AMOUNT_CAP_BJ_FEB else ''}
+        rendered = template.render_many(batch, on_error=log_failure)
+        return [(record, msg) for (record, _), msg in zip(batch, rendered) if msg is not None]
 
-👊 {next_msg}。
-'''
-        return msg
+    def _build_group_notification_message(self, record: Dict) -> str:
+        """构建群通知文本（发送由 outbox 负责）。"""
+        return self._group_template().render(record, self._build_template_context(record))
 
-    def _enqueue_text_outbox(self, record: Dict, text_message: str, message_type: str) -> int:
+    def _build_text_outbox_message(self, record: Dict, text_message: str, message_type: str) -> Dict:
         payload = {
             "msgtype": "text",
             "text": {"content": text_message},
@@ -430,47 +433,49 @@ class NotificationService:
         channel = CHANNEL_SIGN_BROADCAST
         if self.config.config_key == "BJ-PERFORMANCE-BROADCAST":
             channel = CHANNEL_BJ_PERFORMANCE_BROADCAST
+        metadata_json = ""
+        if message_type == GROUP_BROADCAST:
+            # 记录渲染所用模板及版本，便于审计
+            metadata_json = json.dumps(self._group_template().audit_metadata, ensure_ascii=False)
 
-        return self.storage.enqueue_outbox_message(
-            activity_code=self.config.activity_code,
-            contract_id=record["合同ID(_id)"],
-            message_type=message_type,
-            webhook_url=resolve_wecom_webhook(channel),
-            payload_json=payload_json,
-            dedupe_key=f"{dedupe_key}::{hash_value}",
-        )
+        return {
+            "activity_code": self.config.activity_code,
+            "contract_id": record["合同ID(_id)"],
+            "message_type": message_type,
+            "webhook_url": resolve_wecom_webhook(channel),
+            "payload_json": payload_json,
+            "metadata_json": metadata_json,
+            "dedupe_key": f"{dedupe_key}::{hash_value}",
+        }
     
     def _apply_badge_logic(self, housekeeper_name: str) -> str:
-        """应用徽章逻辑（与旧架构保持一致）"""
+        """应用徽章逻辑（与旧架构保持一致），按管家名缓存。"""
+        if housekeeper_name in self._badge_names:
+            return self._badge_names[housekeeper_name]
+        display_name = housekeeper_name
         # 复用现有的徽章逻辑；可选依赖缺失时降级为“无徽章”而非阻断发送
         try:
             from modules.data_utils import should_enable_badge
             if ENABLE_BADGE_MANAGEMENT:
                 elite_badge_enabled = should_enable_badge(self.config.config_key, "elite")
                 if elite_badge_enabled and housekeeper_name in ELITE_HOUSEKEEPER:
-                    return f'{ELITE_BADGE_NAME}{housekeeper_name}'
+                    display_name = f'{ELITE_BADGE_NAME}{housekeeper_name}'
         except Exception as e:
             self.logger.warning(f"徽章逻辑降级（不影响发送）: {e}")
-        return housekeeper_name
+        self._badge_names[housekeeper_name] = display_name
+        return display_name
     
     def _format_amount(self, amount) -> str:
         """格式化金额显示"""
-        try:
-            return f"{int(float(amount)):,d}"
-        except (ValueError, TypeError):
-            return "0"
+        return format_amount(amount)
 
     def _format_amount_without_grouping(self, amount) -> str:
         """格式化单合同金额，不加千分位，匹配北京业绩播报文案。"""
-        try:
-            return str(int(float(amount)))
-        except (ValueError, TypeError):
-            return "0"
+        return format_amount_without_grouping(amount)
 
     def _format_rate(self, rate) -> str:
         """格式化转化率显示"""
-        from modules.data_utils import preprocess_rate
-        return preprocess_rate(str(rate))
+        return format_rate(rate)
     
     def _update_notification_status(self, record: Dict):
         """更新通知发送状态"""
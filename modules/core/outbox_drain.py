@@ -0,0 +1,243 @@
+"""跨活动 outbox 补发任务。
+
+按 id 键集分页扫描所有活动的待发送消息，经共享限速发送器逐条投递，
+在墙钟预算用尽前干净退出，供积压时单独清空 outbox。
+每页消息在读取时即被认领，与各业务任务自身的 _dispatch_outbox 并发运行时不会重复发送；
+电子表格消息沿用对应 SmartsheetSyncConfig 的 dispatch_delay_seconds 作为同一 webhook 的发送间隔。
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+from modules.core.pending_orders_jobs import mark_pending_orders_digest_sent
+from modules.core.project_settlement_jobs import SMARTSHEET_SYNC_CONFIGS, SmartsheetSyncService, _extract_record_id
+from modules.core.storage import PerformanceDataStore, create_data_store
+from modules.core.webhook_router import format_safe_webhook_target
+
+
+class RateLimitedWebhookSender:
+    """共享限速的 webhook 发送器：全局最小间隔 + 同一 webhook 最小间隔。"""
+
+    def __init__(
+        self,
+        min_interval_seconds: float = 0.2,
+        per_webhook_interval_seconds: float = 0.0,
+        timeout_seconds: float = 20,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.min_interval_seconds = min_interval_seconds
+        self.per_webhook_interval_seconds = per_webhook_interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self._last_sent_at: Optional[float] = None
+        self._last_sent_by_webhook: Dict[str, float] = {}
+
+    def wait_seconds(self, webhook_url: str, webhook_interval_seconds: Optional[float] = None) -> float:
+        """距离允许发送还需等待的秒数；webhook_interval_seconds 覆盖默认的同一 webhook 间隔。"""
+        if webhook_interval_seconds is None:
+            webhook_interval_seconds = self.per_webhook_interval_seconds
+        now = self.clock()
+        wait = 0.0
+        if self._last_sent_at is not None:
+            wait = max(wait, self._last_sent_at + self.min_interval_seconds - now)
+        last_for_webhook = self._last_sent_by_webhook.get(webhook_url)
+        if last_for_webhook is not None:
+            wait = max(wait, last_for_webhook + webhook_interval_seconds - now)
+        return wait
+
+    def send(
+        self,
+        webhook_url: str,
+        payload: Dict,
+        timeout: Optional[float] = None,
+        webhook_interval_seconds: Optional[float] = None,
+    ):
+        wait = self.wait_seconds(webhook_url, webhook_interval_seconds)
+        if wait > 0:
+            self.sleep(wait)
+        try:
+            return requests.post(webhook_url, json=payload, timeout=timeout or self.timeout_seconds)
+        finally:
+            sent_at = self.clock()
+            self._last_sent_at = sent_at
+            self._last_sent_by_webhook[webhook_url] = sent_at
+
+
+class OutboxDrainService:
+    """跨活动清空 outbox 积压，成功后的副作用与各业务任务保持一致。"""
+
+    def __init__(
+        self,
+        storage: PerformanceDataStore,
+        budget_seconds: Optional[float] = None,
+        page_size: Optional[int] = None,
+        sender: Optional[RateLimitedWebhookSender] = None,
+        clock: Callable[[], float] = time.monotonic,
+        activity_intervals: Optional[Dict[str, float]] = None,
+    ):
+        self.storage = storage
+        self.budget_seconds = float(
+            budget_seconds if budget_seconds is not None else os.getenv("OUTBOX_DRAIN_BUDGET_SECONDS", "300")
+        )
+        self.page_size = int(page_size or os.getenv("NOTIFICATION_OUTBOX_BATCH_LIMIT", "200"))
+        self.max_attempts = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
+        self.claim_seconds = int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900"))
+        # activity_code -> 电子表格消息同一 webhook 的最小发送间隔
+        self.activity_intervals = (
+            activity_intervals
+            if activity_intervals is not None
+            else {config.activity_code: config.dispatch_delay_seconds for config in SMARTSHEET_SYNC_CONFIGS}
+        )
+        self.clock = clock
+        self.sender = sender or RateLimitedWebhookSender(
+            min_interval_seconds=float(os.getenv("OUTBOX_DRAIN_MIN_INTERVAL_SECONDS", "0.2")),
+            per_webhook_interval_seconds=float(os.getenv("OUTBOX_DRAIN_WEBHOOK_INTERVAL_SECONDS", "0")),
+            clock=clock,
+        )
+        self.logger = logging.getLogger(__name__)
+
+    def run(self) -> Dict:
+        started_at = self.clock()
+        deadline = started_at + self.budget_seconds
+        stats = {
+            "pages": 0,
+            "processed": 0,
+            "sent": 0,
+            "failed": 0,
+            "dead_letter": 0,
+            "budget_exhausted": 0,
+            "by_activity": {},
+        }
+
+        after_id = 0
+        while True:
+            if self.clock() >= deadline:
+                stats["budget_exhausted"] = 1
+                break
+            items = self.storage.get_due_outbox_messages(
+                after_id,
+                max_attempts=self.max_attempts,
+                limit=self.page_size,
+                claim_seconds=self.claim_seconds,
+            )
+            if not items:
+                break
+            stats["pages"] += 1
+            for index, item in enumerate(items):
+                interval = self._webhook_interval(item)
+                remaining = deadline - self.clock() - self.sender.wait_seconds(item["webhook_url"], interval)
+                if remaining <= 0:
+                    stats["budget_exhausted"] = 1
+                    self.storage.release_outbox_claims([int(rest["id"]) for rest in items[index:]])
+                    break
+                after_id = int(item["id"])
+                outcome = self._dispatch_item(
+                    item, timeout=min(self.sender.timeout_seconds, remaining), interval=interval
+                )
+                stats[outcome] += 1
+                stats["processed"] += 1
+                activity_stats = stats["by_activity"].setdefault(
+                    item["activity_code"], {"sent": 0, "failed": 0, "dead_letter": 0}
+                )
+                activity_stats[outcome] += 1
+            if stats["budget_exhausted"] or len(items) < self.page_size:
+                break
+
+        elapsed = max(self.clock() - started_at, 1e-9)
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["messages_per_minute"] = round(stats["processed"] * 60 / elapsed, 2)
+        self.logger.info(
+            "outbox 补发完成 - processed=%s, sent=%s, failed=%s, dead_letter=%s, pages=%s, "
+            "elapsed=%.1fs, throughput=%.2f/min, budget_exhausted=%s",
+            stats["processed"],
+            stats["sent"],
+            stats["failed"],
+            stats["dead_letter"],
+            stats["pages"],
+            stats["elapsed_seconds"],
+            stats["messages_per_minute"],
+            stats["budget_exhausted"],
+        )
+        return stats
+
+    def _webhook_interval(self, item: Dict) -> Optional[float]:
+        if (item.get("message_type") or "").startswith("wedoc_"):
+            return self.activity_intervals.get(item.get("activity_code"))
+        return None
+
+    def _dispatch_item(self, item: Dict, timeout: float, interval: Optional[float] = None) -> str:
+        try:
+            payload = json.loads(item.get("payload_json") or "{}")
+            self.logger.info(
+                "发送 webhook: activity=%s, outbox_id=%s, type=%s, contract=%s, %s",
+                item.get("activity_code"),
+                item.get("id"),
+                item.get("message_type"),
+                item.get("contract_id"),
+                format_safe_webhook_target(item.get("webhook_url", "")),
+            )
+            response = self.sender.send(
+                item["webhook_url"], payload, timeout=timeout, webhook_interval_seconds=interval
+            )
+            body_text = (response.text or "")[:2000]
+            if self._is_success_response(item, response.status_code, body_text):
+                self.storage.mark_outbox_sent(item["id"], response.status_code, body_text)
+                self._after_sent(item, body_text)
+                return "sent"
+            return self._mark_failed(item, f"HTTP {response.status_code}", response.status_code, body_text)
+        except Exception as exc:
+            return self._mark_failed(item, str(exc), 0, "")
+
+    @staticmethod
+    def _is_success_response(item: Dict, status_code: int, body_text: str) -> bool:
+        message_type = item.get("message_type") or ""
+        if message_type.startswith("wedoc_") or message_type == "housekeeper_offline_broadcast":
+            return SmartsheetSyncService._is_success_response(status_code, body_text)
+        return 200 <= status_code < 300
+
+    def _after_sent(self, item: Dict, body_text: str) -> None:
+        """与各业务任务发送成功后的副作用保持一致。"""
+        message_type = item.get("message_type")
+        try:
+            metadata = json.loads(item.get("metadata_json") or "{}")
+        except json.JSONDecodeError:
+            metadata = {}
+
+        if message_type == "group_broadcast":
+            self.storage.update_notification_status(
+                contract_id=item["contract_id"],
+                activity_code=item["activity_code"],
+                notification_sent=True,
+            )
+        elif message_type == "pending_orders_digest":
+            mark_pending_orders_digest_sent(self.storage, item["activity_code"], item)
+        elif message_type == "wedoc_add_record":
+            record_id = _extract_record_id(body_text)
+            if record_id and metadata.get("identity_hash"):
+                self.storage.set_smartsheet_record_id(item["activity_code"], metadata["identity_hash"], record_id)
+
+    def _mark_failed(self, item: Dict, error: str, response_code: int, response_body: str) -> str:
+        self.storage.mark_outbox_failed(
+            outbox_id=item["id"],
+            last_error=error,
+            response_code=response_code,
+            response_body=response_body,
+            max_attempts=self.max_attempts,
+        )
+        if int(item.get("attempt_count", 0)) + 1 >= self.max_attempts:
+            return "dead_letter"
+        return "failed"
+
+
+def drain_outbox_v2(budget_seconds: Optional[float] = None) -> Dict:
+    storage = create_data_store(storage_type="sqlite", db_path="performance_data.db")
+    stats = OutboxDrainService(storage, budget_seconds=budget_seconds).run()
+    logging.info("outbox 补发任务完成: %s", stats)
+    return stats
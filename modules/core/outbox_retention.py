@@ -0,0 +1,65 @@
+"""outbox 保留策略任务：将已发送 / 过期死信消息迁入归档表，保持热表精简。"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from modules.core.storage import PerformanceDataStore, create_data_store
+
+
+def _is_truthy(value: str) -> bool:
+    return str(value or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+class OutboxRetentionService:
+    """按保留天数分批归档 notification_outbox 冷数据。"""
+
+    def __init__(self, storage: PerformanceDataStore, now: Optional[datetime] = None):
+        self.storage = storage
+        self.now = now or datetime.now(timezone.utc)
+        self.sent_retention_days = int(os.getenv("OUTBOX_SENT_RETENTION_DAYS", "30"))
+        self.dead_letter_retention_days = int(os.getenv("OUTBOX_DEAD_LETTER_RETENTION_DAYS", "90"))
+        self.compress = _is_truthy(os.getenv("OUTBOX_ARCHIVE_COMPRESS", "1"))
+        self.batch_size = int(os.getenv("OUTBOX_ARCHIVE_BATCH_SIZE", "500"))
+        self.logger = logging.getLogger(__name__)
+
+    def _cutoff(self, days: int) -> str:
+        # outbox 时间列由 CURRENT_TIMESTAMP 写入，为 UTC 的 "YYYY-MM-DD HH:MM:SS"
+        now_utc = self.now.astimezone(timezone.utc) if self.now.tzinfo else self.now
+        return (now_utc - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def run(self) -> Dict[str, int]:
+        stats = {"archived": 0, "batches": 0, "compressed": int(self.compress)}
+        sent_before = self._cutoff(self.sent_retention_days)
+        dead_letter_before = self._cutoff(self.dead_letter_retention_days)
+
+        while True:
+            archived = self.storage.archive_outbox_messages(
+                sent_before=sent_before,
+                dead_letter_before=dead_letter_before,
+                compress=self.compress,
+                limit=self.batch_size,
+            )
+            if not archived:
+                break
+            stats["archived"] += archived
+            stats["batches"] += 1
+            if archived < self.batch_size:
+                break
+
+        self.logger.info(
+            "outbox 归档完成 - archived=%s, batches=%s, sent_before=%s, dead_letter_before=%s",
+            stats["archived"],
+            stats["batches"],
+            sent_before,
+            dead_letter_before,
+        )
+        return stats
+
+
+def archive_outbox_v2(now: Optional[datetime] = None) -> Dict[str, int]:
+    storage = create_data_store(storage_type="sqlite", db_path="performance_data.db")
+    stats = OutboxRetentionService(storage, now=now).run()
+    logging.info("outbox 归档任务完成: %s", stats)
+    return stats
@@ -6,18 +6,26 @@ import logging
 import os
 import re
 import time
-from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
 
 import requests
 
 from modules.config import API_URL_PENDING_ORDERS_REMINDER
 from modules.core.storage import PerformanceDataStore, create_data_store
 from modules.core.webhook_router import CHANNEL_PENDING_ORDERS, format_safe_webhook_target, resolve_wecom_webhook
-from modules.request_module import send_request_with_managed_session
+from modules.metabase_stream import MetabaseCardStream, card_columns_and_rows
+from modules.request_module import (
+    metabase_card_parameter,
+    metabase_streaming_enabled,
+    send_request_with_managed_session,
+    send_streaming_request_with_managed_session,
+)
+from modules.time_parsing import BEIJING_TZ, parse_datetime
 
 
 PENDING_ORDERS_ACTIVITY_CODE = "PENDING-ORDERS-REMINDER"
+PENDING_ELIGIBLE_HOURS = 48
 
 
 def _is_truthy(value: str) -> bool:
@@ -25,13 +33,7 @@ def _is_truthy(value: str) -> bool:
 
 
 def _parse_iso_datetime(value: str) -> datetime:
-    if "+" in value:
-        parsed = datetime.fromisoformat(value)
-    else:
-        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
-    if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=timezone.utc)
-    return parsed
+    return parse_datetime(value, default_tz=timezone.utc)
 
 
 def _format_simple_date(value: str) -> str:
@@ -100,6 +102,8 @@ class PendingOrdersReminderService:
         self.logger = logging.getLogger(__name__)
         self.activity_code = PENDING_ORDERS_ACTIVITY_CODE
         self.dry_run = _is_truthy(os.getenv("PENDING_ORDERS_DRY_RUN", ""))
+        # 开启后，服务商活跃工单集合自上次成功提醒以来未变化时不再重复提醒
+        self.skip_unchanged = _is_truthy(os.getenv("PENDING_ORDERS_SKIP_UNCHANGED", ""))
 
     def run(self) -> Dict[str, int]:
         """执行一次待预约工单提醒。"""
@@ -108,6 +112,7 @@ class PendingOrdersReminderService:
             "eligible_orders": 0,
             "deactivated_orders": 0,
             "orgs_with_new_orders": 0,
+            "orgs_unchanged": 0,
             "enqueued": 0,
             "sent": 0,
             "failed": 0,
@@ -116,30 +121,21 @@ class PendingOrdersReminderService:
         }
 
         rows = self._fetch_rows_from_metabase()
-        stats["raw_orders"] = len(rows)
         snapshots = self._filter_and_build_snapshots(rows)
+        stats["raw_orders"] = rows.row_count if isinstance(rows, MetabaseCardStream) else len(rows)
         stats["eligible_orders"] = len(snapshots)
 
-        active_fingerprints = []
-        for snapshot in snapshots:
-            self.storage.upsert_pending_order_snapshot(self.activity_code, snapshot)
-            active_fingerprints.append(snapshot["status_fingerprint"])
-
-        stats["deactivated_orders"] = self.storage.deactivate_missing_pending_orders(
-            self.activity_code,
-            active_fingerprints,
-        )
+        sync_result = self.storage.sync_pending_order_snapshots(self.activity_code, snapshots)
+        stats["deactivated_orders"] = sync_result["deactivated"]
 
         active_by_org: Dict[str, List[Dict]] = {}
-        for snapshot in snapshots:
-            org_name = snapshot["org_name"]
-            active_by_org.setdefault(org_name, [])
-        for org_name in list(active_by_org.keys()):
-            active_rows = self.storage.get_active_pending_orders_by_org(self.activity_code, org_name)
-            if active_rows:
-                active_by_org[org_name] = active_rows
-            else:
-                active_by_org.pop(org_name, None)
+        digest_by_org: Dict[str, str] = {}
+        for org_name, group in self.storage.get_active_pending_orders_grouped(self.activity_code).items():
+            if self.skip_unchanged and group["digest_fingerprint"] == group["last_notified_digest"]:
+                stats["orgs_unchanged"] += 1
+                continue
+            active_by_org[org_name] = group["rows"]
+            digest_by_org[org_name] = group["digest_fingerprint"]
 
         # 兼容原有统计字段名，当前语义为“本次需要提醒的服务商数量”
         stats["orgs_with_new_orders"] = len(active_by_org)
@@ -149,13 +145,14 @@ class PendingOrdersReminderService:
         if self.dry_run:
             return stats
 
-        for org_name, active_rows in active_by_org.items():
-            outbox_id = self._enqueue_org_digest(org_name, active_rows)
-            if not outbox_id:
+        digests = [
+            self._build_org_digest(org_name, active_rows, digest_by_org[org_name])
+            for org_name, active_rows in active_by_org.items()
+        ]
+        for outbox in self.storage.enqueue_outbox_messages(digests):
+            if not outbox["id"]:
                 continue
-
-            outbox = self.storage.get_outbox_message(outbox_id)
-            if outbox.get("status") == "sent":
+            if outbox["status"] == "sent":
                 self._mark_rows_notified_from_metadata(outbox)
                 continue
             stats["enqueued"] += 1
@@ -175,15 +172,31 @@ class PendingOrdersReminderService:
             )
             self.logger.info("[DRY RUN] 消息预览:\n%s", preview)
 
-    def _fetch_rows_from_metabase(self) -> List[List]:
+    def _fetch_rows_from_metabase(self) -> Iterable[List]:
+        """返回工单行；开启 METABASE_STREAMING 时返回边读取边解析的 MetabaseCardStream。"""
+        parameters = self._query_parameters()
         self.logger.info("获取待预约工单数据: %s", API_URL_PENDING_ORDERS_REMINDER)
-        response = send_request_with_managed_session(API_URL_PENDING_ORDERS_REMINDER)
-        if not response or "data" not in response:
+        if metabase_streaming_enabled():
+            response = send_streaming_request_with_managed_session(API_URL_PENDING_ORDERS_REMINDER, parameters)
+        else:
+            response = send_request_with_managed_session(API_URL_PENDING_ORDERS_REMINDER, parameters)
+        card = card_columns_and_rows(response)
+        if card is None:
             self.logger.warning("待预约工单接口返回为空或格式异常")
             return []
-        return response.get("data", {}).get("rows", []) or []
-
-    def _filter_and_build_snapshots(self, rows: List[List]) -> List[Dict]:
+        return card[1]
+
+    def _query_parameters(self) -> Optional[List[Dict]]:
+        """PENDING_ORDERS_CREATED_BEFORE_PARAM 配置卡片中 createTime 上限的 template tag 名时，
+        只拉取已满 48 小时的工单（要求卡片只返回待预约/暂不上门状态，否则会漏掉未满 48 小时的其他状态）。
+        """
+        tag = os.getenv("PENDING_ORDERS_CREATED_BEFORE_PARAM", "").strip()
+        if not tag:
+            return None
+        created_before = self.now - timedelta(hours=PENDING_ELIGIBLE_HOURS)
+        return [metabase_card_parameter(tag, created_before.astimezone(BEIJING_TZ).strftime("%Y-%m-%dT%H:%M:%S"))]
+
+    def _filter_and_build_snapshots(self, rows: Iterable[List]) -> List[Dict]:
         snapshots = []
         for row in rows:
             try:
@@ -197,7 +210,7 @@ class PendingOrdersReminderService:
 
                 created_at = _parse_iso_datetime(create_time)
                 hours_elapsed = (self.now - created_at).total_seconds() / 3600
-                if ("待预约" in order_status or "暂不上门" in order_status) and hours_elapsed < 48:
+                if ("待预约" in order_status or "暂不上门" in order_status) and hours_elapsed < PENDING_ELIGIBLE_HOURS:
                     continue
 
                 fingerprint_seed = f"{order_num}::{order_status}"
@@ -223,7 +236,7 @@ class PendingOrdersReminderService:
                 self.logger.warning("跳过异常工单数据 %s，错误: %s", row, exc)
         return snapshots
 
-    def _enqueue_org_digest(self, org_name: str, active_rows: List[Dict]) -> int:
+    def _build_org_digest(self, org_name: str, active_rows: List[Dict], digest_fingerprint: str = "") -> Dict:
         payload = {
             "msgtype": "text",
             "text": {"content": _format_pending_orders_message(org_name, active_rows)},
@@ -231,23 +244,29 @@ class PendingOrdersReminderService:
         metadata = {
             "pending_order_fingerprints": [row["status_fingerprint"] for row in active_rows],
             "org_name": org_name,
+            "digest_fingerprint": digest_fingerprint,
             "run_marker": self.now.isoformat(),
         }
-        return self.storage.enqueue_outbox_message(
-            activity_code=self.activity_code,
-            contract_id=f"org::{org_name}",
-            message_type="pending_orders_digest",
-            webhook_url=resolve_wecom_webhook(CHANNEL_PENDING_ORDERS, org_name=org_name),
-            payload_json=json.dumps(payload, ensure_ascii=False),
-            metadata_json=json.dumps(metadata, ensure_ascii=False),
-            dedupe_key=f"{org_name}::pending_orders_digest::{self.now.isoformat()}",
-        )
+        return {
+            "activity_code": self.activity_code,
+            "contract_id": f"org::{org_name}",
+            "message_type": "pending_orders_digest",
+            "webhook_url": resolve_wecom_webhook(CHANNEL_PENDING_ORDERS, org_name=org_name),
+            "payload_json": json.dumps(payload, ensure_ascii=False),
+            "metadata_json": json.dumps(metadata, ensure_ascii=False),
+            "dedupe_key": f"{org_name}::pending_orders_digest::{self.now.isoformat()}",
+        }
 
     def _dispatch_outbox(self) -> Dict[str, int]:
         stats = {"sent": 0, "failed": 0, "dead_letter": 0}
         max_attempts = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
         limit = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_LIMIT", "200"))
-        outbox_items = self.storage.get_retryable_outbox_messages(self.activity_code, max_attempts=max_attempts, limit=limit)
+        outbox_items = self.storage.get_retryable_outbox_messages(
+            self.activity_code,
+            max_attempts=max_attempts,
+            limit=limit,
+            claim_seconds=int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900")),
+        )
 
         for item in outbox_items:
             try:
@@ -292,12 +311,26 @@ class PendingOrdersReminderService:
         return stats
 
     def _mark_rows_notified_from_metadata(self, outbox_item: Dict) -> int:
-        try:
-            metadata = json.loads(outbox_item.get("metadata_json") or "{}")
-        except json.JSONDecodeError:
-            metadata = {}
-        fingerprints = metadata.get("pending_order_fingerprints") or []
-        return self.storage.mark_pending_orders_notified(self.activity_code, fingerprints)
+        return mark_pending_orders_digest_sent(self.storage, self.activity_code, outbox_item)
+
+
+def mark_pending_orders_digest_sent(storage: PerformanceDataStore, activity_code: str, outbox_item: Dict) -> int:
+    """摘要消息发送成功后：标记工单已提醒，并记录该服务商最近一次已通知的集合指纹。
+
+    业务任务与 outbox 补发任务共用，保证 PENDING_ORDERS_SKIP_UNCHANGED 对两条发送路径一致。
+    """
+    try:
+        metadata = json.loads(outbox_item.get("metadata_json") or "{}")
+    except json.JSONDecodeError:
+        metadata = {}
+    fingerprints = metadata.get("pending_order_fingerprints") or []
+    if metadata.get("org_name") and metadata.get("digest_fingerprint"):
+        storage.save_pending_order_org_digest(
+            activity_code,
+            metadata["org_name"],
+            metadata["digest_fingerprint"],
+        )
+    return storage.mark_pending_orders_notified(activity_code, fingerprints)
 
 
 def send_pending_orders_reminder_v2(now: Optional[datetime] = None) -> Dict[str, int]:
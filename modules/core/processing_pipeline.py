@@ -11,8 +11,11 @@
 4. 统一的处理流程
 """
 
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import re
+import unicodedata
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 
 from .data_models import (
@@ -24,6 +27,15 @@ from .reward_calculator import RewardCalculator
 from .record_builder import RecordBuilder
 
 
+def _normalize_project_address(address: str) -> str:
+    """项目地址归一化：全角转半角、去空白、统一大小写。"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(address or ""))).casefold()
+
+
+def _project_address_hash(normalized_address: str) -> str:
+    return hashlib.sha256(normalized_address.encode("utf-8")).hexdigest()
+
+
 class DataProcessingPipeline:
     """数据库驱动的统一处理管道 - 大幅简化逻辑"""
 
@@ -34,8 +46,19 @@ class DataProcessingPipeline:
         self.record_builder = RecordBuilder(config)
         self.runtime_awards = {}  # 运行时奖励状态，防止同一次执行中重复发放
 
-        # 🔧 修复：运行时项目地址去重管理 - 与旧架构保持一致的内存去重
-        self.runtime_project_addresses = {}  # {housekeeper_key: set(project_addresses)}
+        # 自引单项目地址去重：持久化索引在 process 开始时预加载，跨运行生效
+        self.project_address_index: Optional[Dict[Tuple[str, str], str]] = None  # {(管家键, 地址哈希): 首个合同ID}
+        self.pending_project_addresses: List[Dict] = []
+
+        # 可选：写入记录时在同一事务内渲染并入队播报消息，避免通知阶段全量回读
+        self.inline_notifier = None
+        if config.enable_inline_outbox:
+            from .notification_service import NotificationService
+            notifier = NotificationService(store, config)
+            if notifier.uses_inline_outbox():
+                self.inline_notifier = notifier
+            else:
+                logging.info(f"{config.config_key} 不支持 inline outbox，沿用通知阶段回读入队")
 
         logging.info(f"Initialized processing pipeline for {config.activity_code}")
 
@@ -84,6 +107,9 @@ class DataProcessingPipeline:
                 len(contract_data_list),
             )
 
+        if self.config.enable_dual_track and self.project_address_index is None:
+            self.project_address_index = self._load_project_address_index()
+
         # 🔧 关键修复：保存历史奖励信息
         self.housekeeper_award_lists = housekeeper_award_lists or {}
         logging.info(f"Loaded historical awards for {len(self.housekeeper_award_lists)} housekeepers")
@@ -208,17 +234,13 @@ class DataProcessingPipeline:
                         contract_data.order_type.value == 'self_referral'):
                         project_address = contract_data.raw_data.get('项目地址(projectAddress)', '')
                         if project_address:
-                            is_duplicate_address = self._is_project_address_duplicate_runtime(
-                                housekeeper_key, project_address)
+                            # 记录项目地址到去重索引（无论是否重复都要记录）
+                            is_duplicate_address = self._register_project_address(
+                                housekeeper_key, project_address, contract_data.contract_id)
 
                             if is_duplicate_address:
                                 logging.debug(f"重复项目地址，将处理合同但不给奖励: {project_address}")
 
-                            # 记录项目地址到运行时缓存（无论是否重复都要记录）
-                            if housekeeper_key not in self.runtime_project_addresses:
-                                self.runtime_project_addresses[housekeeper_key] = set()
-                            self.runtime_project_addresses[housekeeper_key].add(project_address)
-
                     # 7. 计算奖励（使用更新后的统计数据，传递序号信息）
                     # 🔧 修复：重复项目地址的自引单不给奖励，与旧架构保持一致
                     if is_duplicate_address:
@@ -262,8 +284,17 @@ class DataProcessingPipeline:
                 if refresh_existing_contracts and existing_record:
                     record.notification_sent = bool(existing_record.get("notification_sent"))
                 
-                # 10. 保存记录
-                self.store.save_performance_record(record)
+                # 10. 保存记录（inline outbox 模式下同事务入队播报消息）
+                if self.inline_notifier:
+                    try:
+                        message = self.inline_notifier.build_outbox_message(record)
+                    except Exception as e:
+                        # 渲染失败不影响记录写入；无 outbox 的未通知记录由通知阶段回读补入队
+                        logging.error(f"Inline outbox render failed for {contract_data.contract_id}: {e}")
+                        message = None
+                    self.store.save_performance_record_with_outbox(record, message)
+                else:
+                    self.store.save_performance_record(record)
                 performance_records.append(record)
 
                 # 只有新增合同才计入processed_count（用于合同序号计算）
@@ -284,6 +315,9 @@ class DataProcessingPipeline:
                 continue
         
         logging.info(f"Processing completed: {processed_count} processed, {skipped_count} skipped")
+        if self.pending_project_addresses:
+            self.store.save_project_address_index(self.config.activity_code, self.pending_project_addresses)
+            self.pending_project_addresses = []
         if refresh_existing_contracts:
             current_contract_ids = {str(item.get("合同ID(_id)")) for item in contract_data_list}
             deleted_count = self.store.delete_performance_records_not_in(
@@ -450,38 +484,49 @@ class DataProcessingPipeline:
         
         return summary
 
-    def _is_project_address_duplicate_runtime(self, housekeeper_key: str, project_address: str) -> bool:
-        """检查项目地址是否重复（运行时内存去重 - 与旧架构保持一致）"""
-        if housekeeper_key not in self.runtime_project_addresses:
-            return False
-
-        return project_address in self.runtime_project_addresses[housekeeper_key]
-
-    def _is_project_address_duplicate(self, housekeeper: str, project_address: str, activity_code: str) -> bool:
-        """检查项目地址是否重复（上海自引单特有逻辑）"""
-        try:
-            # 查询数据库中是否已存在相同管家和项目地址的记录
-            all_records = self.store.get_all_records(activity_code)
-
-            for record in all_records:
-                if (record.get('housekeeper') == housekeeper and
-                    record.get('order_type') == 'self_referral'):
-                    # 从扩展字段中获取项目地址
-                    extensions = record.get('extensions', '{}')
-                    if extensions:
-                        try:
-                            import json
-                            ext_data = json.loads(extensions)
-                            existing_address = ext_data.get('项目地址(projectAddress)', '')
-                            if existing_address == project_address:
-                                return True
-                        except json.JSONDecodeError:
-                            continue
+    def _project_address_entry(self, housekeeper_key: str, project_address: str, contract_id: str) -> Optional[Dict]:
+        normalized = _normalize_project_address(project_address)
+        if not normalized:
+            return None
+        return {
+            "housekeeper": housekeeper_key,
+            "address_hash": _project_address_hash(normalized),
+            "normalized_address": normalized,
+            "contract_id": str(contract_id),
+        }
 
+    def _load_project_address_index(self) -> Dict[Tuple[str, str], str]:
+        """预加载项目地址去重索引，并补录尚未入索引的已存自引单。"""
+        activity_code = self.config.activity_code
+        index: Dict[Tuple[str, str], str] = {}
+        for row in self.store.get_project_address_index(activity_code):
+            index.setdefault((row["housekeeper"], row["address_hash"]), str(row["contract_id"]))
+
+        backfill = []
+        for row in self.store.get_unindexed_project_addresses(activity_code):
+            entry = self._project_address_entry(row["housekeeper"], row["project_address"], row["contract_id"])
+            if entry:
+                backfill.append(entry)
+                index.setdefault((entry["housekeeper"], entry["address_hash"]), entry["contract_id"])
+        if backfill:
+            self.store.save_project_address_index(activity_code, backfill)
+            logging.info(f"项目地址去重索引补录 {len(backfill)} 条")
+
+        logging.info(f"Loaded project address index: {len(index)} entries for {activity_code}")
+        return index
+
+    def _register_project_address(self, housekeeper_key: str, project_address: str, contract_id: str) -> bool:
+        """登记自引单项目地址，返回是否与此前其他合同重复（同一管家、归一化地址相同）。"""
+        entry = self._project_address_entry(housekeeper_key, project_address, contract_id)
+        if entry is None:
             return False
-        except Exception as e:
-            logging.error(f"检查项目地址重复时出错: {e}")
-            return False
+        if self.project_address_index is None:
+            self.project_address_index = {}
+        first_contract_id = self.project_address_index.setdefault(
+            (entry["housekeeper"], entry["address_hash"]), entry["contract_id"]
+        )
+        self.pending_project_addresses.append(entry)
+        return first_contract_id != entry["contract_id"]
 
 
 class PipelineValidator:
@@ -1,22 +1,20 @@
 """企业微信电子表格同步任务。"""
 
+import functools
 import hashlib
 import json
 import logging
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import requests
 
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:  # pragma: no cover - Python < 3.9 fallback
-    ZoneInfo = None
-
 from modules.config import (
     API_URL_CREW_SETTLEMENT_FINANCE_LEDGER_SMARTSHEET,
     API_URL_MATERIAL_REPLENISHMENT_SMARTSHEET,
@@ -29,8 +27,16 @@ from modules.config import (
     WECOM_PAYMENT_RECORDS_SMARTSHEET_WEBHOOK,
     WECOM_PROJECT_SETTLEMENT_SMARTSHEET_WEBHOOK,
 )
+from modules.core.card_fingerprint import CardFingerprintGuard
 from modules.core.storage import PerformanceDataStore, create_data_store
-from modules.request_module import send_request_with_managed_session
+from modules.core.task_lease import TaskLease, TaskLeaseBusy, task_lease_enabled
+from modules.metabase_stream import card_columns_and_rows
+from modules.request_module import (
+    metabase_streaming_enabled,
+    send_request_with_managed_session,
+    send_streaming_request_with_managed_session,
+)
+from modules.time_parsing import BEIJING_TZ, parse_datetime_or_none
 
 
 @dataclass(frozen=True)
@@ -49,16 +55,18 @@ class SmartsheetSyncConfig:
     datetime_fields: Set[str] = field(default_factory=set)
     multi_text_fields: Set[str] = field(default_factory=set)
     identity_keys: Tuple[str, ...] = ()
+    update_changed_records: bool = True
+    # 与 scheduled_tasks.TASKS 中的任务名一致，统一同步与单卡任务共用同一租约键
+    task_name: str = ""
 
 
 def _get_beijing_tz():
-    if ZoneInfo is not None:
-        return ZoneInfo("Asia/Shanghai")
-    return timezone.utc
+    return BEIJING_TZ
 
 
 PROJECT_SETTLEMENT_SYNC_CONFIG = SmartsheetSyncConfig(
     activity_code="PROJECT-SETTLEMENT-SMARTSHEET-SYNC",
+    task_name="project-settlement-smartsheet",
     api_url=API_URL_PROJECT_SETTLEMENT_SMARTSHEET,
     webhook_url=WECOM_PROJECT_SETTLEMENT_SMARTSHEET_WEBHOOK,
     schema={
@@ -104,6 +112,7 @@ PROJECT_SETTLEMENT_SYNC_CONFIG = SmartsheetSyncConfig(
 
 CONTRACT_COMPLETION_SYNC_CONFIG = SmartsheetSyncConfig(
     activity_code="CONTRACT-COMPLETION-SMARTSHEET-SYNC",
+    task_name="contract-completion-smartsheet",
     api_url=API_URL_CONTRACT_COMPLETION_SMARTSHEET,
     webhook_url=WECOM_CONTRACT_COMPLETION_SMARTSHEET_WEBHOOK,
     schema={
@@ -124,6 +133,7 @@ CONTRACT_COMPLETION_SYNC_CONFIG = SmartsheetSyncConfig(
 
 PAYMENT_RECORDS_SYNC_CONFIG = SmartsheetSyncConfig(
     activity_code="PAYMENT-RECORDS-SMARTSHEET-SYNC",
+    task_name="payment-records-smartsheet",
     api_url=API_URL_PAYMENT_RECORDS_SMARTSHEET,
     webhook_url=WECOM_PAYMENT_RECORDS_SMARTSHEET_WEBHOOK,
     schema={
@@ -148,6 +158,7 @@ PAYMENT_RECORDS_SYNC_CONFIG = SmartsheetSyncConfig(
 
 CREW_SETTLEMENT_FINANCE_LEDGER_SYNC_CONFIG = SmartsheetSyncConfig(
     activity_code="CREW-SETTLEMENT-FINANCE-LEDGER-SMARTSHEET-SYNC",
+    task_name="crew-settlement-finance-ledger-smartsheet",
     api_url=API_URL_CREW_SETTLEMENT_FINANCE_LEDGER_SMARTSHEET,
     webhook_url=WECOM_CREW_SETTLEMENT_FINANCE_LEDGER_SMARTSHEET_WEBHOOK,
     schema={
@@ -199,6 +210,7 @@ CREW_SETTLEMENT_FINANCE_LEDGER_SYNC_CONFIG = SmartsheetSyncConfig(
 
 MATERIAL_REPLENISHMENT_SYNC_CONFIG = SmartsheetSyncConfig(
     activity_code="MATERIAL-REPLENISHMENT-SMARTSHEET-SYNC",
+    task_name="material-replenishment-smartsheet",
     api_url=API_URL_MATERIAL_REPLENISHMENT_SMARTSHEET,
     webhook_url=WECOM_MATERIAL_REPLENISHMENT_SMARTSHEET_WEBHOOK,
     schema={
@@ -227,6 +239,18 @@ MATERIAL_REPLENISHMENT_SYNC_CONFIG = SmartsheetSyncConfig(
 )
 
 
+# 统一电子表格同步的卡片顺序（并发预取后按响应到达顺序处理）
+SMARTSHEET_SYNC_CONFIGS: Tuple[SmartsheetSyncConfig, ...] = (
+    PROJECT_SETTLEMENT_SYNC_CONFIG,
+    CONTRACT_COMPLETION_SYNC_CONFIG,
+    PAYMENT_RECORDS_SYNC_CONFIG,
+    CREW_SETTLEMENT_FINANCE_LEDGER_SYNC_CONFIG,
+    MATERIAL_REPLENISHMENT_SYNC_CONFIG,
+)
+DEFAULT_PREFETCH_MAX_WORKERS = 5
+_NOT_PREFETCHED = object()
+
+
 def _is_truthy(value: str) -> bool:
     return str(value or "").strip().lower() in {"1", "true", "yes", "y", "on"}
 
@@ -300,30 +324,9 @@ def _parse_beijing_datetime(value) -> Optional[datetime]:
         seconds = number / 1000.0 if abs(number) >= 1_000_000_000_000 else number
         return datetime.fromtimestamp(seconds, tz=timezone.utc).astimezone(tz)
 
-    # ISO 8601（含时区或不含时区皆可）
-    iso_text = text.replace("Z", "+00:00")
-    try:
-        dt = datetime.fromisoformat(iso_text)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=tz)
-        return dt.astimezone(tz)
-    except ValueError:
-        pass
-
-    # 常见中文系统返回的朴素本地时间格式
-    for fmt in (
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d",
-        "%Y/%m/%d %H:%M:%S",
-        "%Y/%m/%d",
-    ):
-        try:
-            return datetime.strptime(text, fmt).replace(tzinfo=tz)
-        except ValueError:
-            continue
-
-    return None
+    # ISO 8601（含时区或不含时区皆可）及常见中文系统的朴素本地时间格式
+    dt = parse_datetime_or_none(text, default_tz=tz)
+    return dt.astimezone(tz) if dt is not None else None
 
 
 def _normalize_datetime_value(value):
@@ -352,6 +355,30 @@ def _unique_non_empty(values: List[str]) -> List[str]:
     return result
 
 
+def _hash_text(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _build_content_hash(values: Dict) -> str:
+    """对归一化后的电子表格字段值计算稳定指纹。"""
+    return _hash_text(json.dumps(values, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def _extract_record_id(body_text: str) -> str:
+    """从企业微信电子表格 webhook 响应中提取新增记录的 record_id。"""
+    try:
+        body = json.loads(body_text or "{}")
+    except json.JSONDecodeError:
+        return ""
+    if not isinstance(body, dict):
+        return ""
+    records = body.get("add_records") or body.get("records") or (body.get("data") or {}).get("add_records") or []
+    for item in records if isinstance(records, list) else []:
+        if isinstance(item, dict) and item.get("record_id"):
+            return str(item["record_id"])
+    return ""
+
+
 def _is_field_id(config: SmartsheetSyncConfig, key: str) -> bool:
     return key in config.schema
 
@@ -390,18 +417,31 @@ class SmartsheetSyncService:
         if not sync_config.webhook_url:
             raise ValueError(f"{sync_config.log_label} webhook 环境变量未设置")
 
-    def run(self) -> Dict[str, int]:
+    def run(self, response=_NOT_PREFETCHED) -> Dict[str, int]:
+        """执行一次同步；response 为已预取的 Metabase 响应，未传入时由本服务请求。"""
         stats = {
             "raw_records": 0,
             "eligible_records": 0,
+            "unchanged_records": 0,
             "enqueued": 0,
+            "update_enqueued": 0,
+            "unrouted_changes": 0,
             "sent": 0,
             "failed": 0,
             "dead_letter": 0,
+            "card_unchanged": 0,
             "dry_run": 1 if self.dry_run else 0,
         }
 
-        records = self._fetch_records_from_metabase()
+        if response is _NOT_PREFETCHED:
+            response = _fetch_card_response(self.sync_config)
+        card_guard = CardFingerprintGuard(self.storage, self.activity_code, self.sync_config.api_url)
+        if not self.dry_run and card_guard.unchanged(response):
+            return self._finish_unchanged_card(stats, card_guard.row_count)
+
+        records = self._records_from_response(response, card_guard)
+        if not self.dry_run and card_guard.streamed_unchanged():
+            return self._finish_unchanged_card(stats, card_guard.row_count)
         stats["raw_records"] = len(records)
 
         eligible_records = []
@@ -423,50 +463,107 @@ class SmartsheetSyncService:
             self._log_dry_run_preview(eligible_records)
             return stats
 
+        # 先按内容指纹过滤：identity 与归一化字段值都未变化的行不再触碰 outbox
+        sync_state = self.storage.get_smartsheet_sync_state(self.activity_code)
+        state_updates = []
+        messages = []
         for record, values in eligible_records:
-            outbox_id = self._enqueue_record(record, values)
-            if not outbox_id:
+            identity_hash = self._build_identity_hash(record)
+            content_hash = _build_content_hash(values)
+            known = sync_state.get(identity_hash)
+            if known and known.get("content_hash") == content_hash:
+                stats["unchanged_records"] += 1
                 continue
 
-            outbox = self.storage.get_outbox_message(outbox_id)
-            if outbox.get("status") == "sent":
-                continue
-            stats["enqueued"] += 1
+            if known:
+                # identity 已写入过电子表格，内容变化时走 update_records，而不是重复 add
+                record_id = known.get("record_id", "")
+                if not (self.sync_config.update_changed_records and record_id):
+                    # 尚无 record_id 无法更新：保留旧指纹，待 record_id 写入后的下一次运行重试
+                    stats["unrouted_changes"] += 1
+                    continue
+                messages.append(self._build_update_message(record, values, identity_hash, content_hash, record_id))
+            else:
+                messages.append(self._build_add_message(record, values, identity_hash))
+            state_updates.append({"identity_hash": identity_hash, "content_hash": content_hash})
+
+        if messages:
+            for message, outbox in zip(messages, self.storage.enqueue_outbox_messages(messages)):
+                if not outbox["id"] or outbox["status"] == "sent":
+                    continue
+                if message["message_type"] == "wedoc_update_record":
+                    stats["update_enqueued"] += 1
+                else:
+                    stats["enqueued"] += 1
+
+        self.storage.save_smartsheet_sync_state(self.activity_code, state_updates)
+        if stats["unrouted_changes"]:
+            self.logger.warning(
+                "%s有 %s 条已变化记录缺少 record_id，暂无法发送更新，保留旧指纹待下次重试",
+                self.sync_config.log_label,
+                stats["unrouted_changes"],
+            )
+        else:
+            # 仍有未投递的变化时不记录卡片指纹，否则卡片未变化的快速路径会跳过重试
+            card_guard.commit()
 
         dispatch_stats = self._dispatch_outbox()
         for key in ("sent", "failed", "dead_letter"):
             stats[key] = dispatch_stats[key]
         return stats
 
-    def _fetch_records_from_metabase(self) -> List[Dict]:
-        self.logger.info("获取%s数据: %s", self.sync_config.log_label, self.sync_config.api_url)
-        response = send_request_with_managed_session(self.sync_config.api_url)
-        if not response or "data" not in response:
+    def _finish_unchanged_card(self, stats: Dict[str, int], row_count: int) -> Dict[str, int]:
+        # 整张卡片未变化：所有行相对同步指纹也都未变化，只投递到期 outbox
+        stats["card_unchanged"] = 1
+        stats["raw_records"] = stats["unchanged_records"] = row_count
+        stats.update(self._dispatch_outbox())
+        return stats
+
+    def _records_from_response(
+        self, response, card_guard: Optional[CardFingerprintGuard] = None
+    ) -> List[Dict]:
+        """把完整响应或流式响应的 rows 逐行解码为记录；流式响应的行经 card_guard 累计指纹。"""
+        card = card_columns_and_rows(response)
+        if card is None:
             self.logger.warning("%s接口返回为空或格式异常", self.sync_config.log_label)
             return []
 
-        data = response.get("data", {})
-        rows = data.get("rows", []) or []
-        cols = data.get("cols", []) or []
-        if cols:
-            # 同时保留 name 与 display_name 两种 key，兼容 Metabase 对嵌套字段
-            # (如 exts.endDateExts) 的 name 使用 JSON 路径、display_name 使用裸字段名
-            # 的场景，避免 source_field_map 配置与实际列名不一致时字段丢失。
-            records: List[Dict] = []
-            for row in rows:
-                record: Dict = {}
-                for col, value in zip(cols, row):
-                    name = col.get("name")
-                    display_name = col.get("display_name")
-                    if name:
-                        record[name] = value
-                    if display_name and display_name != name:
-                        record.setdefault(display_name, value)
-                records.append(record)
-            return records
-
-        names = _unique_non_empty(list(self.sync_config.source_field_map.values()) + list(self.sync_config.schema.values()))
-        return [dict(zip(names, row)) for row in rows]
+        cols, rows = card
+        if card_guard is not None:
+            rows = card_guard.track(cols, rows)
+        decode = self._compile_record_decoder(cols)
+        return [decode(row) for row in rows]
+
+    def _compile_record_decoder(self, cols: List[Dict]):
+        """按列元数据预先算好 (下标, key) 列表，逐行解码时不再重复判断列名。"""
+        if not cols:
+            names = _unique_non_empty(
+                list(self.sync_config.source_field_map.values()) + list(self.sync_config.schema.values())
+            )
+            return lambda row: dict(zip(names, row))
+
+        # 同时保留 name 与 display_name 两种 key，兼容 Metabase 对嵌套字段
+        # (如 exts.endDateExts) 的 name 使用 JSON 路径、display_name 使用裸字段名
+        # 的场景，避免 source_field_map 配置与实际列名不一致时字段丢失。
+        primary: List[Tuple[int, str]] = []
+        fallback: List[Tuple[int, str]] = []
+        for index, col in enumerate(cols):
+            name = col.get("name")
+            display_name = col.get("display_name")
+            if name:
+                primary.append((index, name))
+            if display_name and display_name != name:
+                fallback.append((index, display_name))
+
+        def decode(row: List) -> Dict:
+            width = len(row)
+            record = {key: row[index] for index, key in primary if index < width}
+            for index, key in fallback:
+                if index < width:
+                    record.setdefault(key, row[index])
+            return record
+
+        return decode
 
     def _build_smartsheet_values(self, record: Dict) -> Dict:
         values = {}
@@ -495,7 +592,7 @@ class SmartsheetSyncService:
                 values[field_id] = text
         return values
 
-    def _enqueue_record(self, record: Dict, values: Dict) -> int:
+    def _build_add_message(self, record: Dict, values: Dict, identity_hash: str = "") -> Dict:
         dedupe_key = self._build_dedupe_key(record)
         primary_value = _stringify(_get_record_value(record, self.sync_config, self.sync_config.primary_field_id))
         payload = {
@@ -508,17 +605,48 @@ class SmartsheetSyncService:
                 key: _stringify(_resolve_identity_value(record, self.sync_config, key))
                 for key in self.sync_config.identity_keys
             },
+            "identity_hash": identity_hash or self._build_identity_hash(record),
             "run_marker": self.now.isoformat(),
         }
-        return self.storage.enqueue_outbox_message(
-            activity_code=self.activity_code,
-            contract_id=primary_value or dedupe_key,
-            message_type="wedoc_add_record",
-            webhook_url=self.sync_config.webhook_url,
-            payload_json=json.dumps(payload, ensure_ascii=False),
-            metadata_json=json.dumps(metadata, ensure_ascii=False),
-            dedupe_key=dedupe_key,
-        )
+        return {
+            "activity_code": self.activity_code,
+            "contract_id": primary_value or dedupe_key,
+            "message_type": "wedoc_add_record",
+            "webhook_url": self.sync_config.webhook_url,
+            "payload_json": json.dumps(payload, ensure_ascii=False),
+            "metadata_json": json.dumps(metadata, ensure_ascii=False),
+            "dedupe_key": dedupe_key,
+        }
+
+    def _build_update_message(
+        self,
+        record: Dict,
+        values: Dict,
+        identity_hash: str,
+        content_hash: str,
+        record_id: str,
+    ) -> Dict:
+        primary_value = _stringify(_get_record_value(record, self.sync_config, self.sync_config.primary_field_id))
+        payload = {
+            "schema": self.sync_config.schema,
+            "update_records": [{"record_id": record_id, "values": values}],
+        }
+        metadata = {
+            "primary_value": primary_value,
+            "identity_hash": identity_hash,
+            "content_hash": content_hash,
+            "record_id": record_id,
+            "run_marker": self.now.isoformat(),
+        }
+        return {
+            "activity_code": self.activity_code,
+            "contract_id": primary_value or identity_hash,
+            "message_type": "wedoc_update_record",
+            "webhook_url": self.sync_config.webhook_url,
+            "payload_json": json.dumps(payload, ensure_ascii=False),
+            "metadata_json": json.dumps(metadata, ensure_ascii=False),
+            "dedupe_key": f"{self.sync_config.dedupe_prefix}::update::{identity_hash}::{content_hash}",
+        }
 
     def _dispatch_outbox(self) -> Dict[str, int]:
         stats = {"sent": 0, "failed": 0, "dead_letter": 0}
@@ -528,6 +656,7 @@ class SmartsheetSyncService:
             self.activity_code,
             max_attempts=max_attempts,
             limit=limit,
+            claim_seconds=int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900")),
         )
 
         for item in outbox_items:
@@ -543,6 +672,7 @@ class SmartsheetSyncService:
                 body_text = (response.text or "")[:2000]
                 if self._is_success_response(response.status_code, body_text):
                     self.storage.mark_outbox_sent(item["id"], response.status_code, body_text)
+                    self._remember_record_id(item, body_text)
                     stats["sent"] += 1
                 else:
                     self.logger.warning(
@@ -577,6 +707,21 @@ class SmartsheetSyncService:
             time.sleep(self.sync_config.dispatch_delay_seconds)
         return stats
 
+    def _remember_record_id(self, item: Dict, body_text: str) -> None:
+        """新增记录成功后保存 record_id，供后续内容变化时生成 update_records。"""
+        if item.get("message_type") != "wedoc_add_record":
+            return
+        record_id = _extract_record_id(body_text)
+        if not record_id:
+            return
+        try:
+            metadata = json.loads(item.get("metadata_json") or "{}")
+        except json.JSONDecodeError:
+            metadata = {}
+        identity_hash = metadata.get("identity_hash")
+        if identity_hash:
+            self.storage.set_smartsheet_record_id(self.activity_code, identity_hash, record_id)
+
     def _log_dry_run_preview(self, eligible_records: List[Tuple[Dict, Dict]]) -> None:
         for record, values in eligible_records[:10]:
             self.logger.info(
@@ -586,14 +731,19 @@ class SmartsheetSyncService:
                 json.dumps(values, ensure_ascii=False),
             )
 
-    def _build_dedupe_key(self, record: Dict) -> str:
+    def _build_identity_raw(self, record: Dict) -> str:
         identity_parts = [
             _stringify(_resolve_identity_value(record, self.sync_config, key))
             for key in self.sync_config.identity_keys
         ]
-        raw = "::".join(identity_parts)
-        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
-        return f"{self.sync_config.dedupe_prefix}::{raw}::{digest}"
+        return "::".join(identity_parts)
+
+    def _build_identity_hash(self, record: Dict) -> str:
+        return _hash_text(self._build_identity_raw(record))
+
+    def _build_dedupe_key(self, record: Dict) -> str:
+        raw = self._build_identity_raw(record)
+        return f"{self.sync_config.dedupe_prefix}::{raw}::{_hash_text(raw)}"
 
     @staticmethod
     def _is_success_response(status_code: int, body_text: str) -> bool:
@@ -609,6 +759,13 @@ class SmartsheetSyncService:
         return errcode in (None, 0, "0")
 
 
+def _fetch_card_response(sync_config: SmartsheetSyncConfig):
+    logging.info("获取%s数据: %s", sync_config.log_label, sync_config.api_url)
+    if metabase_streaming_enabled():
+        return send_streaming_request_with_managed_session(sync_config.api_url)
+    return send_request_with_managed_session(sync_config.api_url)
+
+
 class ProjectSettlementSmartsheetService(SmartsheetSyncService):
     """兼容旧名称的项目结算同步服务。"""
 
@@ -624,6 +781,70 @@ def _sync_smartsheet_task(sync_config: SmartsheetSyncConfig, now: Optional[datet
     return stats
 
 
+def sync_all_smartsheets_v2(
+    now: Optional[datetime] = None,
+    sync_configs: Tuple[SmartsheetSyncConfig, ...] = SMARTSHEET_SYNC_CONFIGS,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Dict[str, int]]:
+    """统一电子表格同步：并发预取全部 Metabase 卡片，按响应到达顺序逐个处理。
+
+    总耗时取决于最慢的卡片而非各卡片之和；处理与 outbox 投递仍在当前线程串行执行，
+    共用一个存储实例。单张卡片失败不影响其余卡片，全部处理后再抛出汇总错误。
+    METABASE_STREAMING 开启时不预取，逐张卡片请求后立即流式处理。
+    每张卡片持有与单卡任务相同的租约（task_name），正由其他执行者同步的卡片本次跳过。
+    """
+    storage = create_data_store(storage_type="sqlite", db_path="performance_data.db")
+
+    results: Dict[str, Dict[str, int]] = {}
+    failures: List[str] = []
+    with ExitStack() as leases:
+        if task_lease_enabled():
+            sync_configs = tuple(
+                sync_config for sync_config in sync_configs if _enter_card_lease(leases, sync_config, storage)
+            )
+        if not sync_configs:
+            return results
+        if max_workers is None:
+            max_workers = int(os.getenv("SMARTSHEET_PREFETCH_MAX_WORKERS", DEFAULT_PREFETCH_MAX_WORKERS))
+        max_workers = max(1, min(max_workers, len(sync_configs)))
+
+        def process(sync_config: SmartsheetSyncConfig, fetch: Callable[[], object]) -> None:
+            try:
+                service = SmartsheetSyncService(storage=storage, sync_config=sync_config, now=now)
+                stats = service.run(response=fetch())
+            except Exception as exc:
+                logging.error("%s电子表格同步失败: %s", sync_config.log_label, exc)
+                failures.append(sync_config.log_label)
+                return
+            logging.info("%s电子表格同步完成: %s", sync_config.log_label, stats)
+            results[sync_config.activity_code] = stats
+
+        if metabase_streaming_enabled():
+            # 流式响应预取时只读到响应头，排队等待期间未读的响应体会触发读超时；逐张请求并立即消费
+            for sync_config in sync_configs:
+                process(sync_config, functools.partial(_fetch_card_response, sync_config))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metabase-prefetch") as pool:
+                futures = {pool.submit(_fetch_card_response, sync_config): sync_config for sync_config in sync_configs}
+                for future in as_completed(futures):
+                    process(futures[future], future.result)
+
+    if failures:
+        raise RuntimeError(f"电子表格同步失败: {', '.join(failures)}")
+    return results
+
+
+def _enter_card_lease(leases: ExitStack, sync_config: SmartsheetSyncConfig, storage: PerformanceDataStore) -> bool:
+    if not sync_config.task_name:
+        return True
+    try:
+        leases.enter_context(TaskLease(sync_config.task_name, store=storage))
+    except TaskLeaseBusy as exc:
+        logging.info("跳过%s电子表格同步: %s", sync_config.log_label, exc)
+        return False
+    return True
+
+
 def sync_project_settlement_smartsheet_v2(now: Optional[datetime] = None) -> Dict[str, int]:
     return _sync_smartsheet_task(PROJECT_SETTLEMENT_SYNC_CONFIG, now=now)
 
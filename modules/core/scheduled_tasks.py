@@ -0,0 +1,193 @@
+"""定时任务注册表与北京时间路由（与 cloudflare-worker/worker.js 保持一致）。
+
+worker 的 cron 心跳为北京时间 08:00-23:30 每 30 分钟一次：
+- 每个心跳：北京签约播报、北京业绩播报、管家下线播报、五个电子表格同步
+- 08:30 额外：待预约工单提醒
+- 09:00 额外：SLA 日报
+- 23:30 额外：outbox 归档（当日最后一个心跳）
+"""
+
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.time_parsing import BEIJING_TZ
+
+# 任务名 -> (模块, 函数, 中文名)；按需导入，避免只跑一个任务时加载全部依赖
+TASKS: Dict[str, Tuple[str, str, str]] = {
+    "beijing-sign-broadcast": ("modules.core.beijing_jobs", "signing_broadcast_beijing", "北京签约播报"),
+    "beijing-performance-broadcast": ("modules.core.beijing_jobs", "performance_broadcast_beijing", "北京业绩播报"),
+    "housekeeper-offline-broadcast": (
+        "modules.core.housekeeper_offline_jobs", "broadcast_housekeeper_offline_v2", "管家下线播报",
+    ),
+    "pending-orders-reminder": ("modules.core.pending_orders_jobs", "send_pending_orders_reminder_v2", "待预约工单提醒"),
+    "project-settlement-smartsheet": (
+        "modules.core.project_settlement_jobs", "sync_project_settlement_smartsheet_v2", "项目结算电子表格同步",
+    ),
+    "contract-completion-smartsheet": (
+        "modules.core.project_settlement_jobs", "sync_contract_completion_smartsheet_v2", "合同完工电子表格同步",
+    ),
+    "payment-records-smartsheet": (
+        "modules.core.project_settlement_jobs", "sync_payment_records_smartsheet_v2", "支付记录电子表格同步",
+    ),
+    "crew-settlement-finance-ledger-smartsheet": (
+        "modules.core.project_settlement_jobs",
+        "sync_crew_settlement_finance_ledger_smartsheet_v2",
+        "吉柿工队结算财务台账电子表格同步",
+    ),
+    "material-replenishment-smartsheet": (
+        "modules.core.project_settlement_jobs", "sync_material_replenishment_smartsheet_v2", "材料补货电子表格同步",
+    ),
+    "daily-service-report": ("modules.core.sla_jobs", "generate_daily_service_report_v2", "SLA 日报"),
+    "outbox-drain": ("modules.core.outbox_drain", "drain_outbox_v2", "outbox 补发"),
+    "outbox-retention": ("modules.core.outbox_retention", "archive_outbox_v2", "outbox 归档"),
+}
+
+SMARTSHEET_TASKS = (
+    "project-settlement-smartsheet",
+    "contract-completion-smartsheet",
+    "payment-records-smartsheet",
+    "crew-settlement-finance-ledger-smartsheet",
+    "material-replenishment-smartsheet",
+)
+HEARTBEAT_TASKS = (
+    "beijing-sign-broadcast",
+    "beijing-performance-broadcast",
+    "housekeeper-offline-broadcast",
+) + SMARTSHEET_TASKS
+# (北京时间 时, 分) -> 该心跳额外执行的任务
+SLOT_TASKS: Dict[Tuple[int, int], Tuple[str, ...]] = {
+    (8, 30): ("pending-orders-reminder",),
+    (9, 0): ("daily-service-report",),
+    (23, 30): ("outbox-retention",),
+}
+HEARTBEAT_FIRST_HOUR = 8
+
+# 命令行 --task 可用的任务组
+TASK_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "heartbeat": HEARTBEAT_TASKS,
+    "smartsheet-sync": SMARTSHEET_TASKS,
+}
+DEFAULT_MAX_WORKERS = 4
+
+# worker /trigger?target=... 的目标名
+TRIGGER_TARGETS: Dict[str, Tuple[str, ...]] = {
+    "sign-broadcast": ("beijing-sign-broadcast",),
+    "performance-broadcast": ("beijing-performance-broadcast",),
+    "housekeeper-offline-broadcast": ("housekeeper-offline-broadcast",),
+    "smartsheet-sync": SMARTSHEET_TASKS,
+    **{name: (name,) for name in SMARTSHEET_TASKS},
+    "pending-orders": ("pending-orders-reminder",),
+    "daily-service-report": ("daily-service-report",),
+    "outbox-retention": ("outbox-retention",),
+    "all": HEARTBEAT_TASKS + ("pending-orders-reminder", "daily-service-report"),
+}
+
+
+def to_beijing(now: Optional[datetime] = None) -> datetime:
+    if now is None:
+        return datetime.now(BEIJING_TZ)
+    if now.tzinfo is None:
+        return now.replace(tzinfo=BEIJING_TZ)
+    return now.astimezone(BEIJING_TZ)
+
+
+def tasks_for_time(now: Optional[datetime] = None) -> List[str]:
+    """某个心跳应执行的任务（对应 worker 的 getTargetWorkflows 默认分支）。"""
+    current = to_beijing(now)
+    return list(HEARTBEAT_TASKS) + list(SLOT_TASKS.get((current.hour, current.minute), ()))
+
+
+def resolve_trigger_target(target: Optional[str], now: Optional[datetime] = None) -> List[str]:
+    """解析手动触发目标；未知目标与 worker 一致，回退到按时间路由。"""
+    if target in TRIGGER_TARGETS:
+        return list(TRIGGER_TARGETS[target])
+    return tasks_for_time(now)
+
+
+def next_heartbeat(now: Optional[datetime] = None) -> datetime:
+    """严格晚于 now 的下一个心跳时刻（北京时间 08:00-23:30 每 30 分钟）。"""
+    current = to_beijing(now).replace(second=0, microsecond=0)
+    candidate = current + timedelta(minutes=30 - current.minute % 30)
+    if candidate.hour < HEARTBEAT_FIRST_HOUR:
+        candidate = candidate.replace(hour=HEARTBEAT_FIRST_HOUR, minute=0)
+    return candidate
+
+
+def resolve_task(name: str) -> Callable:
+    if name not in TASKS:
+        raise KeyError(f"未知任务: {name}")
+    module_name, func_name, _ = TASKS[name]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def run_task(name: str, **kwargs):
+    """在任务租约内执行单个任务；异常向上抛出，由调用方决定记录或汇总。
+
+    同名任务正在其他进程运行时抛出 TaskLeaseBusy。
+    """
+    from modules.core.task_lease import TaskLease, task_lease_enabled
+
+    label = TASKS[name][2] if name in TASKS else name
+    func = resolve_task(name)
+    started = time.monotonic()
+    with TaskLease(name) if task_lease_enabled() else nullcontext():
+        logging.info("开始执行%s任务", label)
+        result = func(**kwargs)
+    logging.info("%s任务执行完成，耗时 %.1fs", label, time.monotonic() - started)
+    return result
+
+
+def expand_task_selection(values: Iterable[str]) -> List[str]:
+    """展开任务名/任务组（支持逗号分隔），按首次出现顺序去重；未知名称抛出 ValueError。"""
+    names: List[str] = []
+    for value in values:
+        for item in str(value).split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if item in TASK_GROUPS:
+                expanded = TASK_GROUPS[item]
+            elif item in TASKS:
+                expanded = (item,)
+            else:
+                raise ValueError(f"未知任务或任务组: {item}")
+            names.extend(name for name in expanded if name not in names)
+    return names
+
+
+def _run_isolated(name: str, kwargs: Dict) -> Dict:
+    from modules.core.task_lease import TaskLeaseBusy
+
+    started = time.monotonic()
+    try:
+        result = run_task(name, **kwargs)
+        outcome = {"status": "success", "result": result}
+    except TaskLeaseBusy as exc:
+        logging.info("跳过本次运行: %s", exc)
+        outcome = {"status": "skipped", "error": str(exc)}
+    except Exception as exc:
+        logging.exception("%s任务执行失败: %s", TASKS[name][2], exc)
+        outcome = {"status": "failed", "error": f"{exc.__class__.__name__}: {exc}"}
+    outcome["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    return outcome
+
+
+def run_tasks(
+    names: List[str],
+    max_workers: Optional[int] = None,
+    task_kwargs: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, Dict]:
+    """在有界线程池中并发执行多个任务；每个任务单独捕获异常并记录耗时，返回 {任务名: 结果}。"""
+    if max_workers is None:
+        max_workers = int(os.getenv("SCHEDULED_TASK_MAX_WORKERS", str(DEFAULT_MAX_WORKERS)))
+    task_kwargs = task_kwargs or {}
+    workers = max(1, min(max_workers, len(names) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task") as pool:
+        futures = {name: pool.submit(_run_isolated, name, task_kwargs.get(name, {})) for name in names}
+        return {name: future.result() for name, future in futures.items()}
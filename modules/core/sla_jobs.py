@@ -10,13 +10,14 @@ from typing import Dict, List, Optional
 
 import requests
 
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:  # pragma: no cover
-    ZoneInfo = None
-
 from modules.config import API_URL_DAILY_SERVICE_REPORT
-from modules.core.storage import PerformanceDataStore, create_data_store
+from modules.core.storage import (
+    SLA_RAW_JSON_FULL,
+    SLA_RAW_JSON_NONE,
+    SLA_RAW_JSON_ZLIB,
+    PerformanceDataStore,
+    create_data_store,
+)
 from modules.core.webhook_router import (
     CHANNEL_SLA_DAILY_REPORT,
     format_safe_webhook_target,
@@ -24,6 +25,7 @@ from modules.core.webhook_router import (
     resolve_wecom_webhook,
 )
 from modules.request_module import send_request_with_managed_session
+from modules.time_parsing import BEIJING_TZ, parse_datetime
 
 
 SLA_ACTIVITY_CODE = "SLA-DAILY-SERVICE-REPORT"
@@ -49,7 +51,7 @@ def _is_truthy(value: str) -> bool:
 
 
 def _beijing_now(now: Optional[datetime] = None) -> datetime:
-    tz = ZoneInfo("Asia/Shanghai") if ZoneInfo is not None else timezone(timedelta(hours=8))
+    tz = BEIJING_TZ
     if now is None:
         return datetime.now(tz)
     if now.tzinfo is None:
@@ -58,23 +60,7 @@ def _beijing_now(now: Optional[datetime] = None) -> datetime:
 
 
 def _safe_parse_datetime(time_str: str) -> datetime:
-    normalized = (time_str or "").replace("Z", "")
-    if "+" in normalized:
-        head, tail = normalized.rsplit("+", 1)
-        tz = f"+{tail}"
-    elif "-" in normalized[19:]:
-        head, tail = normalized.rsplit("-", 1)
-        tz = f"-{tail}"
-    else:
-        return datetime.fromisoformat(normalized)
-
-    if "." in head:
-        base, micros = head.split(".", 1)
-        micros = micros[:6].ljust(6, "0")
-        normalized = f"{base}.{micros}{tz}"
-    else:
-        normalized = f"{head}{tz}"
-    return datetime.fromisoformat(normalized)
+    return parse_datetime(time_str)
 
 
 def construct_sla_violation_message(violation_record: Dict) -> str:
@@ -120,6 +106,15 @@ class DailyServiceReportService:
         self.logger = logging.getLogger(__name__)
         self.activity_code = SLA_ACTIVITY_CODE
         self.dry_run = _is_truthy(os.getenv("DAILY_SERVICE_REPORT_DRY_RUN", ""))
+        self.raw_json_mode = self._raw_json_mode()
+
+    def _raw_json_mode(self) -> str:
+        """raw_json 存储方式：full（默认）/ zlib 压缩 / none 不保存；非法取值告警并回退 full，不中断日报。"""
+        mode = os.getenv("SLA_RAW_JSON_MODE", SLA_RAW_JSON_FULL).strip().lower() or SLA_RAW_JSON_FULL
+        if mode not in (SLA_RAW_JSON_FULL, SLA_RAW_JSON_ZLIB, SLA_RAW_JSON_NONE):
+            self.logger.warning("SLA_RAW_JSON_MODE=%s 不受支持，回退为 %s", mode, SLA_RAW_JSON_FULL)
+            return SLA_RAW_JSON_FULL
+        return mode
 
     def run(self) -> Dict[str, int]:
         stats = {
@@ -136,7 +131,11 @@ class DailyServiceReportService:
         report_data = self._fetch_report_data()
         stats["raw_records"] = len(report_data)
         business_date = self._business_date()
-        stats["stored_records"] = self.storage.replace_sla_violations_for_date(business_date, report_data)
+        stats["stored_records"] = self.storage.replace_sla_violations_for_date(
+            business_date,
+            report_data,
+            raw_json_mode=self.raw_json_mode,
+        )
 
         if self.dry_run:
             self._log_daily_preview(report_data)
@@ -201,14 +200,26 @@ class DailyServiceReportService:
             dedupe_key=dedupe_key,
         )
 
-    def _enqueue_weekly_reports(self) -> Dict[str, int]:
-        weekly_enqueued = 0
+    def _weekly_window(self):
         start_date = (self.now.date() - timedelta(days=7)).strftime("%Y-%m-%d")
         end_date = (self.now.date() - timedelta(days=1)).strftime("%Y-%m-%d")
-        records = self.storage.get_sla_violations_for_window(start_date, end_date)
-        violating_providers = sorted({row["org_name"] for row in records})
-        all_providers = set(get_configured_provider_names())
-        compliant_providers = sorted(all_providers - set(violating_providers))
+        return start_date, end_date
+
+    def _load_weekly_violations(self, start_date: str, end_date: str):
+        """按汇总表确定违规/达标服务商；仅在存在违规时一次性拉取窗口明细，按服务商分组。"""
+        summaries = self.storage.get_sla_provider_summaries(start_date, end_date)
+        violating_providers = [summary["org_name"] for summary in summaries if summary["violation_count"]]
+        compliant_providers = sorted(set(get_configured_provider_names()) - set(violating_providers))
+        records_by_provider: Dict[str, List[Dict]] = {provider: [] for provider in violating_providers}
+        if violating_providers:
+            for row in self.storage.get_sla_violations_for_window(start_date, end_date):
+                records_by_provider.setdefault(row["org_name"], []).append(row)
+        return violating_providers, compliant_providers, records_by_provider
+
+    def _enqueue_weekly_reports(self) -> Dict[str, int]:
+        weekly_enqueued = 0
+        start_date, end_date = self._weekly_window()
+        violating_providers, compliant_providers, records_by_provider = self._load_weekly_violations(start_date, end_date)
         period_marker = end_date
 
         for provider in compliant_providers:
@@ -224,8 +235,7 @@ class DailyServiceReportService:
                 weekly_enqueued += 1
 
         for provider in violating_providers:
-            provider_records = [row for row in records if row["org_name"] == provider]
-            report = build_sla_performance_report(provider, provider_records, self.now)
+            report = build_sla_performance_report(provider, records_by_provider[provider], self.now)
             payload = {"msgtype": "text", "text": {"content": report}}
             if self.storage.enqueue_outbox_message(
                 activity_code=self.activity_code,
@@ -243,7 +253,12 @@ class DailyServiceReportService:
         stats = {"sent": 0, "failed": 0, "dead_letter": 0}
         max_attempts = int(os.getenv("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "5"))
         limit = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_LIMIT", "200"))
-        outbox_items = self.storage.get_retryable_outbox_messages(self.activity_code, max_attempts=max_attempts, limit=limit)
+        outbox_items = self.storage.get_retryable_outbox_messages(
+            self.activity_code,
+            max_attempts=max_attempts,
+            limit=limit,
+            claim_seconds=int(os.getenv("NOTIFICATION_OUTBOX_CLAIM_SECONDS", "900")),
+        )
 
         for item in outbox_items:
             try:
@@ -294,20 +309,18 @@ class DailyServiceReportService:
             self.logger.info("[DRY RUN] SLA 日报预览:\n%s", construct_sla_violation_message(record))
 
     def _log_weekly_preview(self) -> None:
-        start_date = (self.now.date() - timedelta(days=7)).strftime("%Y-%m-%d")
-        end_date = (self.now.date() - timedelta(days=1)).strftime("%Y-%m-%d")
-        records = self.storage.get_sla_violations_for_window(start_date, end_date)
-        violating_providers = sorted({row["org_name"] for row in records})
-        all_providers = set(get_configured_provider_names())
-        compliant_providers = sorted(all_providers - set(violating_providers))
+        start_date, end_date = self._weekly_window()
+        violating_providers, compliant_providers, records_by_provider = self._load_weekly_violations(start_date, end_date)
         self.logger.info(
             "[DRY RUN] SLA 周报预览: 违规服务商=%s, 达标服务商=%s",
             violating_providers,
             compliant_providers,
         )
         for provider in violating_providers[:5]:
-            provider_records = [row for row in records if row["org_name"] == provider]
-            self.logger.info("[DRY RUN] SLA 周报消息预览:\n%s", build_sla_performance_report(provider, provider_records, self.now))
+            self.logger.info(
+                "[DRY RUN] SLA 周报消息预览:\n%s",
+                build_sla_performance_report(provider, records_by_provider[provider], self.now),
+            )
 
     @staticmethod
     def _build_hash_key(*parts: str) -> str:
@@ -8,13 +8,19 @@ SQLite实现用于生产环境，提供高性能的查询和事务支持。
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from collections import Counter, namedtuple
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence
 import sqlite3
 import json
 import logging
 import os
+import base64
+import hashlib
 import math
+import threading
 import time
+import zlib
 try:
     import requests
 except ImportError:  # pragma: no cover - optional dependency for Turso mode
@@ -42,6 +48,106 @@ def _resolve_local_db_path(default_path: str = "performance_data.db") -> str:
     return os.getenv("LOCAL_DB_PATH", default_path)
 
 
+OUTBOX_ARCHIVE_CODEC_ZLIB = "zlib+base64"
+OUTBOX_ARCHIVE_BODY_FIELDS = ("payload_json", "metadata_json", "response_body")
+
+# SLA 违规快照 raw_json 存储方式：原文 / 压缩 / 不保存
+SLA_RAW_JSON_FULL = "full"
+SLA_RAW_JSON_ZLIB = "zlib"
+SLA_RAW_JSON_NONE = "none"
+SLA_ROLLUP_REBUILD_SQL = """
+    INSERT INTO sla_violation_rollups (business_date, org_name, violation_type, violation_count, updated_at)
+    SELECT business_date, org_name, COALESCE(violation_type, ''), COUNT(*), CURRENT_TIMESTAMP
+    FROM sla_violation_records
+    {where}
+    GROUP BY business_date, org_name, COALESCE(violation_type, '')
+"""
+SLA_VIOLATION_FIELDS = (
+    "violation_id", "sid", "sa_create_time", "order_num", "province", "org_name", "supervisor_name",
+    "source_type", "status", "violation_type", "violation_description", "work_type", "create_time",
+    "raw_json", "raw_json_codec", "row_hash",
+)
+
+
+# 冲突时的 DO UPDATE 为无副作用写入，仅用于让 RETURNING 返回已存在行
+OUTBOX_UPSERT_SQL = """
+    INSERT INTO notification_outbox (
+        activity_code, contract_id, message_type, webhook_url, payload_json, metadata_json, dedupe_key, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
+    ON CONFLICT(activity_code, dedupe_key) DO UPDATE SET
+        enqueue_count = notification_outbox.enqueue_count + 1
+    RETURNING id, status, metadata_json, enqueue_count = 1
+"""
+
+
+def _outbox_params(message: Dict):
+    return (
+        message["activity_code"],
+        message["contract_id"],
+        message.get("message_type", "group_broadcast"),
+        message["webhook_url"],
+        message["payload_json"],
+        message.get("metadata_json", ""),
+        message["dedupe_key"],
+    )
+
+
+# 热路径读取的 extensions 字段提升为独立列（extensions 仍保存完整数据）。
+# 列不声明类型以保留 JSON 原值类型；ext_promoted=1 表示该行已写入这些列。
+PROMOTED_EXTENSION_COLUMNS = {
+    '合同编号(contractdocNum)': 'ext_contract_doc_num',
+    '计入业绩金额': 'ext_performance_amount',
+    '管家累计单数': 'ext_housekeeper_contract_count',
+    '管家累计金额': 'ext_housekeeper_total_amount',
+    '管家累计业绩金额': 'ext_housekeeper_performance_amount',
+    '备注': 'ext_remarks',
+    '平台单累计数量': 'ext_platform_count',
+    '自引单累计数量': 'ext_self_referral_count',
+    '平台单累计金额': 'ext_platform_amount',
+    '自引单累计金额': 'ext_self_referral_amount',
+    '转化率(conversion)': 'ext_conversion',
+    '支付金额(paidAmount)': 'ext_paid_amount',
+    '项目地址(projectAddress)': 'ext_project_address',
+}
+PROMOTED_EXTENSIONS_SCHEMA_VERSION = '1.4.0'
+SLA_ROLLUP_SCHEMA_VERSION = '1.5.0'
+
+
+def _extension_json_path(key: str) -> str:
+    return '$."' + key.replace('"', '\\"') + '"'
+
+
+def _promoted_value(value):
+    """extensions 值转换为提升列的存储值（嵌套结构存 JSON 文本，NaN 视为空）。"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+@lru_cache(maxsize=None)
+def _projection_row_type(columns: tuple, with_extensions: bool):
+    """投影查询的行类型（按列组合缓存）。"""
+    fields = columns + ("extensions",) if with_extensions else columns
+    return namedtuple("PerformanceRow", fields)
+
+
+def _encode_archive_body(text: str, codec: str) -> str:
+    """归档大字段编码；使用 base64 文本以兼容 Turso HTTP 参数（不支持 blob）。"""
+    text = text or ""
+    if codec != OUTBOX_ARCHIVE_CODEC_ZLIB or not text:
+        return text
+    return base64.b64encode(zlib.compress(text.encode("utf-8"), 9)).decode("ascii")
+
+
+def _decode_archive_body(text: str, codec: str) -> str:
+    text = text or ""
+    if codec != OUTBOX_ARCHIVE_CODEC_ZLIB or not text:
+        return text
+    return zlib.decompress(base64.b64decode(text)).decode("utf-8")
+
+
 class TursoHttpCursor:
     """最小 DB-API 兼容 Cursor，基于 Turso HTTP Pipeline API。"""
 
@@ -67,27 +173,25 @@ class TursoHttpCursor:
             return {"type": "float", "value": value}
         return {"type": "text", "value": str(value)}
 
-    def execute(self, sql, params=None):
-        args = [self._encode_arg(p) for p in (params or [])]
+    @classmethod
+    def _build_stmt(cls, sql, params=None):
+        args = [cls._encode_arg(p) for p in (params or [])]
         stmt = {"sql": sql}
         if args:
             stmt["args"] = args
+        return stmt
 
-        payload = {"requests": [{"type": "execute", "stmt": stmt}, {"type": "close"}]}
+    def execute(self, sql, params=None):
+        payload = {"requests": [{"type": "execute", "stmt": self._build_stmt(sql, params)}, {"type": "close"}]}
         resp = self.conn._send(payload)
         self._process_response(resp)
         return self
 
     def executemany(self, sql, seq_of_params):
-        total_rowcount = 0
-        lastrowid = None
-        for params in seq_of_params:
-            self.execute(sql, params)
-            total_rowcount += self.rowcount if self.rowcount and self.rowcount > 0 else 0
-            if self.lastrowid is not None:
-                lastrowid = self.lastrowid
-        self.rowcount = total_rowcount
-        self.lastrowid = lastrowid
+        cursors = self.conn.execute_batch([(sql, params) for params in seq_of_params])
+        self.rowcount = sum(c.rowcount for c in cursors if c.rowcount and c.rowcount > 0)
+        lastrowids = [c.lastrowid for c in cursors if c.lastrowid is not None]
+        self.lastrowid = lastrowids[-1] if lastrowids else None
         return self
 
     def _process_response(self, resp_json):
@@ -104,7 +208,9 @@ class TursoHttpCursor:
         if exec_res.get("type") != "ok":
             return
 
-        result = exec_res["response"]["result"]
+        self._load_result(exec_res["response"]["result"])
+
+    def _load_result(self, result):
         self.rowcount = result.get("affected_row_count", 0)
         self.lastrowid = result.get("last_insert_rowid")
 
@@ -169,7 +275,8 @@ class TursoHttpConnection:
         last_error = None
         for attempt in range(1, self.max_retries + 1):
             try:
-                response = requests.post(self.url, headers=self.headers, json=payload, timeout=30)
+                post = _HTTP_SESSION.post if _HTTP_SESSION is not None else requests.post
+                response = post(self.url, headers=self.headers, json=payload, timeout=30)
                 response.raise_for_status()
                 return response.json()
             except requests.RequestException as exc:
@@ -192,6 +299,47 @@ class TursoHttpConnection:
         cursor = self.cursor()
         return cursor.executemany(sql, seq_of_params)
 
+    def execute_batch(self, statements):
+        """一次 pipeline 请求内以事务方式顺序执行多条语句，返回每条语句对应的 cursor。
+
+        使用 Hrana batch：每一步仅在上一步成功时执行，任一步失败则回滚整批。
+        """
+        statements = list(statements)
+        if not statements:
+            return []
+        steps = [{"stmt": {"sql": "BEGIN"}}]
+        for sql, params in statements:
+            steps.append({
+                "stmt": TursoHttpCursor._build_stmt(sql, params),
+                "condition": {"type": "ok", "step": len(steps) - 1},
+            })
+        commit_step = len(steps)
+        steps.append({"stmt": {"sql": "COMMIT"}, "condition": {"type": "ok", "step": commit_step - 1}})
+        steps.append({
+            "stmt": {"sql": "ROLLBACK"},
+            "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+        })
+
+        payload = {"requests": [{"type": "batch", "batch": {"steps": steps}}, {"type": "close"}]}
+        resp = self._send(payload) or {}
+        results = resp.get("results", [])
+        if not results or results[0].get("type") != "ok":
+            error = results[0].get("error") if results else "empty response"
+            raise RuntimeError(f"Turso Error: {error}")
+
+        batch_result = results[0]["response"]["result"]
+        step_errors = [err for err in batch_result.get("step_errors", []) if err]
+        if step_errors:
+            raise RuntimeError(f"Turso Error: {step_errors[0]}")
+
+        cursors = []
+        for step_result in batch_result.get("step_results", [])[1:commit_step]:
+            cursor = self.cursor()
+            if step_result:
+                cursor._load_result(step_result)
+            cursors.append(cursor)
+        return cursors
+
     def executescript(self, script: str):
         statements = []
         for chunk in script.split(";"):
@@ -204,8 +352,7 @@ class TursoHttpConnection:
                 if not stmt:
                     continue
             statements.append(stmt)
-        for stmt in statements:
-            self.execute(stmt)
+        self.execute_batch([(stmt, None) for stmt in statements])
 
     def commit(self):
         return None
@@ -237,6 +384,11 @@ class PerformanceDataStore(ABC):
         """获取管家累计统计数据"""
         pass
 
+    @abstractmethod
+    def get_housekeeper_performance_totals(self, activity_code: str) -> Dict[str, float]:
+        """一次聚合获取活动内各管家累计业绩金额（管家 -> 金额）"""
+        pass
+
     @abstractmethod
     def get_housekeeper_awards(self, housekeeper: str, activity_code: str) -> List[str]:
         """获取管家历史奖励列表"""
@@ -247,6 +399,11 @@ class PerformanceDataStore(ABC):
         """保存业绩记录"""
         pass
 
+    @abstractmethod
+    def save_performance_record_with_outbox(self, record: PerformanceRecord, message: Optional[Dict] = None) -> int:
+        """在同一事务内保存业绩记录并写入其播报 outbox 消息，返回 outbox id。"""
+        pass
+
     @abstractmethod
     def get_project_usage(self, project_id: str, activity_code: str) -> float:
         """获取项目累计使用金额（北京工单上限用）"""
@@ -259,7 +416,7 @@ class PerformanceDataStore(ABC):
 
     @abstractmethod
     def delete_performance_records_not_in(self, activity_code: str, contract_ids: set) -> int:
-        """删除指定活动中不在当前快照内的业绩记录，返回删除数量"""
+        """删除指定活动中不在当前快照内的业绩记录及其项目地址去重索引，返回删除的业绩记录数量"""
         pass
 
     @abstractmethod
@@ -277,8 +434,43 @@ class PerformanceDataStore(ABC):
         pass
 
     @abstractmethod
-    def get_retryable_outbox_messages(self, activity_code: str, max_attempts: int, limit: int = 100) -> List[Dict]:
-        """获取可重试发送的 outbox 消息。"""
+    def enqueue_outbox_messages(self, messages: List[Dict]) -> List[Dict]:
+        """批量创建或复用 outbox 消息，按输入顺序返回 {id, status, created, metadata_json}。"""
+        pass
+
+    @abstractmethod
+    def get_retryable_outbox_messages(
+        self, activity_code: str, max_attempts: int, limit: int = 100, claim_seconds: int = 0
+    ) -> List[Dict]:
+        """获取可重试发送的 outbox 消息；claim_seconds > 0 时同时认领，认领期内其他发送方不会再取到。"""
+        pass
+
+    @abstractmethod
+    def archive_outbox_messages(
+        self,
+        sent_before: str,
+        dead_letter_before: str,
+        compress: bool = True,
+        limit: int = 500,
+    ) -> int:
+        """将早于截止时间的已发送 / 死信 outbox 消息迁入归档表，返回本批归档条数。"""
+        pass
+
+    @abstractmethod
+    def get_archived_outbox_message(self, outbox_id: int) -> Dict:
+        """按原 outbox id 读取归档消息（大字段已解压）。"""
+        pass
+
+    @abstractmethod
+    def get_due_outbox_messages(
+        self, after_id: int, max_attempts: int, limit: int = 100, claim_seconds: int = 0
+    ) -> List[Dict]:
+        """跨活动按 id 键集分页获取待发送的 outbox 消息；claim_seconds 含义同 get_retryable_outbox_messages。"""
+        pass
+
+    @abstractmethod
+    def release_outbox_claims(self, outbox_ids: List[int]) -> None:
+        """释放已认领但未发送的 outbox 消息。"""
         pass
 
     @abstractmethod
@@ -313,6 +505,11 @@ class PerformanceDataStore(ABC):
         """将当前未出现的活跃待预约工单标记为失活。"""
         pass
 
+    @abstractmethod
+    def sync_pending_order_snapshots(self, activity_code: str, snapshots: List[Dict]) -> Dict[str, int]:
+        """以本次完整快照同步待预约工单：批量 upsert 并失活快照外的工单。"""
+        pass
+
     @abstractmethod
     def get_pending_orders_requiring_notification(self, activity_code: str) -> List[Dict]:
         """获取当前需要提醒的待预约工单。"""
@@ -323,13 +520,28 @@ class PerformanceDataStore(ABC):
         """获取指定服务商当前活跃的全部待预约工单。"""
         pass
 
+    @abstractmethod
+    def get_active_pending_orders_grouped(self, activity_code: str) -> Dict[str, Dict]:
+        """一次查询获取全部活跃待预约工单，按服务商分组并附带集合指纹。"""
+        pass
+
+    @abstractmethod
+    def save_pending_order_org_digest(self, activity_code: str, org_name: str, digest_fingerprint: str) -> None:
+        """记录服务商最近一次成功提醒时的活跃工单集合指纹。"""
+        pass
+
     @abstractmethod
     def mark_pending_orders_notified(self, activity_code: str, fingerprints: List[str]) -> int:
         """将待预约工单标记为已提醒。"""
         pass
 
     @abstractmethod
-    def replace_sla_violations_for_date(self, business_date: str, records: List[Dict]) -> int:
+    def replace_sla_violations_for_date(
+        self,
+        business_date: str,
+        records: List[Dict],
+        raw_json_mode: str = SLA_RAW_JSON_FULL,
+    ) -> int:
         """以业务日期为粒度替换 SLA 违规快照。"""
         pass
 
@@ -343,6 +555,76 @@ class PerformanceDataStore(ABC):
         """查询业务日期窗口内的 SLA 违规记录。"""
         pass
 
+    @abstractmethod
+    def get_sla_provider_summaries(self, start_date: str, end_date: str) -> List[Dict]:
+        """按服务商汇总业务日期窗口内的 SLA 违规数（含按违规类型拆分）。"""
+        pass
+
+    @abstractmethod
+    def get_smartsheet_sync_state(self, activity_code: str) -> Dict[str, Dict]:
+        """获取电子表格同步内容指纹，返回 {identity_hash: {content_hash, record_id}}。"""
+        pass
+
+    @abstractmethod
+    def save_smartsheet_sync_state(self, activity_code: str, entries: List[Dict]) -> int:
+        """批量写入电子表格同步内容指纹。"""
+        pass
+
+    @abstractmethod
+    def set_smartsheet_record_id(self, activity_code: str, identity_hash: str, record_id: str) -> None:
+        """记录电子表格行对应的企业微信 record_id。"""
+        pass
+
+    @abstractmethod
+    def get_project_address_index(self, activity_code: str) -> List[Dict]:
+        """按写入顺序获取项目地址去重索引 {housekeeper, address_hash, contract_id}。"""
+        pass
+
+    @abstractmethod
+    def get_unindexed_project_addresses(self, activity_code: str) -> List[Dict]:
+        """获取尚未写入去重索引的自引单 {contract_id, housekeeper, project_address}。"""
+        pass
+
+    @abstractmethod
+    def save_project_address_index(self, activity_code: str, entries: List[Dict]) -> int:
+        """批量写入项目地址去重索引（同一合同已存在时忽略）。"""
+        pass
+
+    @abstractmethod
+    def get_metabase_card_fingerprint(self, task_key: str, card_url: str) -> Optional[Dict]:
+        """获取卡片上次成功处理时的响应指纹 {row_count, content_hash}。"""
+        pass
+
+    @abstractmethod
+    def save_metabase_card_fingerprint(self, task_key: str, card_url: str, row_count: int, content_hash: str) -> None:
+        """记录卡片本次成功处理的响应指纹。"""
+        pass
+
+    @abstractmethod
+    def get_task_watermark(self, task_key: str) -> Optional[str]:
+        """获取任务上次成功处理到的水位（ISO 8601 字符串）。"""
+        pass
+
+    @abstractmethod
+    def save_task_watermark(self, task_key: str, watermark: str) -> None:
+        """记录任务本次成功处理到的水位。"""
+        pass
+
+    @abstractmethod
+    def acquire_task_lease(self, task_name: str, owner: str, ttl_seconds: float) -> bool:
+        """获取任务租约：无人持有、已过期或本就由 owner 持有时成功。"""
+        pass
+
+    @abstractmethod
+    def renew_task_lease(self, task_name: str, owner: str, ttl_seconds: float) -> bool:
+        """续约（心跳）；租约已被他人接管时返回 False。"""
+        pass
+
+    @abstractmethod
+    def release_task_lease(self, task_name: str, owner: str) -> None:
+        """释放 owner 持有的任务租约。"""
+        pass
+
 
 class SQLitePerformanceDataStore(PerformanceDataStore):
     """SQLite实现 - 大幅简化累计计算"""
@@ -380,15 +662,32 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                     schema_sql = schema_sql.replace('CREATE VIEW project_stats', 'CREATE VIEW IF NOT EXISTS project_stats')
                     schema_sql = schema_sql.replace('CREATE VIEW activity_stats', 'CREATE VIEW IF NOT EXISTS activity_stats')
                     schema_sql = schema_sql.replace('CREATE TABLE schema_version', 'CREATE TABLE IF NOT EXISTS schema_version')
-                    schema_sql = schema_sql.replace('CREATE TABLE notification_outbox', 'CREATE TABLE IF NOT EXISTS notification_outbox')
+                    schema_sql = schema_sql.replace('CREATE TABLE notification_outbox (', 'CREATE TABLE IF NOT EXISTS notification_outbox (')
+                    schema_sql = schema_sql.replace('CREATE TABLE notification_outbox_archive', 'CREATE TABLE IF NOT EXISTS notification_outbox_archive')
                     schema_sql = schema_sql.replace('CREATE TABLE pending_order_reminders', 'CREATE TABLE IF NOT EXISTS pending_order_reminders')
+                    schema_sql = schema_sql.replace('CREATE TABLE pending_order_snapshot_staging', 'CREATE TABLE IF NOT EXISTS pending_order_snapshot_staging')
+                    schema_sql = schema_sql.replace('CREATE TABLE pending_order_org_digests', 'CREATE TABLE IF NOT EXISTS pending_order_org_digests')
                     schema_sql = schema_sql.replace('CREATE TABLE sla_violation_records', 'CREATE TABLE IF NOT EXISTS sla_violation_records')
+                    schema_sql = schema_sql.replace('CREATE TABLE sla_violation_rollups', 'CREATE TABLE IF NOT EXISTS sla_violation_rollups')
+                    schema_sql = schema_sql.replace('CREATE TABLE smartsheet_sync_state', 'CREATE TABLE IF NOT EXISTS smartsheet_sync_state')
+                    schema_sql = schema_sql.replace('CREATE TABLE project_address_index', 'CREATE TABLE IF NOT EXISTS project_address_index')
+                    schema_sql = schema_sql.replace('CREATE TABLE task_leases', 'CREATE TABLE IF NOT EXISTS task_leases')
+                    schema_sql = schema_sql.replace('CREATE TABLE metabase_card_fingerprints', 'CREATE TABLE IF NOT EXISTS metabase_card_fingerprints')
+                    schema_sql = schema_sql.replace('CREATE TABLE task_watermarks', 'CREATE TABLE IF NOT EXISTS task_watermarks')
                     conn.executescript(schema_sql)
                     self._ensure_column_exists(conn, 'notification_outbox', 'metadata_json', "ALTER TABLE notification_outbox ADD COLUMN metadata_json TEXT DEFAULT ''")
+                    self._ensure_column_exists(conn, 'notification_outbox', 'enqueue_count', "ALTER TABLE notification_outbox ADD COLUMN enqueue_count INTEGER NOT NULL DEFAULT 1")
+                    self._ensure_column_exists(conn, 'notification_outbox', 'claimed_until', "ALTER TABLE notification_outbox ADD COLUMN claimed_until TIMESTAMP")
+                    self._ensure_column_exists(conn, 'task_leases', 'previous_owner', "ALTER TABLE task_leases ADD COLUMN previous_owner TEXT")
+                    self._ensure_column_exists(conn, 'task_leases', 'previous_expires_at', "ALTER TABLE task_leases ADD COLUMN previous_expires_at REAL")
+                    self._ensure_column_exists(conn, 'sla_violation_records', 'raw_json_codec', "ALTER TABLE sla_violation_records ADD COLUMN raw_json_codec TEXT DEFAULT ''")
+                    self._ensure_column_exists(conn, 'sla_violation_records', 'row_hash', "ALTER TABLE sla_violation_records ADD COLUMN row_hash TEXT DEFAULT ''")
                     logging.info(f"Database initialized with schema from {schema_path}")
                 else:
                     logging.warning(f"Schema file not found: {schema_path}")
                     self._create_basic_schema(conn)
+                self._migrate_promoted_extension_columns(conn)
+                self._migrate_sla_violation_rollups(conn)
         except Exception as e:
             logging.error(f"Failed to initialize database: {e}")
             raise
@@ -405,6 +704,63 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
         except Exception as e:
             logging.warning("Failed ensuring column %s.%s exists: %s", table_name, column_name, e)
 
+    def _migrate_promoted_extension_columns(self, conn) -> None:
+        """schema 1.4.0：为热路径 extensions 字段补齐独立列并回填历史行。
+
+        extensions 不是合法 JSON 的行保持 ext_promoted=0，读取时回退 JSON 解码。
+        """
+        for column in list(PROMOTED_EXTENSION_COLUMNS.values()) + ['ext_promoted']:
+            default = " INTEGER DEFAULT 0" if column == 'ext_promoted' else ""
+            self._ensure_column_exists(conn, 'performance_data', column, f"ALTER TABLE performance_data ADD COLUMN {column}{default}")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_project_address ON performance_data(activity_code, ext_project_address)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_version (version TEXT PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, description TEXT)"
+        )
+        applied = conn.execute(
+            "SELECT 1 FROM schema_version WHERE version = ?", (PROMOTED_EXTENSIONS_SCHEMA_VERSION,)
+        ).fetchone()
+        if applied:
+            return
+
+        assignments = ", ".join(
+            f"{column} = json_extract(extensions, ?)" for column in PROMOTED_EXTENSION_COLUMNS.values()
+        )
+        cursor = conn.execute(
+            f"""
+            UPDATE performance_data
+            SET {assignments}, ext_promoted = 1
+            WHERE ext_promoted = 0 AND extensions IS NOT NULL AND extensions != '' AND json_valid(extensions)
+            """,
+            [_extension_json_path(key) for key in PROMOTED_EXTENSION_COLUMNS],
+        )
+        conn.execute(
+            "UPDATE performance_data SET ext_promoted = 1 WHERE ext_promoted = 0 AND (extensions IS NULL OR extensions = '')"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)",
+            (PROMOTED_EXTENSIONS_SCHEMA_VERSION, 'Promote hot extension fields to columns'),
+        )
+        conn.commit()
+        logging.info("Promoted extension columns backfilled: %s rows", cursor.rowcount)
+
+    def _migrate_sla_violation_rollups(self, conn) -> None:
+        """schema 1.5.0：由已有 SLA 违规快照回填汇总表。"""
+        applied = conn.execute(
+            "SELECT 1 FROM schema_version WHERE version = ?", (SLA_ROLLUP_SCHEMA_VERSION,)
+        ).fetchone()
+        if applied:
+            return
+        conn.execute("DELETE FROM sla_violation_rollups")
+        cursor = conn.execute(SLA_ROLLUP_REBUILD_SQL.format(where=""))
+        conn.execute(
+            "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)",
+            (SLA_ROLLUP_SCHEMA_VERSION, 'SLA violation rollups by provider and business date'),
+        )
+        conn.commit()
+        logging.info("SLA violation rollups backfilled: %s rows", cursor.rowcount)
+
     def _create_basic_schema(self, conn):
         """创建基础schema（如果schema文件不存在）"""
         conn.execute("""
@@ -449,6 +805,8 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                 response_code INTEGER DEFAULT 0,
                 response_body TEXT DEFAULT '',
                 last_error TEXT DEFAULT '',
+                enqueue_count INTEGER NOT NULL DEFAULT 1,
+                claimed_until TIMESTAMP,
                 sent_at TIMESTAMP,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -456,6 +814,31 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             )
         """)
         conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_retry ON notification_outbox(activity_code, status, attempt_count, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox(status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_contract ON notification_outbox(activity_code, contract_id)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS notification_outbox_archive (
+                id INTEGER PRIMARY KEY,
+                activity_code TEXT NOT NULL,
+                contract_id TEXT NOT NULL,
+                message_type TEXT NOT NULL,
+                webhook_url TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempt_count INTEGER NOT NULL DEFAULT 0,
+                response_code INTEGER DEFAULT 0,
+                last_error TEXT DEFAULT '',
+                body_codec TEXT NOT NULL DEFAULT '',
+                payload_json TEXT DEFAULT '',
+                metadata_json TEXT DEFAULT '',
+                response_body TEXT DEFAULT '',
+                sent_at TIMESTAMP,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(activity_code, dedupe_key)
+            )
+        """)
         conn.execute("""
             CREATE TABLE IF NOT EXISTS pending_order_reminders (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -487,6 +870,31 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             CREATE INDEX IF NOT EXISTS idx_pending_orders_order_num
             ON pending_order_reminders(activity_code, order_num)
         """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_order_snapshot_staging (
+                activity_code TEXT NOT NULL,
+                status_fingerprint TEXT NOT NULL,
+                order_num TEXT NOT NULL,
+                customer_name TEXT DEFAULT '',
+                address TEXT DEFAULT '',
+                supervisor_name TEXT DEFAULT '',
+                create_time TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                order_status TEXT NOT NULL,
+                eligible_since TEXT NOT NULL,
+                extensions TEXT DEFAULT '',
+                PRIMARY KEY (activity_code, status_fingerprint)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_order_org_digests (
+                activity_code TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                digest_fingerprint TEXT NOT NULL,
+                notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (activity_code, org_name)
+            )
+        """)
         conn.execute("""
             CREATE TABLE IF NOT EXISTS sla_violation_records (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -505,6 +913,8 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                 work_type TEXT DEFAULT '',
                 create_time TEXT DEFAULT '',
                 raw_json TEXT DEFAULT '',
+                raw_json_codec TEXT DEFAULT '',
+                row_hash TEXT DEFAULT '',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(business_date, order_num, org_name, violation_type, violation_description)
@@ -514,6 +924,70 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             CREATE INDEX IF NOT EXISTS idx_sla_violation_business_date
             ON sla_violation_records(business_date, org_name)
         """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sla_violation_rollups (
+                business_date TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                violation_type TEXT NOT NULL DEFAULT '',
+                violation_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (business_date, org_name, violation_type)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS smartsheet_sync_state (
+                activity_code TEXT NOT NULL,
+                identity_hash TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                record_id TEXT DEFAULT '',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (activity_code, identity_hash)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS project_address_index (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                activity_code TEXT NOT NULL,
+                housekeeper TEXT NOT NULL,
+                address_hash TEXT NOT NULL,
+                normalized_address TEXT NOT NULL,
+                contract_id TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(activity_code, contract_id)
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_project_address_lookup
+            ON project_address_index(activity_code, housekeeper, address_hash)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_leases (
+                task_name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                previous_owner TEXT,
+                previous_expires_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metabase_card_fingerprints (
+                task_key TEXT NOT NULL,
+                card_url TEXT NOT NULL,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                content_hash TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (task_key, card_url)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_watermarks (
+                task_key TEXT PRIMARY KEY,
+                watermark TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
 
     def contract_exists(self, contract_id: str, activity_code: str) -> bool:
         """简化的去重查询 - O(1)索引查询替代O(n)文件扫描"""
@@ -597,6 +1071,23 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error getting housekeeper stats: {e}")
             return HousekeeperStats(housekeeper=housekeeper, activity_code=activity_code)
 
+    def get_housekeeper_performance_totals(self, activity_code: str) -> Dict[str, float]:
+        """单次 GROUP BY 获取各管家累计业绩金额，口径与 get_housekeeper_stats().performance_amount 一致"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("""
+                    SELECT
+                        housekeeper,
+                        COALESCE(SUM(CASE WHEN is_historical = 0 THEN performance_amount ELSE 0 END), 0) as performance_amount
+                    FROM performance_data
+                    WHERE activity_code = ?
+                    GROUP BY housekeeper
+                """, (activity_code,))
+                return {row[0]: float(row[1] or 0) for row in cursor.fetchall()}
+        except Exception as e:
+            logging.error(f"Error getting housekeeper performance totals: {e}")
+            return {}
+
     def get_housekeeper_awards(self, housekeeper: str, activity_code: str) -> List[str]:
         """获取管家历史奖励列表"""
         try:
@@ -668,58 +1159,93 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error getting all housekeeper awards: {e}")
             return {}
 
+    @staticmethod
+    def _performance_record_statement(record: PerformanceRecord):
+        """构造业绩记录写入语句与参数。"""
+        reward_types = json.dumps([r.reward_type for r in record.rewards], ensure_ascii=False)
+        reward_names = json.dumps([r.reward_name for r in record.rewards], ensure_ascii=False)
+
+        # 保存完整数据到extensions，包括双轨统计字段
+        # 🔧 修复：使用record.to_dict()获取完整数据，而不是只保存原始数据
+        record_dict = record.to_dict()
+        extensions_data = record_dict.copy()
+
+        # 移除已经单独存储的字段，避免重复
+        # 🔧 修复：保留"备注"和"管家累计业绩金额"字段在extensions中，因为通知服务需要从extensions中读取
+        fields_to_remove = [
+            '合同ID(_id)', '管家(serviceHousekeeper)', '服务商(orgName)',
+            '合同金额(adjustRefundMoney)', '活动期内第几个合同',
+            '激活奖励状态', '奖励类型', '奖励名称', '是否发送通知'
+        ]
+        for field in fields_to_remove:
+            extensions_data.pop(field, None)
+
+        promoted_columns = list(PROMOTED_EXTENSION_COLUMNS.values())
+        sql = f"""
+            INSERT OR REPLACE INTO performance_data (
+                activity_code, contract_id, housekeeper, service_provider,
+                contract_amount, performance_amount, order_type, project_id,
+                contract_sequence, reward_types, reward_names, is_historical,
+                notification_sent, remarks, extensions,
+                {', '.join(promoted_columns)}, ext_promoted
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {', '.join('?' for _ in promoted_columns)}, 1)
+        """
+        params = (
+            record.activity_code,
+            record.contract_data.contract_id,
+            record.housekeeper_stats.housekeeper,  # 使用管家键而不是原始管家名
+            record.contract_data.service_provider,
+            record.contract_data.contract_amount,
+            record.performance_amount,
+            record.contract_data.order_type.value,
+            record.contract_data.project_id,
+            record.contract_sequence,
+            reward_types,
+            reward_names,
+            record.contract_data.is_historical,
+            record.notification_sent,
+            record.remarks,
+            json.dumps(extensions_data, ensure_ascii=False),
+            *(_promoted_value(extensions_data.get(key)) for key in PROMOTED_EXTENSION_COLUMNS),
+        )
+        return sql, params
+
     def save_performance_record(self, record: PerformanceRecord) -> None:
         """保存业绩记录"""
         try:
             with self._connect() as conn:
-                reward_types = json.dumps([r.reward_type for r in record.rewards], ensure_ascii=False)
-                reward_names = json.dumps([r.reward_name for r in record.rewards], ensure_ascii=False)
-
-                # 保存完整数据到extensions，包括双轨统计字段
-                # 🔧 修复：使用record.to_dict()获取完整数据，而不是只保存原始数据
-                record_dict = record.to_dict()
-                extensions_data = record_dict.copy()
-
-                # 移除已经单独存储的字段，避免重复
-                # 🔧 修复：保留"备注"和"管家累计业绩金额"字段在extensions中，因为通知服务需要从extensions中读取
-                fields_to_remove = [
-                    '合同ID(_id)', '管家(serviceHousekeeper)', '服务商(orgName)',
-                    '合同金额(adjustRefundMoney)', '活动期内第几个合同',
-                    '激活奖励状态', '奖励类型', '奖励名称', '是否发送通知'
-                ]
-                for field in fields_to_remove:
-                    extensions_data.pop(field, None)
+                conn.execute(*self._performance_record_statement(record))
 
-                conn.execute("""
-                    INSERT OR REPLACE INTO performance_data (
-                        activity_code, contract_id, housekeeper, service_provider,
-                        contract_amount, performance_amount, order_type, project_id,
-                        contract_sequence, reward_types, reward_names, is_historical,
-                        notification_sent, remarks, extensions
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    record.activity_code,
-                    record.contract_data.contract_id,
-                    record.housekeeper_stats.housekeeper,  # 使用管家键而不是原始管家名
-                    record.contract_data.service_provider,
-                    record.contract_data.contract_amount,
-                    record.performance_amount,
-                    record.contract_data.order_type.value,
-                    record.contract_data.project_id,
-                    record.contract_sequence,
-                    reward_types,
-                    reward_names,
-                    record.contract_data.is_historical,
-                    record.notification_sent,
-                    record.remarks,
-                    json.dumps(extensions_data, ensure_ascii=False)
-                ))
-                
                 logging.debug(f"Saved performance record for contract {record.contract_data.contract_id}")
         except Exception as e:
             logging.error(f"Error saving performance record: {e}")
             raise
 
+    def save_performance_record_with_outbox(self, record: PerformanceRecord, message: Optional[Dict] = None) -> int:
+        """在同一事务内保存业绩记录并写入其播报 outbox 消息，返回 outbox id（无消息时为 0）。"""
+        if not message:
+            self.save_performance_record(record)
+            return 0
+        try:
+            with self._connect() as conn:
+                archived = self._get_archived_dedupe_hits(conn, [message])
+                statements = [self._performance_record_statement(record)]
+                if not archived:
+                    statements.append((OUTBOX_UPSERT_SQL, _outbox_params(message)))
+                if isinstance(conn, TursoHttpConnection):
+                    cursors = conn.execute_batch(statements)
+                    outbox_row = cursors[1].fetchone() if len(cursors) > 1 else None
+                else:
+                    conn.execute(*statements[0])
+                    outbox_row = conn.execute(*statements[1]).fetchone() if len(statements) > 1 else None
+                    conn.commit()
+        except Exception as e:
+            logging.error(f"Error saving performance record with outbox: {e}")
+            raise
+        if archived:
+            return next(iter(archived.values()))["id"]
+        return int(outbox_row[0]) if outbox_row else 0
+
     def get_project_usage(self, project_id: str, activity_code: str) -> float:
         """获取项目累计使用金额（北京工单上限用）"""
         try:
@@ -751,26 +1277,26 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             return []
 
     def delete_performance_records_not_in(self, activity_code: str, contract_ids: set) -> int:
-        """删除指定活动中不在当前快照内的业绩记录。"""
+        """删除指定活动中不在当前快照内的业绩记录，并同批删除这些合同的项目地址去重索引。"""
+        where_sql = "activity_code = ?"
+        params = [activity_code]
+        if contract_ids:
+            placeholders = ",".join("?" for _ in contract_ids)
+            where_sql += f" AND contract_id NOT IN ({placeholders})"
+            params.extend(sorted(str(contract_id) for contract_id in contract_ids))
+        # 索引行不随业绩记录删除时，之后同地址的新合同会被误判为跨运行重复
+        statements = [
+            (f"DELETE FROM project_address_index WHERE {where_sql}", params),
+            (f"DELETE FROM performance_data WHERE {where_sql}", params),
+        ]
         try:
             with self._connect() as conn:
-                if not contract_ids:
-                    cursor = conn.execute(
-                        "DELETE FROM performance_data WHERE activity_code = ?",
-                        (activity_code,)
-                    )
-                    return cursor.rowcount if cursor.rowcount is not None else 0
-
-                placeholders = ",".join("?" for _ in contract_ids)
-                params = [activity_code, *sorted(str(contract_id) for contract_id in contract_ids)]
-                cursor = conn.execute(
-                    f"""
-                    DELETE FROM performance_data
-                    WHERE activity_code = ?
-                      AND contract_id NOT IN ({placeholders})
-                    """,
-                    params
-                )
+                if isinstance(conn, TursoHttpConnection):
+                    cursor = conn.execute_batch(statements)[1]
+                else:
+                    conn.execute(*statements[0])
+                    cursor = conn.execute(*statements[1])
+                    conn.commit()
                 return cursor.rowcount if cursor.rowcount is not None else 0
         except Exception as e:
             logging.error(f"Error deleting stale performance records: {e}")
@@ -778,29 +1304,41 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
 
 
 
+    @staticmethod
+    def _performance_where(conditions: Dict):
+        """将查询条件转换为 WHERE 子句与参数。"""
+        where_clauses = []
+        params = []
+
+        for key, value in conditions.items():
+            if key == 'notification_sent':
+                # 处理布尔值字段 - 数据库中存储为整数
+                where_clauses.append("notification_sent = ?")
+                params.append(1 if value else 0)
+            elif key == 'is_historical':
+                # 处理布尔值字段
+                where_clauses.append("is_historical = ?")
+                params.append(1 if value else 0)
+            elif key == 'without_outbox_message_type':
+                # 尚无该类型 outbox 消息的记录（inline outbox 渲染失败后的补入队）
+                where_clauses.append(
+                    "NOT EXISTS (SELECT 1 FROM notification_outbox o "
+                    "WHERE o.activity_code = performance_data.activity_code "
+                    "AND o.contract_id = performance_data.contract_id AND o.message_type = ?)"
+                )
+                params.append(value)
+            else:
+                where_clauses.append(f"{key} = ?")
+                params.append(value)
+
+        where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
+        return where_clause, params
+
     def query_performance_records(self, conditions: Dict) -> List[Dict]:
         """查询业绩记录"""
         try:
             with self._connect() as conn:
-                # 构建查询条件
-                where_clauses = []
-                params = []
-
-                for key, value in conditions.items():
-                    if key == 'notification_sent':
-                        # 处理布尔值字段 - 数据库中存储为整数
-                        where_clauses.append("notification_sent = ?")
-                        params.append(1 if value else 0)
-                    elif key == 'is_historical':
-                        # 处理布尔值字段
-                        where_clauses.append("is_historical = ?")
-                        params.append(1 if value else 0)
-                    else:
-                        where_clauses.append(f"{key} = ?")
-                        params.append(value)
-
-                where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
-
+                where_clause, params = self._performance_where(conditions)
                 cursor = conn.execute(f"""
                     SELECT * FROM performance_data
                     WHERE {where_clause}
@@ -811,6 +1349,83 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error querying performance records: {e}")
             return []
 
+    def query_performance_projection(
+        self,
+        conditions: Dict,
+        columns: Sequence[str],
+        extension_keys: Sequence[str] = (),
+    ) -> List[tuple]:
+        """按投影查询业绩记录，返回 namedtuple。
+
+        只读取 columns 指定的列；extension_keys 非空时通过 json_extract 在库内取出
+        extensions 中的对应键，行上的 extensions 属性为仅含这些键的字典（缺失或 null 的键不出现）。
+        extensions 不是合法 JSON（如含 NaN）的行回退为 Python 解码。
+        """
+        columns = tuple(columns)
+        extension_keys = tuple(extension_keys)
+        for column in columns:
+            if not column.isidentifier():
+                raise ValueError(f"非法列名: {column}")
+        if extension_keys and "extensions" in columns:
+            raise ValueError("指定 extension_keys 时 columns 不能包含 extensions")
+
+        select_parts = list(columns)
+        select_params = []
+        for key in extension_keys:
+            promoted_column = PROMOTED_EXTENSION_COLUMNS.get(key)
+            if promoted_column:
+                # 已提升的行直接读列，无需解析 JSON
+                select_parts.append(
+                    f"CASE WHEN ext_promoted = 1 THEN {promoted_column} "
+                    "WHEN json_valid(extensions) THEN json_extract(extensions, ?) END"
+                )
+            else:
+                select_parts.append("CASE WHEN json_valid(extensions) THEN json_extract(extensions, ?) END")
+            select_params.append(_extension_json_path(key))
+        if extension_keys:
+            # 无法在库内解析的 extensions 原样返回，由 Python 解码；请求键全部已提升时已提升行无需回退
+            if all(key in PROMOTED_EXTENSION_COLUMNS for key in extension_keys):
+                select_parts.append(
+                    "CASE WHEN ext_promoted = 1 THEN NULL WHEN json_valid(extensions) THEN NULL ELSE extensions END"
+                )
+            else:
+                select_parts.append("CASE WHEN json_valid(extensions) THEN NULL ELSE extensions END")
+
+        row_type = _projection_row_type(columns, bool(extension_keys))
+        try:
+            with self._connect() as conn:
+                where_clause, params = self._performance_where(conditions)
+                cursor = conn.execute(f"""
+                    SELECT {', '.join(select_parts)} FROM performance_data
+                    WHERE {where_clause}
+                    ORDER BY created_at
+                """, select_params + params)
+                rows = cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Error querying performance projection: {e}")
+            return []
+
+        if not extension_keys:
+            return [row_type(*row) for row in rows]
+
+        width = len(columns)
+        results = []
+        for row in rows:
+            raw_extensions = row[-1]
+            if raw_extensions:
+                try:
+                    decoded = json.loads(raw_extensions)
+                except (TypeError, ValueError):
+                    decoded = {}
+                decoded = decoded if isinstance(decoded, dict) else {}
+                extensions = {key: decoded[key] for key in extension_keys if decoded.get(key) is not None}
+            else:
+                extensions = {
+                    key: value for key, value in zip(extension_keys, row[width:-1]) if value is not None
+                }
+            results.append(row_type(*row[:width], extensions))
+        return results
+
     def update_notification_status(self, contract_id: str, activity_code: str, notification_sent: bool):
         """更新通知发送状态"""
         try:
@@ -837,34 +1452,64 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
         metadata_json: str = "",
     ) -> int:
         """创建或复用 outbox 消息，返回 outbox id。"""
+        results = self.enqueue_outbox_messages([
+            {
+                "activity_code": activity_code,
+                "contract_id": contract_id,
+                "message_type": message_type,
+                "webhook_url": webhook_url,
+                "payload_json": payload_json,
+                "metadata_json": metadata_json,
+                "dedupe_key": dedupe_key,
+            }
+        ])
+        return int(results[0]["id"]) if results else 0
+
+    def enqueue_outbox_messages(self, messages: List[Dict]) -> List[Dict]:
+        """批量创建或复用 outbox 消息，按输入顺序返回 {id, status, created, metadata_json}。
+
+        每条消息一条 INSERT ... ON CONFLICT DO UPDATE ... RETURNING，整批在同一事务内完成，
+        不再需要 INSERT OR IGNORE 之后的补查与调用方的 get_outbox_message。
+        created 由 upsert 自身返回（冲突时 enqueue_count 自增），并发入队时也不会误判。
+        """
+        if not messages:
+            return []
         try:
             with self._connect() as conn:
-                cursor = conn.execute(
-                    """
-                    INSERT OR IGNORE INTO notification_outbox (
-                        activity_code, contract_id, message_type, webhook_url, payload_json, metadata_json, dedupe_key, status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, 'pending')
-                    """,
-                    (activity_code, contract_id, message_type, webhook_url, payload_json, metadata_json, dedupe_key),
-                )
-                if cursor.lastrowid:
-                    conn.commit()
-                    return int(cursor.lastrowid)
-
-                existing = conn.execute(
-                    """
-                    SELECT id FROM notification_outbox
-                    WHERE activity_code = ? AND dedupe_key = ?
-                    LIMIT 1
-                    """,
-                    (activity_code, dedupe_key),
-                ).fetchone()
+                archived = self._get_archived_dedupe_hits(conn, messages)
+                pending = [m for m in messages if (m["activity_code"], m["dedupe_key"]) not in archived]
+                params = [_outbox_params(message) for message in pending]
+                if not params:
+                    inserted_rows = []
+                elif isinstance(conn, TursoHttpConnection):
+                    statements = [(OUTBOX_UPSERT_SQL, p) for p in params]
+                    inserted_rows = [cursor.fetchone() for cursor in conn.execute_batch(statements)]
+                else:
+                    inserted_rows = [conn.execute(OUTBOX_UPSERT_SQL, p).fetchone() for p in params]
                 conn.commit()
-                return int(existing[0]) if existing else 0
         except Exception as e:
-            logging.error(f"Error enqueueing outbox message: {e}")
+            logging.error(f"Error enqueueing outbox messages: {e}")
             raise
 
+        results = []
+        inserted_iter = iter(inserted_rows)
+        for message in messages:
+            archived_hit = archived.get((message["activity_code"], message["dedupe_key"]))
+            if archived_hit:
+                results.append(dict(archived_hit))
+                continue
+            row = next(inserted_iter)
+            if not row:
+                results.append({"id": 0, "status": "", "created": False, "metadata_json": ""})
+                continue
+            results.append({
+                "id": int(row[0]),
+                "status": row[1],
+                "created": bool(row[3]),
+                "metadata_json": row[2] or "",
+            })
+        return results
+
     def upsert_pending_order_snapshot(self, activity_code: str, snapshot: Dict) -> None:
         """写入或更新待预约工单快照。"""
         try:
@@ -937,6 +1582,96 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error deactivating missing pending orders: {e}")
             raise
 
+    def sync_pending_order_snapshots(self, activity_code: str, snapshots: List[Dict]) -> Dict[str, int]:
+        """单事务同步待预约工单快照，返回 {"upserted": n, "deactivated": n}。
+
+        快照先写入暂存表，再以一条 INSERT ... SELECT ... ON CONFLICT 完成 upsert，
+        失活用 NOT EXISTS 反连接，不受 SQL 变量个数上限影响；同一指纹重复出现时以最后一条为准。
+        """
+        staged = {}
+        for snapshot in snapshots:
+            staged[snapshot["status_fingerprint"]] = (
+                activity_code,
+                snapshot["status_fingerprint"],
+                snapshot["order_num"],
+                snapshot.get("customer_name", ""),
+                snapshot.get("address", ""),
+                snapshot.get("supervisor_name", ""),
+                snapshot["create_time"],
+                snapshot["org_name"],
+                snapshot["order_status"],
+                snapshot["eligible_since"],
+                snapshot.get("extensions", ""),
+            )
+        clear_staging = ("DELETE FROM pending_order_snapshot_staging WHERE activity_code = ?", (activity_code,))
+        stage_sql = """
+            INSERT OR REPLACE INTO pending_order_snapshot_staging (
+                activity_code, status_fingerprint, order_num, customer_name, address, supervisor_name,
+                create_time, org_name, order_status, eligible_since, extensions
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        upsert = ("""
+            INSERT INTO pending_order_reminders (
+                activity_code, order_num, customer_name, address, supervisor_name,
+                create_time, org_name, order_status, status_fingerprint, eligible_since,
+                is_active, notification_sent, extensions
+            )
+            SELECT activity_code, order_num, customer_name, address, supervisor_name,
+                   create_time, org_name, order_status, status_fingerprint, eligible_since,
+                   1, 0, extensions
+            FROM pending_order_snapshot_staging
+            WHERE activity_code = ?
+            ON CONFLICT(activity_code, status_fingerprint) DO UPDATE SET
+                order_num = excluded.order_num,
+                customer_name = excluded.customer_name,
+                address = excluded.address,
+                supervisor_name = excluded.supervisor_name,
+                create_time = excluded.create_time,
+                org_name = excluded.org_name,
+                order_status = excluded.order_status,
+                eligible_since = excluded.eligible_since,
+                is_active = 1,
+                notification_sent = CASE
+                    WHEN pending_order_reminders.is_active = 0 THEN 0
+                    ELSE pending_order_reminders.notification_sent
+                END,
+                last_seen_at = CURRENT_TIMESTAMP,
+                resolved_at = NULL,
+                extensions = excluded.extensions
+        """, (activity_code,))
+        deactivate = ("""
+            UPDATE pending_order_reminders
+            SET is_active = 0,
+                resolved_at = CURRENT_TIMESTAMP,
+                last_seen_at = CURRENT_TIMESTAMP
+            WHERE activity_code = ?
+              AND is_active = 1
+              AND NOT EXISTS (
+                  SELECT 1 FROM pending_order_snapshot_staging s
+                  WHERE s.activity_code = pending_order_reminders.activity_code
+                    AND s.status_fingerprint = pending_order_reminders.status_fingerprint
+              )
+        """, (activity_code,))
+        try:
+            with self._connect() as conn:
+                if isinstance(conn, TursoHttpConnection):
+                    statements = [clear_staging]
+                    statements.extend((stage_sql, params) for params in staged.values())
+                    statements.extend([upsert, deactivate, clear_staging])
+                    cursors = conn.execute_batch(statements)
+                    deactivated = cursors[-2].rowcount
+                else:
+                    conn.execute(*clear_staging)
+                    conn.executemany(stage_sql, list(staged.values()))
+                    conn.execute(*upsert)
+                    deactivated = conn.execute(*deactivate).rowcount
+                    conn.execute(*clear_staging)
+                    conn.commit()
+        except Exception as e:
+            logging.error(f"Error syncing pending order snapshots: {e}")
+            raise
+        return {"upserted": len(staged), "deactivated": deactivated or 0}
+
     def get_pending_orders_requiring_notification(self, activity_code: str) -> List[Dict]:
         """获取当前活跃且尚未提醒的工单。"""
         try:
@@ -977,6 +1712,61 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error querying active pending orders by org: {e}")
             return []
 
+    def get_active_pending_orders_grouped(self, activity_code: str) -> Dict[str, Dict]:
+        """获取全部活跃工单并按服务商分组。
+
+        返回 {org_name: {"rows": [...], "digest_fingerprint": str, "last_notified_digest": str}}，
+        digest_fingerprint 由该服务商活跃工单的状态指纹排序后哈希得到。
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    """
+                    SELECT p.*, COALESCE(d.digest_fingerprint, '') AS last_notified_digest
+                    FROM pending_order_reminders p
+                    LEFT JOIN pending_order_org_digests d
+                      ON d.activity_code = p.activity_code
+                     AND d.org_name = p.org_name
+                    WHERE p.activity_code = ?
+                      AND p.is_active = 1
+                    ORDER BY p.org_name ASC, p.create_time ASC, p.order_num ASC
+                    """,
+                    (activity_code,),
+                )
+                rows = self._cursor_rows_to_dicts(cursor)
+        except Exception as e:
+            logging.error(f"Error querying grouped active pending orders: {e}")
+            return {}
+
+        grouped: Dict[str, Dict] = {}
+        for row in rows:
+            last_notified_digest = row.pop("last_notified_digest", "") or ""
+            group = grouped.setdefault(row["org_name"], {"rows": [], "last_notified_digest": last_notified_digest})
+            group["rows"].append(row)
+        for group in grouped.values():
+            fingerprints = sorted(row["status_fingerprint"] for row in group["rows"])
+            group["digest_fingerprint"] = hashlib.sha256("\n".join(fingerprints).encode("utf-8")).hexdigest()
+        return grouped
+
+    def save_pending_order_org_digest(self, activity_code: str, org_name: str, digest_fingerprint: str) -> None:
+        """记录服务商最近一次成功提醒时的活跃工单集合指纹。"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO pending_order_org_digests (activity_code, org_name, digest_fingerprint)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(activity_code, org_name) DO UPDATE SET
+                        digest_fingerprint = excluded.digest_fingerprint,
+                        notified_at = CURRENT_TIMESTAMP
+                    """,
+                    (activity_code, org_name, digest_fingerprint),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error saving pending order org digest: {e}")
+            raise
+
     def mark_pending_orders_notified(self, activity_code: str, fingerprints: List[str]) -> int:
         """将指定指纹的工单标记为已提醒。"""
         if not fingerprints:
@@ -1000,47 +1790,145 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error marking pending orders notified: {e}")
             raise
 
-    def replace_sla_violations_for_date(self, business_date: str, records: List[Dict]) -> int:
-        """按业务日期覆盖 SLA 违规快照。"""
+    @staticmethod
+    def _sla_violation_row(record: Dict, raw_json_mode: str) -> tuple:
+        """原始记录转换为 SLA_VIOLATION_FIELDS 顺序的行；row_hash 覆盖原始内容与 raw_json 存储方式。"""
+        raw_text = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        if raw_json_mode == SLA_RAW_JSON_NONE:
+            raw_json, codec = "", ""
+        elif raw_json_mode == SLA_RAW_JSON_ZLIB:
+            raw_json, codec = _encode_archive_body(raw_text, OUTBOX_ARCHIVE_CODEC_ZLIB), OUTBOX_ARCHIVE_CODEC_ZLIB
+        else:
+            raw_json, codec = json.dumps(record, ensure_ascii=False), ""
+        row_hash = hashlib.sha256(f"{raw_json_mode}\n{raw_text}".encode("utf-8")).hexdigest()
+        return (
+            record.get("_id", ""),
+            record.get("sid", ""),
+            record.get("saCreateTime", ""),
+            record.get("orderNum", ""),
+            record.get("province", ""),
+            record.get("orgName", ""),
+            record.get("supervisorName", ""),
+            str(record.get("sourceType", "")),
+            str(record.get("status", "")),
+            record.get("msg", ""),
+            record.get("memo", ""),
+            str(record.get("workType", "")),
+            record.get("createTime", ""),
+            raw_json,
+            codec,
+            row_hash,
+        )
+
+    @staticmethod
+    def _sla_violation_key(
+        violation_id, order_num, org_name, violation_type, violation_description, duplicate_ids=frozenset()
+    ) -> tuple:
+        """快照行主键：优先 violation_id，缺失或本批重复时退回业务唯一键。"""
+        if violation_id and violation_id not in duplicate_ids:
+            return ("id", violation_id)
+        return ("natural", order_num, org_name, violation_type, violation_description)
+
+    def replace_sla_violations_for_date(
+        self,
+        business_date: str,
+        records: List[Dict],
+        raw_json_mode: str = SLA_RAW_JSON_FULL,
+    ) -> int:
+        """按业务日期覆盖 SLA 违规快照（差量写入），返回实际保存的行数。
+
+        以 (business_date, violation_id) 比对已有行的 row_hash：未变化的行不写，
+        变化的行原地更新，新行插入，快照中消失的行删除，全部在一个事务内完成。
+        同一批中重复的 violation_id 改按业务唯一键区分；业务唯一键也相同的行只保留最后一条。
+        """
+        if raw_json_mode not in (SLA_RAW_JSON_FULL, SLA_RAW_JSON_ZLIB, SLA_RAW_JSON_NONE):
+            raise ValueError(f"Unsupported SLA raw_json mode: {raw_json_mode}")
+        rows = [self._sla_violation_row(record, raw_json_mode) for record in records]
+        id_counts = Counter(row[0] for row in rows if row[0])
+        duplicate_ids = frozenset(violation_id for violation_id, count in id_counts.items() if count > 1)
+        if duplicate_ids:
+            logging.warning(
+                "SLA violations for %s: %s 个 violation_id 重复，改按业务唯一键区分: %s",
+                business_date,
+                len(duplicate_ids),
+                sorted(duplicate_ids)[:10],
+            )
+        incoming = {}
+        for row in rows:
+            # violation_id, order_num, org_name, violation_type, violation_description
+            incoming[self._sla_violation_key(row[0], row[3], row[5], row[9], row[10], duplicate_ids)] = row
+        if len(incoming) < len(rows):
+            logging.warning(
+                "SLA violations for %s: %s 条记录与同批其他记录完全重复，仅保留最后一条",
+                business_date,
+                len(rows) - len(incoming),
+            )
+        assignments = ", ".join(f"{field} = ?" for field in SLA_VIOLATION_FIELDS)
+        update_sql = f"""
+            UPDATE sla_violation_records
+            SET {assignments}, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """
+        insert_sql = f"""
+            INSERT INTO sla_violation_records (business_date, {', '.join(SLA_VIOLATION_FIELDS)}, updated_at)
+            VALUES (?, {', '.join('?' for _ in SLA_VIOLATION_FIELDS)}, CURRENT_TIMESTAMP)
+        """
+        delete_sql = "DELETE FROM sla_violation_records WHERE id = ?"
         try:
             with self._connect() as conn:
-                conn.execute(
-                    "DELETE FROM sla_violation_records WHERE business_date = ?",
+                cursor = conn.execute(
+                    """
+                    SELECT id, violation_id, order_num, org_name, violation_type, violation_description, row_hash
+                    FROM sla_violation_records
+                    WHERE business_date = ?
+                    """,
                     (business_date,),
                 )
-                if records:
-                    conn.executemany(
-                        """
-                        INSERT INTO sla_violation_records (
-                            business_date, violation_id, sid, sa_create_time, order_num,
-                            province, org_name, supervisor_name, source_type, status,
-                            violation_type, violation_description, work_type, create_time, raw_json,
-                            updated_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                        """,
-                        [
-                            (
-                                business_date,
-                                record.get("_id", ""),
-                                record.get("sid", ""),
-                                record.get("saCreateTime", ""),
-                                record.get("orderNum", ""),
-                                record.get("province", ""),
-                                record.get("orgName", ""),
-                                record.get("supervisorName", ""),
-                                str(record.get("sourceType", "")),
-                                str(record.get("status", "")),
-                                record.get("msg", ""),
-                                record.get("memo", ""),
-                                str(record.get("workType", "")),
-                                record.get("createTime", ""),
-                                json.dumps(record, ensure_ascii=False),
-                            )
-                            for record in records
-                        ],
-                    )
-                conn.commit()
-                return len(records)
+                existing = {}
+                deletes = []
+                for row in cursor.fetchall():
+                    key = self._sla_violation_key(*row[1:6], duplicate_ids)
+                    if key in existing:
+                        deletes.append((row[0],))
+                    else:
+                        existing[key] = (row[0], row[6] or "")
+
+                updates, inserts = [], []
+                for key, row in incoming.items():
+                    current = existing.pop(key, None)
+                    if current is None:
+                        inserts.append((business_date, *row))
+                    elif current[1] != row[-1]:
+                        updates.append((*row, current[0]))
+                deletes.extend((row_id,) for row_id, _ in existing.values())
+
+                # 先删后改再插，避免业务唯一键在事务中途冲突；有变化时重算当日汇总
+                statements = [(delete_sql, params) for params in deletes]
+                statements.extend((update_sql, params) for params in updates)
+                statements.extend((insert_sql, params) for params in inserts)
+                if statements:
+                    rollup_statements = [
+                        ("DELETE FROM sla_violation_rollups WHERE business_date = ?", (business_date,)),
+                        (SLA_ROLLUP_REBUILD_SQL.format(where="WHERE business_date = ?"), (business_date,)),
+                    ]
+                    if isinstance(conn, TursoHttpConnection):
+                        conn.execute_batch(statements + rollup_statements)
+                    else:
+                        for sql, params_list in ((delete_sql, deletes), (update_sql, updates), (insert_sql, inserts)):
+                            if params_list:
+                                conn.executemany(sql, params_list)
+                        for sql, params in rollup_statements:
+                            conn.execute(sql, params)
+                        conn.commit()
+                logging.info(
+                    "SLA violations for %s: inserted=%s updated=%s deleted=%s unchanged=%s",
+                    business_date,
+                    len(inserts),
+                    len(updates),
+                    len(deletes),
+                    len(incoming) - len(inserts) - len(updates),
+                )
+                return len(incoming)
         except Exception as e:
             logging.error(f"Error replacing SLA violations for {business_date}: {e}")
             raise
@@ -1066,32 +1954,414 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                     params.append(org_name)
                 sql += " ORDER BY business_date ASC, org_name ASC, order_num ASC"
                 cursor = conn.execute(sql, params)
-                return self._cursor_rows_to_dicts(cursor)
+                rows = self._cursor_rows_to_dicts(cursor)
+            for row in rows:
+                if row.get("raw_json_codec"):
+                    row["raw_json"] = _decode_archive_body(row.get("raw_json"), row["raw_json_codec"])
+            return rows
         except Exception as e:
             logging.error(f"Error querying SLA violations between {start_date} and {end_date}: {e}")
             return []
 
-    def get_retryable_outbox_messages(self, activity_code: str, max_attempts: int, limit: int = 100) -> List[Dict]:
-        """获取可重试发送的 outbox 消息。"""
+    def get_sla_provider_summaries(self, start_date: str, end_date: str) -> List[Dict]:
+        """一次查询汇总窗口内各服务商违规数。
+
+        返回按服务商排序的 [{"org_name", "violation_count", "by_type": {violation_type: count}}]。
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    """
+                    SELECT org_name, violation_type, SUM(violation_count)
+                    FROM sla_violation_rollups
+                    WHERE business_date >= ?
+                      AND business_date <= ?
+                    GROUP BY org_name, violation_type
+                    ORDER BY org_name ASC, violation_type ASC
+                    """,
+                    (start_date, end_date),
+                )
+                rows = cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Error querying SLA provider summaries between {start_date} and {end_date}: {e}")
+            return []
+
+        summaries: Dict[str, Dict] = {}
+        for org_name, violation_type, count in rows:
+            summary = summaries.setdefault(org_name, {"org_name": org_name, "violation_count": 0, "by_type": {}})
+            summary["violation_count"] += int(count or 0)
+            summary["by_type"][violation_type] = int(count or 0)
+        return list(summaries.values())
+
+    def get_smartsheet_sync_state(self, activity_code: str) -> Dict[str, Dict]:
+        """一次性加载电子表格同步内容指纹。"""
         try:
             with self._connect() as conn:
                 cursor = conn.execute(
                     """
-                    SELECT *
-                    FROM notification_outbox
+                    SELECT identity_hash, content_hash, record_id
+                    FROM smartsheet_sync_state
                     WHERE activity_code = ?
-                      AND status IN ('pending', 'failed')
-                      AND attempt_count < ?
-                    ORDER BY created_at ASC
-                    LIMIT ?
                     """,
-                    (activity_code, max_attempts, limit),
+                    (activity_code,),
+                )
+                return {
+                    row[0]: {"content_hash": row[1], "record_id": row[2] or ""}
+                    for row in cursor.fetchall()
+                }
+        except Exception as e:
+            logging.error(f"Error loading smartsheet sync state for {activity_code}: {e}")
+            return {}
+
+    def save_smartsheet_sync_state(self, activity_code: str, entries: List[Dict]) -> int:
+        """批量写入电子表格同步内容指纹；record_id 为空时保留已有值。"""
+        if not entries:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    """
+                    INSERT INTO smartsheet_sync_state (
+                        activity_code, identity_hash, content_hash, record_id, updated_at
+                    ) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(activity_code, identity_hash) DO UPDATE SET
+                        content_hash = excluded.content_hash,
+                        record_id = CASE
+                            WHEN excluded.record_id != '' THEN excluded.record_id
+                            ELSE smartsheet_sync_state.record_id
+                        END,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    [
+                        (
+                            activity_code,
+                            entry["identity_hash"],
+                            entry["content_hash"],
+                            entry.get("record_id", "") or "",
+                        )
+                        for entry in entries
+                    ],
+                )
+                conn.commit()
+                return len(entries)
+        except Exception as e:
+            logging.error(f"Error saving smartsheet sync state for {activity_code}: {e}")
+            raise
+
+    def set_smartsheet_record_id(self, activity_code: str, identity_hash: str, record_id: str) -> None:
+        """记录电子表格行对应的企业微信 record_id。"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    UPDATE smartsheet_sync_state
+                    SET record_id = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE activity_code = ? AND identity_hash = ?
+                    """,
+                    (record_id, activity_code, identity_hash),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error setting smartsheet record id for {activity_code}/{identity_hash}: {e}")
+            raise
+
+    def get_project_address_index(self, activity_code: str) -> List[Dict]:
+        """一次性加载项目地址去重索引（按写入顺序）。"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    """
+                    SELECT housekeeper, address_hash, contract_id
+                    FROM project_address_index
+                    WHERE activity_code = ?
+                    ORDER BY id
+                    """,
+                    (activity_code,),
+                )
+                return self._cursor_rows_to_dicts(cursor)
+        except Exception as e:
+            logging.error(f"Error loading project address index for {activity_code}: {e}")
+            return []
+
+    def get_unindexed_project_addresses(self, activity_code: str) -> List[Dict]:
+        """获取尚未写入去重索引的自引单（升级前的历史记录或写索引前中断的运行）。"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    """
+                    SELECT contract_id, housekeeper, project_address FROM (
+                        SELECT
+                            p.id,
+                            p.contract_id,
+                            p.housekeeper,
+                            CASE
+                                WHEN p.ext_promoted = 1 THEN p.ext_project_address
+                                WHEN json_valid(p.extensions) THEN json_extract(p.extensions, '$."项目地址(projectAddress)"')
+                            END AS project_address
+                        FROM performance_data p
+                        LEFT JOIN project_address_index i
+                            ON i.activity_code = p.activity_code AND i.contract_id = p.contract_id
+                        WHERE p.activity_code = ? AND p.order_type = 'self_referral' AND i.id IS NULL
+                    )
+                    WHERE project_address IS NOT NULL AND project_address != ''
+                    ORDER BY id
+                    """,
+                    (activity_code,),
                 )
                 return self._cursor_rows_to_dicts(cursor)
+        except Exception as e:
+            logging.error(f"Error loading unindexed project addresses for {activity_code}: {e}")
+            return []
+
+    def save_project_address_index(self, activity_code: str, entries: List[Dict]) -> int:
+        """批量写入项目地址去重索引。"""
+        if not entries:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO project_address_index (
+                        activity_code, housekeeper, address_hash, normalized_address, contract_id
+                    ) VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            activity_code,
+                            entry["housekeeper"],
+                            entry["address_hash"],
+                            entry["normalized_address"],
+                            entry["contract_id"],
+                        )
+                        for entry in entries
+                    ],
+                )
+                conn.commit()
+                return len(entries)
+        except Exception as e:
+            logging.error(f"Error saving project address index for {activity_code}: {e}")
+            raise
+
+    def get_retryable_outbox_messages(
+        self, activity_code: str, max_attempts: int, limit: int = 100, claim_seconds: int = 0
+    ) -> List[Dict]:
+        """获取可重试发送的 outbox 消息；claim_seconds > 0 时同时认领，认领期内其他发送方不会再取到。"""
+        try:
+            with self._connect() as conn:
+                return self._select_outbox_messages(
+                    conn,
+                    "activity_code = ? AND status IN ('pending', 'failed') AND attempt_count < ?",
+                    [activity_code, max_attempts],
+                    order_by="created_at ASC, id ASC",
+                    limit=limit,
+                    claim_seconds=claim_seconds,
+                )
         except Exception as e:
             logging.error(f"Error querying retryable outbox messages: {e}")
             return []
 
+    def _select_outbox_messages(
+        self, conn, where_sql: str, params: List, order_by: str, limit: int, claim_seconds: int
+    ) -> List[Dict]:
+        """查询待发送 outbox 行；需要认领时用一条 UPDATE ... RETURNING 跳过他人认领中的行并写入认领截止时间。"""
+        if claim_seconds <= 0:
+            cursor = conn.execute(
+                f"SELECT * FROM notification_outbox WHERE {where_sql} ORDER BY {order_by} LIMIT ?",
+                params + [limit],
+            )
+            return self._cursor_rows_to_dicts(cursor)
+        cursor = conn.execute(
+            f"""
+            UPDATE notification_outbox
+            SET claimed_until = datetime('now', ?)
+            WHERE id IN (
+                SELECT id
+                FROM notification_outbox
+                WHERE {where_sql}
+                  AND (claimed_until IS NULL OR claimed_until <= datetime('now'))
+                ORDER BY {order_by}
+                LIMIT ?
+            )
+            RETURNING *
+            """,
+            [f"+{int(claim_seconds)} seconds"] + params + [limit],
+        )
+        rows = self._cursor_rows_to_dicts(cursor)
+        conn.commit()
+        # RETURNING 不保证顺序，按查询顺序重排
+        if order_by.startswith("created_at"):
+            rows.sort(key=lambda row: (row.get("created_at") or "", int(row["id"])))
+        else:
+            rows.sort(key=lambda row: int(row["id"]))
+        return rows
+
+    def archive_outbox_messages(
+        self,
+        sent_before: str,
+        dead_letter_before: str,
+        compress: bool = True,
+        limit: int = 500,
+    ) -> int:
+        """将早于截止时间的已发送 / 死信 outbox 消息迁入归档表，返回本批归档条数。"""
+        codec = OUTBOX_ARCHIVE_CODEC_ZLIB if compress else ""
+        try:
+            with self._connect() as conn:
+                # 归档表已有同一 (activity_code, dedupe_key) 的其他行时无法迁入，排在批次末尾，避免占满每一批
+                cursor = conn.execute(
+                    """
+                    SELECT o.*, EXISTS (
+                        SELECT 1 FROM notification_outbox_archive a
+                        WHERE a.activity_code = o.activity_code AND a.dedupe_key = o.dedupe_key AND a.id != o.id
+                    ) AS archive_conflict
+                    FROM notification_outbox o
+                    WHERE (o.status = 'sent' AND COALESCE(o.sent_at, o.updated_at) < ?)
+                       OR (o.status = 'dead_letter' AND o.updated_at < ?)
+                    ORDER BY archive_conflict ASC, o.id ASC
+                    LIMIT ?
+                    """,
+                    (sent_before, dead_letter_before, limit),
+                )
+                rows = self._cursor_rows_to_dicts(cursor)
+                if not rows:
+                    return 0
+
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO notification_outbox_archive (
+                        id, activity_code, contract_id, message_type, webhook_url, dedupe_key, status,
+                        attempt_count, response_code, last_error, body_codec,
+                        payload_json, metadata_json, response_body, sent_at, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            row["id"],
+                            row["activity_code"],
+                            row["contract_id"],
+                            row["message_type"],
+                            row["webhook_url"],
+                            row["dedupe_key"],
+                            row["status"],
+                            row["attempt_count"],
+                            row["response_code"],
+                            row["last_error"],
+                            codec,
+                            *(_encode_archive_body(row[field], codec) for field in OUTBOX_ARCHIVE_BODY_FIELDS),
+                            row["sent_at"],
+                            row["created_at"],
+                            row["updated_at"],
+                        )
+                        for row in rows
+                    ],
+                )
+                ids = [row["id"] for row in rows]
+                placeholders = ",".join("?" for _ in ids)
+                # 只删除确实已写入归档表的行；因唯一约束被忽略的行留在热表
+                archived_ids = {
+                    row[0]
+                    for row in conn.execute(
+                        f"""
+                        DELETE FROM notification_outbox
+                        WHERE id IN ({placeholders}) AND id IN (SELECT id FROM notification_outbox_archive)
+                        RETURNING id
+                        """,
+                        ids,
+                    ).fetchall()
+                }
+                conn.commit()
+                skipped = [outbox_id for outbox_id in ids if outbox_id not in archived_ids]
+                if skipped:
+                    logging.warning(
+                        "outbox 归档表已存在相同 dedupe_key 的消息，%s 条保留在 notification_outbox: ids=%s",
+                        len(skipped),
+                        skipped,
+                    )
+                return len(archived_ids)
+        except Exception as e:
+            logging.error(f"Error archiving outbox messages: {e}")
+            raise
+
+    def get_archived_outbox_message(self, outbox_id: int) -> Dict:
+        """按原 outbox id 读取归档消息（大字段已解压）。"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "SELECT * FROM notification_outbox_archive WHERE id = ? LIMIT 1",
+                    (outbox_id,),
+                )
+                rows = self._cursor_rows_to_dicts(cursor)
+        except Exception as e:
+            logging.error(f"Error getting archived outbox message {outbox_id}: {e}")
+            return {}
+        if not rows:
+            return {}
+        row = rows[0]
+        for field in OUTBOX_ARCHIVE_BODY_FIELDS:
+            row[field] = _decode_archive_body(row[field], row["body_codec"])
+        return row
+
+    def _get_archived_dedupe_hits(self, conn, messages: List[Dict]) -> Dict:
+        """查询本批消息中已被归档的去重键，避免归档后同一消息被重新入队。"""
+        keys_by_activity: Dict[str, List[str]] = {}
+        for message in messages:
+            keys_by_activity.setdefault(message["activity_code"], []).append(message["dedupe_key"])
+
+        hits = {}
+        for activity_code, keys in keys_by_activity.items():
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                cursor = conn.execute(
+                    f"""
+                    SELECT id, status, dedupe_key, body_codec, metadata_json
+                    FROM notification_outbox_archive
+                    WHERE activity_code = ? AND dedupe_key IN ({placeholders})
+                    """,
+                    [activity_code, *chunk],
+                )
+                for row in cursor.fetchall():
+                    hits[(activity_code, row[2])] = {
+                        "id": int(row[0]),
+                        "status": row[1],
+                        "created": False,
+                        "metadata_json": _decode_archive_body(row[4], row[3]),
+                    }
+        return hits
+
+    def get_due_outbox_messages(
+        self, after_id: int, max_attempts: int, limit: int = 100, claim_seconds: int = 0
+    ) -> List[Dict]:
+        """跨活动按 id 键集分页获取待发送的 outbox 消息；claim_seconds 含义同 get_retryable_outbox_messages。"""
+        try:
+            with self._connect() as conn:
+                return self._select_outbox_messages(
+                    conn,
+                    "status IN ('pending', 'failed') AND id > ? AND attempt_count < ?",
+                    [after_id, max_attempts],
+                    order_by="id ASC",
+                    limit=limit,
+                    claim_seconds=claim_seconds,
+                )
+        except Exception as e:
+            logging.error(f"Error querying due outbox messages: {e}")
+            return []
+
+    def release_outbox_claims(self, outbox_ids: List[int]) -> None:
+        """释放已认领但未发送的 outbox 消息。"""
+        if not outbox_ids:
+            return
+        try:
+            with self._connect() as conn:
+                placeholders = ",".join("?" for _ in outbox_ids)
+                conn.execute(
+                    f"UPDATE notification_outbox SET claimed_until = NULL WHERE id IN ({placeholders})",
+                    list(outbox_ids),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error releasing outbox claims: {e}")
+
     def get_outbox_message(self, outbox_id: int) -> Dict:
         """按 id 获取 outbox 消息。"""
         try:
@@ -1122,6 +2392,7 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                         response_code = ?,
                         response_body = ?,
                         last_error = '',
+                        claimed_until = NULL,
                         sent_at = CURRENT_TIMESTAMP,
                         updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
@@ -1158,6 +2429,7 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
                         response_code = ?,
                         response_body = ?,
                         last_error = ?,
+                        claimed_until = NULL,
                         updated_at = CURRENT_TIMESTAMP
                     WHERE id = ?
                     """,
@@ -1175,6 +2447,142 @@ class SQLitePerformanceDataStore(PerformanceDataStore):
             logging.error(f"Error marking outbox failed (id={outbox_id}): {e}")
             raise
 
+    def get_metabase_card_fingerprint(self, task_key: str, card_url: str) -> Optional[Dict]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    """
+                    SELECT row_count, content_hash
+                    FROM metabase_card_fingerprints
+                    WHERE task_key = ? AND card_url = ?
+                    """,
+                    (task_key, card_url),
+                ).fetchone()
+                if not row:
+                    return None
+                return {"row_count": int(row[0] or 0), "content_hash": row[1] or ""}
+        except Exception as e:
+            logging.error(f"Error getting Metabase card fingerprint ({task_key}): {e}")
+            return None
+
+    def save_metabase_card_fingerprint(self, task_key: str, card_url: str, row_count: int, content_hash: str) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO metabase_card_fingerprints (task_key, card_url, row_count, content_hash, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(task_key, card_url) DO UPDATE SET
+                        row_count = excluded.row_count,
+                        content_hash = excluded.content_hash,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    (task_key, card_url, row_count, content_hash),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error saving Metabase card fingerprint ({task_key}): {e}")
+            raise
+
+    def get_task_watermark(self, task_key: str) -> Optional[str]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT watermark FROM task_watermarks WHERE task_key = ?",
+                    (task_key,),
+                ).fetchone()
+                return row[0] if row and row[0] else None
+        except Exception as e:
+            logging.error(f"Error getting task watermark ({task_key}): {e}")
+            return None
+
+    def save_task_watermark(self, task_key: str, watermark: str) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO task_watermarks (task_key, watermark, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(task_key) DO UPDATE SET
+                        watermark = excluded.watermark,
+                        updated_at = CURRENT_TIMESTAMP
+                    """,
+                    (task_key, watermark),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error saving task watermark ({task_key}): {e}")
+            raise
+
+    def acquire_task_lease(self, task_name: str, owner: str, ttl_seconds: float) -> bool:
+        """单条 upsert 原子抢占：仅当现有租约已过期或属于同一 owner 时覆盖。"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                # SET 表达式读取的是冲突行的旧值，原持有者经 RETURNING 一并带回，无需额外查询
+                row = conn.execute(
+                    """
+                    INSERT INTO task_leases (
+                        task_name, owner, acquired_at, heartbeat_at, expires_at, previous_owner, previous_expires_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, NULL, NULL)
+                    ON CONFLICT(task_name) DO UPDATE SET
+                        previous_owner = task_leases.owner,
+                        previous_expires_at = task_leases.expires_at,
+                        owner = excluded.owner,
+                        acquired_at = excluded.acquired_at,
+                        heartbeat_at = excluded.heartbeat_at,
+                        expires_at = excluded.expires_at
+                    WHERE task_leases.expires_at <= ? OR task_leases.owner = excluded.owner
+                    RETURNING previous_owner, previous_expires_at
+                    """,
+                    (task_name, owner, now, now, now + ttl_seconds, now),
+                ).fetchone()
+                conn.commit()
+                if row is None:
+                    return False
+                if row[0] and row[0] != owner:
+                    logging.warning(
+                        "接管过期任务租约 %s：原持有者 %s，已过期 %.0fs",
+                        task_name,
+                        row[0],
+                        now - float(row[1]),
+                    )
+                return True
+        except Exception as e:
+            logging.error(f"Error acquiring task lease ({task_name}): {e}")
+            raise
+
+    def renew_task_lease(self, task_name: str, owner: str, ttl_seconds: float) -> bool:
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    """
+                    UPDATE task_leases
+                    SET heartbeat_at = ?, expires_at = ?
+                    WHERE task_name = ? AND owner = ?
+                    """,
+                    (now, now + ttl_seconds, task_name, owner),
+                )
+                conn.commit()
+                return (cursor.rowcount or 0) > 0
+        except Exception as e:
+            logging.error(f"Error renewing task lease ({task_name}): {e}")
+            raise
+
+    def release_task_lease(self, task_name: str, owner: str) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "DELETE FROM task_leases WHERE task_name = ? AND owner = ?",
+                    (task_name, owner),
+                )
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Error releasing task lease ({task_name}): {e}")
+            raise
+
 
 class TursoPerformanceDataStore(SQLitePerformanceDataStore):
     """Turso 实现（复用同一套 SQL 逻辑）。"""
@@ -1187,19 +2595,51 @@ class TursoPerformanceDataStore(SQLitePerformanceDataStore):
     def _connect(self):
         return TursoHttpConnection(self.db_url, self.auth_token)
 
+# 常驻进程复用：同一库只初始化一次 schema，Turso 请求复用 keep-alive 连接（默认关闭）
+_REUSE_STORES = False
+_STORE_CACHE: Dict[tuple, PerformanceDataStore] = {}
+_STORE_CACHE_LOCK = threading.Lock()
+_HTTP_SESSION = None
+
+
+def enable_store_reuse(enabled: bool = True) -> None:
+    """开启/关闭存储实例与 Turso HTTP 会话复用；关闭时清空缓存。"""
+    global _HTTP_SESSION, _REUSE_STORES
+    _STORE_CACHE.clear()
+    if _HTTP_SESSION is not None:
+        _HTTP_SESSION.close()
+        _HTTP_SESSION = None
+    if enabled:
+        if requests is None:
+            raise RuntimeError("requests is required for store reuse. Please install dependencies first.")
+        _HTTP_SESSION = requests.Session()
+    _REUSE_STORES = enabled
+
+
+def _cached_store(key: tuple, factory) -> PerformanceDataStore:
+    if not _REUSE_STORES:
+        return factory()
+    # 并发任务同时取同一个库时只初始化一次 schema
+    with _STORE_CACHE_LOCK:
+        store = _STORE_CACHE.get(key)
+        if store is None:
+            store = _STORE_CACHE[key] = factory()
+    return store
+
+
 def create_data_store(storage_type: str = "sqlite", **kwargs) -> PerformanceDataStore:
     """工厂函数：根据环境和参数创建 SQLite 或 Turso 存储实例。"""
     resolved_type = _resolve_storage_type(storage_type)
 
     if resolved_type == "sqlite":
         db_path = _resolve_local_db_path(kwargs.get("db_path", "performance_data.db"))
-        return SQLitePerformanceDataStore(db_path)
+        return _cached_store(("sqlite", db_path), lambda: SQLitePerformanceDataStore(db_path))
 
     if resolved_type == "turso":
         db_url = kwargs.get("db_url") or os.getenv("TURSO_DB_URL")
         auth_token = kwargs.get("auth_token") or os.getenv("TURSO_AUTH_TOKEN")
         if not db_url or not auth_token:
             raise ValueError("Turso storage requires TURSO_DB_URL and TURSO_AUTH_TOKEN.")
-        return TursoPerformanceDataStore(db_url, auth_token)
+        return _cached_store(("turso", db_url, auth_token), lambda: TursoPerformanceDataStore(db_url, auth_token))
 
     raise ValueError(f"Unsupported storage type: {resolved_type}. Only 'sqlite' and 'turso' are supported.")
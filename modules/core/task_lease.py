@@ -0,0 +1,149 @@
+"""定时任务运行租约：同一任务同一时间只允许一次运行。
+
+心跳每 30 分钟触发一次，慢的电子表格同步或 Turso 抖动会让同一任务的两次运行重叠，
+重复拉取、处理并发送同一批数据。租约存放在 task_leases 表中（SQLite/Turso 通用），
+持有期间后台线程定期续约；执行者崩溃后租约过期即可被下一次运行接管。
+
+环境变量：
+- TASK_LEASE_ENABLED：默认开启，设为 0 关闭
+- TASK_LEASE_TTL_SECONDS：租约有效期（默认 600），每 TTL/3 续约一次
+- TASK_LEASE_MODE：skip（默认，已有运行时跳过）或 wait（等待对方结束）
+- TASK_LEASE_WAIT_SECONDS：wait 模式最长等待时间（默认 300），超时后跳过
+"""
+
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from modules.core.storage import PerformanceDataStore, create_data_store
+
+LEASE_MODE_SKIP = "skip"
+LEASE_MODE_WAIT = "wait"
+DEFAULT_TTL_SECONDS = 600.0
+DEFAULT_WAIT_SECONDS = 300.0
+DEFAULT_POLL_SECONDS = 5.0
+
+
+def _is_truthy(value: Optional[str]) -> bool:
+    return str(value or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def task_lease_enabled() -> bool:
+    return _is_truthy(os.getenv("TASK_LEASE_ENABLED", "1"))
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class TaskLeaseBusy(Exception):
+    """任务租约被其他执行者持有，本次运行跳过。"""
+
+
+class TaskLease:
+    """任务租约上下文：进入时获取（失败抛出 TaskLeaseBusy），退出时停止续约并释放。
+
+    存储不可用时记录告警并在无租约的情况下继续执行，保持与引入租约前一致的可用性。
+    """
+
+    def __init__(
+        self,
+        task_name: str,
+        store: Optional[PerformanceDataStore] = None,
+        ttl_seconds: Optional[float] = None,
+        mode: Optional[str] = None,
+        wait_seconds: Optional[float] = None,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        owner: Optional[str] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.task_name = task_name
+        self.store = store
+        self.ttl_seconds = float(ttl_seconds or os.getenv("TASK_LEASE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.mode = (mode or os.getenv("TASK_LEASE_MODE", LEASE_MODE_SKIP)).strip().lower()
+        if wait_seconds is None:
+            wait_seconds = float(os.getenv("TASK_LEASE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = owner or default_owner()
+        self.sleep = sleep
+        self.clock = clock
+        self.held = False
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "TaskLease":
+        if self.store is None:
+            try:
+                self.store = create_data_store(storage_type="sqlite")
+            except Exception as exc:
+                logging.warning("任务租约存储不可用，%s 将在无租约状态下执行: %s", self.task_name, exc)
+                return self
+
+        deadline = self.clock() + (self.wait_seconds if self.mode == LEASE_MODE_WAIT else 0)
+        while True:
+            try:
+                self.held = self.store.acquire_task_lease(self.task_name, self.owner, self.ttl_seconds)
+            except Exception as exc:
+                logging.warning("获取任务租约失败，%s 将在无租约状态下执行: %s", self.task_name, exc)
+                return self
+            if self.held:
+                break
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                raise TaskLeaseBusy(f"{self.task_name} 正在由其他执行者运行")
+            self.sleep(min(self.poll_seconds, remaining))
+
+        self._heartbeat = threading.Thread(
+            target=self._renew_loop, name=f"lease-{self.task_name}", daemon=True
+        )
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+        if self.held:
+            try:
+                self.store.release_task_lease(self.task_name, self.owner)
+            except Exception as release_exc:
+                logging.warning("释放任务租约失败 %s（将在到期后自动失效）: %s", self.task_name, release_exc)
+            self.held = False
+        return False
+
+    def _renew_loop(self) -> None:
+        interval = max(self.ttl_seconds / 3, 1.0)
+        while not self._stop.wait(interval):
+            try:
+                if not self.store.renew_task_lease(self.task_name, self.owner, self.ttl_seconds):
+                    logging.error("任务租约已被接管，%s 可能与其他执行者重叠", self.task_name)
+                    return
+            except Exception as exc:
+                logging.warning("任务租约续约失败 %s: %s", self.task_name, exc)
+
+
+def with_task_lease(task_name: str):
+    """装饰器：在任务租约内执行；已有运行时记录并跳过（返回 None）。"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not task_lease_enabled():
+                return func(*args, **kwargs)
+            try:
+                with TaskLease(task_name):
+                    return func(*args, **kwargs)
+            except TaskLeaseBusy as exc:
+                logging.info("跳过本次运行: %s", exc)
+                return None
+
+        return wrapper
+
+    return decorator
@@ -1,6 +1,6 @@
 # data_processing_module.py
 import logging
-from modules.log_config import setup_logging
+from modules.log_config import ensure_logging
 from datetime import date
 from modules.config import (
     BONUS_POOL_RATIO,  # Import the configurable bonus pool ratio
@@ -8,7 +8,7 @@ from modules.config import (
 from modules import config  # Add config import to use config.x consistently
 
 # 设置日志
-setup_logging()
+ensure_logging()
 
 def determine_lucky_number_reward(
     contract_number: int,
@@ -1,30 +1,29 @@
 # data_utils.py - 数据处理工具模块
 import csv
 import logging
-import pandas as pd
 import os
 import shutil
 import json
 from datetime import datetime, timezone
-import pandas as pd
-import pytz
 import re
-from modules.log_config import setup_logging
+from modules.log_config import ensure_logging
+from modules.time_parsing import BEIJING_TZ, parse_datetime
 
-# 设置日志
-setup_logging()
+# 设置日志（入口已配置时不重复配置）
+ensure_logging()
 
 def save_to_csv_with_headers(data, filename='ContractData.csv', columns=None):
     if columns is None:
         columns = ["合同ID(_id)", "活动城市(province)", "工单编号(serviceAppointmentNum)", "Status", "管家(serviceHousekeeper)", "合同编号(contractdocNum)", "合同金额(adjustRefundMoney)", "支付金额(paidAmount)", "差额(difference)", "State", "创建时间(createTime)", "服务商(orgName)", "签约时间(signedDate)", "Doorsill", "款项来源类型(tradeIn)"]
     
+    import pandas as pd  # 仅 CSV 导出需要，避免拖慢不涉及 CSV 的任务启动
+
     df = pd.DataFrame(data, columns=columns)   
     df.to_csv(filename, index=False)
 
 def archive_file(filename, archive_dir='archive', days_to_keep=1):
     # Get current timestamp in China timezone
-    china_tz = pytz.timezone('Asia/Shanghai')
-    timestamp = datetime.now(china_tz).strftime('%Y%m%d%H%M')
+    timestamp = datetime.now(BEIJING_TZ).strftime('%Y%m%d%H%M')
 
     # Define archive file name
     base_name = os.path.splitext(filename)[0]
@@ -97,6 +96,7 @@ def update_performance_data(filename, data, fieldnames):
         writer.writerows(data)
         
 def get_housekeeper_award_list(file_path):
+    import pandas as pd
 
     try:
         # Load the CSV file
@@ -121,6 +121,7 @@ def get_housekeeper_award_list(file_path):
 
 # 重写，获取唯一的管家奖励列表
 def get_unique_housekeeper_award_list(file_path):
+    import pandas as pd
 
     try:
         # Load the CSV file
@@ -188,10 +189,7 @@ def format_create_time(iso_time_str):
     """将ISO时间格式转换为易读格式"""
     try:
         # 处理带时区的ISO格式
-        if '+' in iso_time_str:
-            dt = datetime.fromisoformat(iso_time_str)
-        else:
-            dt = datetime.fromisoformat(iso_time_str.replace('Z', '+00:00'))
+        dt = parse_datetime(iso_time_str)
         return dt.strftime('%Y-%m-%d %H:%M')
     except Exception as e:
         logging.warning(f'时间格式转换失败: {iso_time_str}, 错误: {e}')
@@ -201,10 +199,7 @@ def format_simple_date(create_time_str):
     """格式化创建时间为简单的月-日格式"""
     try:
         # 解析创建时间
-        if '+' in create_time_str:
-            create_time = datetime.fromisoformat(create_time_str)
-        else:
-            create_time = datetime.fromisoformat(create_time_str.replace('Z', '+00:00'))
+        create_time = parse_datetime(create_time_str)
 
         # 格式化为MM-DD
         return f"{create_time.month:02d}-{create_time.day:02d}"
@@ -217,10 +212,7 @@ def calculate_retention_duration(create_time_str):
     """计算工单滞留时长"""
     try:
         # 解析创建时间
-        if '+' in create_time_str:
-            create_time = datetime.fromisoformat(create_time_str)
-        else:
-            create_time = datetime.fromisoformat(create_time_str.replace('Z', '+00:00'))
+        create_time = parse_datetime(create_time_str)
 
         # 获取当前时间（带时区）
         current_time = datetime.now(timezone.utc)
@@ -273,10 +265,7 @@ def filter_orders_by_time_threshold(orders_data):
 
             # 解析创建时间
             create_time_str = order_info['createTime']
-            if '+' in create_time_str:
-                create_time = datetime.fromisoformat(create_time_str)
-            else:
-                create_time = datetime.fromisoformat(create_time_str.replace('Z', '+00:00'))
+            create_time = parse_datetime(create_time_str)
 
             # 确保创建时间有时区信息
             if create_time.tzinfo is None:
@@ -13,7 +13,17 @@ def get_log_level():
     else:
         return logging.INFO
 
+_configured = False
+
+
+def ensure_logging():
+    """模块导入时使用：入口已调用 setup_logging 时不再重复配置（避免重复加载 .env 与叠加 handler）。"""
+    if not _configured:
+        setup_logging()
+
+
 def setup_logging():
+    global _configured
     # 配置根日志记录器
     root_logger = logging.getLogger()
     root_logger.setLevel(get_log_level())
@@ -69,3 +79,4 @@ def setup_logging():
 
     # 为确保send_logger的消息不会被root_logger重复处理
     send_logger.propagate = False
+    _configured = True
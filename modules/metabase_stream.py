@@ -0,0 +1,187 @@
+"""Metabase 卡片响应的流式解析：边读取响应体边逐行产出 data.rows，不构建完整的响应结构。
+
+`response.json()` 需要先缓冲整个响应体再构建完整的嵌套结构，任务随后还要把 rows 再转成字典，
+大卡片（整月合同、结算台账）的内存峰值因此翻倍甚至三倍。MetabaseCardStream 按块读取响应体，
+只解码 data.cols 与 data.rows 中的单行，其余字段（json_query、results_metadata 等）解码后即丢弃。
+
+Metabase 的响应中 rows 通常位于 cols 之前：读取 cols 时已到达的行以原始列表形式暂存，
+这部分行的内存与 rows 列表相当，但仍省去了响应体文本与完整结构。
+"""
+
+import codecs
+import json
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class MetabaseCardStream:
+    """流式 Metabase 卡片响应：cols 属性返回列元数据，迭代产出每一行（原始列表）。
+
+    迭代结束或调用 close() 时释放底层 HTTP 响应；响应体不是合法 JSON 时在迭代中抛出 ValueError。
+    """
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]], on_close: Optional[Callable[[], None]] = None):
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._on_close = on_close
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._cols: Optional[List[Dict]] = None
+        self._pending_rows: deque = deque()
+        self._events = self._walk()
+        self.has_data = False
+        self.row_count = 0
+
+    @property
+    def cols(self) -> List[Dict]:
+        while self._cols is None:
+            event = next(self._events, None)
+            if event is None:
+                self._cols = []
+            elif event[0] == "row":
+                self._pending_rows.append(event[1])
+        return self._cols
+
+    def __iter__(self) -> Iterator[List]:
+        self.cols
+        try:
+            while self._pending_rows:
+                self.row_count += 1
+                yield self._pending_rows.popleft()
+            for kind, value in self._events:
+                if kind == "row":
+                    self.row_count += 1
+                    yield value
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._on_close is not None:
+            on_close, self._on_close = self._on_close, None
+            on_close()
+
+    def __enter__(self) -> "MetabaseCardStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # --- 增量 JSON 扫描 ---
+
+    def _walk(self) -> Iterator[Tuple[str, object]]:
+        self._expect("{")
+        for key in self._members():
+            if key == "data" and self._peek() == "{":
+                self.has_data = True
+                self._pos += 1
+                for data_key in self._members():
+                    if data_key == "rows" and self._peek() == "[":
+                        self._pos += 1
+                        for row in self._elements():
+                            yield "row", row
+                    elif data_key == "cols":
+                        cols = self._value()
+                        self._cols = cols if isinstance(cols, list) else []
+                        yield "cols", self._cols
+                    else:
+                        self._value()
+            else:
+                self._value()
+        self.close()
+
+    def _members(self) -> Iterator[str]:
+        """在 '{' 之后逐个产出键，调用方在两次迭代之间消费对应的值。"""
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            self._peek()
+            yield key
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Metabase 响应 JSON 格式错误：对象中出现 {separator!r}")
+
+    def _elements(self) -> Iterator[object]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            separator = self._peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Metabase 响应 JSON 格式错误：数组中出现 {separator!r}")
+
+    def _value(self):
+        self._peek()
+        want = 0
+        while True:
+            # 值恰好结束在缓冲区末尾时可能是被截断的数字，继续读取后再判断
+            if len(self._buf) - self._pos > want or self._eof:
+                try:
+                    value, end = _DECODER.raw_decode(self._buf, self._pos)
+                    if end < len(self._buf) or self._eof:
+                        self._pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                want = 2 * (len(self._buf) - self._pos)
+            if not self._fill():
+                self._eof = True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                self._eof = True
+                return ""
+
+    def _expect(self, char: str) -> None:
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Metabase 响应 JSON 格式错误：期望 {char!r}，实际 {found!r}")
+        self._pos += 1
+
+    def _fill(self) -> bool:
+        for chunk in self._chunks:
+            text = chunk if isinstance(chunk, str) else self._text_decoder.decode(chunk)
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        tail = self._text_decoder.decode(b"", final=True)
+        if tail:
+            self._buf = self._buf[self._pos:] + tail
+            self._pos = 0
+            return True
+        return False
+
+
+def card_columns_and_rows(response) -> Optional[Tuple[List[Dict], Iterable[List]]]:
+    """统一读取卡片的 cols 与 rows，兼容完整响应字典与 MetabaseCardStream；响应为空或缺少 data 时返回 None。"""
+    if isinstance(response, MetabaseCardStream):
+        cols = response.cols
+        if not response.has_data:
+            response.close()
+            return None
+        return cols, response
+    data = response.get("data") if isinstance(response, dict) else None
+    if not isinstance(data, dict):
+        return None
+    return data.get("cols", []) or [], data.get("rows", []) or []
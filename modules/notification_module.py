@@ -1,14 +1,14 @@
 # notification_module.py
 import logging
 import time
-from modules.log_config import setup_logging
+from modules.log_config import ensure_logging
 import requests
 from modules.config import *
 from modules.data_utils import load_send_status, update_send_status, get_all_records_from_csv, update_performance_data
 from task_manager import create_task
 
 # 配置日志
-setup_logging()
+ensure_logging()
 # 使用专门的发送消息日志记录器
 send_logger = logging.getLogger('sendLogger')
 
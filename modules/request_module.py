@@ -7,13 +7,40 @@ import re
 from requests.exceptions import Timeout
 import logging
 from modules.config import METABASE_PASSWORD, METABASE_SESSION, METABASE_USERNAME
-from modules.log_config import setup_logging
+from modules.log_config import ensure_logging
+from modules.metabase_stream import MetabaseCardStream
 
 # 设置日志
-setup_logging()
+ensure_logging()
 
 SESSION_FILE = 'metabase_session.json'
 SESSION_DURATION = 14 * 24 * 60 * 60  # 14 days in seconds
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 常驻进程复用：keep-alive HTTP 连接 + 内存中的 Metabase session（默认关闭）
+_HTTP_SESSION = None
+_CACHED_SESSION_INFO = None
+
+
+def enable_session_reuse(enabled=True):
+    """开启/关闭 HTTP 连接与 Metabase session 的进程内复用。"""
+    global _HTTP_SESSION, _CACHED_SESSION_INFO
+    if _HTTP_SESSION is not None:
+        _HTTP_SESSION.close()
+    _HTTP_SESSION = requests.Session() if enabled else None
+    _CACHED_SESSION_INFO = None
+
+
+def _remember_session(session_info):
+    global _CACHED_SESSION_INFO
+    if _HTTP_SESSION is not None:
+        _CACHED_SESSION_INFO = session_info
+
+
+def _post(url, **kwargs):
+    if _HTTP_SESSION is not None:
+        return _HTTP_SESSION.post(url, **kwargs)
+    return requests.post(url, **kwargs)
 
 
 def _normalize_metabase_query_url(api_url: str) -> str:
@@ -39,7 +66,7 @@ def get_metabase_session():
 
     data = {"username": METABASE_USERNAME, "password": METABASE_PASSWORD}
     logging.debug(f"Sending POST request to {METABASE_SESSION} with username: {METABASE_USERNAME} and password: {METABASE_PASSWORD}")
-    response = requests.post(METABASE_SESSION, headers=headers, json=data, timeout=30)
+    response = _post(METABASE_SESSION, headers=headers, json=data, timeout=30)
     session_id = response.json()['id']
     
     # Save session info to file
@@ -50,16 +77,20 @@ def get_metabase_session():
     logging.info(f"Saving session info to file: {SESSION_FILE}")
     with open(SESSION_FILE, 'w') as f:
         json.dump(session_info, f)
+    _remember_session(session_info)
     
     logging.info(f"Metabase session obtained with ID: {session_id}")
     return session_id
 
 def load_session():
+    if _CACHED_SESSION_INFO is not None:
+        return _CACHED_SESSION_INFO
     logging.info("Attempting to load session from file.")
     if os.path.exists(SESSION_FILE):
         with open(SESSION_FILE, 'r') as f:
             session_info = json.load(f)
         logging.info("Session loaded successfully.")
+        _remember_session(session_info)
         return session_info
     logging.warning("No session found in file.")
     return None
@@ -84,14 +115,21 @@ def get_valid_session():
         logging.info("Invalid session, getting a new one.")
         return get_metabase_session()
 
-def _send_request_with_session(session_id, api_url):
+def metabase_card_parameter(tag, value, param_type="date/single"):
+    """构造 /api/card/{id}/query 的模板变量参数；卡片 SQL 中需定义同名 template tag。"""
+    return {"type": param_type, "target": ["variable", ["template-tag", tag]], "value": value}
+
+def _query_body(parameters):
+    return {"parameters": parameters} if parameters else None
+
+def _send_request_with_session(session_id, api_url, parameters=None):
     try:
         target_url = _normalize_metabase_query_url(api_url)
         header = {
             'X-Metabase-Session': session_id,
             'Content-Type': 'application/json'
         }
-        response = requests.post(target_url, headers=header, timeout=30)
+        response = _post(target_url, headers=header, json=_query_body(parameters), timeout=30)
         if response.status_code in (200, 202):
             try:
                 return response.json()
@@ -107,25 +145,60 @@ def _send_request_with_session(session_id, api_url):
         logging.error(f"An error occurred: {e.__class__.__name__}: {str(e)}")
         return None
 
+def _send_streaming_request_with_session(session_id, api_url, parameters=None):
+    try:
+        target_url = _normalize_metabase_query_url(api_url)
+        header = {
+            'X-Metabase-Session': session_id,
+            'Content-Type': 'application/json'
+        }
+        response = _post(target_url, headers=header, json=_query_body(parameters), timeout=30, stream=True)
+        if response.status_code in (200, 202):
+            return MetabaseCardStream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), on_close=response.close)
+        response.close()
+        logging.error(f"Request failed with status code {response.status_code}, url={target_url}")
+        return None
+    except Timeout:
+        logging.error("Request timed out")
+        return None
+    except Exception as e:
+        logging.error(f"An error occurred: {e.__class__.__name__}: {str(e)}")
+        return None
+
+def metabase_streaming_enabled():
+    """METABASE_STREAMING=1 时，支持流式解析的任务改用 send_streaming_request_with_managed_session。"""
+    return str(os.getenv("METABASE_STREAMING", "")).strip().lower() in {"1", "true", "yes", "y", "on"}
+
 def send_request(session_id, api_url=None):
     if api_url is None:
         logging.error("API URL not provided.")
         return None
     return _send_request_with_session(session_id, api_url)
 
-def send_request_with_managed_session(api_url=None):
+def _send_with_managed_session(api_url, sender, parameters=None):
     if api_url is None:
         logging.error("API URL not provided.")
         return None
-    logging.debug(f"send_request_with_managed_session called at {datetime.datetime.now()}")
+    logging.debug(f"{sender.__name__} called at {datetime.datetime.now()}")
 
     session_id = get_valid_session()
-    response = _send_request_with_session(session_id, api_url)
+    response = sender(session_id, api_url, parameters)
 
     # 如果返回None（可能是401错误），尝试重新获取session并重试一次
     if response is None:
         logging.info("First request failed, attempting to get new session and retry...")
         session_id = get_metabase_session()  # 强制获取新session
-        response = _send_request_with_session(session_id, api_url)
+        response = sender(session_id, api_url, parameters)
 
     return response
+
+def send_request_with_managed_session(api_url=None, parameters=None):
+    """parameters 为 Metabase 卡片参数列表（见 metabase_card_parameter），由服务端过滤后只返回相关窗口。"""
+    return _send_with_managed_session(api_url, _send_request_with_session, parameters)
+
+def send_streaming_request_with_managed_session(api_url=None, parameters=None):
+    """与 send_request_with_managed_session 相同，但返回逐行解析响应体的 MetabaseCardStream。
+
+    调用方需迭代完毕或调用 close() 以释放连接；响应体中途出错时在迭代中抛出异常。
+    """
+    return _send_with_managed_session(api_url, _send_streaming_request_with_session, parameters)
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import logging
 from modules.config import SLA_VIOLATIONS_RECORDS_FILE, SLA_CONFIG, ORG_WEBHOOKS, WEBHOOK_URL_DEFAULT  # 引入配置中的文件路径和webhook配置
 from modules.data_utils import post_text_to_webhook
+from modules.time_parsing import parse_datetime
 
 # 假设SLA违规记录存储在这个文件中
 # SLA_VIOLATIONS_RECORDS_FILE = 'sla_violations.json'
@@ -188,8 +189,7 @@ def send_sla_violation_notifications(violation_data):
 
 def safe_parse_datetime(time_str):
     """
-    安全解析时间字符串，兼容Python 3.7.2
-    处理微秒位数不足的问题
+    安全解析时间字符串，兼容微秒位数不足/超过 6 位、Z 后缀等变体
 
     Args:
         time_str: 时间字符串
@@ -197,40 +197,7 @@ def safe_parse_datetime(time_str):
     Returns:
         datetime: 解析后的时间对象
     """
-    import re
-
-    # 移除可能的Z后缀
-    time_str = time_str.replace("Z", "")
-
-    # 正则表达式匹配时间格式
-    # 匹配: YYYY-MM-DDTHH:MM:SS.微秒+时区 或 YYYY-MM-DDTHH:MM:SS+时区
-    pattern = r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?([\+\-]\d{2}:\d{2})'
-    match = re.match(pattern, time_str)
-
-    if not match:
-        # 如果正则匹配失败，尝试直接解析
-        return datetime.fromisoformat(time_str)
-
-    base_time = match.group(1)      # 基础时间部分
-    microseconds = match.group(2)   # 微秒部分
-    timezone = match.group(3)       # 时区部分
-
-    if microseconds:
-        # 将微秒部分标准化为6位
-        if len(microseconds) < 6:
-            # 不足6位，右侧补0
-            microseconds = microseconds.ljust(6, '0')
-        elif len(microseconds) > 6:
-            # 超过6位，截断到6位
-            microseconds = microseconds[:6]
-
-        # 重新组装标准格式的时间字符串
-        standard_time_str = f"{base_time}.{microseconds}{timezone}"
-    else:
-        # 没有微秒部分，直接使用
-        standard_time_str = f"{base_time}{timezone}"
-
-    return datetime.fromisoformat(standard_time_str)
+    return parse_datetime(time_str)
 
 def construct_sla_violation_message(violation_record):
     try:
@@ -0,0 +1,113 @@
+"""共享时间解析：各任务统一使用，避免逐行重复实现与多格式 strptime 试探。
+
+解析顺序：datetime.fromisoformat 快速路径 → 单个正则识别其余变体（斜杠日期、非 6 位小数秒、
+Z 后缀等）后直接构造，不做多格式 strptime 试探。结果按原始字符串 LRU 缓存（datetime 不可变，可安全复用）。
+"""
+
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Optional
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+PARSE_CACHE_SIZE = 8192
+
+UTC = timezone.utc
+
+
+def _load_beijing_tz() -> tzinfo:
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo("Asia/Shanghai")
+        except Exception:
+            pass
+    return timezone(timedelta(hours=8))
+
+
+# 时区对象只构造一次
+BEIJING_TZ = _load_beijing_tz()
+
+# fromisoformat 不接受的变体：斜杠日期、单位数月/日/时、非 3/6 位小数秒、无冒号时区等
+_DATETIME_VARIANT = re.compile(
+    r"^(\d{4})[-/](\d{1,2})[-/](\d{1,2})"
+    r"(?:[T ](\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.(\d+))?)?"
+    r"\s*(Z|[+-]\d{2}:?\d{2})?$"
+)
+
+
+@lru_cache(maxsize=64)
+def _offset_tz(offset: str) -> tzinfo:
+    if offset == "Z":
+        return UTC
+    sign = -1 if offset[0] == "-" else 1
+    digits = offset[1:].replace(":", "")
+    return timezone(sign * timedelta(hours=int(digits[:2]), minutes=int(digits[2:])))
+
+
+def _parse_variant(text: str) -> Optional[datetime]:
+    match = _DATETIME_VARIANT.match(text)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    return datetime(
+        int(year),
+        int(month),
+        int(day),
+        int(hour or 0),
+        int(minute or 0),
+        int(second or 0),
+        int(fraction[:6].ljust(6, "0")) if fraction else 0,
+        tzinfo=_offset_tz(offset) if offset else None,
+    )
+
+
+def _parse_uncached(text: str) -> datetime:
+    if "/" not in text:
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError:
+            pass
+    parsed = _parse_variant(text)
+    if parsed is None:
+        raise ValueError(f"无法解析的时间: {text!r}")
+    return parsed
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(text: str, default_tz: Optional[tzinfo]) -> datetime:
+    parsed = _parse_uncached(text)
+    if parsed.tzinfo is None and default_tz is not None:
+        parsed = parsed.replace(tzinfo=default_tz)
+    return parsed
+
+
+def parse_datetime(value, default_tz: Optional[tzinfo] = None) -> datetime:
+    """解析时间字符串；无时区的结果在给定 default_tz 时补上该时区。无法解析时抛出 ValueError。"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None and default_tz is not None:
+            return value.replace(tzinfo=default_tz)
+        return value
+    text = str(value or "").strip()
+    if not text:
+        raise ValueError("空时间字符串")
+    return _parse_cached(text, default_tz)
+
+
+def parse_datetime_or_none(value, default_tz: Optional[tzinfo] = None) -> Optional[datetime]:
+    """同 parse_datetime，空值或无法解析时返回 None。"""
+    try:
+        return parse_datetime(value, default_tz)
+    except ValueError:
+        return None
+
+
+def parse_cache_info():
+    return _parse_cached.cache_info()
+
+
+def clear_parse_cache() -> None:
+    _parse_cached.cache_clear()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""时间解析微基准：Metabase 实际返回的几种时间格式，对比旧的逐处实现与共享解析模块（冷/热缓存）。
+
+示例：
+    python scripts/benchmark_datetime_parsing.py
+    python scripts/benchmark_datetime_parsing.py --values 100000 --distinct 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from modules.time_parsing import BEIJING_TZ, clear_parse_cache, parse_datetime  # noqa: E402
+
+
+def _legacy_sla(time_str: str) -> datetime:
+    """原 sla_jobs._safe_parse_datetime。"""
+    normalized = (time_str or "").replace("Z", "")
+    if "+" in normalized:
+        head, tail = normalized.rsplit("+", 1)
+        tz = f"+{tail}"
+    elif "-" in normalized[19:]:
+        head, tail = normalized.rsplit("-", 1)
+        tz = f"-{tail}"
+    else:
+        return datetime.fromisoformat(normalized)
+    if "." in head:
+        base, micros = head.split(".", 1)
+        normalized = f"{base}.{micros[:6].ljust(6, '0')}{tz}"
+    else:
+        normalized = f"{head}{tz}"
+    return datetime.fromisoformat(normalized)
+
+
+def _legacy_monitor(time_str: str) -> datetime:
+    """原 service_provider_sla_monitor.safe_parse_datetime（每次编译正则）。"""
+    time_str = time_str.replace("Z", "")
+    match = re.match(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?([\+\-]\d{2}:\d{2})', time_str)
+    if not match:
+        return datetime.fromisoformat(time_str)
+    base_time, microseconds, tz = match.groups()
+    if microseconds:
+        return datetime.fromisoformat(f"{base_time}.{microseconds[:6].ljust(6, '0')}{tz}")
+    return datetime.fromisoformat(f"{base_time}{tz}")
+
+
+def _legacy_settlement(text: str):
+    """原 project_settlement_jobs._parse_beijing_datetime 的字符串分支（每次构造时区）。"""
+    from zoneinfo import ZoneInfo
+    tz = ZoneInfo("Asia/Shanghai")
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return (dt.replace(tzinfo=tz) if dt.tzinfo is None else dt).astimezone(tz)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=tz)
+        except ValueError:
+            continue
+    return None
+
+
+# Metabase 卡片中出现过的格式：(生成函数, 原实现, 朴素时间的默认时区)
+FORMATS = {
+    "SLA saCreateTime": (lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%S+08:00"), _legacy_sla, None),
+    "SLA createTime(2位小数)": (
+        lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 10000:02d}+08:00",
+        _legacy_sla,
+        None,
+    ),
+    "SLA monitor(Z)": (lambda dt: dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z", _legacy_monitor, None),
+    "结算 朴素本地时间": (lambda dt: dt.strftime("%Y-%m-%d %H:%M:%S"), _legacy_settlement, BEIJING_TZ),
+    "结算 斜杠日期": (lambda dt: dt.strftime("%Y/%m/%d %H:%M:%S"), _legacy_settlement, BEIJING_TZ),
+}
+
+
+def _same(ours: datetime, old: datetime) -> bool:
+    if ours.tzinfo and old.tzinfo:
+        return ours == old
+    return ours.replace(tzinfo=None) == old.replace(tzinfo=None)
+
+
+def _values(fmt, count: int, distinct: int, seed: int = 5):
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    pool = [fmt(start + timedelta(seconds=rng.randint(0, 30 * 86400), microseconds=rng.randint(0, 999999)))
+            for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def _timed(func, values) -> float:
+    started = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark shared datetime parsing.")
+    parser.add_argument("--values", type=int, default=50000, help="每种格式解析次数（默认 50000）")
+    parser.add_argument("--distinct", type=int, default=5000, help="每种格式的不同取值数（默认 5000）")
+    args = parser.parse_args()
+
+    print(f"每种格式解析 {args.values} 次，不同取值 {args.distinct} 个")
+    print(f"{'格式':<22} {'旧实现':>10} {'共享-冷':>10} {'共享-热':>10} {'热缓存加速':>8}")
+    for label, (fmt, legacy, default_tz) in FORMATS.items():
+        values = _values(fmt, args.values, args.distinct)
+        for value in values[:200]:
+            assert _same(parse_datetime(value, default_tz=default_tz), legacy(value)), value
+
+        legacy_elapsed = _timed(legacy, values)
+        clear_parse_cache()
+        distinct_values = list(dict.fromkeys(values))
+        cold_elapsed = _timed(parse_datetime, distinct_values) * len(values) / len(distinct_values)
+        warm_elapsed = _timed(parse_datetime, values)
+        print(
+            f"{label:<22} {legacy_elapsed * 1000:>8.1f}ms {cold_elapsed * 1000:>8.1f}ms "
+            f"{warm_elapsed * 1000:>8.1f}ms {legacy_elapsed / warm_elapsed:>9.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""端到端基准：合成 Metabase 卡片 -> 处理管道 / 通知 / 待预约 / SLA / 电子表格同步 -> outbox 投递。
+
+每个规模的每一轮都在独立子进程中运行（峰值 RSS 互不影响），父进程为每一轮启动全新的
+Metabase / 企业微信 / Turso 替身（scripts/local_stand_ins.py），卡片由 scripts/synthetic_metabase_cards.py 按种子即时生成。
+
+阶段（共用同一个 SQLite 或 Turso 替身库）：
+  metabase_fetch       请求北京业绩播报卡片并解析为合同字典（METABASE_STREAMING 决定是否流式解析）
+  pipeline_process     DataProcessingPipeline.process 写入业绩记录
+  notification_enqueue NotificationService 回读、渲染并入队播报消息
+  pending_orders       PendingOrdersReminderService.run
+  sla_report           DailyServiceReportService.run（周一：日报 + 周报）
+  smartsheet_sync      项目结算电子表格 SmartsheetSyncService.run
+  outbox_drain         OutboxDrainService 在 --drain-budget-seconds 内向企业微信替身投递
+
+各业务服务只入队（NOTIFICATION_OUTBOX_BATCH_LIMIT=0），投递统一在 outbox_drain 阶段完成且不做节流，
+因此结果不含各服务逐条 sleep 的固定等待。Metabase 阶段耗时包含替身生成与序列化行的时间（相当于服务端出数耗时）。
+
+统计口径：每阶段按轮次取 p50/p99 耗时（最近秩），吞吐 = 条数 / p50 耗时；
+peak_rss_mb 为子进程在该阶段结束时的 RSS 高水位（各轮取最大值）。
+PIPELINE_INLINE_OUTBOX、METABASE_STREAMING 等开关沿用当前环境变量，并记录在结果的 meta.feature_flags 中。
+
+示例：
+  python scripts/benchmark_end_to_end.py --scales 1k,10k
+  METABASE_STREAMING=1 python scripts/benchmark_end_to_end.py --scales 100k --rounds 1
+  python scripts/benchmark_end_to_end.py --scales 10k --backend turso --turso-latency-ms 20
+
+  # 与基线对比：任一阶段吞吐下降或峰值 RSS 上升超过 20% 时返回非零退出码
+  python scripts/benchmark_end_to_end.py --scales 1k,10k --baseline scripts/benchmark_end_to_end_baseline.json
+
+  # 刷新基线（1m 规模单轮约需数十分钟）
+  python scripts/benchmark_end_to_end.py --scales 1k,10k --write-baseline scripts/benchmark_end_to_end_baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS = Path(__file__).resolve().parent
+for _path in (ROOT, SCRIPTS):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+from local_stand_ins import MetabaseStandIn, TursoStandIn, WeComStandIn  # noqa: E402
+from synthetic_metabase_cards import (  # noqa: E402
+    DEFAULT_NOW,
+    DEFAULT_SEED,
+    PENDING_ORDERS_CARD_ID,
+    PERFORMANCE_CARD_ID,
+    PROJECT_SETTLEMENT_CARD_ID,
+    SyntheticCards,
+)
+
+STAGES = (
+    "metabase_fetch",
+    "pipeline_process",
+    "notification_enqueue",
+    "pending_orders",
+    "sla_report",
+    "smartsheet_sync",
+    "outbox_drain",
+)
+FEATURE_FLAGS = (
+    "METABASE_STREAMING",
+    "PIPELINE_INLINE_OUTBOX",
+    "PENDING_ORDERS_SKIP_UNCHANGED",
+    "SLA_RAW_JSON_MODE",
+)
+DEFAULT_OUTPUT = "state/benchmark_end_to_end.json"
+
+
+def parse_scale(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def scale_label(contracts: int) -> str:
+    if contracts >= 1000000 and contracts % 1000000 == 0:
+        return f"{contracts // 1000000}m"
+    if contracts >= 1000 and contracts % 1000 == 0:
+        return f"{contracts // 1000}k"
+    return str(contracts)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """最近秩百分位。"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- 子进程：执行一轮 ---
+
+
+def _run_worker(result_path: str) -> None:
+    from modules.core import create_standard_pipeline
+    from modules.core.beijing_jobs import _fetch_metabase_card, _get_contract_data_from_metabase_performance_broadcast
+    from modules.core.notification_service import NotificationService
+    from modules.core.outbox_drain import OutboxDrainService, RateLimitedWebhookSender
+    from modules.core.pending_orders_jobs import PendingOrdersReminderService
+    from modules.core.project_settlement_jobs import PROJECT_SETTLEMENT_SYNC_CONFIG, SmartsheetSyncService
+    from modules.core.sla_jobs import DailyServiceReportService
+
+    now = DEFAULT_NOW
+    stages: Dict[str, Dict] = {}
+
+    def measure(name: str, func: Callable[[], int]) -> None:
+        started = time.perf_counter()
+        items = func()
+        stages[name] = {
+            "seconds": time.perf_counter() - started,
+            "items": items,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+
+    state: Dict = {}
+
+    def fetch() -> int:
+        response = _fetch_metabase_card(os.environ["API_URL_BJ_PERFORMANCE_BROADCAST"])
+        state["contracts"] = _get_contract_data_from_metabase_performance_broadcast(response, now)
+        return len(state["contracts"])
+
+    def process() -> int:
+        pipeline, config, store = create_standard_pipeline(
+            config_key="BJ-PERFORMANCE-BROADCAST",
+            activity_code=f"BJ-PERFORMANCE-BROADCAST-{now.strftime('%Y-%m')}",
+            city="BJ",
+            housekeeper_key_format="管家",
+            storage_type="sqlite",
+            enable_dual_track=False,
+            enable_project_limit=False,
+            enable_historical_contracts=False,
+        )
+        state.update(config=config, store=store)
+        return len(pipeline.process(state.pop("contracts")))
+
+    measure("metabase_fetch", fetch)
+    measure("pipeline_process", process)
+    store = state["store"]
+    measure(
+        "notification_enqueue",
+        lambda: NotificationService(store, state["config"]).send_notifications()["enqueued"],
+    )
+    measure("pending_orders", lambda: PendingOrdersReminderService(store, now=now).run()["raw_orders"])
+    measure("sla_report", lambda: DailyServiceReportService(store, now=now).run()["raw_records"])
+    measure(
+        "smartsheet_sync",
+        lambda: SmartsheetSyncService(store, PROJECT_SETTLEMENT_SYNC_CONFIG, now=now).run()["raw_records"],
+    )
+    drain = OutboxDrainService(
+        store,
+        budget_seconds=float(os.environ["BENCHMARK_DRAIN_BUDGET_SECONDS"]),
+        page_size=200,
+        sender=RateLimitedWebhookSender(min_interval_seconds=0),
+        activity_intervals={},
+    )
+    measure("outbox_drain", lambda: drain.run()["processed"])
+
+    Path(result_path).write_text(json.dumps({"stages": stages}), encoding="utf-8")
+
+
+# --- 父进程：替身 + 汇总 ---
+
+
+def _worker_env(args, workdir: str, cards: SyntheticCards, metabase, wecom, turso) -> Dict[str, str]:
+    webhook = f"{wecom.url}/cgi-bin/webhook/send?key="
+    env = dict(os.environ)
+    env.update({
+        "ENVIRONMENT": "production",
+        "CONTACT_PHONE_NUMBER": "13800000000",
+        "METABASE_USERNAME": "benchmark@example.com",
+        "METABASE_PASSWORD": "benchmark",
+        "METABASE_URL": metabase.url,
+        "API_URL_BJ_PERFORMANCE_BROADCAST": f"{metabase.url}/api/card/{PERFORMANCE_CARD_ID}/query",
+        "API_URL_PENDING_ORDERS_REMINDER": f"{metabase.url}/api/card/{PENDING_ORDERS_CARD_ID}/query",
+        "API_URL_PROJECT_SETTLEMENT_SMARTSHEET": f"{metabase.url}/api/card/{PROJECT_SETTLEMENT_CARD_ID}/query",
+        "PENDING_ORDERS_CREATED_BEFORE_PARAM": "",
+        "WECOM_WEBHOOK_DEFAULT": webhook + "default",
+        "WECOM_WEBHOOK_BJ_PERFORMANCE_BROADCAST": webhook + "bj-performance",
+        "WECOM_PROJECT_SETTLEMENT_SMARTSHEET_WEBHOOK": f"{wecom.url}/cgi-bin/wedoc/smartsheet/webhook?key=project-settlement",
+        "WECOM_WEBHOOK_PENDING_ORDERS_FORCE_URL": "",
+        # 每家服务商独立 webhook key，企业微信替身按 key 限流
+        "WECOM_WEBHOOK_PENDING_ORDERS_ORG_MAP": json.dumps(
+            {name: f"{webhook}org-{index:02d}" for index, name in enumerate(cards.providers)}, ensure_ascii=False
+        ),
+        "PENDING_ORDERS_DRY_RUN": "",
+        "DAILY_SERVICE_REPORT_DRY_RUN": "",
+        "PROJECT_SETTLEMENT_SMARTSHEET_DRY_RUN": "",
+        "NOTIFICATION_OUTBOX_BATCH_LIMIT": "0",
+        "BENCHMARK_DRAIN_BUDGET_SECONDS": str(args.drain_budget_seconds),
+        "LOCAL_DB_PATH": os.path.join(workdir, "performance_data.db"),
+    })
+    if turso is not None:
+        env.update({"DB_SOURCE": "cloud", "TURSO_DB_URL": turso.url, "TURSO_AUTH_TOKEN": "benchmark"})
+    else:
+        env["DB_SOURCE"] = "local"
+    return env
+
+
+def _run_round(args, contracts: int) -> Dict:
+    cards = SyntheticCards(contracts, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="benchmark-e2e-") as workdir:
+        metabase = MetabaseStandIn(cards=cards.card_sources(), latency_ms=args.metabase_latency_ms).start()
+        wecom = WeComStandIn(
+            rate_limit_per_minute=args.wecom_rate_limit or None,
+            error_rate=args.wecom_error_rate,
+            latency_ms=args.wecom_latency_ms,
+            seed=args.seed,
+        ).start()
+        turso = None
+        if args.backend == "turso":
+            turso = TursoStandIn(
+                db_path=os.path.join(workdir, "turso.db"), auth_token="benchmark", latency_ms=args.turso_latency_ms
+            ).start()
+        try:
+            result_path = os.path.join(workdir, "result.json")
+            log_path = os.path.join(workdir, "worker.log")
+            with open(log_path, "wb") as log:
+                # cwd 指向临时目录：logs/ 与 metabase_session.json 不落到仓库
+                completed = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--worker-result", result_path],
+                    cwd=workdir,
+                    env=_worker_env(args, workdir, cards, metabase, wecom, turso),
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+            if completed.returncode != 0:
+                tail = Path(log_path).read_text(encoding="utf-8", errors="replace")[-3000:]
+                raise RuntimeError(f"基准子进程失败（exit {completed.returncode}）:\n{tail}")
+            result = json.loads(Path(result_path).read_text(encoding="utf-8"))
+        finally:
+            for server in (metabase, wecom, turso):
+                if server is not None:
+                    server.stop()
+    result["wecom_errcodes"] = {str(code): count for code, count in sorted(wecom.errcodes.items())}
+    result["turso_pipelines"] = turso.pipelines if turso is not None else 0
+    return result
+
+
+def summarize(rounds: List[Dict]) -> Dict:
+    stages = {}
+    for name in STAGES:
+        samples = [item["stages"][name] for item in rounds if name in item["stages"]]
+        if not samples:
+            continue
+        seconds = [sample["seconds"] for sample in samples]
+        p50 = percentile(seconds, 50)
+        items = samples[0]["items"]
+        stages[name] = {
+            "items": items,
+            "p50_seconds": round(p50, 4),
+            "p99_seconds": round(percentile(seconds, 99), 4),
+            "throughput_per_second": round(items / p50, 1) if p50 > 0 else 0.0,
+            "peak_rss_mb": max(sample["peak_rss_mb"] for sample in samples),
+        }
+    return {
+        "rounds": len(rounds),
+        "peak_rss_mb": max((stage["peak_rss_mb"] for stage in stages.values()), default=0.0),
+        "stages": stages,
+        "wecom_errcodes": rounds[-1].get("wecom_errcodes", {}) if rounds else {},
+        "turso_pipelines": rounds[-1].get("turso_pipelines", 0) if rounds else 0,
+    }
+
+
+def compare_with_baseline(current: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """返回超出阈值的退化项：吞吐下降或峰值 RSS 上升超过 max_regression。"""
+    regressions = []
+    for label, scale in current.get("scales", {}).items():
+        base_scale = baseline.get("scales", {}).get(label)
+        if not base_scale:
+            continue
+        for name, stats in scale["stages"].items():
+            base = base_scale["stages"].get(name)
+            if not base or not base.get("throughput_per_second"):
+                continue
+            ratio = stats["throughput_per_second"] / base["throughput_per_second"]
+            stats["vs_baseline_throughput"] = round(ratio, 3)
+            if ratio < 1 - max_regression:
+                regressions.append(f"{label}/{name}: 吞吐 {stats['throughput_per_second']}/s，基线 {base['throughput_per_second']}/s")
+        if base_scale.get("peak_rss_mb") and scale["peak_rss_mb"] > base_scale["peak_rss_mb"] * (1 + max_regression):
+            regressions.append(f"{label}: 峰值 RSS {scale['peak_rss_mb']} MB，基线 {base_scale['peak_rss_mb']} MB")
+    return regressions
+
+
+def _print_report(result: Dict) -> None:
+    for label, scale in result["scales"].items():
+        print(f"\n规模 {label}（{scale['rounds']} 轮，峰值 RSS {scale['peak_rss_mb']} MB）")
+        print(f"{'阶段':<22}{'条数':>10}{'p50 s':>10}{'p99 s':>10}{'吞吐/s':>12}{'RSS MB':>10}{'对比基线':>10}")
+        for name, stats in scale["stages"].items():
+            ratio = stats.get("vs_baseline_throughput")
+            print(
+                f"{name:<22}{stats['items']:>10}{stats['p50_seconds']:>10.3f}{stats['p99_seconds']:>10.3f}"
+                f"{stats['throughput_per_second']:>12.1f}{stats['peak_rss_mb']:>10.1f}"
+                f"{(f'{ratio:.2f}x' if ratio else '-'):>10}"
+            )
+        if scale["wecom_errcodes"]:
+            print(f"企业微信替身 errcode 分布: {scale['wecom_errcodes']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmark against local stand-ins.")
+    parser.add_argument("--scales", default="1k,10k", help="合同规模列表，支持 k/m 后缀（默认 1k,10k；可选 100k,1m）")
+    parser.add_argument("--rounds", type=int, default=3, help="每个规模的轮数（默认 3）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"合成数据种子（默认 {DEFAULT_SEED}）")
+    parser.add_argument("--backend", choices=("sqlite", "turso"), default="sqlite", help="存储后端（turso 使用本地替身）")
+    parser.add_argument("--drain-budget-seconds", type=float, default=10, help="outbox_drain 阶段墙钟预算（默认 10 秒）")
+    parser.add_argument("--metabase-latency-ms", type=float, default=0, help="Metabase 替身查询延迟")
+    parser.add_argument("--wecom-latency-ms", type=float, default=0, help="企业微信替身延迟")
+    parser.add_argument("--wecom-rate-limit", type=int, default=0, help="企业微信替身每 key 每分钟条数上限，0 不限")
+    parser.add_argument("--wecom-error-rate", type=float, default=0.0, help="企业微信替身随机注入 45009 的比例")
+    parser.add_argument("--turso-latency-ms", type=float, default=0, help="Turso 替身往返延迟")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"结果 JSON 路径（默认 {DEFAULT_OUTPUT}）")
+    parser.add_argument("--baseline", help="与该基线 JSON 对比")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的退化比例（默认 0.2）")
+    parser.add_argument("--write-baseline", help="把本次结果另存为基线 JSON")
+    parser.add_argument("--worker-result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_result:
+        _run_worker(args.worker_result)
+        return 0
+
+    result = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "backend": args.backend,
+            "drain_budget_seconds": args.drain_budget_seconds,
+            "feature_flags": {name: os.getenv(name, "") for name in FEATURE_FLAGS},
+        },
+        "scales": {},
+    }
+    for contracts in (parse_scale(item) for item in args.scales.split(",") if item.strip()):
+        label = scale_label(contracts)
+        rounds = []
+        for index in range(args.rounds):
+            print(f"规模 {label} 第 {index + 1}/{args.rounds} 轮...", flush=True)
+            rounds.append(_run_round(args, contracts))
+        result["scales"][label] = summarize(rounds)
+
+    regressions: List[str] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(result, baseline, args.max_regression)
+
+    _print_report(result)
+    for path in filter(None, (args.output, args.write_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(result, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\n结果已写入 {path}")
+
+    if regressions:
+        print(f"\n相对基线退化超过 {args.max_regression:.0%}:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""群播报模板渲染基准：模拟 1 万条积压记录，对比预编译模板与逐条 str.format 的耗时。
+
+示例：
+    python scripts/benchmark_message_templates.py
+    python scripts/benchmark_message_templates.py --records 50000 --config-key SH-2025-10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# 仅渲染文本，不读取 .env 中的真实凭据
+for _key, _value in {
+    "CONTACT_PHONE_NUMBER": "13800000000",
+    "METABASE_USERNAME": "benchmark@example.com",
+    "METABASE_PASSWORD": "benchmark",
+    "WECOM_WEBHOOK_DEFAULT": "https://example.com/default",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from modules.core.data_models import City, ProcessingConfig  # noqa: E402
+from modules.core.message_templates import GROUP_BROADCAST, get_template  # noqa: E402
+from modules.core.notification_service import NotificationService  # noqa: E402
+
+
+def _synthetic_records(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    housekeepers = [f"管家{i:03d}" for i in range(200)]
+    for index in range(count):
+        amount = rng.randint(3000, 80000)
+        yield {
+            "合同ID(_id)": f"bench-{index}",
+            "管家(serviceHousekeeper)": rng.choice(housekeepers),
+            "合同编号(contractdocNum)": f"YHWX-BJ-JSJZ-{index:010d}",
+            "计入业绩金额": amount,
+            "管家累计业绩金额": amount * rng.randint(1, 12),
+            "管家累计金额": amount * rng.randint(1, 12),
+            "管家累计单数": rng.randint(1, 30),
+            "活动期内第几个合同": index + 1,
+            "转化率(conversion)": round(rng.random(), 4),
+            "工单类型": rng.choice(["平台单", "自引单"]),
+            "备注": rng.choice(["无", "距离 节节高 还需 1 单"]),
+            "平台单累计数量": rng.randint(0, 20),
+            "平台单累计金额": rng.randint(0, 500000),
+            "自引单累计数量": rng.randint(0, 5),
+            "自引单累计金额": rng.randint(0, 100000),
+            "是否发送通知": "N",
+        }
+
+
+def _timed(label: str, func, count: int) -> float:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:>9.1f} ms  {count / elapsed:>12,.0f} 条/秒")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark group broadcast template rendering.")
+    parser.add_argument("--records", type=int, default=10000, help="模拟积压记录数（默认 10000）")
+    parser.add_argument("--config-key", default="BJ-2025-10", help="活动配置键（默认 BJ-2025-10）")
+    parser.add_argument("--city", default=None, help="城市，默认取 config key 前缀")
+    args = parser.parse_args()
+
+    city = args.city or args.config_key.split("-")[0]
+    config = ProcessingConfig(
+        config_key=args.config_key,
+        activity_code=f"BENCH-{args.config_key}",
+        city=City(city),
+        housekeeper_key_format="管家",
+    )
+    service = NotificationService(storage=None, config=config)
+    records = list(_synthetic_records(args.records))
+    contexts = [service._build_template_context(record) for record in records]
+
+    template = get_template(config.config_key, city, GROUP_BROADCAST)
+    template.render(records[0], contexts[0])  # 预热懒加载依赖，避免计入第一组耗时
+    print(f"模板 {template.name} ({template.version})，记录数 {len(records)}")
+
+    # 对照组：同一模板文本逐条 str.format（每次重新解析格式串）
+    source = template.source
+
+    def naive():
+        for record, context in zip(records, contexts):
+            source.text.format(**{name: field(record, context) for name, field in source.fields.items()})
+
+    _timed("逐条 str.format", naive, len(records))
+    _timed("预编译 render_many", lambda: template.render_many(zip(records, contexts)), len(records))
+    _timed(
+        "发送路径整批渲染 + outbox 消息",
+        lambda: [
+            service._build_text_outbox_message(record, msg, GROUP_BROADCAST)
+            for record, msg in service._render_group_messages(records)
+        ],
+        len(records),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""通知回读路径基准：对比 SELECT * + Python 解码、json_extract 投影、提升列投影三种读取方式。
+
+示例：
+    python scripts/benchmark_notification_read_path.py
+    python scripts/benchmark_notification_read_path.py --records 20000 --rounds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+for _key, _value in {
+    "CONTACT_PHONE_NUMBER": "13800000000",
+    "METABASE_USERNAME": "benchmark@example.com",
+    "METABASE_PASSWORD": "benchmark",
+    "WECOM_WEBHOOK_DEFAULT": "https://example.com/default",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+from modules.core.data_models import City, ProcessingConfig  # noqa: E402
+from modules.core.notification_service import NotificationService  # noqa: E402
+from modules.core.storage import (  # noqa: E402
+    PROMOTED_EXTENSION_COLUMNS,
+    SQLitePerformanceDataStore,
+    _promoted_value,
+)
+
+ACTIVITY_CODE = "BENCH-READ"
+
+
+def _extensions(rng: random.Random, index: int) -> dict:
+    """约 40 个字段的 extensions，与线上记录规模相当。"""
+    data = {
+        "活动编号": ACTIVITY_CODE,
+        "合同编号(contractdocNum)": f"YHWX-BJ-JSJZ-{index:010d}",
+        "计入业绩金额": rng.randint(3000, 80000),
+        "管家累计单数": rng.randint(1, 30),
+        "管家累计金额": rng.randint(3000, 900000),
+        "管家累计业绩金额": rng.randint(3000, 900000),
+        "备注": rng.choice(["无", "距离 节节高 还需 1 单"]),
+        "平台单累计数量": rng.randint(0, 20),
+        "自引单累计数量": rng.randint(0, 5),
+        "平台单累计金额": rng.randint(0, 500000),
+        "自引单累计金额": rng.randint(0, 100000),
+        "转化率(conversion)": round(rng.random(), 6),
+        "支付金额(paidAmount)": rng.randint(0, 80000),
+        "项目地址(projectAddress)": f"北京市朝阳区某某路{index}号院{rng.randint(1, 30)}号楼",
+    }
+    for extra in range(26):
+        data[f"原始字段{extra:02d}"] = f"value-{rng.randint(0, 10**9)}"
+    return data
+
+
+def _populate(store: SQLitePerformanceDataStore, count: int) -> None:
+    rng = random.Random(11)
+    promoted_columns = list(PROMOTED_EXTENSION_COLUMNS.values())
+    with store._connect() as conn:
+        for index in range(count):
+            extensions = _extensions(rng, index)
+            conn.execute(
+                f"""
+                INSERT INTO performance_data (
+                    activity_code, contract_id, housekeeper, contract_amount, performance_amount,
+                    contract_sequence, reward_types, reward_names, notification_sent, extensions,
+                    {', '.join(promoted_columns)}, ext_promoted
+                ) VALUES (?, ?, ?, ?, ?, ?, '[]', '[]', 0, ?, {', '.join('?' for _ in promoted_columns)}, 1)
+                """,
+                (
+                    ACTIVITY_CODE,
+                    f"bench-{index}",
+                    f"管家{index % 200:03d}",
+                    extensions["计入业绩金额"],
+                    extensions["计入业绩金额"],
+                    index + 1,
+                    json.dumps(extensions, ensure_ascii=False),
+                    *(_promoted_value(extensions.get(key)) for key in PROMOTED_EXTENSION_COLUMNS),
+                ),
+            )
+
+
+def _best_of(rounds: int, func) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the notification read path.")
+    parser.add_argument("--records", type=int, default=5000, help="待通知记录数（默认 5000）")
+    parser.add_argument("--rounds", type=int, default=3, help="每种方式取最优的轮数（默认 3）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SQLitePerformanceDataStore(os.path.join(temp_dir, "bench.db"))
+        _populate(store, args.records)
+        service = NotificationService(
+            storage=store,
+            config=ProcessingConfig(
+                config_key="BJ-2025-11",
+                activity_code=ACTIVITY_CODE,
+                city=City.BEIJING,
+                housekeeper_key_format="管家",
+            ),
+        )
+        conditions = {"activity_code": ACTIVITY_CODE, "notification_sent": False, "is_historical": False}
+
+        def legacy():
+            return [service._convert_record_to_dict(row) for row in store.query_performance_records(conditions)]
+
+        promoted = _best_of(args.rounds, service._get_notification_records)
+        expected = service._get_notification_records()
+        with store._connect() as conn:
+            conn.execute("UPDATE performance_data SET ext_promoted = 0")
+        json_extract = _best_of(args.rounds, service._get_notification_records)
+        assert service._get_notification_records() == expected
+        full_decode = _best_of(args.rounds, legacy)
+        assert legacy() == expected
+
+    print(f"记录数 {args.records}，每种方式取 {args.rounds} 轮最优")
+    for label, elapsed in (
+        ("SELECT * + json.loads", full_decode),
+        ("投影 + json_extract", json_extract),
+        ("投影 + 提升列", promoted),
+    ):
+        print(f"{label:<24} {elapsed * 1000:>9.1f} ms  {full_decode / elapsed:>6.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
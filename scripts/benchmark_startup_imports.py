@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""启动导入耗时基准：用 `python -X importtime` 统计单个定时任务从入口到执行路径所需的模块导入耗时。
+
+探针在子进程中导入 run_scheduled_task.py 的入口依赖、解析任务函数，并导入该任务运行时按需加载的模块
+（Metabase 请求、通知、消息模板等），不发起任何网络请求。超过阈值或加载了禁止的重量级模块时返回非 0，
+可作为 CI 回归检查。
+
+示例：
+    python scripts/benchmark_startup_imports.py
+    python scripts/benchmark_startup_imports.py --task beijing-sign-broadcast --runs 7 --max-ms 300
+    python scripts/benchmark_startup_imports.py --top 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# 任务运行时在函数内按需导入的模块（不在导入任务函数时加载）
+RUNTIME_IMPORTS = {
+    "beijing-sign-broadcast": (
+        "modules.config",
+        "modules.request_module",
+        "modules.core.notification_service",
+        "modules.core.message_templates",
+        "modules.data_utils",
+    ),
+    "beijing-performance-broadcast": (
+        "modules.config",
+        "modules.request_module",
+        "modules.core.notification_service",
+        "modules.core.message_templates",
+        "modules.data_utils",
+    ),
+}
+DEFAULT_FORBIDDEN = ("pandas", "pytz", "schedule", "main")
+
+PROBE = """
+import sys
+from modules import request_module
+from modules.core import scheduled_tasks, storage
+from modules.log_config import setup_logging
+scheduled_tasks.resolve_task({task!r})
+for name in {runtime!r}:
+    __import__(name)
+print("LOADED=" + ",".join(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+def _run_probe(task: str, workdir: str):
+    env = dict(os.environ)
+    env.setdefault("METABASE_USERNAME", "benchmark@example.com")
+    env.setdefault("METABASE_PASSWORD", "benchmark")
+    env.setdefault("CONTACT_PHONE_NUMBER", "13800000000")
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    code = PROBE.format(task=task, runtime=RUNTIME_IMPORTS.get(task, ()))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"探针执行失败：\n{proc.stderr[-2000:]}")
+
+    total_us = 0
+    cumulative = {}
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("LOADED="):
+            loaded = set(line[len("LOADED="):].split(","))
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        module = name.rstrip()
+        cumulative[module.strip()] = int(cumulative_us)
+        # 顶层导入的缩进只有分隔符后的一个空格
+        if len(module) - len(module.lstrip()) == 1:
+            total_us += int(cumulative_us)
+    return total_us, cumulative, loaded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark scheduled task startup imports.")
+    parser.add_argument("--task", default="beijing-sign-broadcast", help="任务名（默认 beijing-sign-broadcast）")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数，取中位数（默认 5）")
+    parser.add_argument("--max-ms", type=float, default=350.0, help="导入耗时中位数上限，超过视为回归（默认 350）")
+    parser.add_argument(
+        "--forbid",
+        default=",".join(DEFAULT_FORBIDDEN),
+        help=f"不允许加载的顶层模块，逗号分隔（默认 {','.join(DEFAULT_FORBIDDEN)}）",
+    )
+    parser.add_argument("--top", type=int, default=10, help="列出累计耗时最高的模块数（默认 10）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _run_probe(args.task, workdir)  # 预热 .pyc
+        samples = [_run_probe(args.task, workdir) for _ in range(args.runs)]
+
+    totals_ms = [total / 1000 for total, _, _ in samples]
+    median_ms = statistics.median(totals_ms)
+    _, cumulative, loaded = samples[-1]
+    forbidden = sorted(name for name in args.forbid.split(",") if name and name in loaded)
+
+    print(f"任务 {args.task}：导入耗时中位数 {median_ms:.1f}ms（{args.runs} 次：{', '.join(f'{t:.0f}' for t in totals_ms)}）")
+    print(f"已加载模块数 {len(loaded)}")
+    print(f"累计耗时最高的 {args.top} 个模块：")
+    for name, us in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {us / 1000:>8.1f}ms  {name}")
+
+    failed = False
+    if median_ms > args.max_ms:
+        print(f"回归：导入耗时 {median_ms:.1f}ms 超过阈值 {args.max_ms:.1f}ms")
+        failed = True
+    if forbidden:
+        print(f"回归：加载了禁止的模块 {', '.join(forbidden)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
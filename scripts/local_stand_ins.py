@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""本地 Metabase / 企业微信 / Turso 替身服务，用于无外网的单机压测与联调。
+
+- Metabase：/api/session 返回固定 session；/api/card/{id}/query 返回 fixture 目录中录制的 {id}.json，
+  --metabase-rows 把行数循环放大到指定规模，--metabase-latency-ms 模拟查询耗时；响应以 chunked 分块写出，
+  与真实 Metabase 一样 rows 位于 cols 之前
+- 企业微信：/cgi-bin/webhook/send 与 /cgi-bin/wedoc/smartsheet/webhook 按 key 统计每分钟条数，
+  超过 --wecom-rate-limit 时返回 errcode 45009（HTTP 仍为 200），--wecom-error-rate 按比例随机注入 45009
+- Turso：/v2/pipeline 按 Hrana 协议执行 execute/batch（含 step 条件），后端为本地 SQLite 文件
+
+录制 fixture：
+  curl -s -X POST -H "X-Metabase-Session: $SESSION" -H "Content-Type: application/json" \\
+    http://112.126.77.6:3000/api/card/2015/query > state/metabase_fixtures/2015.json
+
+示例：
+  # 启动全部替身，卡片放大到 10 万行，企业微信每个 key 每分钟 20 条
+  python scripts/local_stand_ins.py --fixtures-dir state/metabase_fixtures --metabase-rows 100000
+
+  # 模拟 Turso 往返延迟与 5% 的企业微信限流
+  python scripts/local_stand_ins.py --turso-latency-ms 40 --wecom-error-rate 0.05
+
+启动后按打印的环境变量运行任务即可（.env 中显式配置的 API_URL_* / WECOM_* 需一并覆盖）。
+其他脚本可直接导入 MetabaseStandIn / WeComStandIn / TursoStandIn，以端口 0 启动后读取 .url。
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import itertools
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+CardSource = Union[Dict, Callable[[List[Dict]], Dict]]
+
+_CARD_QUERY_PATH = re.compile(r"^/api/card/(\d+)/query/?$")
+_ROWS_PER_CHUNK = 1000
+
+
+class StandInServer(ThreadingHTTPServer):
+    """替身服务基类：后台线程运行，端口传 0 时由系统分配。"""
+
+    daemon_threads = True
+
+    def __init__(self, handler_class, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, seed: Optional[int] = None):
+        super().__init__((host, port), handler_class)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.1,), name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    def delay(self) -> None:
+        delay_ms = self.latency_ms + (self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    # keep-alive：与任务侧的 requests.Session 复用保持一致
+    protocol_version = "HTTP/1.1"
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        raw = self.rfile.read(length) if length > 0 else b""
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    def _reply(self, status: int, body) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        return
+
+
+# --- Metabase ---
+
+
+class MetabaseHandler(_JsonHandler):
+    server: "MetabaseStandIn"
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._read_json() or {}
+        if path.rstrip("/") == "/api/session":
+            self._reply(200, {"id": self.server.session_id})
+            return
+        match = _CARD_QUERY_PATH.match(path)
+        if not match:
+            self._reply(404, {"message": "Not found."})
+            return
+        if not self.headers.get("X-Metabase-Session"):
+            self._reply(401, {"message": "Unauthenticated"})
+            return
+
+        card_id = match.group(1)
+        parameters = (body.get("parameters") or []) if isinstance(body, dict) else []
+        self.server.record_query(card_id, parameters)
+        response = self.server.card_response(card_id, parameters)
+        if response is None:
+            self._reply(404, {"message": "Not found."})
+            return
+        self.server.delay()
+        try:
+            self._write_card(response)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前关闭流式响应（如指纹短路），无需处理
+            self.close_connection = True
+
+    def _write_card(self, response: Dict) -> None:
+        data = response.get("data")
+        if not isinstance(data, dict):
+            self._reply(202, response)
+            return
+
+        self.send_response(202)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        rows = data.get("rows") or []
+        if self.server.rows is not None and rows:
+            rows = itertools.islice(itertools.cycle(rows), self.server.rows)
+        self._chunk('{"data":{"rows":[')
+        count = 0
+        batch: List[str] = []
+        for row in rows:
+            batch.append(json.dumps(row, ensure_ascii=False))
+            if len(batch) >= _ROWS_PER_CHUNK:
+                self._chunk(("," if count else "") + ",".join(batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            self._chunk(("," if count else "") + ",".join(batch))
+            count += len(batch)
+
+        extras = {key: value for key, value in data.items() if key != "rows"}
+        self._chunk("]," + json.dumps(extras, ensure_ascii=False)[1:] if extras else "]}")
+        top = {key: value for key, value in response.items() if key not in ("data", "row_count")}
+        tail = json.dumps(top, ensure_ascii=False)[1:-1] if top else ""
+        self._chunk(f',"row_count":{count}' + ("," + tail if tail else "") + "}")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+class MetabaseStandIn(StandInServer):
+    """Metabase 替身：cards 可直接注册响应字典或 callable(parameters) -> 响应字典，其余从 fixtures_dir 读取。"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        fixtures_dir: Optional[Union[str, Path]] = None,
+        cards: Optional[Dict[str, CardSource]] = None,
+        rows: Optional[int] = None,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(MetabaseHandler, host, port, latency_ms, jitter_ms, seed)
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.cards: Dict[str, CardSource] = {str(key): value for key, value in (cards or {}).items()}
+        self.rows = rows
+        self.session_id = str(uuid.uuid4())
+        self.queries: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record_query(self, card_id: str, parameters: List[Dict]) -> None:
+        with self._lock:
+            self.queries.append({"card_id": card_id, "parameters": parameters})
+
+    def card_response(self, card_id: str, parameters: List[Dict]) -> Optional[Dict]:
+        with self._lock:
+            source = self.cards.get(card_id)
+            if source is None and self.fixtures_dir is not None:
+                fixture = self.fixtures_dir / f"{card_id}.json"
+                if fixture.exists():
+                    source = self.cards[card_id] = json.loads(fixture.read_text(encoding="utf-8"))
+        if callable(source):
+            return source(parameters)
+        return source
+
+
+# --- 企业微信 ---
+
+WECOM_RATE_LIMITED = 45009
+
+
+class WeComHandler(_JsonHandler):
+    server: "WeComStandIn"
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        body = self._read_json()
+        if not parsed.path.endswith(("/webhook/send", "/smartsheet/webhook")):
+            self._reply(404, {"errcode": 404, "errmsg": "not found"})
+            return
+        key = (parse_qs(parsed.query).get("key") or [""])[0]
+        self.server.delay()
+        errcode = self.server.admit(key, parsed.path, body)
+        if errcode:
+            self._reply(200, {"errcode": errcode, "errmsg": "api freq out of limit"})
+        elif parsed.path.endswith("/smartsheet/webhook"):
+            self._reply(200, {"errcode": 0, "errmsg": "ok", "add_records": [{"record_id": uuid.uuid4().hex[:10]}]})
+        else:
+            self._reply(200, {"errcode": 0, "errmsg": "ok"})
+
+
+class WeComStandIn(StandInServer):
+    """企业微信 webhook 替身：按 key 做 60 秒滑动窗口限流，并可按比例随机注入 45009。"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit_per_minute: Optional[int] = None,
+        error_rate: float = 0.0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: Optional[int] = None,
+        keep_last: int = 1000,
+    ):
+        super().__init__(WeComHandler, host, port, latency_ms, jitter_ms, seed)
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.error_rate = error_rate
+        self.errcodes: Counter = Counter()
+        self.received: deque = deque(maxlen=keep_last)
+        self._windows: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def admit(self, key: str, path: str, body) -> int:
+        with self._lock:
+            errcode = 0
+            if self.error_rate and self.rng.random() < self.error_rate:
+                errcode = WECOM_RATE_LIMITED
+            elif self.rate_limit_per_minute:
+                now = time.monotonic()
+                window = self._windows.setdefault(key, deque())
+                while window and now - window[0] >= 60:
+                    window.popleft()
+                if len(window) >= self.rate_limit_per_minute:
+                    errcode = WECOM_RATE_LIMITED
+                else:
+                    window.append(now)
+            self.errcodes[errcode] += 1
+            self.received.append({"key": key, "path": path, "body": body, "errcode": errcode})
+            return errcode
+
+
+# --- Turso ---
+
+
+def _decode_value(value: Optional[Dict]):
+    kind = (value or {}).get("type", "null")
+    if kind == "null":
+        return None
+    if kind == "integer":
+        return int(value["value"])
+    if kind == "float":
+        return float(value["value"])
+    if kind == "blob":
+        return base64.b64decode(value.get("base64", ""))
+    return str(value.get("value", ""))
+
+
+def _encode_value(value) -> Dict:
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, int):
+        return {"type": "integer", "value": str(value)}
+    if isinstance(value, float):
+        return {"type": "float", "value": value}
+    if isinstance(value, bytes):
+        return {"type": "blob", "base64": base64.b64encode(value).decode("ascii")}
+    return {"type": "text", "value": str(value)}
+
+
+class TursoHandler(_JsonHandler):
+    server: "TursoStandIn"
+
+    def do_POST(self):
+        payload = self._read_json()
+        if urlparse(self.path).path.rstrip("/") != "/v2/pipeline":
+            self._reply(404, {"message": "not found"})
+            return
+        token = self.server.auth_token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self._reply(401, {"message": "Unauthorized"})
+            return
+        if not isinstance(payload, dict):
+            self._reply(400, {"message": "invalid pipeline request"})
+            return
+        self.server.delay()
+        self._reply(200, self.server.run_pipeline(payload))
+
+
+class TursoStandIn(StandInServer):
+    """Turso /v2/pipeline 替身：同一 SQLite 连接串行执行各 pipeline，结束时回滚未提交的事务（对应流关闭）。"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        db_path: Union[str, Path] = ":memory:",
+        auth_token: Optional[str] = None,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(TursoHandler, host, port, latency_ms, jitter_ms, seed)
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self.auth_token = auth_token
+        self.pipelines = 0
+        self._lock = threading.Lock()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.db.close()
+
+    def run_pipeline(self, payload: Dict) -> Dict:
+        results = []
+        with self._lock:
+            self.pipelines += 1
+            for request in payload.get("requests") or []:
+                kind = request.get("type")
+                try:
+                    if kind == "execute":
+                        response = {"type": "execute", "result": self._execute(request["stmt"])}
+                    elif kind == "batch":
+                        response = {"type": "batch", "result": self._batch(request["batch"])}
+                    elif kind == "close":
+                        response = {"type": "close"}
+                    else:
+                        raise ValueError(f"unsupported request type: {kind}")
+                    results.append({"type": "ok", "response": response})
+                except (sqlite3.Error, ValueError, KeyError) as exc:
+                    results.append({"type": "error", "error": {"message": str(exc), "code": "SQLITE_ERROR"}})
+            if self.db.in_transaction:
+                self.db.rollback()
+        return {"baton": None, "base_url": None, "results": results}
+
+    def _execute(self, stmt: Dict) -> Dict:
+        if stmt.get("named_args"):
+            params = {arg["name"].lstrip(":@$"): _decode_value(arg["value"]) for arg in stmt["named_args"]}
+        else:
+            params = [_decode_value(arg) for arg in stmt.get("args") or []]
+        cursor = self.db.execute(stmt["sql"], params)
+        rows = cursor.fetchall()
+        return {
+            "cols": [{"name": column[0], "decltype": None} for column in cursor.description or []],
+            "rows": [[_encode_value(value) for value in row] for row in rows],
+            "affected_row_count": max(cursor.rowcount, 0),
+            "last_insert_rowid": str(cursor.lastrowid) if cursor.lastrowid else None,
+        }
+
+    def _batch(self, batch: Dict) -> Dict:
+        step_results: List[Optional[Dict]] = []
+        step_errors: List[Optional[Dict]] = []
+        outcomes: List[Optional[bool]] = []
+        for step in batch.get("steps") or []:
+            if not self._condition_met(step.get("condition"), outcomes):
+                step_results.append(None)
+                step_errors.append(None)
+                outcomes.append(None)
+                continue
+            try:
+                step_results.append(self._execute(step["stmt"]))
+                step_errors.append(None)
+                outcomes.append(True)
+            except sqlite3.Error as exc:
+                step_results.append(None)
+                step_errors.append({"message": str(exc), "code": "SQLITE_ERROR"})
+                outcomes.append(False)
+        return {"step_results": step_results, "step_errors": step_errors}
+
+    def _condition_met(self, condition: Optional[Dict], outcomes: List[Optional[bool]]) -> bool:
+        if not condition:
+            return True
+        kind = condition.get("type")
+        if kind == "ok":
+            return outcomes[condition["step"]] is True
+        if kind == "error":
+            return outcomes[condition["step"]] is False
+        if kind == "not":
+            return not self._condition_met(condition["cond"], outcomes)
+        if kind == "and":
+            return all(self._condition_met(item, outcomes) for item in condition["conds"])
+        if kind == "or":
+            return any(self._condition_met(item, outcomes) for item in condition["conds"])
+        if kind == "is_autocommit":
+            return not self.db.in_transaction
+        raise ValueError(f"unsupported batch condition: {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local Metabase / WeCom / Turso stand-ins for offline benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind host, default 127.0.0.1")
+    parser.add_argument("--metabase-port", type=int, default=8791, help="Metabase port, default 8791")
+    parser.add_argument("--wecom-port", type=int, default=8792, help="WeCom webhook port, default 8792")
+    parser.add_argument("--turso-port", type=int, default=8793, help="Turso pipeline port, default 8793")
+    parser.add_argument("--fixtures-dir", default="state/metabase_fixtures", help="Directory of recorded card responses ({card_id}.json)")
+    parser.add_argument("--metabase-rows", type=int, default=None, help="Cycle fixture rows up to this many rows per card")
+    parser.add_argument("--metabase-latency-ms", type=float, default=0, help="Card query latency in milliseconds")
+    parser.add_argument("--wecom-rate-limit", type=int, default=20, help="Messages per key per minute before errcode 45009, 0 disables")
+    parser.add_argument("--wecom-error-rate", type=float, default=0.0, help="Probability of injecting errcode 45009")
+    parser.add_argument("--wecom-latency-ms", type=float, default=0, help="Webhook latency in milliseconds")
+    parser.add_argument("--turso-db", default="state/local_turso.db", help="SQLite file behind the Turso stand-in")
+    parser.add_argument("--turso-latency-ms", type=float, default=0, help="Pipeline round-trip latency in milliseconds")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform latency jitter applied to all stand-ins")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter and injected errors")
+    args = parser.parse_args()
+
+    servers = [
+        MetabaseStandIn(
+            args.host, args.metabase_port, fixtures_dir=args.fixtures_dir, rows=args.metabase_rows,
+            latency_ms=args.metabase_latency_ms, jitter_ms=args.jitter_ms, seed=args.seed,
+        ),
+        WeComStandIn(
+            args.host, args.wecom_port, rate_limit_per_minute=args.wecom_rate_limit or None,
+            error_rate=args.wecom_error_rate, latency_ms=args.wecom_latency_ms, jitter_ms=args.jitter_ms, seed=args.seed,
+        ),
+        TursoStandIn(
+            args.host, args.turso_port, db_path=args.turso_db, latency_ms=args.turso_latency_ms,
+            jitter_ms=args.jitter_ms, seed=args.seed,
+        ),
+    ]
+    for server in servers:
+        server.start()
+    metabase, wecom, turso = servers
+
+    print(f"Metabase stand-in: {metabase.url} (fixtures: {args.fixtures_dir})", flush=True)
+    print(f"WeCom stand-in:    {wecom.url}", flush=True)
+    print(f"Turso stand-in:    {turso.url} (sqlite: {args.turso_db})", flush=True)
+    print("Environment:", flush=True)
+    print(f"  METABASE_URL={metabase.url}", flush=True)
+    print(f"  WECOM_WEBHOOK_DEFAULT={wecom.url}/cgi-bin/webhook/send?key=default", flush=True)
+    print(f"  WECOM_PROJECT_SETTLEMENT_SMARTSHEET_WEBHOOK={wecom.url}/cgi-bin/wedoc/smartsheet/webhook?key=project-settlement", flush=True)
+    print(f"  DB_SOURCE=cloud TURSO_DB_URL={turso.url} TURSO_AUTH_TOKEN=local", flush=True)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+        print(f"WeCom errcodes: {dict(wecom.errcodes)}; Turso pipelines: {turso.pipelines}", flush=True)
+        print("Stand-ins stopped.", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,78 @@
 #!/usr/bin/env python3
-"""Run one scheduled task once (for GitHub Actions/cron)."""
+"""Run one or more scheduled tasks once (for GitHub Actions/cron).
+
+Multiple tasks (or a task group such as ``smartsheet-sync``) run concurrently in
+one process, sharing one store per backend and one Metabase HTTP session.
+"""
 
 import argparse
 import logging
+import sys
 
+from modules import request_module
+from modules.core import scheduled_tasks, storage
 from modules.log_config import setup_logging
-from main import run_contract_completion_smartsheet_task
-from main import run_beijing_performance_broadcast_task
-from main import run_beijing_sign_broadcast_task
-from main import run_crew_settlement_finance_ledger_smartsheet_task
-from main import run_daily_service_report_task
-from main import run_material_replenishment_smartsheet_task
-from main import run_housekeeper_offline_broadcast_task
-from main import run_pending_orders_reminder_task
-from main import run_payment_records_smartsheet_task
-from main import run_project_settlement_smartsheet_task
 
 
 def main():
-    parser = argparse.ArgumentParser(description="Run one scheduled task once and exit.")
+    parser = argparse.ArgumentParser(description="Run scheduled tasks once and exit.")
     parser.add_argument(
         "--task",
-        choices=[
-            "beijing-sign-broadcast",
-            "beijing-performance-broadcast",
-            "housekeeper-offline-broadcast",
-            "pending-orders-reminder",
-            "project-settlement-smartsheet",
-            "contract-completion-smartsheet",
-            "payment-records-smartsheet",
-            "crew-settlement-finance-ledger-smartsheet",
-            "material-replenishment-smartsheet",
-            "daily-service-report",
-        ],
+        nargs="+",
         required=True,
-        help="Task selector.",
+        metavar="TASK",
+        help=(
+            "Task names or groups, space- or comma-separated. "
+            f"Tasks: {', '.join(scheduled_tasks.TASKS)}. "
+            f"Groups: {', '.join(scheduled_tasks.TASK_GROUPS)}."
+        ),
+    )
+    parser.add_argument(
+        "--budget-seconds",
+        type=float,
+        default=None,
+        help="Wall-clock budget for outbox-drain (default: OUTBOX_DRAIN_BUDGET_SECONDS or 300).",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Concurrent task limit (default: SCHEDULED_TASK_MAX_WORKERS or 4).",
     )
     args = parser.parse_args()
+    try:
+        names = scheduled_tasks.expand_task_selection(args.task)
+    except ValueError as exc:
+        parser.error(str(exc))
 
     setup_logging()
-    logging.info("Running scheduled task: %s", args.task)
+    storage.enable_store_reuse()
+    request_module.enable_session_reuse()
+    logging.info("Running scheduled task(s): %s", ", ".join(names))
 
-    if args.task == "beijing-sign-broadcast":
-        run_beijing_sign_broadcast_task()
-    elif args.task == "beijing-performance-broadcast":
-        run_beijing_performance_broadcast_task()
-    elif args.task == "housekeeper-offline-broadcast":
-        run_housekeeper_offline_broadcast_task()
-    elif args.task == "daily-service-report":
-        run_daily_service_report_task()
-    elif args.task == "contract-completion-smartsheet":
-        run_contract_completion_smartsheet_task()
-    elif args.task == "payment-records-smartsheet":
-        run_payment_records_smartsheet_task()
-    elif args.task == "crew-settlement-finance-ledger-smartsheet":
-        run_crew_settlement_finance_ledger_smartsheet_task()
-    elif args.task == "material-replenishment-smartsheet":
-        run_material_replenishment_smartsheet_task()
-    elif args.task == "project-settlement-smartsheet":
-        run_project_settlement_smartsheet_task()
-    else:
-        run_pending_orders_reminder_task()
+    results = scheduled_tasks.run_tasks(
+        names,
+        max_workers=args.max_workers,
+        task_kwargs={"outbox-drain": {"budget_seconds": args.budget_seconds}},
+    )
 
-    logging.info("Scheduled task completed: %s", args.task)
+    failed = [name for name, outcome in results.items() if outcome["status"] == "failed"]
+    for name, outcome in results.items():
+        logging.info(
+            "Scheduled task %s: %s (%.1fs)%s",
+            name,
+            outcome["status"],
+            outcome["elapsed_seconds"],
+            f" - {outcome['error']}" if "error" in outcome else "",
+        )
+    logging.info(
+        "Scheduled tasks completed: %d succeeded, %d skipped, %d failed",
+        sum(1 for outcome in results.values() if outcome["status"] == "success"),
+        sum(1 for outcome in results.values() if outcome["status"] == "skipped"),
+        len(failed),
+    )
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""常驻调度进程：按 worker.js 的北京时间路由在进程内执行定时任务。
+
+与 run_scheduled_task.py 每次冷启动不同，本进程只导入一次模块，复用存储实例（schema 只初始化一次）、
+Turso/Metabase 的 keep-alive HTTP 连接与 Metabase session。外部 cron 仍可通过本地端点触发：
+    GET /trigger?target=<worker 目标名 | 任务名>   入队执行，立即返回
+    GET /status                                    路由、队列与最近一次执行结果
+
+示例：
+    PYTHONPATH=. python scripts/run_scheduler_daemon.py
+    PYTHONPATH=. python scripts/run_scheduler_daemon.py --port 8788 --no-scheduler
+    curl 'http://127.0.0.1:8788/trigger?target=smartsheet-sync'
+"""
+
+import argparse
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from modules import request_module  # noqa: E402
+from modules.core import scheduled_tasks, storage  # noqa: E402
+from modules.core.task_lease import TaskLeaseBusy  # noqa: E402
+from modules.log_config import setup_logging  # noqa: E402
+from modules.time_parsing import BEIJING_TZ  # noqa: E402
+
+
+class TaskRunner:
+    """单工作线程串行执行任务，保证同一任务不会并发运行；已在队列中的任务不重复入队。"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.running = None
+        self.last_results = {}
+        self._thread = threading.Thread(target=self._work, name="task-runner", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, names, source: str):
+        accepted = []
+        with self._lock:
+            for name in names:
+                if name in self._pending:
+                    continue
+                self._pending.add(name)
+                self._queue.put(name)
+                accepted.append(name)
+        logging.info("任务入队（%s）：%s", source, ", ".join(accepted) or "无（均已在队列中）")
+        return accepted
+
+    def pending(self):
+        with self._lock:
+            return sorted(self._pending)
+
+    def _work(self):
+        while True:
+            name = self._queue.get()
+            self.running = name
+            started = time.monotonic()
+            try:
+                scheduled_tasks.run_task(name)
+                status = "success"
+            except TaskLeaseBusy as exc:
+                logging.info("跳过本次运行: %s", exc)
+                status = "skipped"
+            except Exception as exc:
+                logging.exception("任务执行失败 %s: %s", name, exc)
+                status = f"failed: {exc.__class__.__name__}: {exc}"
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+                self.running = None
+            self.last_results[name] = {
+                "status": status,
+                "finished_at": datetime.now(BEIJING_TZ).isoformat(),
+                "elapsed_seconds": round(time.monotonic() - started, 2),
+            }
+
+
+def _scheduler_loop(runner: TaskRunner, stop: threading.Event):
+    while not stop.is_set():
+        slot = scheduled_tasks.next_heartbeat()
+        logging.info("下一次心跳（北京时间）：%s", slot.strftime("%Y-%m-%d %H:%M"))
+        while not stop.is_set():
+            remaining = (slot - datetime.now(BEIJING_TZ)).total_seconds()
+            if remaining <= 0:
+                break
+            stop.wait(min(remaining, 60))
+        if not stop.is_set():
+            runner.submit(scheduled_tasks.tasks_for_time(slot), source=f"heartbeat {slot:%H:%M}")
+
+
+def _make_handler(runner: TaskRunner, scheduler_enabled: bool):
+    class DaemonHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/trigger":
+                target = (parse_qs(url.query).get("target") or ["all"])[0]
+                if target in scheduled_tasks.TASKS:
+                    names = [target]
+                else:
+                    names = scheduled_tasks.resolve_trigger_target(target)
+                accepted = runner.submit(names, source=f"trigger {target}")
+                self._reply(200, {"target": target, "tasks": names, "queued": accepted})
+            elif url.path == "/status":
+                now = datetime.now(BEIJING_TZ)
+                self._reply(200, {
+                    "service": "Sales Reward Hub Scheduler Daemon",
+                    "status": "running",
+                    "beijing_time": now.isoformat(),
+                    "scheduler_enabled": scheduler_enabled,
+                    "next_heartbeat": scheduled_tasks.next_heartbeat(now).isoformat(),
+                    "routing": {
+                        "heartbeat": list(scheduled_tasks.HEARTBEAT_TASKS),
+                        "slots": {f"{h:02d}:{m:02d}": list(v) for (h, m), v in scheduled_tasks.SLOT_TASKS.items()},
+                    },
+                    "running": runner.running,
+                    "pending": runner.pending(),
+                    "last_results": runner.last_results,
+                })
+            else:
+                self._reply(200, {"message": "Sales Reward Hub Scheduler Daemon - Use /status or /trigger"})
+
+        def _reply(self, code, payload):
+            body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug("daemon http: " + format, *args)
+
+    return DaemonHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scheduled tasks in one warm process.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind host, default 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788, help="Bind port, default 8788")
+    parser.add_argument(
+        "--no-scheduler",
+        action="store_true",
+        help="Disable the in-process heartbeat; only run tasks via /trigger (external cron).",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    storage.enable_store_reuse()
+    request_module.enable_session_reuse()
+
+    runner = TaskRunner()
+    runner.start()
+    stop = threading.Event()
+    if not args.no_scheduler:
+        threading.Thread(target=_scheduler_loop, args=(runner, stop), name="scheduler", daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(runner, not args.no_scheduler))
+    logging.info("常驻调度进程已启动：http://%s:%s（内置调度：%s）", args.host, args.port, not args.no_scheduler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
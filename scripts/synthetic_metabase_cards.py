@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""按种子生成与线上形状一致的 Metabase 卡片响应，供端到端基准与本地替身使用。
+
+分布参照线上数据：
+- 管家数随合同规模增长（合同数 / 40，20~3000 人），单量按 Zipf 分布（s=0.6）偏向头部管家
+- 服务商约 30 家，规模呈 Zipf 分布（s=0.8），每个管家固定归属一家服务商
+- 合同金额为对数正态分布（中位数约 1.8 万，800~60 万），约 30% 取整到百元；约 12% 的合同复用该管家已有的项目地址
+- 工单类型：平台单 70% / 自引单 20% / 修链平台单 7% / 修链自获客 3%；签约时间在本月内按序分布
+
+卡片规模由合同数推导：待预约工单 = 合同数 / 5，SLA 违规 = 合同数 / 50，项目结算电子表格 = 合同数 / 2。
+行以生成器形式惰性产出，百万行卡片不会在内存中整体驻留。
+
+示例：
+  # 写出 1 万合同规模的 fixture，供 scripts/local_stand_ins.py --fixtures-dir 使用
+  python scripts/synthetic_metabase_cards.py --contracts 10000 --output-dir state/metabase_fixtures
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+# 周一上午：SLA 任务同时生成日报与周报
+DEFAULT_NOW = datetime(2026, 10, 19, 10, 0, tzinfo=BEIJING_TZ)
+DEFAULT_SEED = 20261019
+
+PERFORMANCE_CARD_ID = "2084"
+PENDING_ORDERS_CARD_ID = "1712"
+SLA_REPORT_CARD_ID = "1514"
+PROJECT_SETTLEMENT_CARD_ID = "2015"
+
+PERFORMANCE_COLUMNS = (
+    "_id", "province", "serviceAppointmentNum", "status", "serviceHousekeeper", "serviceHousekeeperId",
+    "contractdocNum", "adjustRefundMoney", "paidAmount", "difference", "state", "createTime", "orgName",
+    "signedDate", "Doorsill", "tradeIn", "conversion", "average", "scount", "ccount", "sourceType",
+    "contactsAddress", "projectAddress",
+)
+PENDING_ORDERS_COLUMNS = ("orderNum", "customerName", "address", "supervisorName", "createTime", "orgName", "status")
+SLA_REPORT_COLUMNS = (
+    "_id", "sid", "saCreateTime", "orderNum", "province", "orgName", "supervisorName", "sourceType",
+    "status", "msg", "memo", "workType", "createTime",
+)
+PROJECT_SETTLEMENT_COLUMNS = (
+    "contractdocNum", "address", "contactsName", "contactsPhone", "serviceHousekeeper", "leakagesiteText",
+    "adjustRefundMoney", "warrantyYears", "signedDate",
+)
+
+_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+_GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红建文辉力鹏飞波宁斌浩凯亮俊峰帅东林成志军海晨阳雪梅琳丹婷蕾思宇轩博涵睿"
+_DISTRICTS = ("朝阳区", "海淀区", "丰台区", "西城区", "东城区", "通州区", "昌平区", "大兴区", "顺义区", "房山区", "石景山区", "门头沟区")
+_STREETS = ("望京西路", "学院路", "丰台北路", "广安门内大街", "安定门外大街", "新华西街", "回龙观东大街", "黄村西大街", "府前街", "良乡大街", "鲁谷路", "双峪路")
+_PROVIDER_WORDS = ("经常亮", "雨虹", "修链", "安居", "筑家", "匠心", "恒通", "美缮", "固德", "优居", "城建", "宏达", "顺安", "立邦", "京诚")
+_PROVIDER_SUFFIXES = ("工程技术有限公司", "建筑装饰工程有限公司", "防水工程有限公司", "房屋修缮有限公司")
+_LEAKAGE_SITES = ("屋面", "卫生间", "外墙", "阳台", "厨房", "地下室", "窗台")
+_SLA_VIOLATIONS = (
+    ("超时未联系", "工单派发后 30 分钟内未联系业主"),
+    ("超时未上门", "预约时间后 2 小时内未签到"),
+    ("超时未报价", "上门后 24 小时内未提交报价"),
+    ("超时未完工", "超过约定工期未完工"),
+)
+_PENDING_STATUSES = ("待预约",) * 11 + ("暂不上门",) * 3 + ("已预约",) * 4 + ("施工中",) * 2
+_SOURCE_TYPES = (2,) * 70 + (1,) * 20 + (4,) * 7 + (5,) * 3
+
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def metabase_card(columns: Sequence[str], rows) -> Dict:
+    """组装 /api/card/{id}/query 响应；rows 可为生成器（本地替身会边生成边写出）。"""
+    return {
+        "data": {
+            "rows": rows,
+            "cols": [{"name": name, "display_name": name, "source": "native"} for name in columns],
+            "native_form": {"query": "-- synthetic"},
+        },
+        "row_count": None,
+        "status": "completed",
+    }
+
+
+class SyntheticCards:
+    """合成卡片集合：同一 (contracts, seed, now) 每次产出的行完全一致。"""
+
+    def __init__(self, contracts: int, seed: int = DEFAULT_SEED, now: Optional[datetime] = None):
+        self.contracts = contracts
+        self.seed = seed
+        self.now = now or DEFAULT_NOW
+        self.month_start = self.now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        self.pending_orders = max(50, contracts // 5)
+        self.sla_violations = max(20, contracts // 50)
+        self.settlement_rows = max(10, contracts // 2)
+
+        rng = self._rng("population")
+        self.providers = self._build_providers(rng)
+        self.housekeepers = self._build_housekeepers(rng, min(3000, max(20, contracts // 40)))
+        provider_weights = _zipf_cum_weights(len(self.providers), 0.8)
+        self.housekeeper_provider = [self._pick(rng, self.providers, provider_weights) for _ in self.housekeepers]
+        self.housekeeper_conversion = [round(rng.uniform(0.08, 0.65), 4) for _ in self.housekeepers]
+        self._housekeeper_weights = _zipf_cum_weights(len(self.housekeepers), 0.6)
+
+    def _rng(self, stream: str) -> random.Random:
+        return random.Random(f"{self.seed}:{self.contracts}:{stream}")
+
+    @staticmethod
+    def _pick(rng: random.Random, items: Sequence, cum_weights: List[float]):
+        return items[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+    def _pick_housekeeper(self, rng: random.Random) -> int:
+        return bisect.bisect(self._housekeeper_weights, rng.random() * self._housekeeper_weights[-1])
+
+    @staticmethod
+    def _build_providers(rng: random.Random) -> List[str]:
+        names = [f"北京{word}{suffix}" for word in _PROVIDER_WORDS for suffix in _PROVIDER_SUFFIXES]
+        rng.shuffle(names)
+        return names[:30]
+
+    @staticmethod
+    def _build_housekeepers(rng: random.Random, count: int) -> List[str]:
+        names: Dict[str, None] = {}
+        while len(names) < count:
+            names.setdefault(rng.choice(_SURNAMES) + "".join(rng.choices(_GIVEN, k=rng.choice((1, 2)))), None)
+        return list(names)
+
+    @staticmethod
+    def _address(rng: random.Random) -> str:
+        return (
+            f"北京市{rng.choice(_DISTRICTS)}{rng.choice(_STREETS)}{rng.randint(1, 300)}号院"
+            f"{rng.randint(1, 30)}号楼{rng.randint(1, 6)}单元{rng.randint(101, 2802)}"
+        )
+
+    @staticmethod
+    def _amount(rng: random.Random) -> float:
+        amount = min(600000.0, max(800.0, rng.lognormvariate(math.log(18000), 0.75)))
+        return float(round(amount, -2)) if rng.random() < 0.3 else round(amount, 2)
+
+    @staticmethod
+    def _phone(rng: random.Random) -> str:
+        return f"1{rng.choice('3578')}{rng.randint(0, 999999999):09d}"
+
+    # --- 卡片 ---
+
+    def performance_rows(self) -> Iterator[List]:
+        """北京业绩播报卡片（2084）：本月合同，按签约时间升序。"""
+        rng = self._rng("performance")
+        month_seconds = (self.now - self.month_start).total_seconds()
+        month_tag = self.month_start.strftime("%Y%m")
+        personal_counts = [0] * len(self.housekeepers)
+        personal_amounts = [0.0] * len(self.housekeepers)
+        recent_addresses: Dict[int, List[str]] = {}
+        for index in range(self.contracts):
+            hk = self._pick_housekeeper(rng)
+            known = recent_addresses.setdefault(hk, [])
+            if known and rng.random() < 0.12:
+                project_address = rng.choice(known)
+            else:
+                project_address = self._address(rng)
+                known.append(project_address)
+                del known[:-3]
+            amount = self._amount(rng)
+            paid = amount if rng.random() < 0.6 else round(amount * rng.uniform(0.3, 0.9), 2)
+            signed_at = self.month_start + timedelta(seconds=month_seconds * (index + rng.random()) / self.contracts)
+            created_at = signed_at - timedelta(days=rng.uniform(0.5, 20))
+            personal_counts[hk] += 1
+            personal_amounts[hk] += amount
+            yield [
+                f"{rng.getrandbits(96):024x}",
+                "北京",
+                f"GD{signed_at.strftime('%Y%m%d')}{index:08d}",
+                "已签约",
+                self.housekeepers[hk],
+                f"HK{hk:06d}",
+                f"YHWX-BJ-JSJZ-{month_tag}{index:07d}",
+                amount,
+                paid,
+                round(amount - paid, 2),
+                "正常",
+                _iso(created_at),
+                self.housekeeper_provider[hk],
+                _iso(signed_at),
+                0,
+                rng.choice(("", "", "", "以旧换新")),
+                self.housekeeper_conversion[hk],
+                round(personal_amounts[hk] / personal_counts[hk], 2),
+                index + 1,
+                personal_counts[hk],
+                rng.choice(_SOURCE_TYPES),
+                project_address,
+                project_address,
+            ]
+
+    def pending_orders_rows(self) -> Iterator[List]:
+        """待预约工单卡片（1712）：近 10 天建单，约 80% 已超过 48 小时。"""
+        rng = self._rng("pending")
+        for index in range(self.pending_orders):
+            hk = self._pick_housekeeper(rng)
+            created_at = self.now - timedelta(hours=rng.uniform(1, 240))
+            yield [
+                f"GD{created_at.strftime('%Y%m%d')}{index:08d}",
+                rng.choice(_SURNAMES) + rng.choice(("先生", "女士")),
+                self._address(rng),
+                self.housekeepers[hk],
+                _iso(created_at),
+                self.housekeeper_provider[hk],
+                rng.choice(_PENDING_STATUSES),
+            ]
+
+    def sla_rows(self) -> Iterator[List]:
+        """SLA 日报卡片（1514）：前一自然日的超时工单。"""
+        rng = self._rng("sla")
+        business_day = (self.now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        for index in range(self.sla_violations):
+            hk = self._pick_housekeeper(rng)
+            created_at = business_day + timedelta(seconds=rng.uniform(0, 86399))
+            violation, memo = rng.choice(_SLA_VIOLATIONS)
+            yield [
+                f"{rng.getrandbits(96):024x}",
+                f"SA{index:08d}",
+                _iso(created_at),
+                f"GD{created_at.strftime('%Y%m%d')}{index:08d}",
+                "北京",
+                self.housekeeper_provider[hk],
+                self.housekeepers[hk],
+                rng.choice(_SOURCE_TYPES),
+                "进行中",
+                violation,
+                memo,
+                rng.choice(("防水维修", "渗漏检测", "局部翻新")),
+                _iso(created_at - timedelta(hours=rng.uniform(1, 72))),
+            ]
+
+    def project_settlement_rows(self) -> Iterator[List]:
+        """项目结算电子表格卡片（2015）：已签约合同的施工与结算信息。"""
+        rng = self._rng("settlement")
+        month_tag = self.month_start.strftime("%Y%m")
+        for index in range(self.settlement_rows):
+            hk = self._pick_housekeeper(rng)
+            yield [
+                f"YHWX-BJ-JSJZ-{month_tag}{index * 2:07d}",
+                self._address(rng),
+                rng.choice(_SURNAMES) + rng.choice(("先生", "女士")),
+                self._phone(rng),
+                self.housekeepers[hk],
+                "、".join(rng.sample(_LEAKAGE_SITES, rng.randint(1, 3))),
+                self._amount(rng),
+                rng.choice((1, 2, 3, 5)),
+                _iso(self.month_start + timedelta(days=rng.uniform(0, 18))),
+            ]
+
+    def card_sources(self) -> Dict[str, Callable[[List[Dict]], Dict]]:
+        """卡片 id -> callable(parameters)，可直接注册到 MetabaseStandIn(cards=...)；每次请求重新按种子生成。"""
+        return {
+            PERFORMANCE_CARD_ID: lambda parameters: metabase_card(PERFORMANCE_COLUMNS, self.performance_rows()),
+            PENDING_ORDERS_CARD_ID: lambda parameters: metabase_card(PENDING_ORDERS_COLUMNS, self.pending_orders_rows()),
+            SLA_REPORT_CARD_ID: lambda parameters: metabase_card(SLA_REPORT_COLUMNS, self.sla_rows()),
+            PROJECT_SETTLEMENT_CARD_ID: lambda parameters: metabase_card(
+                PROJECT_SETTLEMENT_COLUMNS, self.project_settlement_rows()
+            ),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Metabase card fixtures.")
+    parser.add_argument("--contracts", type=int, default=1000, help="合同数（默认 1000）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"随机种子（默认 {DEFAULT_SEED}）")
+    parser.add_argument("--output-dir", default="state/metabase_fixtures", help="fixture 输出目录，文件名为 {card_id}.json")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cards = SyntheticCards(args.contracts, seed=args.seed)
+    for card_id, source in cards.card_sources().items():
+        response = source([])
+        response["data"]["rows"] = list(response["data"]["rows"])
+        response["row_count"] = len(response["data"]["rows"])
+        path = output_dir / f"{card_id}.json"
+        path.write_text(json.dumps(response, ensure_ascii=False), encoding="utf-8")
+        print(f"{path}: {response['row_count']} rows", flush=True)
+
+
+if __name__ == "__main__":
+    main()
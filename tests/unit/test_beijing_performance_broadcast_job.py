@@ -4,6 +4,7 @@ import json
 import tempfile
 from datetime import datetime
 from importlib import reload
+from unittest.mock import Mock, patch
 
 from modules.core.beijing_jobs import (
     _apply_latest_housekeeper_conversion_rate,
@@ -57,6 +58,25 @@ class BeijingPerformanceBroadcastJobTest(unittest.TestCase):
         self.assertEqual(records[0]["转化率(conversion)"], 0.2222222222222222)
         self.assertEqual(records[0]["个人累计签约单数"], 6)
 
+    def test_metabase_failure_still_sends_pending_notifications(self):
+        from modules.core import beijing_jobs
+
+        for job in (beijing_jobs.signing_broadcast_beijing_v2, beijing_jobs.performance_broadcast_beijing_v2):
+            with self.subTest(job=job.__name__):
+                pipeline = Mock()
+                pipeline.process.return_value = []
+                config = Mock()
+                with patch.dict(os.environ, {"METABASE_STREAMING": "0"}), patch(
+                    "modules.core.beijing_jobs.create_standard_pipeline", return_value=(pipeline, config, Mock())
+                ), patch(
+                    "modules.request_module.send_request_with_managed_session",
+                    side_effect=ConnectionError("metabase login failed"),
+                ), patch("modules.core.beijing_jobs._send_notifications") as mock_send:
+                    self.assertEqual(job(), [])
+
+                pipeline.process.assert_called_once_with([])
+                mock_send.assert_called_once_with([], config)
+
     def test_activity_code_uses_beijing_month(self):
         self.assertEqual(
             _get_bj_performance_broadcast_activity_code(datetime(2026, 5, 11)),
@@ -281,6 +301,52 @@ class BeijingPerformanceBroadcastJobTest(unittest.TestCase):
             self.assertEqual(refreshed["notification_sent"], 1)
             self.assertEqual(new_row_extensions["管家累计业绩金额"], 25000)
 
+    def test_performance_broadcast_aggregates_snapshot_totals_once_per_send(self):
+        with tempfile.NamedTemporaryFile(suffix=".db") as tmp:
+            store = SQLitePerformanceDataStore(tmp.name)
+            activity_code = "BJ-PERFORMANCE-BROADCAST-2026-05"
+            config = ProcessingConfig(
+                config_key="BJ-PERFORMANCE-BROADCAST",
+                activity_code=activity_code,
+                city=City.BEIJING,
+                housekeeper_key_format="管家",
+            )
+
+            contracts = []
+            for index, (housekeeper, amount) in enumerate([("李小军", 7000), ("李小军", 3000), ("刘沐泽", 16900)]):
+                contracts.append({
+                    "合同ID(_id)": f"snapshot-{index}",
+                    "管家(serviceHousekeeper)": housekeeper,
+                    "合同编号(contractdocNum)": f"YHWX-BJ-JSJZ-20260500{index}",
+                    "合同金额(adjustRefundMoney)": amount,
+                    "计入业绩金额": amount,
+                    "支付金额(paidAmount)": amount,
+                    "工单编号(serviceAppointmentNum)": f"GD20260500{index}",
+                    "签约时间(signedDate)": f"2026-05-0{index + 1}T10:00:00.000+08:00",
+                    "工单类型(sourceType)": "2",
+                    "转化率(conversion)": 0.2,
+                })
+            DataProcessingPipeline(config, store).process(contracts)
+
+            service = NotificationService(storage=store, config=config)
+            with patch.object(store, "get_housekeeper_stats") as mock_stats, patch.object(
+                store, "get_housekeeper_performance_totals", wraps=store.get_housekeeper_performance_totals
+            ) as mock_totals, patch(
+                "modules.core.notification_service.requests.post", return_value=Mock(status_code=200, text="ok")
+            ):
+                service.send_notifications()
+
+            mock_stats.assert_not_called()
+            mock_totals.assert_called_once_with(activity_code)
+            with store._connect() as conn:
+                payloads = [
+                    json.loads(row[0])["text"]["content"]
+                    for row in conn.execute("SELECT payload_json FROM notification_outbox ORDER BY id")
+                ]
+            self.assertEqual(len(payloads), 3)
+            self.assertTrue(all("本月个人累计签约业绩 10,000 元" in p for p in payloads[:2]))
+            self.assertIn("本月个人累计签约业绩 16,900 元", payloads[2])
+
     def test_performance_broadcast_source_type_filter_includes_self_referral(self):
         with tempfile.NamedTemporaryFile(suffix=".db") as tmp:
             store = SQLitePerformanceDataStore(tmp.name)
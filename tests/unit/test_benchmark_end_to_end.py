@@ -0,0 +1,96 @@
+import importlib.util
+import itertools
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from modules.core.beijing_jobs import _parse_metabase_response
+from modules.core.sla_jobs import SLA_REPORT_COLUMNS
+
+_SCRIPTS = Path(__file__).resolve().parents[2] / "scripts"
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(name, _SCRIPTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+synthetic = _load("synthetic_metabase_cards")
+benchmark = _load("benchmark_end_to_end")
+
+
+class SyntheticCardsTest(unittest.TestCase):
+    def setUp(self):
+        self.cards = synthetic.SyntheticCards(2000, seed=7)
+
+    def test_same_seed_produces_identical_rows(self):
+        again = synthetic.SyntheticCards(2000, seed=7)
+        self.assertEqual(list(self.cards.performance_rows()), list(again.performance_rows()))
+        self.assertEqual(list(self.cards.pending_orders_rows()), list(again.pending_orders_rows()))
+        self.assertNotEqual(
+            list(itertools.islice(self.cards.performance_rows(), 5)),
+            list(itertools.islice(synthetic.SyntheticCards(2000, seed=8).performance_rows(), 5)),
+        )
+
+    def test_performance_card_parses_into_contracts(self):
+        response = self.cards.card_sources()[synthetic.PERFORMANCE_CARD_ID]([])
+        response["data"]["rows"] = list(response["data"]["rows"])
+        contracts = _parse_metabase_response(response)
+
+        self.assertEqual(len(contracts), 2000)
+        self.assertEqual(len({item["合同ID(_id)"] for item in contracts}), 2000)
+        signed = [item["签约时间(signedDate)"] for item in contracts]
+        self.assertEqual(signed, sorted(signed))
+        self.assertTrue(all(item["合同金额(adjustRefundMoney)"] >= 800 for item in contracts))
+
+    def test_distributions_are_skewed_but_not_degenerate(self):
+        rows = list(self.cards.performance_rows())
+        by_housekeeper = Counter(row[4] for row in rows)
+        by_provider = Counter(row[12] for row in rows)
+        by_source_type = Counter(row[20] for row in rows)
+
+        self.assertEqual(len(self.cards.housekeepers), 50)
+        self.assertGreater(by_housekeeper.most_common(1)[0][1], 2 * 2000 / 50)
+        self.assertLess(by_housekeeper.most_common(1)[0][1], 2000 * 0.2)
+        self.assertGreater(len(by_provider), 10)
+        self.assertAlmostEqual(by_source_type[2] / 2000, 0.7, delta=0.05)
+
+    def test_derived_cards_match_job_column_layouts(self):
+        self.assertEqual(list(synthetic.SLA_REPORT_COLUMNS), SLA_REPORT_COLUMNS)
+        self.assertEqual(len(list(self.cards.sla_rows())), 40)
+        pending = list(self.cards.pending_orders_rows())
+        self.assertEqual(len(pending), 400)
+        self.assertTrue(all(row[5] in self.cards.providers for row in pending))
+
+
+class BenchmarkSummaryTest(unittest.TestCase):
+    def test_scale_labels_round_trip(self):
+        for text, contracts in (("1k", 1000), ("10K", 10000), ("100k", 100000), ("1m", 1000000), ("2500", 2500)):
+            self.assertEqual(benchmark.parse_scale(text), contracts)
+        self.assertEqual(benchmark.scale_label(1000000), "1m")
+        self.assertEqual(benchmark.scale_label(10000), "10k")
+
+    def test_summarize_uses_nearest_rank_percentiles(self):
+        rounds = [
+            {"stages": {"pipeline_process": {"seconds": seconds, "items": 1000, "peak_rss_mb": rss}}}
+            for seconds, rss in ((2.0, 50.0), (1.0, 60.0), (4.0, 55.0))
+        ]
+        stats = benchmark.summarize(rounds)["stages"]["pipeline_process"]
+
+        self.assertEqual((stats["p50_seconds"], stats["p99_seconds"]), (2.0, 4.0))
+        self.assertEqual(stats["throughput_per_second"], 500.0)
+        self.assertEqual(stats["peak_rss_mb"], 60.0)
+
+    def test_compare_flags_throughput_and_rss_regressions(self):
+        def result(throughput, rss):
+            return {"scales": {"1k": {"peak_rss_mb": rss, "stages": {"pipeline_process": {"throughput_per_second": throughput}}}}}
+
+        self.assertEqual(benchmark.compare_with_baseline(result(450, 52), result(500, 50), 0.2), [])
+        regressions = benchmark.compare_with_baseline(result(300, 70), result(500, 50), 0.2)
+        self.assertEqual(len(regressions), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import os
 import sqlite3
 import sys
@@ -164,6 +165,112 @@ class DailyServiceReportJobTest(unittest.TestCase):
         self.assertEqual(stats["sent"], 0)
         mock_post.assert_not_called()
 
+    def test_replace_sla_violations_only_touches_changed_rows(self):
+        def violation(violation_id, memo="超时详情"):
+            return {
+                "_id": violation_id,
+                "orderNum": f"GD-{violation_id}",
+                "orgName": "服务商A",
+                "supervisorName": "管家A",
+                "saCreateTime": "2026-03-30T09:00:00+08:00",
+                "msg": "超时",
+                "memo": memo,
+            }
+
+        self.storage.replace_sla_violations_for_date("2026-03-30", [violation("v1"), violation("v2"), violation("v3")])
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE sla_violation_records SET updated_at = '2000-01-01 00:00:00'")
+            before = dict(conn.execute("SELECT violation_id, id FROM sla_violation_records").fetchall())
+
+        stored = self.storage.replace_sla_violations_for_date(
+            "2026-03-30",
+            [violation("v1"), violation("v2", memo="超时 2 小时"), violation("v4")],
+        )
+
+        with sqlite3.connect(self.db_path) as conn:
+            rows = {
+                row[0]: row[1:]
+                for row in conn.execute(
+                    "SELECT violation_id, id, violation_description, updated_at FROM sla_violation_records"
+                )
+            }
+        self.assertEqual(stored, 3)
+        self.assertEqual(sorted(rows), ["v1", "v2", "v4"])
+        self.assertEqual(rows["v1"], (before["v1"], "超时详情", "2000-01-01 00:00:00"))
+        self.assertEqual(rows["v2"][:2], (before["v2"], "超时 2 小时"))
+        self.assertNotEqual(rows["v2"][2], "2000-01-01 00:00:00")
+
+    def test_replace_sla_violations_raw_json_modes(self):
+        record = {"_id": "v1", "orderNum": "GD001", "orgName": "服务商A", "memo": "超时详情" * 20}
+
+        self.storage.replace_sla_violations_for_date("2026-03-30", [record], raw_json_mode="zlib")
+        with sqlite3.connect(self.db_path) as conn:
+            raw_json, codec = conn.execute("SELECT raw_json, raw_json_codec FROM sla_violation_records").fetchone()
+        self.assertEqual(codec, "zlib+base64")
+        self.assertNotIn("超时详情", raw_json)
+        stored = self.storage.get_sla_violations_for_window("2026-03-30", "2026-03-30")
+        self.assertEqual(json.loads(stored[0]["raw_json"]), record)
+
+        # 存储方式变化也视为内容变化，重跑时改写
+        self.storage.replace_sla_violations_for_date("2026-03-30", [record], raw_json_mode="none")
+        stored = self.storage.get_sla_violations_for_window("2026-03-30", "2026-03-30")
+        self.assertEqual((stored[0]["raw_json"], stored[0]["raw_json_codec"]), ("", ""))
+
+        with self.assertRaises(ValueError):
+            self.storage.replace_sla_violations_for_date("2026-03-30", [record], raw_json_mode="gzip")
+
+    def test_replace_sla_violations_keeps_rows_with_duplicate_violation_ids(self):
+        def violation(violation_id, order_num, msg="超时"):
+            return {"_id": violation_id, "orderNum": order_num, "orgName": "服务商A", "msg": msg, "memo": "详情"}
+
+        records = [violation("dup", "GD001"), violation("dup", "GD002"), violation("v3", "GD003")]
+        with self.assertLogs(level="WARNING") as logs:
+            stored = self.storage.replace_sla_violations_for_date("2026-03-30", records)
+        self.assertEqual(stored, 3)
+        self.assertTrue(any("dup" in line for line in logs.output))
+
+        # 重跑同一快照不产生多余写入；业务唯一键也相同的记录只保留一条
+        self.assertEqual(self.storage.replace_sla_violations_for_date("2026-03-30", records), 3)
+        stored = self.storage.replace_sla_violations_for_date("2026-03-30", records + [violation("v3", "GD003")])
+        self.assertEqual(stored, 3)
+        orders = [row["order_num"] for row in self.storage.get_sla_violations_for_window("2026-03-30", "2026-03-30")]
+        self.assertEqual(orders, ["GD001", "GD002", "GD003"])
+
+    def test_invalid_raw_json_mode_falls_back_to_full(self):
+        with patch.dict(os.environ, {"SLA_RAW_JSON_MODE": "gzip"}), self.assertLogs(level="WARNING"):
+            service = DailyServiceReportService(self.storage, now=datetime(2026, 3, 31, 9, 0))
+        self.assertEqual(service.raw_json_mode, "full")
+
+    def test_sla_rollups_follow_snapshot_writes_and_summarize_window(self):
+        def violation(violation_id, org_name, violation_type):
+            return {"_id": violation_id, "orderNum": f"GD-{violation_id}", "orgName": org_name, "msg": violation_type}
+
+        self.storage.replace_sla_violations_for_date("2026-03-23", [
+            violation("v1", "服务商A", "超时"),
+            violation("v2", "服务商A", "超时"),
+            violation("v3", "服务商B", "未上门"),
+        ])
+        self.storage.replace_sla_violations_for_date("2026-03-24", [violation("v4", "服务商A", "未上门")])
+        # 重跑后 v2 消失：汇总随之更新
+        self.storage.replace_sla_violations_for_date("2026-03-23", [
+            violation("v1", "服务商A", "超时"),
+            violation("v3", "服务商B", "未上门"),
+        ])
+        self.storage.replace_sla_violations_for_date("2026-03-30", [violation("v5", "服务商C", "超时")])
+
+        summaries = self.storage.get_sla_provider_summaries("2026-03-23", "2026-03-29")
+        self.assertEqual(summaries, [
+            {"org_name": "服务商A", "violation_count": 2, "by_type": {"未上门": 1, "超时": 1}},
+            {"org_name": "服务商B", "violation_count": 1, "by_type": {"未上门": 1}},
+        ])
+
+        # 历史库：汇总表为空时按 schema 版本一次性回填
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM sla_violation_rollups")
+            conn.execute("DELETE FROM schema_version WHERE version = '1.5.0'")
+        reopened = create_data_store(storage_type="sqlite", db_path=self.db_path)
+        self.assertEqual(reopened.get_sla_provider_summaries("2026-03-23", "2026-03-29"), summaries)
+
 
 if __name__ == "__main__":
     unittest.main()
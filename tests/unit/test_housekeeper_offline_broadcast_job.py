@@ -1,8 +1,11 @@
 import json
 import tempfile
+import threading
 import unittest
 from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import Mock, patch
+from urllib.request import Request, urlopen
 
 from modules.core.housekeeper_offline_jobs import (
     HousekeeperOfflineBroadcastService,
@@ -77,6 +80,10 @@ class HousekeeperOfflineBroadcastJobTest(unittest.TestCase):
 
         self.assertEqual(first["sent"], 1)
         self.assertEqual(second["sent"], 0)
+        self.assertEqual(first["card_unchanged"], 0)
+        # 卡片内容未变化时第二次轮询直接短路到 outbox 投递
+        self.assertEqual(second["card_unchanged"], 1)
+        self.assertEqual(second["valid_events"], 0)
         self.assertEqual(post.call_count, 1)
         payload = post.call_args.kwargs["json"]
         self.assertEqual(
@@ -123,5 +130,100 @@ class HousekeeperOfflineBroadcastJobTest(unittest.TestCase):
         post.assert_not_called()
 
 
+class _MetabaseStandIn(BaseHTTPRequestHandler):
+    """本地 Metabase 替身：按请求中的 since 参数（北京时间）在服务端过滤 createTime。"""
+
+    rows = []
+    requests_seen = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        type(self).requests_seen.append(body)
+        since = next((p["value"] for p in body.get("parameters", []) if p["target"][1][1] == "since"), None)
+        rows = type(self).rows
+        if since:
+            lower = datetime.fromisoformat(since + "+08:00")
+            rows = [row for row in rows if datetime.fromisoformat(row[1]) >= lower]
+        payload = json.dumps({
+            "data": {
+                "cols": [{"name": "eventId"}, {"name": "createTime"}, {"name": "createUserName"}, {"name": "动作"}],
+                "rows": rows,
+            }
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _urllib_post(url, headers=None, timeout=None, **kwargs):
+    """测试包中 requests 为桩模块，这里用 urllib 真实请求本地替身。"""
+    payload = kwargs.get("json")
+    data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    with urlopen(Request(url, data=data, headers=headers or {}, method="POST"), timeout=timeout) as resp:
+        body = resp.read()
+        status = resp.status
+    return Mock(status_code=status, json=lambda: json.loads(body))
+
+
+class HousekeeperOfflineIncrementalQueryTest(unittest.TestCase):
+    def setUp(self):
+        _MetabaseStandIn.rows = [
+            ["event-old", "2026-07-01T15:00:00+08:00", "李四", ["下线"]],
+            ["event-1", "2026-07-01T17:19:09+08:00", "张三", ["下线"]],
+        ]
+        _MetabaseStandIn.requests_seen = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _MetabaseStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.card_url = f"http://127.0.0.1:{self.server.server_port}/api/card/2085/query"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLitePerformanceDataStore(f"{self.tmp.name}/offline.db")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _run(self, now, dry_run=False):
+        service = HousekeeperOfflineBroadcastService(self.store, now=now)
+        service.dry_run = dry_run
+        with patch.dict("os.environ", {"HOUSEKEEPER_OFFLINE_SINCE_PARAM": "since"}), patch(
+            "modules.core.housekeeper_offline_jobs.API_URL_HOUSEKEEPER_OFFLINE", self.card_url
+        ), patch("modules.request_module.get_valid_session", return_value="stand-in-session"), patch(
+            "modules.request_module._post", side_effect=_urllib_post
+        ), patch(
+            "modules.core.housekeeper_offline_jobs.resolve_wecom_webhook", return_value="https://example.com/offline"
+        ), patch.object(
+            HousekeeperOfflineBroadcastService, "_dispatch_outbox", return_value={"sent": 0, "failed": 0, "dead_letter": 0}
+        ):
+            service.since_param = "since"
+            stats = service.run()
+        return stats, _MetabaseStandIn.requests_seen[-1]["parameters"][0]["value"]
+
+    def test_window_starts_at_lookback_then_follows_watermark(self):
+        stats, since = self._run(datetime(2026, 7, 1, 9, 30, tzinfo=timezone.utc))
+        # 首次运行无水位：窗口起点为回看 60 分钟，旧事件由服务端过滤
+        self.assertEqual(since, "2026-07-01T16:30:00")
+        self.assertEqual(stats["raw_events"], 1)
+        self.assertEqual(stats["enqueued"], 1)
+
+        stats, since = self._run(datetime(2026, 7, 1, 10, 0, tzinfo=timezone.utc))
+        # 水位 09:30Z 回退 15 分钟重叠，晚于回看起点 09:00Z
+        self.assertEqual(since, "2026-07-01T17:15:00")
+        self.assertEqual(stats["raw_events"], 1)
+        self.assertEqual(stats["enqueued"], 0)
+
+    def test_dry_run_does_not_advance_watermark(self):
+        self._run(datetime(2026, 7, 1, 9, 30, tzinfo=timezone.utc), dry_run=True)
+        self.assertIsNone(self.store.get_task_watermark("HOUSEKEEPER-OFFLINE-BROADCAST"))
+
+        _, since = self._run(datetime(2026, 7, 1, 10, 0, tzinfo=timezone.utc))
+        self.assertEqual(since, "2026-07-01T17:00:00")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,128 @@
+import importlib.util
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from modules.core.project_settlement_jobs import _extract_record_id
+from modules.core.storage import TursoPerformanceDataStore
+from modules.metabase_stream import MetabaseCardStream
+
+_SCRIPT = Path(__file__).resolve().parents[2] / "scripts" / "local_stand_ins.py"
+_spec = importlib.util.spec_from_file_location("local_stand_ins", _SCRIPT)
+stand_ins = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stand_ins)
+
+
+def _open(url, payload=None, headers=None):
+    data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    return urlopen(Request(url, data=data, headers=headers or {}, method="POST"), timeout=10)
+
+
+class _UrllibSession:
+    """测试包中 requests 为桩模块，这里用 urllib 真实请求本地替身。"""
+
+    def post(self, url, headers=None, timeout=None, **kwargs):
+        with _open(url, kwargs.get("json"), headers) as resp:
+            body = resp.read()
+            status = resp.status
+        return Mock(status_code=status, json=lambda: json.loads(body))
+
+
+class TursoStandInTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stand_ins.TursoStandIn(auth_token="local").start()
+        patcher = patch("modules.core.storage._HTTP_SESSION", _UrllibSession())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.stop)
+
+    def test_store_round_trip_through_pipeline(self):
+        store = TursoPerformanceDataStore(self.server.url, "local")
+        store.save_task_watermark("HOUSEKEEPER-OFFLINE-BROADCAST", "2026-07-01T09:30:00+00:00")
+
+        self.assertEqual(store.get_task_watermark("HOUSEKEEPER-OFFLINE-BROADCAST"), "2026-07-01T09:30:00+00:00")
+        self.assertGreater(self.server.pipelines, 1)
+
+    def test_failed_batch_rolls_back(self):
+        store = TursoPerformanceDataStore(self.server.url, "local")
+        conn = store._connect()
+        with self.assertRaises(RuntimeError):
+            conn.execute_batch([
+                ("INSERT INTO task_watermarks (task_key, watermark) VALUES (?, ?)", ["K", "v"]),
+                ("INSERT INTO missing_table VALUES (1)", None),
+            ])
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM task_watermarks").fetchone(), (0,))
+
+
+class WeComStandInTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stand_ins.WeComStandIn(rate_limit_per_minute=2).start()
+        self.addCleanup(self.server.stop)
+
+    def _send(self, path):
+        with _open(self.server.url + path, {"msgtype": "text", "text": {"content": "hi"}}) as resp:
+            return resp.status, resp.read().decode("utf-8")
+
+    def test_rate_limit_per_key_returns_45009(self):
+        codes = [json.loads(self._send("/cgi-bin/webhook/send?key=a")[1])["errcode"] for _ in range(3)]
+        status, body = self._send("/cgi-bin/webhook/send?key=b")
+
+        self.assertEqual(codes, [0, 0, 45009])
+        self.assertEqual((status, json.loads(body)["errcode"]), (200, 0))
+        self.assertEqual(self.server.errcodes, {0: 3, 45009: 1})
+
+    def test_smartsheet_webhook_returns_record_id(self):
+        _, body = self._send("/cgi-bin/wedoc/smartsheet/webhook?key=sheet")
+        self.assertTrue(_extract_record_id(body))
+
+
+class MetabaseStandInTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        fixture = {
+            "data": {"rows": [[1, "合同1"], [2, "合同2"]], "cols": [{"name": "id"}, {"name": "合同编号"}]},
+            "row_count": 2,
+            "status": "completed",
+        }
+        Path(self.tmp.name, "2015.json").write_text(json.dumps(fixture, ensure_ascii=False), encoding="utf-8")
+        self.server = stand_ins.MetabaseStandIn(fixtures_dir=self.tmp.name, rows=2500).start()
+        self.addCleanup(self.server.stop)
+
+    def test_session_and_scaled_fixture(self):
+        with _open(self.server.url + "/api/session/", {"username": "u", "password": "p"}) as resp:
+            session_id = json.loads(resp.read())["id"]
+        parameters = [{"type": "date/single", "value": "2026-07-01"}]
+        with _open(
+            self.server.url + "/api/card/2015/query", {"parameters": parameters}, {"X-Metabase-Session": session_id}
+        ) as resp:
+            body = json.loads(resp.read())
+
+        self.assertEqual(len(body["data"]["rows"]), 2500)
+        self.assertEqual(body["data"]["rows"][2], [1, "合同1"])
+        self.assertEqual(body["row_count"], 2500)
+        self.assertEqual(body["status"], "completed")
+        self.assertEqual(self.server.queries, [{"card_id": "2015", "parameters": parameters}])
+
+    def test_streams_rows_before_cols(self):
+        with _open(self.server.url + "/api/card/2015/query", None, {"X-Metabase-Session": "s"}) as resp:
+            stream = MetabaseCardStream(iter(lambda: resp.read(4096), b""))
+            self.assertEqual(stream.cols, [{"name": "id"}, {"name": "合同编号"}])
+            self.assertEqual(sum(1 for _ in stream), 2500)
+
+    def test_unknown_card_and_missing_session(self):
+        for path, headers, status in (
+            ("/api/card/9999/query", {"X-Metabase-Session": "s"}, 404),
+            ("/api/card/2015/query", {}, 401),
+        ):
+            with self.subTest(path=path), self.assertRaises(HTTPError) as ctx:
+                _open(self.server.url + path, None, headers)
+            self.assertEqual(ctx.exception.code, status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from modules.core.data_models import City, ProcessingConfig
+from modules.core.message_templates import (
+    GROUP_BROADCAST,
+    MessageTemplate,
+    CompiledTemplate,
+    get_template,
+    record_value,
+)
+from modules.core.notification_service import NotificationService
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class MessageTemplatesTest(unittest.TestCase):
+    def test_unknown_config_key_falls_back_to_city_default(self):
+        self.assertEqual(get_template("SH-2025-10", "SH").name, "SH-PLATFORM-ONLY/group_broadcast")
+        self.assertEqual(get_template("SH-2099-01", "SH").name, "SH-DEFAULT/group_broadcast")
+        self.assertEqual(get_template("BJ-2099-01", "BJ").name, "BJ-DEFAULT/group_broadcast")
+
+    def test_compile_rejects_undeclared_field(self):
+        with self.assertRaises(ValueError):
+            CompiledTemplate(MessageTemplate(name="bad", version="v1", text="{a} {b}", fields={"a": record_value("a")}))
+
+    def test_group_broadcast_outbox_records_template_version(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = SQLitePerformanceDataStore(os.path.join(temp_dir, "templates.db"))
+            config = ProcessingConfig(
+                config_key="BJ-2025-11",
+                activity_code="BJ-NOV",
+                city=City.BEIJING,
+                housekeeper_key_format="管家",
+            )
+            service = NotificationService(storage=store, config=config)
+            record = {
+                "合同ID(_id)": "tpl-1",
+                "管家(serviceHousekeeper)": "测试管家",
+                "合同编号(contractdocNum)": "HT-TPL-1",
+                "活动期内第几个合同": 3,
+                "管家累计单数": 2,
+                "管家累计金额": 12345,
+            }
+
+            message = service._build_text_outbox_message(
+                record, service._build_group_notification_message(record), GROUP_BROADCAST
+            )
+            store.enqueue_outbox_messages([message])
+
+            item = store.get_retryable_outbox_messages("BJ-NOV", max_attempts=5)[0]
+            self.assertEqual(
+                json.loads(item["metadata_json"]),
+                {"template": "BJ-2025-11/group_broadcast", "template_version": "v1"},
+            )
+            self.assertIn("个人累计签约第 2 单，累计签约 12,345 元", json.loads(item["payload_json"])["text"]["content"])
+
+    def test_render_many_isolates_failing_records(self):
+        template = CompiledTemplate(MessageTemplate(
+            name="t", version="v1", text="#{n}", fields={"n": lambda record, context: 10 // record["n"]},
+        ))
+        failed = []
+
+        rendered = template.render_many(
+            [({"n": 5}, {}), ({"n": 0}, {}), ({"n": 2}, {})],
+            on_error=lambda record, exc: failed.append(record["n"]),
+        )
+
+        self.assertEqual(rendered, ["#2", None, "#5"])
+        self.assertEqual(failed, [0])
+        with self.assertRaises(ZeroDivisionError):
+            template.render_many([({"n": 0}, {})])
+
+    def test_send_path_renders_backlog_in_one_batch(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = SQLitePerformanceDataStore(os.path.join(temp_dir, "batch.db"))
+            config = ProcessingConfig(
+                config_key="BJ-2025-11",
+                activity_code="BJ-NOV",
+                city=City.BEIJING,
+                housekeeper_key_format="管家",
+            )
+            service = NotificationService(storage=store, config=config)
+            records = [
+                {
+                    "合同ID(_id)": f"batch-{index}",
+                    "管家(serviceHousekeeper)": "测试管家",
+                    "合同编号(contractdocNum)": f"HT-{index}",
+                    "是否发送通知": "N",
+                }
+                for index in range(3)
+            ]
+            records.append({"合同ID(_id)": "batch-bad", "是否发送通知": "N"})
+
+            with patch.object(CompiledTemplate, "render_many", autospec=True, side_effect=CompiledTemplate.render_many) as mock_many, \
+                    patch.object(service, "_get_notification_records", return_value=records), \
+                    patch.dict(os.environ, {"NOTIFICATION_OUTBOX_BATCH_LIMIT": "0"}):
+                stats = service.send_notifications()
+
+            mock_many.assert_called_once()
+            self.assertEqual(stats["enqueued"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
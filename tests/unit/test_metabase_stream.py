@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from modules.metabase_stream import MetabaseCardStream, card_columns_and_rows
+
+
+def _chunks(body: bytes, size: int):
+    return [body[index:index + size] for index in range(0, len(body), size)]
+
+
+class MetabaseCardStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.response = {
+            "json_query": {"database": 2, "parameters": [{"value": "北京"}]},
+            "data": {
+                "rows": [[index, f"合同{index}", index * 1.5, None, True, ["甲", "乙"]] for index in range(200)],
+                "cols": [{"name": "id"}, {"name": "合同编号", "display_name": "contractNum"}],
+                "results_metadata": {"columns": [{"name": "id"}]},
+            },
+            "row_count": 200,
+            "status": "completed",
+        }
+        self.body = json.dumps(self.response, ensure_ascii=False).encode("utf-8")
+
+    def test_rows_match_full_decode_for_any_chunk_size(self):
+        for size in (1, 7, 64, 4096, len(self.body)):
+            with self.subTest(chunk_size=size):
+                stream = MetabaseCardStream(_chunks(self.body, size))
+                self.assertEqual(stream.cols, self.response["data"]["cols"])
+                self.assertEqual(list(stream), self.response["data"]["rows"])
+                self.assertEqual(stream.row_count, 200)
+
+    def test_cols_before_rows_streams_without_buffering(self):
+        body = json.dumps({"data": {"cols": [{"name": "n"}], "rows": [[12345], [6789]]}}).encode("utf-8")
+        stream = MetabaseCardStream(_chunks(body, 3))
+
+        self.assertEqual(stream.cols, [{"name": "n"}])
+        self.assertEqual(len(stream._pending_rows), 0)
+        self.assertEqual(list(stream), [[12345], [6789]])
+
+    def test_closes_response_after_iteration(self):
+        closed = []
+        stream = MetabaseCardStream(_chunks(self.body, 512), on_close=lambda: closed.append(True))
+        for _ in stream:
+            pass
+        stream.close()
+        self.assertEqual(closed, [True])
+
+    def test_truncated_body_raises(self):
+        stream = MetabaseCardStream([b'{"data":{"rows":[[1],[2'])
+        with self.assertRaises(ValueError):
+            list(stream)
+
+    def test_card_columns_and_rows_handles_both_shapes(self):
+        cols, rows = card_columns_and_rows(self.response)
+        self.assertEqual(len(rows), 200)
+
+        cols, rows = card_columns_and_rows(MetabaseCardStream([self.body]))
+        self.assertEqual(cols, self.response["data"]["cols"])
+        self.assertEqual(len(list(rows)), 200)
+
+        self.assertIsNone(card_columns_and_rows(None))
+        self.assertIsNone(card_columns_and_rows({"error": "boom"}))
+        self.assertIsNone(card_columns_and_rows(MetabaseCardStream([b'{"error":"boom"}'])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from modules.core.outbox_drain import OutboxDrainService, RateLimitedWebhookSender
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class OutboxDrainJobTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.storage = SQLitePerformanceDataStore(os.path.join(self.temp_dir.name, "outbox-drain.db"))
+        self.clock = _FakeClock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _message(self, activity_code, dedupe_key, message_type="sla_daily_violation", webhook_url="https://example.com/a"):
+        return {
+            "activity_code": activity_code,
+            "contract_id": dedupe_key,
+            "message_type": message_type,
+            "webhook_url": webhook_url,
+            "payload_json": json.dumps({"msgtype": "text", "text": {"content": dedupe_key}}),
+            "metadata_json": "",
+            "dedupe_key": dedupe_key,
+        }
+
+    def _service(self, budget_seconds, page_size=2, min_interval=1.0):
+        sender = RateLimitedWebhookSender(
+            min_interval_seconds=min_interval,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+        )
+        return OutboxDrainService(
+            self.storage,
+            budget_seconds=budget_seconds,
+            page_size=page_size,
+            sender=sender,
+            clock=self.clock,
+        )
+
+    def test_drains_all_activities_across_pages(self):
+        self.storage.enqueue_outbox_messages([
+            self._message("ACT-A", "a1"),
+            self._message("ACT-B", "b1"),
+            self._message("ACT-A", "a2"),
+        ])
+
+        with patch("modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text='{"errcode":0}')) as mock_post:
+            stats = self._service(budget_seconds=60).run()
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(stats["sent"], 3)
+        self.assertEqual(stats["pages"], 2)
+        self.assertEqual(stats["by_activity"]["ACT-A"]["sent"], 2)
+        self.assertEqual(stats["by_activity"]["ACT-B"]["sent"], 1)
+        self.assertEqual(stats["budget_exhausted"], 0)
+        self.assertEqual(self.storage.get_due_outbox_messages(0, max_attempts=5), [])
+
+    def test_stops_when_budget_is_used_up(self):
+        self.storage.enqueue_outbox_messages([self._message("ACT-A", f"a{i}") for i in range(5)])
+
+        with patch("modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text="")) as mock_post:
+            stats = self._service(budget_seconds=2.5, page_size=10).run()
+
+        # 限速间隔 1s：t=0、1、2 发送三条，第四条需等到 t=3，超出 2.5s 预算
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(stats["budget_exhausted"], 1)
+        self.assertEqual(len(self.storage.get_due_outbox_messages(0, max_attempts=5)), 2)
+
+    def test_group_broadcast_success_marks_record_notified(self):
+        self.storage.enqueue_outbox_messages([self._message("ACT-A", "c1", message_type="group_broadcast")])
+
+        with patch.object(self.storage, "update_notification_status") as mock_update, patch(
+            "modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text="ok")
+        ):
+            self._service(budget_seconds=60).run()
+
+        mock_update.assert_called_once_with(contract_id="c1", activity_code="ACT-A", notification_sent=True)
+
+    def test_wedoc_errcode_is_treated_as_failure(self):
+        self.storage.enqueue_outbox_messages([self._message("ACT-A", "w1", message_type="wedoc_add_record")])
+
+        with patch(
+            "modules.core.outbox_drain.requests.post",
+            return_value=Mock(status_code=200, text='{"errcode":40058,"errmsg":"invalid"}'),
+        ):
+            stats = self._service(budget_seconds=60).run()
+
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(self.storage.get_due_outbox_messages(0, max_attempts=5)[0]["attempt_count"], 1)
+
+    def test_wedoc_rows_use_smartsheet_dispatch_delay_per_webhook(self):
+        self.storage.enqueue_outbox_messages([
+            self._message("SHEET", "w1", message_type="wedoc_add_record", webhook_url="https://example.com/sheet"),
+            self._message("SHEET", "w2", message_type="wedoc_add_record", webhook_url="https://example.com/sheet"),
+            self._message("ACT-A", "a1"),
+        ])
+        sent_at = []
+        service = self._service(budget_seconds=60, page_size=10, min_interval=0.2)
+        service.activity_intervals = {"SHEET": 1.5}
+
+        with patch(
+            "modules.core.outbox_drain.requests.post",
+            side_effect=lambda *args, **kwargs: sent_at.append(self.clock.now) or Mock(status_code=200, text='{"errcode":0}'),
+        ):
+            service.run()
+
+        self.assertEqual(sent_at, [0.0, 1.5, 1.7])
+
+    def test_claimed_rows_are_not_dispatched_twice(self):
+        self.storage.enqueue_outbox_messages([self._message("ACT-A", f"a{i}") for i in range(3)])
+        claimed = self.storage.get_retryable_outbox_messages("ACT-A", max_attempts=5, claim_seconds=600)
+
+        with patch("modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text="")) as mock_post:
+            stats = self._service(budget_seconds=60).run()
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(mock_post.call_count, 0)
+        self.assertEqual(stats["processed"], 0)
+        self.assertEqual(self.storage.get_due_outbox_messages(0, max_attempts=5, claim_seconds=600), [])
+
+        self.storage.mark_outbox_failed(claimed[0]["id"], "HTTP 500")
+        self.assertEqual(
+            [item["id"] for item in self.storage.get_due_outbox_messages(0, max_attempts=5, claim_seconds=600)],
+            [claimed[0]["id"]],
+        )
+
+    def test_budget_exhaustion_releases_unsent_claims(self):
+        self.storage.enqueue_outbox_messages([self._message("ACT-A", f"a{i}") for i in range(5)])
+
+        with patch("modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text="")):
+            self._service(budget_seconds=2.5, page_size=10).run()
+
+        remaining = self.storage.get_retryable_outbox_messages("ACT-A", max_attempts=5, claim_seconds=600)
+        self.assertEqual([item["dedupe_key"] for item in remaining], ["a3", "a4"])
+
+    def test_pending_orders_digest_records_last_notified_digest(self):
+        self.storage.sync_pending_order_snapshots("PENDING", [{
+            "order_num": "S00001",
+            "create_time": "2026-10-18 09:00:00",
+            "org_name": "服务商A",
+            "order_status": "待预约",
+            "status_fingerprint": "S00001::待预约",
+            "eligible_since": "2026-10-18 09:00:00",
+        }])
+        digest = self.storage.get_active_pending_orders_grouped("PENDING")["服务商A"]["digest_fingerprint"]
+        message = self._message("PENDING", "digest-1", message_type="pending_orders_digest")
+        message["metadata_json"] = json.dumps({
+            "org_name": "服务商A",
+            "digest_fingerprint": digest,
+            "pending_order_fingerprints": ["S00001::待预约"],
+        })
+        self.storage.enqueue_outbox_messages([message])
+
+        with patch("modules.core.outbox_drain.requests.post", return_value=Mock(status_code=200, text="ok")):
+            self._service(budget_seconds=60).run()
+
+        group = self.storage.get_active_pending_orders_grouped("PENDING")["服务商A"]
+        self.assertEqual(group["last_notified_digest"], digest)
+        self.assertEqual(self.storage.get_pending_orders_requiring_notification("PENDING"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
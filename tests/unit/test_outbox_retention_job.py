@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from modules.core.outbox_retention import OutboxRetentionService
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class OutboxRetentionJobTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "outbox-retention.db")
+        self.storage = SQLitePerformanceDataStore(self.db_path)
+        self.now = datetime(2026, 6, 1, 0, 0, tzinfo=timezone.utc)
+
+    def tearDown(self):
+        os.environ.pop("OUTBOX_ARCHIVE_COMPRESS", None)
+        self.temp_dir.cleanup()
+
+    def _message(self, dedupe_key):
+        return {
+            "activity_code": "ACT-A",
+            "contract_id": dedupe_key,
+            "message_type": "pending_orders_digest",
+            "webhook_url": "https://example.com/a",
+            "payload_json": json.dumps({"msgtype": "text", "text": {"content": "测试消息" * 50}}, ensure_ascii=False),
+            "metadata_json": json.dumps({"pending_order_fingerprints": [dedupe_key]}),
+            "dedupe_key": dedupe_key,
+        }
+
+    def _seed(self):
+        ids = [item["id"] for item in self.storage.enqueue_outbox_messages(
+            [self._message("old-sent"), self._message("new-sent"), self._message("old-dead"), self._message("pending")]
+        )]
+        self.storage.mark_outbox_sent(ids[0], 200, "ok")
+        self.storage.mark_outbox_sent(ids[1], 200, "ok")
+        self.storage.mark_outbox_failed(ids[2], "boom", max_attempts=1)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE notification_outbox SET sent_at = '2026-04-01 00:00:00' WHERE id = ?", (ids[0],))
+            conn.execute("UPDATE notification_outbox SET sent_at = '2026-05-30 00:00:00' WHERE id = ?", (ids[1],))
+            conn.execute("UPDATE notification_outbox SET updated_at = '2026-01-01 00:00:00' WHERE id = ?", (ids[2],))
+        return ids
+
+    def test_archives_old_sent_and_dead_letter_rows_with_compression(self):
+        ids = self._seed()
+
+        stats = OutboxRetentionService(self.storage, now=self.now).run()
+
+        self.assertEqual(stats["archived"], 2)
+        with sqlite3.connect(self.db_path) as conn:
+            hot_keys = [row[0] for row in conn.execute("SELECT dedupe_key FROM notification_outbox ORDER BY id")]
+            raw_payload, codec = conn.execute(
+                "SELECT payload_json, body_codec FROM notification_outbox_archive WHERE id = ?", (ids[0],)
+            ).fetchone()
+        self.assertEqual(hot_keys, ["new-sent", "pending"])
+        self.assertEqual(codec, "zlib+base64")
+        self.assertNotIn("msgtype", raw_payload)
+
+        archived = self.storage.get_archived_outbox_message(ids[0])
+        self.assertEqual(archived["status"], "sent")
+        self.assertEqual(json.loads(archived["payload_json"])["text"]["content"], "测试消息" * 50)
+        self.assertEqual(archived["response_body"], "ok")
+
+    def test_archived_dedupe_key_is_not_enqueued_again(self):
+        ids = self._seed()
+        OutboxRetentionService(self.storage, now=self.now).run()
+
+        result = self.storage.enqueue_outbox_messages([self._message("old-sent"), self._message("brand-new")])
+
+        self.assertEqual(result[0]["id"], ids[0])
+        self.assertEqual(result[0]["status"], "sent")
+        self.assertFalse(result[0]["created"])
+        self.assertEqual(json.loads(result[0]["metadata_json"]), {"pending_order_fingerprints": ["old-sent"]})
+        self.assertTrue(result[1]["created"])
+        self.assertGreater(result[1]["id"], max(ids))
+
+    def test_row_conflicting_with_archive_stays_in_hot_table(self):
+        ids = self._seed()
+        OutboxRetentionService(self.storage, now=self.now).run()
+        # 模拟入队与归档竞争：同一 dedupe_key 在归档后又以新 id 写回热表
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO notification_outbox (
+                    activity_code, contract_id, message_type, webhook_url, payload_json, dedupe_key, status, sent_at
+                ) VALUES ('ACT-A', 'old-sent', 'pending_orders_digest', 'https://example.com/a', '{}', 'old-sent',
+                          'sent', '2026-04-02 00:00:00')
+                """
+            )
+
+        with self.assertLogs(level="WARNING") as logs:
+            stats = OutboxRetentionService(self.storage, now=self.now).run()
+
+        self.assertEqual(stats["archived"], 0)
+        self.assertIn("保留在 notification_outbox", "\n".join(logs.output))
+        with sqlite3.connect(self.db_path) as conn:
+            hot = conn.execute("SELECT dedupe_key FROM notification_outbox WHERE dedupe_key = 'old-sent'").fetchall()
+            archived = conn.execute(
+                "SELECT id FROM notification_outbox_archive WHERE dedupe_key = 'old-sent'"
+            ).fetchall()
+        self.assertEqual(hot, [("old-sent",)])
+        self.assertEqual(archived, [(ids[0],)])
+
+    def test_compression_can_be_disabled(self):
+        os.environ["OUTBOX_ARCHIVE_COMPRESS"] = "0"
+        ids = self._seed()
+
+        OutboxRetentionService(self.storage, now=self.now).run()
+
+        with sqlite3.connect(self.db_path) as conn:
+            raw_payload, codec = conn.execute(
+                "SELECT payload_json, body_codec FROM notification_outbox_archive WHERE id = ?", (ids[0],)
+            ).fetchone()
+        self.assertEqual(codec, "")
+        self.assertIn("msgtype", raw_payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -61,6 +61,7 @@ class PendingOrdersReminderJobTest(unittest.TestCase):
 
     def tearDown(self):
         os.environ.pop("PENDING_ORDERS_DRY_RUN", None)
+        os.environ.pop("PENDING_ORDERS_SKIP_UNCHANGED", None)
         self.temp_dir.cleanup()
 
     def _build_response(self, rows):
@@ -78,6 +79,19 @@ class PendingOrdersReminderJobTest(unittest.TestCase):
             status,
         ]
 
+    def test_created_before_parameter_limits_query_window(self):
+        response = self._build_response([self._row("A001", 72)])
+
+        with patch.dict(os.environ, {"PENDING_ORDERS_CREATED_BEFORE_PARAM": "created_before", "PENDING_ORDERS_DRY_RUN": "1"}), patch(
+            "modules.core.pending_orders_jobs.send_request_with_managed_session", return_value=response
+        ) as mock_fetch:
+            PendingOrdersReminderService(self.storage, now=self.now).run()
+
+        parameters = mock_fetch.call_args.args[1]
+        self.assertEqual(parameters[0]["target"], ["variable", ["template-tag", "created_before"]])
+        # 12:00Z 前 48 小时，北京时间
+        self.assertEqual(parameters[0]["value"], "2026-03-28T20:00:00")
+
     def test_first_run_filters_and_sends_only_eligible_orders(self):
         rows = [
             self._row("A001", 72, org_name="测试服务商A", status="待预约"),
@@ -165,6 +179,60 @@ class PendingOrdersReminderJobTest(unittest.TestCase):
             ).fetchone()[0]
         self.assertEqual(active_count, 2)
 
+    def test_grouped_active_orders_are_fetched_in_one_query_with_digest(self):
+        rows = [
+            self._row("A001", 72, org_name="测试服务商A"),
+            self._row("A002", 80, org_name="测试服务商A"),
+            self._row("B001", 90, org_name="测试服务商B"),
+        ]
+        with patch(
+            "modules.core.pending_orders_jobs.send_request_with_managed_session",
+            return_value=self._build_response(rows),
+        ), patch("modules.core.pending_orders_jobs.requests.post") as mock_post, patch.object(
+            self.storage, "get_active_pending_orders_by_org", wraps=self.storage.get_active_pending_orders_by_org
+        ) as per_org_query:
+            mock_post.return_value = MagicMock(status_code=200, text="ok")
+            PendingOrdersReminderService(self.storage, now=self.now).run()
+
+        per_org_query.assert_not_called()
+        grouped = self.storage.get_active_pending_orders_grouped("PENDING-ORDERS-REMINDER")
+        self.assertEqual(list(grouped), ["测试服务商A", "测试服务商B"])
+        self.assertEqual([row["order_num"] for row in grouped["测试服务商A"]["rows"]], ["A002", "A001"])
+        self.assertNotIn("last_notified_digest", grouped["测试服务商A"]["rows"][0])
+        for group in grouped.values():
+            self.assertEqual(group["last_notified_digest"], group["digest_fingerprint"])
+
+    def test_skip_unchanged_only_resends_orgs_whose_active_set_changed(self):
+        os.environ["PENDING_ORDERS_SKIP_UNCHANGED"] = "1"
+        first_response = self._build_response(
+            [self._row("A001", 72, org_name="测试服务商A"), self._row("B001", 72, org_name="测试服务商B")]
+        )
+        second_response = self._build_response(
+            [
+                self._row("A001", 72, org_name="测试服务商A"),
+                self._row("B001", 72, org_name="测试服务商B"),
+                self._row("B002", 60, org_name="测试服务商B"),
+            ]
+        )
+
+        with patch(
+            "modules.core.pending_orders_jobs.send_request_with_managed_session",
+            side_effect=[first_response, second_response, second_response],
+        ), patch("modules.core.pending_orders_jobs.requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text="ok")
+            service = PendingOrdersReminderService(self.storage, now=self.now)
+            first_stats = service.run()
+            service.now = self.now + timedelta(minutes=30)
+            second_stats = service.run()
+            service.now = self.now + timedelta(minutes=60)
+            third_stats = service.run()
+
+        self.assertEqual((first_stats["sent"], first_stats["orgs_unchanged"]), (2, 0))
+        self.assertEqual((second_stats["sent"], second_stats["orgs_unchanged"]), (1, 1))
+        self.assertEqual((third_stats["sent"], third_stats["orgs_unchanged"]), (0, 2))
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertIn("测试服务商B", mock_post.call_args_list[2].kwargs["json"]["text"]["content"])
+
     def test_webhook_router_pending_orders_uses_default_webhook_and_org_override(self):
         sign_webhook = resolve_wecom_webhook(CHANNEL_SIGN_BROADCAST)
         pending_default = resolve_wecom_webhook(CHANNEL_PENDING_ORDERS, org_name="未知服务商")
@@ -209,6 +277,78 @@ class PendingOrdersReminderJobTest(unittest.TestCase):
         self.assertEqual(stats["enqueued"], 0)
         mock_post.assert_not_called()
 
+    def test_bulk_enqueue_returns_status_and_created_flag_per_message(self):
+        def message(dedupe_key):
+            return {
+                "activity_code": "PENDING-ORDERS-TEST",
+                "contract_id": dedupe_key,
+                "message_type": "pending_orders_digest",
+                "webhook_url": "https://example.com/hook",
+                "payload_json": "{}",
+                "metadata_json": '{"org_name": "%s"}' % dedupe_key,
+                "dedupe_key": dedupe_key,
+            }
+
+        first = self.storage.enqueue_outbox_messages([message("k1"), message("k2")])
+        self.storage.mark_outbox_sent(first[0]["id"], 200, "ok")
+        second = self.storage.enqueue_outbox_messages([message("k1"), message("k3"), message("k3")])
+
+        self.assertEqual([item["created"] for item in first], [True, True])
+        self.assertEqual(second[0]["id"], first[0]["id"])
+        self.assertEqual(second[0]["status"], "sent")
+        self.assertFalse(second[0]["created"])
+        self.assertEqual(second[0]["metadata_json"], '{"org_name": "k1"}')
+        self.assertTrue(second[1]["created"])
+        self.assertEqual(second[2]["id"], second[1]["id"])
+        self.assertFalse(second[2]["created"])
+
+    def test_sync_snapshots_upserts_reactivates_and_deactivates_in_one_pass(self):
+        def snapshot(index, status="待预约"):
+            return {
+                "order_num": f"S{index:05d}",
+                "customer_name": f"客户-{index}",
+                "address": f"地址-{index}",
+                "supervisor_name": "负责人",
+                "create_time": "2026-03-27T12:00:00+00:00",
+                "org_name": f"服务商{index % 7}",
+                "order_status": status,
+                "status_fingerprint": f"S{index:05d}|{status}",
+                "eligible_since": "2026-03-29T12:00:00+00:00",
+                "extensions": "",
+            }
+
+        activity_code = "PENDING-ORDERS-SYNC"
+        # 超过 SQLite 默认变量上限，验证失活不再依赖 NOT IN 参数列表
+        first = self.storage.sync_pending_order_snapshots(activity_code, [snapshot(i) for i in range(1500)])
+        self.assertEqual(first, {"upserted": 1500, "deactivated": 0})
+        self.storage.mark_pending_orders_notified(activity_code, ["S00000|待预约", "S00001|待预约"])
+
+        second = self.storage.sync_pending_order_snapshots(
+            activity_code,
+            [snapshot(i) for i in range(1, 1200)] + [snapshot(1, "暂不上门"), snapshot(5), snapshot(5)],
+        )
+        self.assertEqual(second, {"upserted": 1200, "deactivated": 301})
+
+        self.storage.sync_pending_order_snapshots(activity_code, [snapshot(0)] + [snapshot(i) for i in range(1, 1200)])
+
+        with sqlite3.connect(self.db_path) as conn:
+            rows = dict(
+                (fingerprint, (is_active, notification_sent))
+                for fingerprint, is_active, notification_sent in conn.execute(
+                    "SELECT status_fingerprint, is_active, notification_sent FROM pending_order_reminders"
+                )
+            )
+            staging_count = conn.execute("SELECT COUNT(*) FROM pending_order_snapshot_staging").fetchone()[0]
+
+        self.assertEqual(len(rows), 1501)
+        # 失活后重新出现：重新激活并重置提醒状态
+        self.assertEqual(rows["S00000|待预约"], (1, 0))
+        # 一直活跃：保留已提醒状态
+        self.assertEqual(rows["S00001|待预约"], (1, 1))
+        self.assertEqual(rows["S00001|暂不上门"], (0, 0))
+        self.assertEqual(rows["S01300|待预约"], (0, 0))
+        self.assertEqual(staging_count, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
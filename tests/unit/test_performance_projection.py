@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from modules.core.data_models import City, ContractData, HousekeeperStats, PerformanceRecord, ProcessingConfig
+from modules.core.notification_service import NotificationService
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class PerformanceProjectionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SQLitePerformanceDataStore(os.path.join(self.temp_dir.name, "projection.db"))
+        rows = [
+            ("p1", json.dumps({"合同编号(contractdocNum)": "HT-1", "管家累计金额": 12000, "备注": None}, ensure_ascii=False)),
+            # 含 NaN 的 extensions 不是合法 JSON，需回退 Python 解码
+            ("p2", json.dumps({"合同编号(contractdocNum)": "HT-2", "转化率(conversion)": float("nan")}, ensure_ascii=False)),
+            ("p3", ""),
+        ]
+        with self.store._connect() as conn:
+            for contract_id, extensions in rows:
+                conn.execute(
+                    """
+                    INSERT INTO performance_data (
+                        activity_code, contract_id, housekeeper, contract_amount, performance_amount,
+                        reward_types, reward_names, notification_sent, extensions
+                    ) VALUES ('ACT', ?, '管家A_服务商', 1000, 1000, '["节节高"]', '["达标奖"]', 0, ?)
+                    """,
+                    (contract_id, extensions),
+                )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_projection_extracts_only_requested_extension_keys(self):
+        rows = self.store.query_performance_projection(
+            {"activity_code": "ACT"},
+            columns=("contract_id", "contract_amount"),
+            extension_keys=("合同编号(contractdocNum)", "管家累计金额", "备注"),
+        )
+
+        self.assertEqual([row.contract_id for row in rows], ["p1", "p2", "p3"])
+        self.assertEqual(rows[0].contract_amount, 1000)
+        self.assertEqual(rows[0].extensions, {"合同编号(contractdocNum)": "HT-1", "管家累计金额": 12000})
+        self.assertEqual(rows[1].extensions, {"合同编号(contractdocNum)": "HT-2"})
+        self.assertEqual(rows[2].extensions, {})
+
+    def test_projection_rejects_non_identifier_columns(self):
+        with self.assertRaises(ValueError):
+            self.store.query_performance_projection({}, columns=("contract_id; DROP TABLE performance_data",))
+
+    def test_notification_records_match_full_row_conversion(self):
+        config = ProcessingConfig(
+            config_key="BJ-2025-11",
+            activity_code="ACT",
+            city=City.BEIJING,
+            housekeeper_key_format="管家_服务商",
+        )
+        service = NotificationService(storage=self.store, config=config)
+
+        expected = [
+            service._convert_record_to_dict(row)
+            for row in self.store.query_performance_records({"activity_code": "ACT", "notification_sent": False})
+        ]
+        expected[0]["备注"] = "无"  # 投影不区分 JSON null 与缺失键，均取默认值
+
+        self.assertEqual(service._get_notification_records(), expected)
+
+    def test_saved_records_fill_promoted_columns(self):
+        record = PerformanceRecord(
+            activity_code="ACT",
+            contract_data=ContractData(
+                contract_id="saved-1",
+                housekeeper="管家B",
+                service_provider="服务商",
+                contract_amount=2000,
+                raw_data={"合同编号(contractdocNum)": "HT-S1", "项目地址(projectAddress)": "上海市某路1号"},
+            ),
+            housekeeper_stats=HousekeeperStats(housekeeper="管家B", activity_code="ACT", contract_count=4),
+            rewards=[],
+            performance_amount=2000,
+        )
+        self.store.save_performance_record(record)
+
+        with self.store._connect() as conn:
+            rows = conn.execute(
+                "SELECT contract_id, ext_promoted, ext_contract_doc_num, ext_project_address, ext_housekeeper_contract_count "
+                "FROM performance_data WHERE contract_id IN ('p1', 'saved-1') ORDER BY id"
+            ).fetchall()
+        # 直接 INSERT 的行（模拟旧版本写入）未提升，读取时回退 JSON
+        self.assertEqual(rows, [("p1", 0, None, None, None), ("saved-1", 1, "HT-S1", "上海市某路1号", 4)])
+
+    def test_migration_backfills_promoted_columns_for_existing_database(self):
+        db_path = os.path.join(self.temp_dir.name, "legacy.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE performance_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    activity_code TEXT NOT NULL, contract_id TEXT NOT NULL, housekeeper TEXT NOT NULL,
+                    service_provider TEXT, contract_amount REAL NOT NULL, performance_amount REAL NOT NULL,
+                    paid_amount REAL DEFAULT 0, project_id TEXT, order_type TEXT DEFAULT 'platform',
+                    contract_sequence INTEGER DEFAULT 0, reward_types TEXT, reward_names TEXT,
+                    is_historical BOOLEAN DEFAULT FALSE, notification_sent BOOLEAN DEFAULT FALSE,
+                    remarks TEXT DEFAULT '', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, extensions TEXT,
+                    UNIQUE(activity_code, contract_id)
+                )
+                """
+            )
+            conn.executemany(
+                "INSERT INTO performance_data (activity_code, contract_id, housekeeper, contract_amount, performance_amount, extensions) "
+                "VALUES ('ACT', ?, '管家A', 1, 1, ?)",
+                [
+                    ("legacy-1", json.dumps({"合同编号(contractdocNum)": "HT-L1", "管家累计单数": 3}, ensure_ascii=False)),
+                    ("legacy-nan", '{"转化率(conversion)": NaN}'),
+                ],
+            )
+
+        store = SQLitePerformanceDataStore(db_path)
+
+        with store._connect() as conn:
+            rows = conn.execute(
+                "SELECT contract_id, ext_promoted, ext_contract_doc_num, ext_housekeeper_contract_count "
+                "FROM performance_data ORDER BY id"
+            ).fetchall()
+            version = conn.execute("SELECT 1 FROM schema_version WHERE version = '1.4.0'").fetchone()
+        self.assertEqual(rows, [("legacy-1", 1, "HT-L1", 3), ("legacy-nan", 0, None, None)])
+        self.assertIsNotNone(version)
+
+        projected = store.query_performance_projection(
+            {"activity_code": "ACT"},
+            columns=("contract_id",),
+            extension_keys=("合同编号(contractdocNum)", "管家累计单数", "转化率(conversion)"),
+        )
+        self.assertEqual(projected[0].extensions, {"合同编号(contractdocNum)": "HT-L1", "管家累计单数": 3})
+        self.assertEqual(list(projected[1].extensions), ["转化率(conversion)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from modules.core.data_models import City, ProcessingConfig
+from modules.core.notification_service import NotificationService
+from modules.core.processing_pipeline import DataProcessingPipeline
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class PipelineInlineOutboxJobTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _contracts(self):
+        return [
+            {
+                '合同ID(_id)': 'inline-c1',
+                '管家(serviceHousekeeper)': '测试管家A',
+                '合同金额(adjustRefundMoney)': 50000,
+                '工单类型(sourceType)': 2,
+                '服务商(orgName)': '测试服务商',
+                '转化率(conversion)': 0.5,
+                '合同编号(contractdocNum)': 'HT-INLINE-1',
+            }
+        ]
+
+    def _run(self, name, enable_inline_outbox):
+        store = SQLitePerformanceDataStore(os.path.join(self.temp_dir.name, f"{name}.db"))
+        config = ProcessingConfig(
+            config_key="BJ-2025-11",
+            activity_code="BJ-NOV",
+            city=City.BEIJING,
+            housekeeper_key_format="管家",
+            enable_inline_outbox=enable_inline_outbox,
+        )
+        DataProcessingPipeline(config, store).process(self._contracts())
+        with patch.object(store, "query_performance_projection", wraps=store.query_performance_projection) as mock_query, patch(
+            "modules.core.notification_service.requests.post", return_value=Mock(status_code=200, text="ok")
+        ):
+            stats = NotificationService(store, config).send_notifications()
+        with store._connect() as conn:
+            rows = conn.execute(
+                "SELECT contract_id, message_type, payload_json, status FROM notification_outbox"
+            ).fetchall()
+        return stats, rows, mock_query
+
+    def test_inline_outbox_matches_read_back_payload_without_re_reading(self):
+        classic_stats, classic_rows, _ = self._run("classic", enable_inline_outbox=False)
+        inline_stats, inline_rows, inline_query = self._run("inline", enable_inline_outbox=True)
+
+        self.assertEqual(len(classic_rows), 1)
+        self.assertEqual(len(inline_rows), 1)
+        contract_id, message_type, payload_json, status = inline_rows[0]
+        self.assertEqual((contract_id, message_type, status), ("inline-c1", "group_broadcast", "sent"))
+        self.assertEqual(json.loads(payload_json), json.loads(classic_rows[0][2]))
+        self.assertEqual(inline_stats["sent"], classic_stats["sent"])
+        # 只做一次“无 outbox 记录”的反连接回读，且正常情况下为空
+        inline_query.assert_called_once()
+        self.assertEqual(inline_query.call_args.args[0]["without_outbox_message_type"], "group_broadcast")
+        self.assertEqual(inline_stats["records"], 0)
+
+    def test_render_failure_still_stores_record_and_read_back_enqueues_it(self):
+        store = SQLitePerformanceDataStore(os.path.join(self.temp_dir.name, "render-failure.db"))
+        config = ProcessingConfig(
+            config_key="BJ-2025-11",
+            activity_code="BJ-NOV",
+            city=City.BEIJING,
+            housekeeper_key_format="管家",
+            enable_inline_outbox=True,
+        )
+        with patch.object(NotificationService, "build_outbox_message", side_effect=KeyError("模板字段缺失")):
+            DataProcessingPipeline(config, store).process(self._contracts())
+
+        stored = store.query_performance_records({"activity_code": "BJ-NOV"})
+        self.assertEqual([row["contract_id"] for row in stored], ["inline-c1"])
+        with store._connect() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM notification_outbox").fetchone(), (0,))
+
+        with patch("modules.core.notification_service.requests.post", return_value=Mock(status_code=200, text="ok")):
+            stats = NotificationService(store, config).send_notifications()
+            again = NotificationService(store, config).send_notifications()
+
+        self.assertEqual((stats["records"], stats["sent"]), (1, 1))
+        self.assertEqual((again["records"], again["sent"]), (0, 0))
+        with store._connect() as conn:
+            self.assertEqual(
+                conn.execute("SELECT contract_id, status FROM notification_outbox").fetchall(),
+                [("inline-c1", "sent")],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
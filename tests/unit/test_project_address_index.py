@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from modules.core.data_models import City, ProcessingConfig
+from modules.core.processing_pipeline import DataProcessingPipeline
+from modules.core.storage import SQLitePerformanceDataStore
+
+
+class ProjectAddressIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = SQLitePerformanceDataStore(os.path.join(self.temp_dir.name, "address.db"))
+        self.config = ProcessingConfig(
+            config_key="SH-2025-09",
+            activity_code="SH-SEP",
+            city=City.SHANGHAI,
+            housekeeper_key_format="管家_服务商",
+            enable_dual_track=True,
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _self_referral(self, contract_id, address):
+        return {
+            '合同ID(_id)': contract_id,
+            '管家(serviceHousekeeper)': '测试管家',
+            '服务商(orgName)': '测试服务商',
+            '合同金额(adjustRefundMoney)': 8000,
+            '工单类型(sourceType)': 1,
+            '项目地址(projectAddress)': address,
+            '合同编号(contractdocNum)': f'HT-{contract_id}',
+        }
+
+    def test_duplicate_address_detected_across_runs(self):
+        first = DataProcessingPipeline(self.config, self.store).process([self._self_referral("sr-1", "上海市 徐汇区 某路1号")])
+        # 新一轮心跳：全角/空白差异的同一地址仍判为重复
+        second = DataProcessingPipeline(self.config, self.store).process([
+            self._self_referral("sr-2", "上海市徐汇区某路１号"),
+            self._self_referral("sr-3", "上海市徐汇区某路2号"),
+        ])
+
+        self.assertTrue(first[0].rewards)
+        self.assertEqual(second[0].rewards, [])
+        self.assertTrue(second[1].rewards)
+        self.assertEqual(len(self.store.get_project_address_index("SH-SEP")), 3)
+
+    def test_existing_records_are_backfilled_into_index(self):
+        DataProcessingPipeline(self.config, self.store).process([self._self_referral("sr-1", "上海市某路1号")])
+        with self.store._connect() as conn:
+            conn.execute("DELETE FROM project_address_index")
+
+        pipeline = DataProcessingPipeline(self.config, self.store)
+        records = pipeline.process([self._self_referral("sr-2", "上海市某路1号")])
+
+        self.assertEqual(records[0].rewards, [])
+        self.assertEqual(
+            [row["contract_id"] for row in self.store.get_project_address_index("SH-SEP")],
+            ["sr-1", "sr-2"],
+        )
+
+    def test_refresh_delete_drops_index_entries_of_removed_contracts(self):
+        DataProcessingPipeline(self.config, self.store).process([
+            self._self_referral("sr-1", "上海市某路1号"),
+            self._self_referral("sr-2", "上海市某路2号"),
+        ])
+        # 全量快照刷新：源数据已不再包含 sr-1
+        self.assertEqual(self.store.delete_performance_records_not_in("SH-SEP", {"sr-2"}), 1)
+
+        records = DataProcessingPipeline(self.config, self.store).process([self._self_referral("sr-3", "上海市某路1号")])
+
+        self.assertTrue(records[0].rewards)
+        self.assertEqual(
+            [row["contract_id"] for row in self.store.get_project_address_index("SH-SEP")],
+            ["sr-2", "sr-3"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ import os
 import sqlite3
 import sys
 import tempfile
+import threading
 import types
 import unittest
 from datetime import datetime, timezone
@@ -65,9 +66,12 @@ from modules.core.project_settlement_jobs import CONTRACT_COMPLETION_SYNC_CONFIG
 from modules.core.project_settlement_jobs import CREW_SETTLEMENT_FINANCE_LEDGER_SYNC_CONFIG
 from modules.core.project_settlement_jobs import MATERIAL_REPLENISHMENT_SYNC_CONFIG
 from modules.core.project_settlement_jobs import PAYMENT_RECORDS_SYNC_CONFIG
+from modules.core.project_settlement_jobs import PROJECT_SETTLEMENT_SYNC_CONFIG
 from modules.core.project_settlement_jobs import ProjectSettlementSmartsheetService
 from modules.core.project_settlement_jobs import SmartsheetSyncService
+from modules.core.project_settlement_jobs import sync_all_smartsheets_v2
 from modules.core.storage import create_data_store
+from modules.metabase_stream import MetabaseCardStream
 
 
 class ProjectSettlementSmartsheetJobTest(unittest.TestCase):
@@ -186,6 +190,159 @@ class ProjectSettlementSmartsheetJobTest(unittest.TestCase):
         payload = json.loads(stored_payload)
         self.assertEqual(payload["add_records"][0]["values"]["f28Fkl"], [{"text": "已发起"}])
 
+    def test_unrouted_change_keeps_old_hash_and_is_sent_once_record_id_is_known(self):
+        first_response = self._response([self._row("HT001", settle_status="已发起")])
+        second_response = self._response([self._row("HT001", settle_status="已结算")])
+        activity_code = PROJECT_SETTLEMENT_SYNC_CONFIG.activity_code
+
+        with patch(
+            "modules.core.project_settlement_jobs.send_request_with_managed_session",
+            side_effect=[first_response, second_response, second_response],
+        ), patch("modules.core.project_settlement_jobs.requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text='{"errcode":0}')
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            service.run()
+            first_state = self.storage.get_smartsheet_sync_state(activity_code)
+            service.now = datetime(2026, 4, 15, 11, 0, 0)
+            second_stats = service.run()
+
+            self.assertEqual(second_stats["unrouted_changes"], 1)
+            self.assertEqual(self.storage.get_smartsheet_sync_state(activity_code), first_state)
+            identity_hash = next(iter(first_state))
+            self.storage.set_smartsheet_record_id(activity_code, identity_hash, "rec_late")
+            third_stats = service.run()
+
+        self.assertEqual(third_stats["card_unchanged"], 0)
+        self.assertEqual(third_stats["unrouted_changes"], 0)
+        self.assertEqual(third_stats["update_enqueued"], 1)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(mock_post.call_args_list[1].kwargs["json"]["update_records"][0]["record_id"], "rec_late")
+
+    def test_unchanged_record_skips_outbox_entirely(self):
+        response = self._response([self._row("HT001")])
+
+        with patch("modules.core.project_settlement_jobs.send_request_with_managed_session", return_value=response), patch(
+            "modules.core.project_settlement_jobs.requests.post"
+        ) as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text='{"errcode":0}')
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            service.run()
+            with patch.object(self.storage, "enqueue_outbox_messages") as mock_enqueue:
+                second_stats = service.run()
+
+        mock_enqueue.assert_not_called()
+        self.assertEqual(second_stats["unchanged_records"], 1)
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_unchanged_card_skips_processing_but_drains_due_outbox(self):
+        response = self._response([self._row("HT001"), self._row("HT002", team_name="李四")])
+
+        with patch("modules.core.project_settlement_jobs.send_request_with_managed_session", return_value=response), patch(
+            "modules.core.project_settlement_jobs.requests.post"
+        ) as mock_post:
+            mock_post.side_effect = [
+                MagicMock(status_code=500, text="error"),
+                MagicMock(status_code=200, text='{"errcode":0}'),
+                MagicMock(status_code=200, text='{"errcode":0}'),
+            ]
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            first_stats = service.run()
+            with patch.object(service, "_records_from_response") as mock_parse:
+                second_stats = service.run()
+
+        mock_parse.assert_not_called()
+        self.assertEqual(first_stats["card_unchanged"], 0)
+        self.assertEqual(first_stats["failed"], 1)
+        self.assertEqual(second_stats["card_unchanged"], 1)
+        self.assertEqual(second_stats["raw_records"], 2)
+        self.assertEqual(second_stats["unchanged_records"], 2)
+        self.assertEqual(second_stats["sent"], 1)
+        self.assertEqual(mock_post.call_count, 3)
+
+    def test_changed_card_row_count_runs_full_processing(self):
+        first_response = self._response([self._row("HT001")])
+        second_response = self._response([self._row("HT001"), self._row("HT002", team_name="李四")])
+
+        with patch(
+            "modules.core.project_settlement_jobs.send_request_with_managed_session",
+            side_effect=[first_response, second_response],
+        ), patch("modules.core.project_settlement_jobs.requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text='{"errcode":0}')
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            service.run()
+            second_stats = service.run()
+
+        self.assertEqual(second_stats["card_unchanged"], 0)
+        self.assertEqual(second_stats["unchanged_records"], 1)
+        self.assertEqual(second_stats["sent"], 1)
+        self.assertEqual(mock_post.call_count, 2)
+
+    def test_fingerprint_skip_can_be_disabled(self):
+        response = self._response([self._row("HT001")])
+
+        with patch.dict(os.environ, {"METABASE_FINGERPRINT_SKIP": "0"}), patch(
+            "modules.core.project_settlement_jobs.send_request_with_managed_session", return_value=response
+        ), patch("modules.core.project_settlement_jobs.requests.post") as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text='{"errcode":0}')
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            service.run()
+            second_stats = service.run()
+
+        self.assertEqual(second_stats["card_unchanged"], 0)
+        self.assertEqual(second_stats["unchanged_records"], 1)
+        self.assertEqual(self.storage.get_metabase_card_fingerprint(service.activity_code, service.sync_config.api_url), None)
+
+    def test_streaming_fetch_records_fingerprint_while_decoding(self):
+        response = self._response([self._row("HT001"), self._row("HT002", team_name="李四")])
+        body = json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+        def fake_stream(url):
+            return MetabaseCardStream([body[index:index + 50] for index in range(0, len(body), 50)])
+
+        with patch.dict(os.environ, {"METABASE_STREAMING": "1"}), patch(
+            "modules.core.project_settlement_jobs.send_streaming_request_with_managed_session", side_effect=fake_stream
+        ), patch("modules.core.project_settlement_jobs.send_request_with_managed_session") as mock_full, patch(
+            "modules.core.project_settlement_jobs.requests.post"
+        ) as mock_post:
+            mock_post.return_value = MagicMock(status_code=200, text='{"errcode":0}')
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            first_stats = service.run()
+            with patch.object(self.storage, "enqueue_outbox_messages") as mock_enqueue:
+                second_stats = service.run()
+
+        mock_full.assert_not_called()
+        mock_enqueue.assert_not_called()
+        self.assertEqual(first_stats["raw_records"], 2)
+        self.assertEqual(first_stats["sent"], 2)
+        self.assertEqual(second_stats["card_unchanged"], 1)
+        self.assertEqual(second_stats["unchanged_records"], 2)
+        self.assertEqual(mock_post.call_count, 2)
+
+    def test_changed_record_with_known_record_id_sends_update_records(self):
+        first_response = self._response([self._row("HT001", settle_status="已发起")])
+        second_response = self._response([self._row("HT001", settle_status="已结算")])
+
+        with patch(
+            "modules.core.project_settlement_jobs.send_request_with_managed_session",
+            side_effect=[first_response, second_response],
+        ), patch("modules.core.project_settlement_jobs.requests.post") as mock_post:
+            mock_post.return_value = MagicMock(
+                status_code=200,
+                text='{"errcode":0,"add_records":[{"record_id":"rec_001"}]}',
+            )
+            service = ProjectSettlementSmartsheetService(self.storage, now=self.now)
+            service.run()
+            service.now = datetime(2026, 4, 15, 11, 0, 0)
+            second_stats = service.run()
+
+        self.assertEqual(second_stats["update_enqueued"], 1)
+        self.assertEqual(second_stats["sent"], 1)
+        self.assertEqual(mock_post.call_count, 2)
+        update_payload = mock_post.call_args_list[1].kwargs["json"]
+        self.assertNotIn("add_records", update_payload)
+        self.assertEqual(update_payload["update_records"][0]["record_id"], "rec_001")
+        self.assertEqual(update_payload["update_records"][0]["values"]["f28Fkl"], [{"text": "已结算"}])
+
     def test_dry_run_previews_without_sending(self):
         os.environ["PROJECT_SETTLEMENT_SMARTSHEET_DRY_RUN"] = "1"
         response = self._response([self._row("HT001")])
@@ -564,5 +721,103 @@ class MaterialReplenishmentSmartsheetJobTest(unittest.TestCase):
         self.assertEqual(mock_post.call_count, 1)
 
 
+class UnifiedSmartsheetSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "unified-smartsheet.db")
+        os.environ["LOCAL_DB_PATH"] = self.db_path
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_cards_are_fetched_concurrently_and_processed_as_they_arrive(self):
+        configs = (PROJECT_SETTLEMENT_SYNC_CONFIG, CONTRACT_COMPLETION_SYNC_CONFIG, PAYMENT_RECORDS_SYNC_CONFIG)
+        last_started = threading.Event()
+        processed = []
+
+        def fake_fetch(url):
+            if url == PAYMENT_RECORDS_SYNC_CONFIG.api_url:
+                last_started.set()
+            if url == PROJECT_SETTLEMENT_SYNC_CONFIG.api_url:
+                # 串行请求时最后一张卡片永远不会开始，这里会超时
+                self.assertTrue(last_started.wait(timeout=5))
+            return {"data": {"cols": [], "rows": []}}
+
+        def fake_run(service, response):
+            processed.append(service.activity_code)
+            return {"raw_records": len(response["data"]["rows"])}
+
+        with patch("modules.core.project_settlement_jobs.send_request_with_managed_session", side_effect=fake_fetch), patch.object(
+            SmartsheetSyncService, "run", autospec=True, side_effect=fake_run
+        ):
+            results = sync_all_smartsheets_v2(sync_configs=configs, max_workers=3)
+
+        self.assertEqual(set(results), {config.activity_code for config in configs})
+        self.assertEqual(processed[-1], PROJECT_SETTLEMENT_SYNC_CONFIG.activity_code)
+
+    def test_failed_card_does_not_block_remaining_cards(self):
+        configs = (PROJECT_SETTLEMENT_SYNC_CONFIG, CONTRACT_COMPLETION_SYNC_CONFIG)
+
+        def fake_fetch(url):
+            if url == PROJECT_SETTLEMENT_SYNC_CONFIG.api_url:
+                raise TimeoutError("metabase timeout")
+            return {"data": {"cols": [], "rows": []}}
+
+        with patch("modules.core.project_settlement_jobs.send_request_with_managed_session", side_effect=fake_fetch), patch(
+            "modules.core.project_settlement_jobs.requests.post"
+        ) as mock_post:
+            with self.assertRaisesRegex(RuntimeError, PROJECT_SETTLEMENT_SYNC_CONFIG.log_label):
+                sync_all_smartsheets_v2(sync_configs=configs)
+
+        mock_post.assert_not_called()
+        storage = create_data_store(storage_type="sqlite", db_path=self.db_path)
+        self.assertIsNotNone(
+            storage.get_metabase_card_fingerprint(
+                CONTRACT_COMPLETION_SYNC_CONFIG.activity_code, CONTRACT_COMPLETION_SYNC_CONFIG.api_url
+            )
+        )
+
+    def test_streaming_cards_are_consumed_before_next_card_is_requested(self):
+        configs = (PROJECT_SETTLEMENT_SYNC_CONFIG, CONTRACT_COMPLETION_SYNC_CONFIG, PAYMENT_RECORDS_SYNC_CONFIG)
+        body = json.dumps({"data": {"cols": [], "rows": []}}).encode("utf-8")
+        requested = []
+        closed = []
+
+        def fake_stream(url):
+            # 预取时后续卡片的响应体在前一张处理期间无人读取，生产环境中会读超时
+            self.assertEqual(len(closed), len(requested))
+            requested.append(url)
+            return MetabaseCardStream([body[:10], body[10:]], on_close=lambda: closed.append(url))
+
+        with patch.dict(os.environ, {"METABASE_STREAMING": "1"}), patch(
+            "modules.core.project_settlement_jobs.send_streaming_request_with_managed_session", side_effect=fake_stream
+        ), patch("modules.core.project_settlement_jobs.send_request_with_managed_session") as mock_fetch:
+            results = sync_all_smartsheets_v2(sync_configs=configs, max_workers=3)
+
+        mock_fetch.assert_not_called()
+        self.assertEqual(requested, [config.api_url for config in configs])
+        self.assertEqual(closed, requested)
+        self.assertEqual(set(results), {config.activity_code for config in configs})
+
+    def test_card_leased_by_single_card_task_is_skipped(self):
+        configs = (PROJECT_SETTLEMENT_SYNC_CONFIG, CONTRACT_COMPLETION_SYNC_CONFIG)
+        storage = create_data_store(storage_type="sqlite", db_path=self.db_path)
+        self.assertTrue(storage.acquire_task_lease(PROJECT_SETTLEMENT_SYNC_CONFIG.task_name, "single-card-run", 600))
+        fetched = []
+
+        def fake_fetch(url):
+            fetched.append(url)
+            return {"data": {"cols": [], "rows": []}}
+
+        with patch("modules.core.project_settlement_jobs.send_request_with_managed_session", side_effect=fake_fetch):
+            results = sync_all_smartsheets_v2(sync_configs=configs)
+
+        self.assertEqual(fetched, [CONTRACT_COMPLETION_SYNC_CONFIG.api_url])
+        self.assertEqual(set(results), {CONTRACT_COMPLETION_SYNC_CONFIG.activity_code})
+        # 统一同步结束后释放自己持有的卡片租约，不影响他人的租约
+        self.assertTrue(storage.acquire_task_lease(CONTRACT_COMPLETION_SYNC_CONFIG.task_name, "single-card-run", 600))
+        self.assertFalse(storage.acquire_task_lease(PROJECT_SETTLEMENT_SYNC_CONFIG.task_name, "next-run", 600))
+
+
 if __name__ == "__main__":
     unittest.main()
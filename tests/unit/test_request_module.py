@@ -1,7 +1,12 @@
 import unittest
 from unittest.mock import MagicMock, patch
 
-from modules.request_module import _send_request_with_session, send_request_with_managed_session
+from modules.request_module import (
+    _send_request_with_session,
+    metabase_card_parameter,
+    send_request_with_managed_session,
+    send_streaming_request_with_managed_session,
+)
 
 
 class RequestModuleTest(unittest.TestCase):
@@ -14,6 +19,29 @@ class RequestModuleTest(unittest.TestCase):
 
         self.assertEqual(result, {"data": {"rows": []}})
 
+    def test_card_parameters_are_posted_as_query_body(self):
+        fake_response = MagicMock(status_code=200)
+        fake_response.json.return_value = {"data": {"rows": []}}
+        parameters = [metabase_card_parameter("since", "2026-07-01T16:30:00")]
+
+        with patch("modules.request_module.requests.post", return_value=fake_response) as mock_post:
+            _send_request_with_session("session-id", "http://example.com/api/card/123/query", parameters)
+            _send_request_with_session("session-id", "http://example.com/api/card/123/query")
+
+        self.assertEqual(
+            mock_post.call_args_list[0].kwargs["json"],
+            {
+                "parameters": [
+                    {
+                        "type": "date/single",
+                        "target": ["variable", ["template-tag", "since"]],
+                        "value": "2026-07-01T16:30:00",
+                    }
+                ]
+            },
+        )
+        self.assertIsNone(mock_post.call_args_list[1].kwargs["json"])
+
     def test_send_request_with_managed_session_uses_valid_session(self):
         fake_response = MagicMock(status_code=200)
         fake_response.json.return_value = {"data": {"rows": []}}
@@ -25,6 +53,21 @@ class RequestModuleTest(unittest.TestCase):
 
         self.assertEqual(result, {"data": {"rows": []}})
 
+    def test_streaming_request_parses_body_incrementally(self):
+        fake_response = MagicMock(status_code=200)
+        fake_response.iter_content.return_value = [b'{"data":{"rows":[[1,"a"],', b'[2,"b"]],"cols":[{"name":"id"}]}}']
+
+        with patch("modules.request_module.get_valid_session", return_value="session-id"), patch(
+            "modules.request_module.requests.post", return_value=fake_response
+        ) as mock_post:
+            stream = send_streaming_request_with_managed_session("http://example.com/api/card/123/query")
+            self.assertEqual(stream.cols, [{"name": "id"}])
+            self.assertEqual(list(stream), [[1, "a"], [2, "b"]])
+
+        self.assertTrue(mock_post.call_args.kwargs["stream"])
+        fake_response.json.assert_not_called()
+        fake_response.close.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
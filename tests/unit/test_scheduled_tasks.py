@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from modules.core import scheduled_tasks, storage
+from modules.time_parsing import BEIJING_TZ
+
+
+class ScheduledTaskRoutingTest(unittest.TestCase):
+    def test_heartbeat_routing_matches_worker(self):
+        regular = scheduled_tasks.tasks_for_time(datetime(2026, 3, 23, 10, 30, tzinfo=BEIJING_TZ))
+        self.assertEqual(regular, list(scheduled_tasks.HEARTBEAT_TASKS))
+
+        # 00:30 UTC == 08:30 北京
+        morning = scheduled_tasks.tasks_for_time(datetime(2026, 3, 23, 0, 30, tzinfo=timezone.utc))
+        self.assertEqual(morning[-1], "pending-orders-reminder")
+        report = scheduled_tasks.tasks_for_time(datetime(2026, 3, 23, 9, 0, tzinfo=BEIJING_TZ))
+        self.assertEqual(report[-1], "daily-service-report")
+        # 15:30 UTC == 23:30 北京，生产环境只经由 worker 心跳归档 outbox
+        retention = scheduled_tasks.tasks_for_time(datetime(2026, 3, 23, 15, 30, tzinfo=timezone.utc))
+        self.assertEqual(retention[-1], "outbox-retention")
+
+    def test_trigger_targets(self):
+        now = datetime(2026, 3, 23, 10, 0, tzinfo=BEIJING_TZ)
+        self.assertEqual(
+            scheduled_tasks.resolve_trigger_target("smartsheet-sync", now), list(scheduled_tasks.SMARTSHEET_TASKS)
+        )
+        self.assertEqual(scheduled_tasks.resolve_trigger_target("pending-orders", now), ["pending-orders-reminder"])
+        self.assertIn("daily-service-report", scheduled_tasks.resolve_trigger_target("all", now))
+        # 未知目标回退到按时间路由
+        self.assertEqual(scheduled_tasks.resolve_trigger_target("unknown", now), list(scheduled_tasks.HEARTBEAT_TASKS))
+
+    def test_next_heartbeat(self):
+        cases = {
+            datetime(2026, 3, 23, 10, 0): datetime(2026, 3, 23, 10, 30),
+            datetime(2026, 3, 23, 10, 12, 45): datetime(2026, 3, 23, 10, 30),
+            datetime(2026, 3, 23, 23, 30): datetime(2026, 3, 24, 8, 0),
+            datetime(2026, 3, 23, 3, 5): datetime(2026, 3, 23, 8, 0),
+        }
+        for now, expected in cases.items():
+            with self.subTest(now=now):
+                self.assertEqual(scheduled_tasks.next_heartbeat(now), expected.replace(tzinfo=BEIJING_TZ))
+
+    def test_every_task_resolves(self):
+        for name in scheduled_tasks.TASKS:
+            with self.subTest(name=name):
+                self.assertTrue(callable(scheduled_tasks.resolve_task(name)))
+        with self.assertRaises(KeyError):
+            scheduled_tasks.run_task("no-such-task")
+
+    def test_smartsheet_lease_keys_match_single_card_tasks(self):
+        from modules.core.project_settlement_jobs import SMARTSHEET_SYNC_CONFIGS
+
+        self.assertEqual(
+            tuple(config.task_name for config in SMARTSHEET_SYNC_CONFIGS), scheduled_tasks.SMARTSHEET_TASKS
+        )
+
+    def test_expand_task_selection(self):
+        names = scheduled_tasks.expand_task_selection(
+            ["beijing-sign-broadcast,smartsheet-sync", "payment-records-smartsheet", "outbox-drain"]
+        )
+        self.assertEqual(
+            names, ["beijing-sign-broadcast", *scheduled_tasks.SMARTSHEET_TASKS, "outbox-drain"]
+        )
+        with self.assertRaises(ValueError):
+            scheduled_tasks.expand_task_selection(["beijing-sign-broadcast", "nope"])
+
+    def test_run_tasks_isolates_failures(self):
+        calls = []
+
+        def ok(**kwargs):
+            calls.append(kwargs)
+            return {"sent": 1}
+
+        def boom():
+            raise RuntimeError("metabase down")
+
+        funcs = {"outbox-drain": ok, "beijing-sign-broadcast": boom, "outbox-retention": ok, "daily-service-report": ok}
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {"LOCAL_DB_PATH": os.path.join(tmp, "t.db")}):
+            # 其他进程正在运行日报：本次跳过，不计为失败
+            storage.SQLitePerformanceDataStore(os.environ["LOCAL_DB_PATH"]).acquire_task_lease(
+                "daily-service-report", "other-host", 60
+            )
+            with patch.object(scheduled_tasks, "resolve_task", side_effect=funcs.__getitem__):
+                results = scheduled_tasks.run_tasks(
+                    list(funcs), max_workers=2, task_kwargs={"outbox-drain": {"budget_seconds": 5}}
+                )
+
+        self.assertEqual(list(results), list(funcs))
+        self.assertEqual(results["outbox-drain"]["result"], {"sent": 1})
+        self.assertEqual(results["beijing-sign-broadcast"]["status"], "failed")
+        self.assertIn("metabase down", results["beijing-sign-broadcast"]["error"])
+        self.assertEqual(results["outbox-retention"]["status"], "success")
+        self.assertEqual(results["daily-service-report"]["status"], "skipped")
+        self.assertIn({"budget_seconds": 5}, calls)
+        self.assertIn({}, calls)
+
+
+class StartupImportTest(unittest.TestCase):
+    def test_sign_broadcast_path_does_not_load_pandas(self):
+        code = (
+            "import sys\n"
+            "from modules.core import scheduled_tasks\n"
+            "scheduled_tasks.resolve_task('beijing-sign-broadcast')\n"
+            "import modules.request_module, modules.core.notification_service, modules.data_utils\n"
+            "print(','.join(m for m in ('pandas', 'pytz', 'main') if m in sys.modules))\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with tempfile.TemporaryDirectory() as tmp:
+            proc = subprocess.run(
+                [sys.executable, "-c", code],
+                cwd=tmp,
+                env={**os.environ, "PYTHONPATH": root},
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        self.assertEqual(proc.stdout.strip(), "")
+
+
+class StoreReuseTest(unittest.TestCase):
+    def tearDown(self):
+        storage.enable_store_reuse(False)
+
+    def test_create_data_store_reuses_instance_only_when_enabled(self):
+        with tempfile.TemporaryDirectory() as tmp, patch.dict(os.environ, {"LOCAL_DB_PATH": os.path.join(tmp, "reuse.db")}):
+            first = storage.create_data_store(storage_type="sqlite")
+            self.assertIsNot(first, storage.create_data_store(storage_type="sqlite"))
+
+            with patch("modules.core.storage.requests.Session", return_value=MagicMock(), create=True):
+                storage.enable_store_reuse()
+            warm = storage.create_data_store(storage_type="sqlite")
+            self.assertIs(warm, storage.create_data_store(storage_type="sqlite"))
+
+            storage.enable_store_reuse(False)
+            self.assertIsNot(warm, storage.create_data_store(storage_type="sqlite"))
+
+    def test_turso_connection_uses_shared_session(self):
+        fake_session = MagicMock()
+        fake_session.post.return_value.json.return_value = {"results": []}
+        with patch("modules.core.storage.requests.Session", return_value=fake_session, create=True):
+            storage.enable_store_reuse()
+        conn = storage.TursoHttpConnection("libsql://example.turso.io", "token")
+        conn._send({"requests": []})
+        fake_session.post.assert_called_once()
+        self.assertEqual(fake_session.post.call_args.args[0], "https://example.turso.io/v2/pipeline")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from modules.core.storage import SQLitePerformanceDataStore
+from modules.core.task_lease import TaskLease, TaskLeaseBusy, with_task_lease
+
+
+class TaskLeaseStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLitePerformanceDataStore(os.path.join(self.tmp.name, "lease.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_acquire_renew_release(self):
+        self.assertTrue(self.store.acquire_task_lease("sync", "a", 60))
+        self.assertFalse(self.store.acquire_task_lease("sync", "b", 60))
+        # 同一 owner 可重入
+        self.assertTrue(self.store.acquire_task_lease("sync", "a", 60))
+        self.assertTrue(self.store.renew_task_lease("sync", "a", 60))
+        self.assertFalse(self.store.renew_task_lease("sync", "b", 60))
+
+        self.store.release_task_lease("sync", "b")
+        self.assertFalse(self.store.acquire_task_lease("sync", "b", 60))
+        self.store.release_task_lease("sync", "a")
+        self.assertTrue(self.store.acquire_task_lease("sync", "b", 60))
+
+    def test_stale_lease_takeover(self):
+        self.assertTrue(self.store.acquire_task_lease("sync", "crashed", 60))
+        with self.store._connect() as conn:
+            conn.execute("UPDATE task_leases SET expires_at = ?", (time.time() - 1,))
+            conn.commit()
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertTrue(self.store.acquire_task_lease("sync", "next", 60))
+        self.assertIn("crashed", "\n".join(logs.output))
+        self.assertFalse(self.store.renew_task_lease("sync", "crashed", 60))
+
+
+class TaskLeaseContextTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLitePerformanceDataStore(os.path.join(self.tmp.name, "lease.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_skip_mode_raises_when_held(self):
+        with TaskLease("sync", store=self.store, owner="first", mode="skip") as lease:
+            self.assertTrue(lease.held)
+            with self.assertRaises(TaskLeaseBusy):
+                with TaskLease("sync", store=self.store, owner="second", mode="skip"):
+                    pass
+        # 退出后已释放
+        with TaskLease("sync", store=self.store, owner="second", mode="skip") as lease:
+            self.assertTrue(lease.held)
+
+    def test_wait_mode_polls_until_released(self):
+        self.store.acquire_task_lease("sync", "first", 60)
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                self.store.release_task_lease("sync", "first")
+
+        with TaskLease(
+            "sync", store=self.store, owner="second", mode="wait", wait_seconds=30, poll_seconds=5, sleep=fake_sleep
+        ) as lease:
+            self.assertTrue(lease.held)
+        self.assertEqual(sleeps, [5, 5])
+
+    def test_wait_mode_gives_up_after_timeout(self):
+        self.store.acquire_task_lease("sync", "first", 60)
+        now = [0.0]
+
+        def fake_sleep(seconds):
+            now[0] += seconds
+
+        with self.assertRaises(TaskLeaseBusy):
+            with TaskLease(
+                "sync",
+                store=self.store,
+                owner="second",
+                mode="wait",
+                wait_seconds=12,
+                poll_seconds=5,
+                sleep=fake_sleep,
+                clock=lambda: now[0],
+            ):
+                pass
+        self.assertEqual(now[0], 12)
+
+    def test_decorator_skips_overlapping_run(self):
+        calls = []
+
+        @with_task_lease("sync")
+        def job():
+            calls.append(1)
+            return "done"
+
+        with patch.dict(os.environ, {"LOCAL_DB_PATH": os.path.join(self.tmp.name, "lease.db")}):
+            self.assertEqual(job(), "done")
+            self.store.acquire_task_lease("sync", "other", 60)
+            self.assertIsNone(job())
+        self.assertEqual(calls, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from modules.time_parsing import (
+    BEIJING_TZ,
+    clear_parse_cache,
+    parse_cache_info,
+    parse_datetime,
+    parse_datetime_or_none,
+)
+
+
+class TimeParsingTest(unittest.TestCase):
+    def setUp(self):
+        clear_parse_cache()
+
+    def test_metabase_formats(self):
+        cst = timezone(timedelta(hours=8))
+        cases = {
+            "2026-03-23T03:02:00.17+08:00": datetime(2026, 3, 23, 3, 2, 0, 170000, tzinfo=cst),
+            "2026-03-23T09:38:53+08:00": datetime(2026, 3, 23, 9, 38, 53, tzinfo=cst),
+            "2026-03-23T01:02:03.1234567Z": datetime(2026, 3, 23, 1, 2, 3, 123456, tzinfo=timezone.utc),
+            "2026-03-23T01:02:03Z": datetime(2026, 3, 23, 1, 2, 3, tzinfo=timezone.utc),
+            "2026-03-23 10:00:00": datetime(2026, 3, 23, 10, 0, 0),
+            "2026-03-23": datetime(2026, 3, 23),
+            "2026/03/23 10:00": datetime(2026, 3, 23, 10, 0),
+            "2026/03/23": datetime(2026, 3, 23),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                parsed = parse_datetime(text)
+                self.assertEqual(parsed, expected)
+                self.assertEqual(parsed.utcoffset(), expected.utcoffset())
+
+    def test_default_tz_only_applies_to_naive_values(self):
+        self.assertEqual(parse_datetime("2026-03-23 10:00", default_tz=BEIJING_TZ).tzinfo, BEIJING_TZ)
+        self.assertEqual(parse_datetime("2026-03-23T10:00:00Z", default_tz=BEIJING_TZ).utcoffset(), timedelta(0))
+        # 同一字符串在不同 default_tz 下分别缓存
+        self.assertIsNone(parse_datetime("2026-03-23 10:00").tzinfo)
+        naive = datetime(2026, 3, 23, 10, 0)
+        self.assertEqual(parse_datetime(naive, default_tz=timezone.utc).tzinfo, timezone.utc)
+
+    def test_invalid_values(self):
+        for value in ("", None, "not-a-date", "2026-13-45"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_datetime_or_none(value))
+                with self.assertRaises(ValueError):
+                    parse_datetime(value)
+
+    def test_repeated_strings_hit_cache(self):
+        for _ in range(3):
+            parse_datetime(" 2026-03-23T09:38:53+08:00 ")
+        info = parse_cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()